@@ -60,7 +60,7 @@ from privacyidea.api.lib.utils import get_all_params, hardening_action_active
 from privacyidea.config import ConfigKey
 from privacyidea.lib.auth import ROLE
 from privacyidea.lib.config import (get_multichallenge_enrollable_types, get_token_class, get_privacyidea_node)
-from privacyidea.lib.crypto import Sign
+from privacyidea.lib.crypto import get_sign_object
 from privacyidea.lib.error import PolicyError, ValidateError
 from privacyidea.lib.info.rss import FETCH_DAYS
 from privacyidea.lib.machine import get_auth_items
@@ -71,7 +71,7 @@ from privacyidea.lib.subscriptions import (subscription_status,
                                            check_subscription,
                                            SubscriptionError,
                                            EXPIRE_MESSAGE)
-from privacyidea.lib.token import get_tokens, assign_token, get_one_token, init_token
+from privacyidea.lib.token import get_tokens, assign_token, get_one_token, init_token, get_otp_index_candidates
 from privacyidea.lib.tokenclass import ChallengeSession
 from privacyidea.lib.tokenrolloutstate import RolloutState
 from privacyidea.lib.tokens.passkeytoken import PasskeyTokenClass
@@ -191,9 +191,9 @@ def sign_response(request, response):
     # Disable the costly checking of private RSA keys when loading them.
     check_private_key = not current_app.config.get(ConfigKey.RESPONSE_NO_PRIVATE_KEY_CHECK, False)
     try:
-        with open(private_key_file, 'rb') as file:
-            private_key = file.read()
-        sign_object = Sign(private_key, public_key=None, check_private_key=check_private_key)
+        if not private_key_file:
+            raise TypeError("No private key file configured")
+        sign_object = get_sign_object(private_key_file, check_private_key=check_private_key)
     except (OSError, ValueError, TypeError) as e:
         log.info('Could not load private key from '
                  f'file {private_key_file!s}: {e!r}!')
@@ -879,6 +879,9 @@ def autoassign(request, response):
                 # a matching OTP:
                 realm_tokens = get_tokens(realm=user.realm,
                                           assigned=False)
+                # Only check the tokens, which may create the OTP value according to the OTP index
+                realm_tokens = get_otp_index_candidates(
+                    realm_tokens, lambda realm_token: realm_token.split_pin_pass(password)[2])
 
                 for token in realm_tokens:
                     (res, pin, otp) = token.split_pin_pass(password)
@@ -22,7 +22,7 @@ import pathlib
 import sys
 import click
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.primitives import serialization
 from flask.cli import AppGroup
 from flask import current_app
@@ -143,26 +143,38 @@ def create_pgp_keys(ctx, keysize, force):
 
 @setup_cli.command("create_audit_keys")
 @click.option("-k", "--keysize", type=int, default=2048, show_default=True,
-              help="Create keys with the given size in bits")
+              help="Create RSA keys with the given size in bits")
+@click.option("-a", "--algorithm", type=click.Choice(["rsa", "ecdsa", "ed25519"]),
+              default="rsa", show_default=True,
+              help="Create keys for RSA-PSS, ECDSA with the curve P-256 or Ed25519 signatures")
 @click.pass_context
-def create_audit_keys(ctx, keysize):
+def create_audit_keys(ctx, keysize, algorithm):
     """
-    Create the RSA signing keys for the audit log.
+    Create the signing keys for the audit log and the responses.
 
-    You may specify a different key size.
-    The default key size is 2048 bit.
+    You may specify a different key size for RSA keys.
+    The default key size is 2048 bit. ECDSA and Ed25519 keys
+    are much faster to sign with.
     """
     priv_key = pathlib.Path(current_app.config.get("PI_AUDIT_KEY_PRIVATE"))
     if priv_key.is_file():
         click.secho(f"The file \n\t{priv_key}\nalready exist. We do not overwrite it!",
                     fg="yellow")
         ctx.exit(1)
-    new_key = rsa.generate_private_key(public_exponent=65537,
-                                       key_size=keysize,
-                                       backend=default_backend())
+    if algorithm == "ecdsa":
+        new_key = ec.generate_private_key(ec.SECP256R1())
+        private_format = serialization.PrivateFormat.PKCS8
+    elif algorithm == "ed25519":
+        new_key = ed25519.Ed25519PrivateKey.generate()
+        private_format = serialization.PrivateFormat.PKCS8
+    else:
+        new_key = rsa.generate_private_key(public_exponent=65537,
+                                           key_size=keysize,
+                                           backend=default_backend())
+        private_format = serialization.PrivateFormat.TraditionalOpenSSL
     priv_pem = new_key.private_bytes(
         encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        format=private_format,
         encryption_algorithm=serialization.NoEncryption())
     with open(priv_key, "wb") as f:
         f.write(priv_pem)
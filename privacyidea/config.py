@@ -74,6 +74,11 @@ class ConfigKey:
     REDIS_URL = "PI_REDIS_URL"
     REDIS_CACHE_CHALLENGES = "PI_REDIS_CACHE_CHALLENGES"
     REDIS_RETRY_COOLDOWN = "PI_REDIS_RETRY_COOLDOWN"
+    REDIS_CACHE_CONFIG = "PI_REDIS_CACHE_CONFIG"
+    REDIS_CONFIG_RECHECK = "PI_REDIS_CONFIG_RECHECK"
+    REDIS_CACHE_USERS = "PI_REDIS_CACHE_USERS"
+    REDIS_CACHE_RESOLVER_AUTH = "PI_REDIS_CACHE_RESOLVER_AUTH"
+    REDIS_CACHE_SUBSCRIPTION = "PI_REDIS_CACHE_SUBSCRIPTION"
 
     AUDIT_SQL_URI = "PI_AUDIT_SQL_URI"
     AUDIT_SQL_OPTIONS = "PI_AUDIT_SQL_OPTIONS"
@@ -85,8 +90,18 @@ class ConfigKey:
     AUDIT_SERVERNAME = "PI_AUDIT_SERVERNAME"
     AUDIT_SQL_TRUNCATE = "PI_AUDIT_SQL_TRUNCATE"
     AUDIT_NO_SIGN = "PI_AUDIT_NO_SIGN"
+    AUDIT_SIGN_NONCE = "PI_AUDIT_SIGN_NONCE"
+    AUDIT_SIGN_CHECKPOINT = "PI_AUDIT_SIGN_CHECKPOINT"
+    AUDIT_SIGN_CHECKPOINT_SIZE = "PI_AUDIT_SIGN_CHECKPOINT_SIZE"
+    AUDIT_SIGN_CHECKPOINT_INTERVAL = "PI_AUDIT_SIGN_CHECKPOINT_INTERVAL"
     AUDIT_NO_PRIVATE_KEY_CHECK = "PI_AUDIT_NO_PRIVATE_KEY_CHECK"
     AUDIT_SQL_COLUMN_LENGTH = "PI_AUDIT_SQL_COLUMN_LENGTH"
+    AUDIT_SQL_ASYNC = "PI_AUDIT_SQL_ASYNC"
+    AUDIT_SQL_ASYNC_QUEUE_SIZE = "PI_AUDIT_SQL_ASYNC_QUEUE_SIZE"
+    AUDIT_SQL_ASYNC_BATCH_SIZE = "PI_AUDIT_SQL_ASYNC_BATCH_SIZE"
+    AUDIT_SQL_ASYNC_FLUSH_INTERVAL = "PI_AUDIT_SQL_ASYNC_FLUSH_INTERVAL"
+    AUDIT_SQL_ASYNC_QUEUE_TIMEOUT = "PI_AUDIT_SQL_ASYNC_QUEUE_TIMEOUT"
+    AUDIT_SQL_ASYNC_SYNC_FALLBACK = "PI_AUDIT_SQL_ASYNC_SYNC_FALLBACK"
     CHECK_OLD_SIGNATURES = "PI_CHECK_OLD_SIGNATURES"
 
     LOGLEVEL = "PI_LOGLEVEL"
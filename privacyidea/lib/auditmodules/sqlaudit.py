@@ -37,15 +37,31 @@ Optional::
     PI_AUDIT_SQL_URI = "sqlite://"
     PI_AUDIT_SQL_TRUNCATE = True | False
     PI_AUDIT_SQL_COLUMN_LENGTH = {"user": 60, "info": 10 ...}
+    PI_AUDIT_SQL_ASYNC = True | False
+    PI_AUDIT_SIGN_NONCE = True | False
+    PI_AUDIT_SIGN_CHECKPOINT = True | False
 
 If the PI_AUDIT_SQL_URI is omitted the Audit data is written to the
 token database.
+
+With PI_AUDIT_SQL_ASYNC the entries are not written in the request but
+handed to a background thread, which writes them in batches.
+
+With PI_AUDIT_SIGN_CHECKPOINT the entries are hash-chained and only a
+checkpoint over a batch of entries is signed.
 """
 
+import atexit
 import datetime
+import hashlib
 import inspect
 import logging
+import os
+import queue
+import threading
+import time
 import traceback
+import uuid
 from collections import OrderedDict
 
 from sqlalchemy import asc, desc, and_, or_, select, delete, text
@@ -57,13 +73,15 @@ from sqlalchemy.sql.expression import FunctionElement
 
 from privacyidea.config import ConfigKey
 from privacyidea.lib.auditmodules.base import Audit as AuditBase, Paginate
-from privacyidea.lib.crypto import Sign
+from privacyidea.lib.crypto import get_sign_object
+from privacyidea.lib.framework import get_app_local_store
 from privacyidea.lib.lifecycle import register_finalizer
-from privacyidea.lib.pooling import get_engine
+from privacyidea.lib.pooling import get_engine, release_engine
 from privacyidea.lib.utils import censor_connect_string
 from privacyidea.lib.utils import (truncate_comma_list, is_true,
                                    convert_wildcard_to_sql_like, SQL_LIKE_ESCAPE)
 from privacyidea.models import Audit as LogEntry
+from privacyidea.models import AuditCheckpoint
 from privacyidea.models import audit_column_length as column_length
 
 log = logging.getLogger(__name__)
@@ -124,6 +142,450 @@ def _now():
     return datetime.datetime.now()
 
 
+_AUDIT_WRITER_KEY = "sqlaudit_writer"
+_audit_writer_lock = threading.Lock()
+# Tells the writer thread to stop after writing the entries queued before
+_STOP_WRITER = object()
+# Prefix of the signatures which cover the position in a NonceChain instead of the id of the entry
+NONCE_SIGNATURE_VERSION = "n1"
+NONCE_DATE_FORMAT = "%Y%m%d%H%M%S"
+# The number of exported audit entries, whose positions in the nonce chains are read with one query
+NONCE_POSITION_CHUNK_SIZE = 200
+_nonce_chain = None
+_nonce_chain_lock = threading.Lock()
+_AUDIT_CHAIN_KEY = "sqlaudit_chain"
+_audit_chain_lock = threading.Lock()
+# Prefix of the chain hashes, which are stored instead of a signature
+CHAIN_SIGNATURE_VERSION = "c1"
+# Seconds an entry may wait for its checkpoint longer than the checkpoint interval
+CHECKPOINT_GRACE_PERIOD = 60
+
+
+def _chain_hash(previous, data):
+    """
+    Hash an audit entry into the chain.
+
+    :param previous: The chain hash of the previous entry as hex string, empty for the first entry
+    :param data: The string representation of the audit entry
+    :return: The chain hash of the entry as hex string
+    """
+    return hashlib.sha256(f"{previous}:{data}".encode()).hexdigest()
+
+
+def _merkle_root(hashes):
+    """
+    Calculate the Merkle root of a list of hashes. An odd hash on a level is
+    paired with itself.
+
+    :param hashes: A list of hex encoded SHA-256 hashes
+    :return: The hex encoded root hash
+    """
+    level = [bytes.fromhex(h) for h in hashes]
+    if not level:
+        return ""
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def _split_leaves(leaves):
+    """
+    :param leaves: The concatenated hashes of a checkpoint
+    :return: The list of hex encoded hashes
+    """
+    leaves = leaves or ""
+    return [leaves[i:i + 64] for i in range(0, len(leaves), 64)]
+
+
+def _checkpoint_to_string(checkpoint):
+    """
+    Create the string of a checkpoint, which is signed.
+
+    :param checkpoint: The checkpoint
+    :type checkpoint: AuditCheckpoint
+    :rtype: str
+    """
+    return (f"chain={checkpoint.chain},first={checkpoint.first_sequence},last={checkpoint.last_sequence},"
+            f"previous={checkpoint.previous or ''},root={_merkle_root(_split_leaves(checkpoint.leaves))}")
+
+
+def _nonce_hash(data):
+    """
+    :param data: The string representation of an audit entry signed with a nonce
+    :return: The shortened hash of the entry, which the next entry of its chain is signed with
+    """
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class NonceChain:
+    """
+    The order of the audit entries, which are signed with a nonce by this process.
+
+    Every entry is signed with the next sequence number of the chain and the date and
+    hash of the previous entry. So a copy of an entry and an entry, which replaces
+    another one, are detected, although the signature does not cover the id.
+    The date of the previous entry is used to look it up on the indexed date column.
+    The hashes are shortened, since the signature column has to hold the nonce in
+    front of the signature.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.chain = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.previous_date = ""
+        self.previous = ""
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self):
+        return self.pid == os.getpid()
+
+    def add(self, le):
+        """
+        Add an audit entry to the chain.
+
+        :param le: LogEntry object, which is not yet written to the database
+        :type le: LogEntry
+        :return: a tuple of the nonce and the string of the entry to sign
+        """
+        with self._lock:
+            self.sequence += 1
+            nonce = ":".join([self.chain, str(self.sequence), self.previous_date, self.previous])
+            data = Audit._log_to_string(le, nonce)
+            self.previous_date = le.date.strftime(NONCE_DATE_FORMAT)
+            self.previous = _nonce_hash(data)
+        return nonce, data
+
+
+def _get_nonce_chain():
+    """
+    :return: the NonceChain of this process
+    """
+    global _nonce_chain
+    with _nonce_chain_lock:
+        if not (_nonce_chain and _nonce_chain.is_alive):
+            _nonce_chain = NonceChain()
+        return _nonce_chain
+
+
+class AuditChain:
+    """
+    The hash chain of the audit entries written by this process.
+
+    Each entry is hashed together with the hash of the previous entry and the
+    chain hash is stored in the signature column of the entry. After
+    ``checkpoint_size`` entries or ``checkpoint_interval`` seconds a checkpoint
+    is created, which contains the chain hashes since the last checkpoint and a
+    signature over their Merkle root. So only one signature is created for a
+    whole batch of entries.
+
+    A checkpoint that becomes due by time without further entries is written
+    by a timer thread, and the last checkpoint is written when the process exits.
+    Like the :py:class:`AuditWriter` the chain is process-local.
+    """
+
+    def __init__(self, engine, fingerprint=None, checkpoint_size=1000, checkpoint_interval=10.0):
+        """
+        :param engine: The SQLAlchemy engine to write checkpoints, which are not part of a transaction
+            of audit entries. It is owned by the chain.
+        :param fingerprint: A description of the configuration the chain was created with
+        :param checkpoint_size: The maximum number of entries covered by one checkpoint
+        :param checkpoint_interval: The maximum time in seconds an entry waits for its checkpoint
+        """
+        self.engine = engine
+        self.fingerprint = fingerprint
+        self.checkpoint_size = max(1, checkpoint_size)
+        self.checkpoint_interval = max(0.0, checkpoint_interval)
+        self.pid = os.getpid()
+        # The sequence numbers are only unique within the chain, hence every process uses a new chain
+        self.chain = uuid.uuid4().hex
+        self.sequence = 0
+        self.last_hash = ""
+        self.previous = ""
+        self.pending = []
+        self.sign_object = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._session_factory = sessionmaker(bind=self.engine)
+        atexit.register(self.close)
+
+    @property
+    def is_alive(self):
+        return self.pid == os.getpid()
+
+    def add(self, le, sign_object):
+        """
+        Add an audit entry to the chain and set its chain hash as signature.
+
+        :param le: LogEntry object, which is not yet written to the database
+        :type le: LogEntry
+        :param sign_object: The Sign object to sign the checkpoints with
+        :return: The AuditCheckpoint to write with the entry, if one is due, otherwise None
+        """
+        Audit._apply_defaults(le)
+        with self._lock:
+            self.sign_object = sign_object
+            self.sequence += 1
+            chain_hash = _chain_hash(self.last_hash,
+                                     Audit._log_to_string(le, f"{self.chain}:{self.sequence}"))
+            le.signature = ":".join([CHAIN_SIGNATURE_VERSION, self.chain, str(self.sequence), chain_hash])
+            self.last_hash = chain_hash
+            self.pending.append(chain_hash)
+            if len(self.pending) >= self.checkpoint_size:
+                return self._create_checkpoint()
+            if len(self.pending) == 1 and self.checkpoint_interval:
+                self._timer = threading.Timer(self.checkpoint_interval, self.write_checkpoint)
+                self._timer.daemon = True
+                self._timer.start()
+        return None
+
+    def _create_checkpoint(self):
+        """
+        Create and sign the checkpoint over the pending chain hashes. The lock must be held.
+
+        :return: an AuditCheckpoint or None if there are no pending hashes
+        """
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return None
+        checkpoint = AuditCheckpoint(chain=self.chain,
+                                     first_sequence=self.sequence - len(self.pending) + 1,
+                                     last_sequence=self.sequence,
+                                     previous=self.previous,
+                                     leaves="".join(self.pending),
+                                     date=_now())
+        checkpoint.signature = self.sign_object.sign(_checkpoint_to_string(checkpoint))
+        self.previous = self.last_hash
+        self.pending = []
+        return checkpoint
+
+    def write_checkpoint(self):
+        """
+        Create the checkpoint over the pending chain hashes and write it to the database.
+        """
+        if not self.is_alive:
+            return
+        with self._lock:
+            checkpoint = self._create_checkpoint()
+        if checkpoint:
+            self.store(checkpoint)
+
+    def store(self, checkpoint):
+        """
+        Write a checkpoint to the database in its own transaction.
+
+        :param checkpoint: The checkpoint to write
+        :type checkpoint: AuditCheckpoint
+        """
+        session = self._session_factory()
+        try:
+            session.add(checkpoint)
+            session.commit()
+        except Exception as exx:  # pragma: no cover
+            log.error(f"Could not write the audit checkpoint {checkpoint.chain}:{checkpoint.first_sequence}-"
+                      f"{checkpoint.last_sequence}: {exx!r}")
+            log.debug(f"{traceback.format_exc()!s}")
+            session.rollback()
+        finally:
+            session.close()
+
+    def close(self):
+        """
+        Write the last checkpoint of the chain.
+        """
+        atexit.unregister(self.close)
+        if self.is_alive:
+            self.write_checkpoint()
+            self.engine.dispose()
+
+
+class AuditWriter:
+    """
+    Background thread which writes audit entries to the database in batches.
+
+    The request threads only put the column values of their audit entry into a
+    bounded queue. The writer collects up to ``batch_size`` entries or waits at most
+    ``flush_interval`` seconds after the first entry of a batch and then writes the
+    whole batch in one transaction.
+
+    The writer is process-local. It does not survive a fork, so the audit module
+    starts a new one in a forked worker process.
+    """
+
+    def __init__(self, engine, fingerprint=None, queue_size=1000, batch_size=50, flush_interval=0.2):
+        """
+        :param engine: The SQLAlchemy engine to write the entries with. It is owned by the writer.
+        :param fingerprint: A description of the configuration the writer was created with
+        :param queue_size: The maximum number of entries waiting to be written
+        :param batch_size: The maximum number of entries written in one transaction
+        :param flush_interval: The maximum time in seconds an entry waits for its batch to fill up
+        """
+        self.engine = engine
+        self.fingerprint = fingerprint
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self._session_factory = sessionmaker(bind=self.engine)
+        self._thread = threading.Thread(target=self._run, name="privacyidea-audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @property
+    def is_alive(self):
+        return self.pid == os.getpid() and self._thread.is_alive()
+
+    def put(self, values, sign_object=None, timeout=None, sign_with_nonce=False, chain=None):
+        """
+        Queue an audit entry to be written.
+
+        :param values: The column values of the audit entry
+        :type values: dict
+        :param sign_object: The Sign object to sign the entry with or None
+        :param timeout: The time in seconds to wait for a free slot in a full queue.
+            ``None`` waits until the writer has made room.
+        :param sign_with_nonce: Sign the entry before it is inserted, see
+            :py:meth:`Audit._sign_with_nonce`
+        :param chain: The AuditChain to add the entry to instead of signing it
+        :return: True if the entry was queued, False if the queue stayed full
+        """
+        try:
+            self.queue.put((values, sign_object, sign_with_nonce, chain), timeout=timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self):
+        """
+        Wait until all queued entries have been written.
+        """
+        if self.is_alive:
+            self.queue.join()
+
+    def stop(self):
+        """
+        Write the queued entries and stop the writer thread.
+        """
+        atexit.unregister(self.stop)
+        if self.is_alive:
+            self.queue.put((_STOP_WRITER, None, False, None))
+            self._thread.join()
+            self.engine.dispose()
+
+    def _next_batch(self):
+        """
+        Wait for the next entry and collect the entries arriving until the batch is
+        full or the flush interval has passed.
+
+        :return: a tuple of the list of entries and a flag whether the writer has to stop
+        """
+        batch = []
+        item = self.queue.get()
+        if item[0] is _STOP_WRITER:
+            return batch, True
+        batch.append(item)
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] is _STOP_WRITER:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                # One task_done() for each entry and one for the stop marker
+                for _ in range(len(batch) + int(stop)):
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        """
+        Write a batch of audit entries in one transaction.
+
+        The entries are added to the session together and written with a single
+        flush and one commit. Entries signed with a nonce or added to a hash chain
+        are signed before. Otherwise, the signature covers the id of the entry, so
+        these entries are signed after the flush and the signatures are written in
+        the same transaction. Checkpoints of the hash chain, which became due, are
+        written afterwards.
+
+        If the batch can not be written, the entries are written one by one, so that
+        a single broken entry does not lose the whole batch.
+
+        :param batch: a list of tuples of column values, Sign object, nonce flag and chain
+        """
+        entries = []
+        checkpoints = []
+        for values, sign_object, sign_with_nonce, chain in batch:
+            le = LogEntry(**values)
+            try:
+                if sign_object and chain:
+                    checkpoint = chain.add(le, sign_object)
+                    if checkpoint:
+                        checkpoints.append((chain, checkpoint))
+                elif sign_object and sign_with_nonce:
+                    Audit._sign_with_nonce(le, sign_object)
+            except Exception as exx:  # pragma: no cover
+                # We rather write the entry without a signature than lose it
+                log.error(f"Could not sign the audit entry: {exx!r}")
+                log.debug(f"{traceback.format_exc()!s}")
+            # The signing applies the column defaults, so the entry is written with the signed values
+            column_values = {column.key: getattr(le, column.key) for column in LogEntry.__table__.columns
+                             if column.key != "id"}
+            entries.append((column_values, sign_object if not (sign_with_nonce or chain) else None))
+        if not self._insert(entries) and len(entries) > 1:
+            log.warning(f"Could not write {len(entries)} audit entries in one transaction, "
+                        "writing them one by one.")
+            for entry in entries:
+                self._insert([entry])
+        for chain, checkpoint in checkpoints:
+            chain.store(checkpoint)
+
+    def _insert(self, entries):
+        """
+        Insert audit entries in one transaction and sign the entries, whose
+        signature covers the id.
+
+        :param entries: a list of tuples of the column values and the Sign object
+            to sign the entry with after the INSERT
+        :return: True if the entries were written
+        """
+        session = self._session_factory()
+        try:
+            log_entries = [LogEntry(**values) for values, _sign_object in entries]
+            session.add_all(log_entries)
+            session.flush()
+            for le, (_values, sign_object) in zip(log_entries, entries):
+                if sign_object:
+                    le.signature = sign_object.sign(Audit._log_to_string(le))
+            session.commit()
+            return True
+        except Exception as exx:
+            log.error(f"Could not write {len(entries)} audit entries: {exx!r}")
+            if len(entries) == 1:
+                log.error(f"DATA: {entries[0][0]!s}")
+            log.debug(f"{traceback.format_exc()!s}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+
 class Audit(AuditBase):
     """
     This is the SQLAudit module, which writes the audit entries
@@ -151,9 +613,33 @@ class Audit(AuditBase):
     * ``PI_AUDIT_SQL_TRUNCATE``
     * ``PI_AUDIT_NO_SIGN``
     * ``PI_CHECK_OLD_SIGNATURES``
+    * ``PI_AUDIT_SQL_ASYNC``
+    * ``PI_AUDIT_SIGN_NONCE``
+    * ``PI_AUDIT_SIGN_CHECKPOINT``
 
     You can use ``PI_AUDIT_NO_SIGN = True`` to avoid signing of the audit log.
 
+    By default, the signature of an entry covers its id, so that the entry is
+    written twice: once to get the id and again with the signature. With
+    ``PI_AUDIT_SIGN_NONCE = True`` the signature covers the position of the entry
+    in the :py:class:`NonceChain` of the process instead, which is stored with the
+    signature, and the entry is written with a single INSERT. Entries of both kinds
+    are verified.
+
+    With ``PI_AUDIT_SIGN_CHECKPOINT = True`` the entries are not signed at all,
+    but added to an :py:class:`AuditChain`, and only the checkpoints over
+    ``PI_AUDIT_SIGN_CHECKPOINT_SIZE`` entries or ``PI_AUDIT_SIGN_CHECKPOINT_INTERVAL``
+    seconds are signed. Entries, which are not yet covered by a checkpoint, are
+    reported as ``PENDING``, until the checkpoint interval has passed.
+
+    With ``PI_AUDIT_SQL_ASYNC = True`` the entries are written by a background
+    :py:class:`AuditWriter`. It is tuned with ``PI_AUDIT_SQL_ASYNC_QUEUE_SIZE``,
+    ``PI_AUDIT_SQL_ASYNC_BATCH_SIZE``, ``PI_AUDIT_SQL_ASYNC_FLUSH_INTERVAL`` and
+    ``PI_AUDIT_SQL_ASYNC_QUEUE_TIMEOUT`` (both in milliseconds). If the queue is
+    still full after the timeout, the entry is written in the request, unless
+    ``PI_AUDIT_SQL_ASYNC_SYNC_FALLBACK = False``, which makes the request wait
+    for the writer.
+
     If ``PI_CHECK_OLD_SIGNATURES = True`` old style signatures (text-book RSA) will
     be checked as well, otherwise they will be marked as ``FAIL``.
     """
@@ -165,23 +651,31 @@ class Audit(AuditBase):
         self.name = "sqlaudit"
         self.sign_data = not self.config.get(ConfigKey.AUDIT_NO_SIGN)
         self.sign_object = None
+        self.sign_with_nonce = bool(self.config.get(ConfigKey.AUDIT_SIGN_NONCE, False))
+        self.sign_checkpoints = bool(self.config.get(ConfigKey.AUDIT_SIGN_CHECKPOINT, False))
         self.verify_old_sig = self.config.get(ConfigKey.CHECK_OLD_SIGNATURES)
         # Disable the costly checking of private RSA keys when loading them.
         self.check_private_key = not self.config.get(ConfigKey.AUDIT_NO_PRIVATE_KEY_CHECK, False)
         if self.sign_data:
-            self.read_keys(self.config.get(ConfigKey.AUDIT_KEY_PUBLIC),
-                           self.config.get(ConfigKey.AUDIT_KEY_PRIVATE))
-            self.sign_object = Sign(self.private, self.public,
-                                    check_private_key=self.check_private_key)
+            # The parsed keys are shared with the response signing and only read
+            # again if one of the key files changes.
+            try:
+                self.sign_object = get_sign_object(self.config.get(ConfigKey.AUDIT_KEY_PRIVATE),
+                                                   self.config.get(ConfigKey.AUDIT_KEY_PUBLIC),
+                                                   check_private_key=self.check_private_key)
+            except Exception as e:
+                log.error(f"Error reading key file: {e!r}")
+                log.debug(traceback.format_exc())
+                raise e
         # Read column_length from the config file
         config_column_length = self.config.get(ConfigKey.AUDIT_SQL_COLUMN_LENGTH, {})
         # fill the missing parts with the default from the models
         self.custom_column_length = {k: (v if k not in config_column_length else config_column_length[k])
                                      for k, v in column_length.items()}
         # We can use "sqlaudit" as the key because the SQLAudit connection
-        # string is fixed for a running privacyIDEA instance.
-        # In other words, we will not run into any problems with changing connect strings.
-        self.engine = get_engine(self.name, self._create_engine)
+        # string is fixed for a running privacyIDEA instance. Should the configuration
+        # change nevertheless, the fingerprint makes a shared registry replace the engine.
+        self.engine = get_engine(self.name, self._create_engine, self._engine_fingerprint())
         # create a configured "Session" class. ``scoped_session`` is not
         # necessary because we do not share session objects among threads.
         # We use it anyway as a safety measure.
@@ -194,6 +688,22 @@ class Audit(AuditBase):
         # Lazily determined by _get_id_stride(), cached per instance since a single
         # instance serves an entire request (e.g. one page of audit entries).
         self._id_stride = None
+        # The checkpoints read by _get_checkpoint() with the result of their verification
+        self._checkpoints = []
+        # The entries of the nonce chains last read by _load_nonce_positions() by chain,
+        # sequence and date, and the ids of the entries, whose positions they cover
+        self._nonce_positions = {}
+        self._nonce_positions_loaded = set()
+
+    def _engine_fingerprint(self):
+        """
+        :return: a hashable description of the configuration the audit engine is created with
+        """
+        return (self.config.get(ConfigKey.AUDIT_SQL_URI, self.config.get(ConfigKey.SQLALCHEMY_DATABASE_URI)),
+                repr(self.config.get(ConfigKey.AUDIT_SQL_OPTIONS,
+                                     self.config.get(ConfigKey.SQLALCHEMY_ENGINE_OPTIONS, {}))),
+                self.config.get(ConfigKey.AUDIT_POOL_SIZE),
+                self.config.get(ConfigKey.AUDIT_POOL_RECYCLE))
 
     def _create_engine(self):
         """
@@ -223,9 +733,13 @@ class Audit(AuditBase):
         return create_engine(connect_string, **engine_kwargs)
 
     def _finalize_session(self):
-        """ Close current session and dispose connections of db engine"""
+        """
+        Close the current session and hand the engine back to the engine registry.
+        A shared registry keeps the connections in its pool for the next request,
+        otherwise the connections of the engine are closed.
+        """
         self.session.close()
-        self.engine.dispose()
+        release_engine(self.engine)
 
     def _truncate_data(self):
         """
@@ -372,6 +886,92 @@ class Audit(AuditBase):
             self.session.close()
         return count
 
+    def _get_audit_writer(self):
+        """
+        Return the background writer of this process and start it if necessary.
+
+        :return: an AuditWriter
+        """
+        fingerprint = (self._engine_fingerprint(),
+                       self.config.get(ConfigKey.AUDIT_SQL_ASYNC_QUEUE_SIZE, 1000),
+                       self.config.get(ConfigKey.AUDIT_SQL_ASYNC_BATCH_SIZE, 50),
+                       self.config.get(ConfigKey.AUDIT_SQL_ASYNC_FLUSH_INTERVAL, 200))
+        app_store = get_app_local_store()
+        writer = app_store.get(_AUDIT_WRITER_KEY)
+        if writer and writer.is_alive and writer.fingerprint == fingerprint:
+            return writer
+        with _audit_writer_lock:
+            writer = app_store.get(_AUDIT_WRITER_KEY)
+            if not (writer and writer.is_alive and writer.fingerprint == fingerprint):
+                if writer:
+                    writer.stop()
+                log.info("Starting the background writer for the audit log.")
+                writer = AuditWriter(self._create_engine(), fingerprint,
+                                     queue_size=int(fingerprint[1]),
+                                     batch_size=int(fingerprint[2]),
+                                     flush_interval=int(fingerprint[3]) / 1000)
+                app_store[_AUDIT_WRITER_KEY] = writer
+            return writer
+
+    def _get_audit_chain(self):
+        """
+        Return the hash chain of this process and start a new one if necessary.
+
+        :return: an AuditChain
+        """
+        fingerprint = (self._engine_fingerprint(),
+                       self.config.get(ConfigKey.AUDIT_SIGN_CHECKPOINT_SIZE, 1000),
+                       self.config.get(ConfigKey.AUDIT_SIGN_CHECKPOINT_INTERVAL, 10))
+        app_store = get_app_local_store()
+        chain = app_store.get(_AUDIT_CHAIN_KEY)
+        if chain and chain.is_alive and chain.fingerprint == fingerprint:
+            return chain
+        with _audit_chain_lock:
+            chain = app_store.get(_AUDIT_CHAIN_KEY)
+            if not (chain and chain.is_alive and chain.fingerprint == fingerprint):
+                if chain:
+                    chain.close()
+                chain = AuditChain(self._create_engine(), fingerprint,
+                                   checkpoint_size=int(fingerprint[1]),
+                                   checkpoint_interval=float(fingerprint[2]))
+                log.info(f"Starting the audit hash chain {chain.chain}.")
+                app_store[_AUDIT_CHAIN_KEY] = chain
+            return chain
+
+    def _write_async(self, values):
+        """
+        Hand the audit entry to the background writer.
+
+        :param values: The column values of the audit entry
+        :return: True if the entry was queued, False if it has to be written synchronously
+        """
+        writer = self._get_audit_writer()
+        sign_object = self.sign_object if self.sign_data else None
+        chain = self._get_audit_chain() if sign_object and self.sign_checkpoints else None
+        timeout = self.config.get(ConfigKey.AUDIT_SQL_ASYNC_QUEUE_TIMEOUT, 50) / 1000
+        if writer.put(values, sign_object, timeout=timeout, sign_with_nonce=self.sign_with_nonce, chain=chain):
+            return True
+        if self.config.get(ConfigKey.AUDIT_SQL_ASYNC_SYNC_FALLBACK, True):
+            log.warning("The audit queue is full, writing the audit entry synchronously.")
+            return False
+        log.warning("The audit queue is full, waiting for the audit writer.")
+        return writer.put(values, sign_object, sign_with_nonce=self.sign_with_nonce, chain=chain)
+
+    def flush(self):
+        """
+        Wait until the background writer has written all queued audit entries.
+        Without ``PI_AUDIT_SQL_ASYNC`` the entries are already written.
+        With ``PI_AUDIT_SIGN_CHECKPOINT`` the checkpoint over the pending entries
+        is written as well.
+        """
+        app_store = get_app_local_store()
+        writer = app_store.get(_AUDIT_WRITER_KEY)
+        if writer:
+            writer.flush()
+        chain = app_store.get(_AUDIT_CHAIN_KEY)
+        if chain:
+            chain.write_checkpoint()
+
     def finalize_log(self):
         """
         This method is used to log the data.
@@ -393,7 +993,7 @@ class Audit(AuditBase):
                 duration = end_date - self.audit_data.get("startdate")
             else:
                 duration = None
-            le = LogEntry(action=self.audit_data.get("action"),
+            values = dict(action=self.audit_data.get("action"),
                           success=int(self.audit_data.get("success", 0)),
                           authentication=self.audit_data.get("authentication"),
                           serial=self.audit_data.get("serial"),
@@ -416,12 +1016,29 @@ class Audit(AuditBase):
                           startdate=self.audit_data.get("startdate"),
                           duration=duration,
                           date=end_date,
-                          thread_id=self.audit_data.get("thread_id")
-                          )
+                          thread_id=self.audit_data.get("thread_id"))
+            if self.config.get(ConfigKey.AUDIT_SQL_ASYNC) and self._write_async(values):
+                return
+            le = LogEntry(**values)
+            chain = None
+            checkpoint = None
+            if self.sign_data and self.sign_object and (self.sign_with_nonce or self.sign_checkpoints):
+                try:
+                    if self.sign_checkpoints:
+                        chain = self._get_audit_chain()
+                        checkpoint = chain.add(le, self.sign_object)
+                    else:
+                        self._sign_with_nonce(le, self.sign_object)
+                except Exception as exx:  # pragma: no cover
+                    # We rather write the entry without a signature than lose it
+                    log.error(f"Could not sign the audit entry: {exx!r}")
+                    log.debug(f"{traceback.format_exc()!s}")
             self.session.add(le)
             self.session.commit()
+            if checkpoint:
+                chain.store(checkpoint)
             # Add the signature
-            if self.sign_data and self.sign_object:
+            if self.sign_data and self.sign_object and not (self.sign_with_nonce or self.sign_checkpoints):
                 s = self._log_to_string(le)
                 sign = self.sign_object.sign(s)
                 le.signature = sign
@@ -502,7 +1119,125 @@ class Audit(AuditBase):
         return res
 
     @staticmethod
-    def _log_to_string(le):
+    def _sign_with_nonce(le, sign_object):
+        """
+        Sign a log entry before it is written to the database.
+
+        The signature can not cover the id, which is only known after the INSERT.
+        Instead, it covers the position of the entry in the :py:class:`NonceChain`
+        of this process and the hash of the previous entry of the chain. This nonce
+        is stored in front of the signature like
+        ``n1:<chain>:<sequence>:<previous date>:<previous hash>:rsa_sha256_pss:<signature>``.
+
+        The signature has to match the entry as it is read back from the database.
+        Hence, the column defaults are applied to empty values.
+
+        :param le: LogEntry object, which is not yet written to the database
+        :type le: LogEntry
+        :param sign_object: The Sign object to sign the entry with
+        """
+        Audit._apply_defaults(le)
+        nonce, data = _get_nonce_chain().add(le)
+        le.signature = ":".join([NONCE_SIGNATURE_VERSION, nonce, sign_object.sign(data)])
+
+    @staticmethod
+    def _apply_defaults(le):
+        """
+        Apply the column defaults to the empty values of a log entry, which is not
+        yet written to the database, so that it is signed like it is read back.
+
+        :param le: LogEntry object, which is not yet written to the database
+        :type le: LogEntry
+        """
+        for column in LogEntry.__table__.columns:
+            if column.default is not None and column.default.is_scalar and getattr(le, column.key) is None:
+                setattr(le, column.key, column.default.arg)
+
+    @staticmethod
+    def _split_signature(signature):
+        """
+        Split the nonce off a signature written by :py:meth:`_sign_with_nonce`.
+
+        :param signature: The signature column of a log entry
+        :return: a tuple of the nonce (or None for signatures covering the id) and the signature
+        """
+        if signature and signature.startswith(NONCE_SIGNATURE_VERSION + ":"):
+            _version, chain, sequence, previous_date, previous, signature = signature.split(":", 5)
+            return ":".join([chain, sequence, previous_date, previous]), signature
+        return None, signature
+
+    def _load_nonce_positions(self, audit_entries):
+        """
+        Read the entries of the nonce chains, which the positions of the given entries
+        are checked against, with a single query: The entries with the same position and
+        the previous entries of the chains. They are looked up by their signed date, so
+        only the index on the date is used.
+
+        :param audit_entries: A list of LogEntry objects read from the database
+        """
+        self._nonce_positions = {}
+        self._nonce_positions_loaded = set()
+        dates = set()
+        chains = set()
+        for audit_entry in audit_entries:
+            nonce, _signature = self._split_signature(audit_entry.signature)
+            if not nonce:
+                continue
+            chain, _sequence, previous_date, _previous = nonce.split(":")
+            chains.add(chain)
+            dates.add(audit_entry.date.replace(microsecond=0))
+            if previous_date:
+                dates.add(datetime.datetime.strptime(previous_date, NONCE_DATE_FORMAT))
+            self._nonce_positions_loaded.add(audit_entry.id)
+        if not chains:
+            return
+        stmt = select(LogEntry).where(
+            or_(*[and_(LogEntry.date >= date, LogEntry.date < date + datetime.timedelta(seconds=1))
+                  for date in dates]),
+            or_(*[LogEntry.signature.startswith(f"{NONCE_SIGNATURE_VERSION}:{chain}:", autoescape=True)
+                  for chain in chains]))
+        for le in self.session.scalars(stmt).all():
+            # The entries are only read, so they are kept apart from the session
+            self.session.expunge(le)
+            nonce, _signature = self._split_signature(le.signature)
+            chain, sequence, _previous_date, _previous = nonce.split(":")
+            key = (chain, int(sequence), le.date.replace(microsecond=0))
+            self._nonce_positions.setdefault(key, {})[le.id] = le
+
+    def _verify_nonce_position(self, audit_entry, nonce):
+        """
+        Check the position of an entry signed with a nonce: No other entry may have
+        the same position in the nonce chain and the previous entry of the chain has
+        to match the hash the entry was signed with. The entries of the chains are read
+        by :py:meth:`_load_nonce_positions`, for all entries of a page at once.
+
+        A previous entry, which does not exist anymore, is not reported here. Deleted
+        entries are found by :py:meth:`_check_missing`.
+
+        :param audit_entry: The LogEntry object read from the database
+        :param nonce: The nonce of the entry
+        :return: True or False
+        """
+        if audit_entry.id not in self._nonce_positions_loaded:
+            self._load_nonce_positions([audit_entry])
+        chain, sequence, previous_date, previous = nonce.split(":")
+        sequence = int(sequence)
+        same_position = self._nonce_positions.get((chain, sequence, audit_entry.date.replace(microsecond=0)), {})
+        if len(same_position) != 1:
+            log.warning(f"The audit entry {audit_entry.id} was copied.")
+            return False
+        if not previous_date:
+            return True
+        previous_date = datetime.datetime.strptime(previous_date, NONCE_DATE_FORMAT)
+        previous_entries = self._nonce_positions.get((chain, sequence - 1, previous_date))
+        if not previous_entries:
+            return True
+        previous_entry = next(iter(previous_entries.values()))
+        previous_nonce, _signature = self._split_signature(previous_entry.signature)
+        return _nonce_hash(self._log_to_string(previous_entry, previous_nonce)) == previous
+
+    @staticmethod
+    def _log_to_string(le, nonce=None):
         """
         This function creates a string from the logentry so
         that this string can be signed.
@@ -512,15 +1247,27 @@ class Audit(AuditBase):
 
         :param le: LogEntry object containing the data
         :type le: LogEntry
+        :param nonce: The nonce of an entry which is signed before it is written.
+            It replaces the id in the string. Not all databases store fractions of a
+            second, so the dates of such an entry are represented in whole seconds.
+        :type nonce: str or None
         :rtype str
         """
         # TODO: Add thread_id. We really should add a versioning to identify which audit data is signed.
-        s = f"id={le.id},date={le.date},action={le.action},succ={le.success},serial={le.serial}," \
-            f"t={le.token_type},u={le.user},r={le.realm},adm={le.administrator},ad={le.action_detail}," \
-            f"i={le.info},ps={le.privacyidea_server},c={le.client},l={le.loglevel},cl={le.clearance_level}"
+        date = le.date
+        startdate = le.startdate
+        if nonce:
+            s = f"nonce={nonce},"
+            date = date.replace(microsecond=0) if date else date
+            startdate = startdate.replace(microsecond=0) if startdate else startdate
+        else:
+            s = f"id={le.id},"
+        s += f"date={date},action={le.action},succ={le.success},serial={le.serial}," \
+             f"t={le.token_type},u={le.user},r={le.realm},adm={le.administrator},ad={le.action_detail}," \
+             f"i={le.info},ps={le.privacyidea_server},c={le.client},l={le.loglevel},cl={le.clearance_level}"
         # If we have the new log entries, we also add them for signing and verification.
-        if le.startdate:
-            s += f",{le.startdate!s}"
+        if startdate:
+            s += f",{startdate!s}"
         if le.duration:
             s += f",{le.duration!s}"
         if le.container_serial:
@@ -578,7 +1325,9 @@ class Audit(AuditBase):
         stmt = select(LogEntry).where(filter_condition).order_by(LogEntry.date)
         logentries = self.session.scalars(stmt).all()
 
-        for le in logentries:
+        for i, le in enumerate(logentries):
+            if self.sign_data and i % NONCE_POSITION_CHUNK_SIZE == 0:
+                self._load_nonce_positions(logentries[i:i + NONCE_POSITION_CHUNK_SIZE])
             audit_dict = self.audit_entry_to_dict(le)
             yield ",".join([f"'{x!s}'" for x in audit_dict.values()]) + "\n"
 
@@ -629,9 +1378,13 @@ class Audit(AuditBase):
         if paging_object.total > (page_size * page):
             paging_object.next = page + 1
 
-        auditIter = self.search_query(search_dict, admin_params=admin_params, page_size=page_size,
-                                      page=page, sortorder=sortorder,
-                                      timelimit=timelimit)
+        logentries = list(self.search_query(search_dict, admin_params=admin_params, page_size=page_size,
+                                            page=page, sortorder=sortorder,
+                                            timelimit=timelimit))
+        if self.sign_data:
+            # The positions of all entries of the page in the nonce chains are read at once
+            self._load_nonce_positions(logentries)
+        auditIter = iter(logentries)
         while True:
             try:
                 le = next(auditIter)
@@ -710,15 +1463,97 @@ class Audit(AuditBase):
         """
         stmt = delete(LogEntry)
         self.session.execute(stmt)
+        self.session.execute(delete(AuditCheckpoint))
         self.session.commit()
 
+    def _get_checkpoint(self, chain, sequence):
+        """
+        Read the checkpoint, which covers an entry of a hash chain, and verify its signature.
+        The checkpoints are kept, since the entries of a page mostly share one.
+
+        :param chain: The id of the chain
+        :param sequence: The sequence number of the entry in the chain
+        :return: a tuple of the checkpoint, the result of its verification and its
+            chain hashes or None, if the entry is not yet covered by a checkpoint
+        """
+        for checkpoint in self._checkpoints:
+            if checkpoint[0].chain == chain and \
+                    checkpoint[0].first_sequence <= sequence <= checkpoint[0].last_sequence:
+                return checkpoint
+        stmt = select(AuditCheckpoint).where(AuditCheckpoint.chain == chain,
+                                             AuditCheckpoint.first_sequence <= sequence,
+                                             AuditCheckpoint.last_sequence >= sequence)
+        audit_checkpoint = self.session.scalars(stmt).first()
+        if not audit_checkpoint:
+            return None
+        hashes = _split_leaves(audit_checkpoint.leaves)
+        valid = (len(hashes) == audit_checkpoint.last_sequence - audit_checkpoint.first_sequence + 1
+                 and self.sign_object.verify(_checkpoint_to_string(audit_checkpoint), audit_checkpoint.signature))
+        if not valid:
+            log.warning(f"The signature of the audit checkpoint {audit_checkpoint.id} is invalid.")
+        checkpoint = (audit_checkpoint, valid, hashes)
+        self._checkpoints.append(checkpoint)
+        return checkpoint
+
+    def _check_pending(self, audit_entry, chain, sequence):
+        """
+        Check if an entry, which is not covered by a checkpoint, may still wait for it.
+
+        The checkpoint is missing, if the chain already has a checkpoint after the
+        entry or if the entry is older than the checkpoint interval, since the
+        checkpoint would have been written by then. A grace period allows for
+        the delay of the background writer.
+
+        :param audit_entry: The LogEntry object read from the database
+        :param chain: The id of the chain
+        :param sequence: The sequence number of the entry in the chain
+        :return: None if the entry is pending, otherwise False
+        """
+        stmt = select(AuditCheckpoint.id).where(AuditCheckpoint.chain == chain,
+                                                AuditCheckpoint.first_sequence > sequence).limit(1)
+        if self.session.scalars(stmt).first() is not None:
+            log.warning(f"The audit entry {audit_entry.id} is not covered by a checkpoint of its chain.")
+            return False
+        interval = float(self.config.get(ConfigKey.AUDIT_SIGN_CHECKPOINT_INTERVAL, 10))
+        if interval and audit_entry.date < _now() - datetime.timedelta(seconds=interval + CHECKPOINT_GRACE_PERIOD):
+            log.warning(f"The checkpoint of the audit entry {audit_entry.id} is missing.")
+            return False
+        return None
+
+    def _verify_chain_hash(self, audit_entry):
+        """
+        Verify an entry, which was added to a hash chain, against the signed
+        checkpoint covering it.
+
+        :param audit_entry: The LogEntry object read from the database
+        :return: True or False, or None if the entry still waits for its checkpoint
+        """
+        _version, chain, sequence, chain_hash = audit_entry.signature.split(":", 3)
+        sequence = int(sequence)
+        checkpoint = self._get_checkpoint(chain, sequence)
+        if checkpoint is None:
+            return self._check_pending(audit_entry, chain, sequence)
+        audit_checkpoint, valid, hashes = checkpoint
+        index = sequence - audit_checkpoint.first_sequence
+        previous = hashes[index - 1] if index else audit_checkpoint.previous or ""
+        return bool(valid and hashes[index] == chain_hash ==
+                    _chain_hash(previous, self._log_to_string(audit_entry, f"{chain}:{sequence}")))
+
     def audit_entry_to_dict(self, audit_entry):
         sig = None
+        pending = False
         if self.sign_data:
             try:
-                sig = self.sign_object.verify(self._log_to_string(audit_entry),
-                                              audit_entry.signature,
-                                              self.verify_old_sig)
+                if audit_entry.signature and audit_entry.signature.startswith(CHAIN_SIGNATURE_VERSION + ":"):
+                    sig = self._verify_chain_hash(audit_entry)
+                    pending = sig is None
+                else:
+                    nonce, signature = self._split_signature(audit_entry.signature)
+                    sig = self.sign_object.verify(self._log_to_string(audit_entry, nonce),
+                                                  signature,
+                                                  self.verify_old_sig)
+                    if sig and nonce:
+                        sig = self._verify_nonce_position(audit_entry, nonce)
             except UnicodeDecodeError as _e:
                 # TODO: Unless we trace and eliminate the broken unicode in the
                 #  audit_entry, we will get issues when packing the response.
@@ -731,7 +1566,7 @@ class Audit(AuditBase):
         audit_dict = OrderedDict()
         audit_dict['number'] = audit_entry.id
         audit_dict['date'] = audit_entry.date.isoformat()
-        audit_dict['sig_check'] = "OK" if sig else "FAIL"
+        audit_dict['sig_check'] = "PENDING" if pending else "OK" if sig else "FAIL"
         audit_dict['missing_line'] = "OK" if is_not_missing else "FAIL"
         audit_dict['action'] = audit_entry.action
         audit_dict['authentication'] = audit_entry.authentication
@@ -8,6 +8,12 @@ from privacyidea.lib.cache.redis import (  # noqa: F401
     evict_transaction,
     evict_challenges_for_serial,
     get_challenges_from_cache,
+    cache_resolver_lookup,
+    get_resolver_lookup_from_cache,
+    evict_resolver_lookups,
+    cache_resolver_auth_header,
+    get_resolver_auth_header_from_cache,
+    evict_resolver_auth_header,
     CacheState,
     ChallengeDTO,
 )
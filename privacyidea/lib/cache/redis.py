@@ -314,6 +314,346 @@ def _disable_redis(e: Exception):
     # issues vs. one-off blips.
 
 
+# Channel on which every config change is announced, see ``publish_config_change``.
+_CONFIG_CHANNEL = "pi:config:changed"
+
+# Serialises the creation of the config change listener, like ``_connect_lock``.
+_listener_lock = threading.Lock()
+
+
+class ConfigChangeListener:
+    """
+    Subscribes to the config change channel in a background thread.
+
+    Every received message increments ``version``. The shared config object
+    compares this version instead of polling the config timestamp in the
+    database, so a worker learns about a config change immediately.
+
+    If the subscription fails, ``connected`` becomes False and the worker falls
+    back to polling the database until a new listener is connected. A new
+    listener starts with version 0; as messages may have been missed in between,
+    the shared config object reloads the config for every new listener.
+    """
+
+    def __init__(self, client: "redis_lib.Redis"):
+        self.pid = os.getpid()
+        self.version = 0
+        self._version_lock = threading.Lock()
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{_CONFIG_CHANNEL: self._on_message})
+        self.connected = True
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True,
+                                                  exception_handler=self._on_error)
+
+    def _on_message(self, message):
+        self.notify()
+
+    def _on_error(self, error, pubsub, thread):
+        # This runs in the listener thread, which has no application context, so the
+        # next request notices the lost subscription and connects a new listener.
+        log.warning("Lost the subscription to the config change channel: %s - "
+                    "polling the config timestamp from the database.", error)
+        self.connected = False
+        thread.stop()
+
+    def notify(self):
+        """
+        Mark the config as changed.
+        """
+        with self._version_lock:
+            self.version += 1
+
+    def stop(self):
+        self.connected = False
+        self._thread.stop()
+
+
+def get_config_change_listener() -> ConfigChangeListener | None:
+    """
+    Return the config change listener of this process, or ``None``.
+
+    The listener is only used if ``PI_REDIS_CACHE_CONFIG`` is set and Redis is
+    reachable. Like the Redis client, the listener is created again in a forked
+    worker and after it lost its subscription.
+    """
+    client = redis_client_for_feature("config")
+    if client is None:
+        return None
+    store = get_app_local_store()
+    listener = store.get('_config_change_listener')
+    if listener is not None and listener.pid == os.getpid() and listener.connected:
+        return listener
+    with _listener_lock:
+        listener = store.get('_config_change_listener')
+        if listener is not None and listener.pid == os.getpid() and listener.connected:
+            return listener
+        try:
+            listener = ConfigChangeListener(client)
+        except (redis_lib.exceptions.RedisError, OSError) as e:
+            _disable_redis(e)
+            return None
+        store['_config_change_listener'] = listener
+        log.info("Subscribed to the config change channel.")
+        return listener
+
+
+def publish_config_change():
+    """
+    Announce a committed config change to all workers.
+
+    The listener of this process is notified directly, so the current request
+    already reloads the changed config. If publishing fails, the other workers
+    notice the change when they check the config timestamp in the database
+    (see ``PI_REDIS_CONFIG_RECHECK``).
+    """
+    client = redis_client_for_feature("config")
+    if client is None:
+        return
+    listener = get_app_local_store().get('_config_change_listener')
+    if listener is not None and listener.pid == os.getpid():
+        listener.notify()
+    try:
+        client.publish(_CONFIG_CHANNEL, str(os.getpid()))
+    except (redis_lib.exceptions.RedisError, OSError) as e:
+        _disable_redis(e)
+
+
+# User lookups of the LDAP resolvers, shared by all workers. The namespace is made of the
+# resolver name and the resolver id, which is a hash of its connection and mapping config.
+_RESOLVER_KEY = "pi:resolver:{}:{}:{}"  # pi:resolver:<name>:<resolver id>:<function>:<key> -> JSON
+_RESOLVER_KEYS_KEY = "pi:resolver_keys:{}"  # pi:resolver_keys:<name> -> SET of the lookup keys
+
+
+def _resolver_key(resolver_name: str, resolver_id: str, func_name: str, key: str) -> str:
+    return _RESOLVER_KEY.format(f"{resolver_name}:{resolver_id}", func_name, key)
+
+
+def cache_resolver_lookup(resolver_name: str, resolver_id: str, func_name: str, key: str,
+                          value, timestamp: float, ttl: int):
+    """
+    Store the result of a resolver lookup in Redis for ``ttl`` seconds.
+
+    Skips silently if ``PI_REDIS_CACHE_USERS`` is not set, Redis is not reachable
+    or the value can not be stored as JSON (e.g. a binary LDAP attribute). The
+    lookup is then only cached in the per-process cache of the resolver.
+
+    :param value: the result of the lookup
+    :param timestamp: the time of the lookup as UNIX timestamp
+    :param ttl: the cache timeout of the resolver
+    """
+    r = redis_client_for_feature("users")
+    if r is None:
+        return
+    try:
+        payload = json.dumps({"value": value, "timestamp": timestamp})
+    except (TypeError, ValueError) as e:
+        log.debug(f"Not caching the {func_name!r} result of resolver {resolver_name!r} in Redis: {e}")
+        return
+    lookup_key = _resolver_key(resolver_name, resolver_id, func_name, key)
+    keys_key = _RESOLVER_KEYS_KEY.format(resolver_name)
+    try:
+        pipe = r.pipeline()
+        pipe.set(lookup_key, payload, ex=ttl)
+        # The index of the keys of the resolver lives as long as its longest-lived lookup, like
+        # the serial set of the challenges. Keys of expired lookups stay in it until then.
+        pipe.sadd(keys_key, lookup_key)
+        pipe.expire(keys_key, ttl, nx=True)
+        pipe.expire(keys_key, ttl, gt=True)
+        pipe.execute()
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
+def get_resolver_lookup_from_cache(resolver_name: str, resolver_id: str, func_name: str,
+                                   key: str) -> "tuple[object, float] | CacheState":
+    """
+    Return the result of a resolver lookup stored by another worker.
+
+    :return: tuple of the cached value and the time of the lookup as UNIX timestamp,
+        ``CacheState.MISS`` if there is no entry or ``CacheState.UNAVAILABLE`` if the
+        shared cache can not be used. In both cases the resolver asks its server.
+    """
+    r = redis_client_for_feature("users")
+    if r is None:
+        return CacheState.UNAVAILABLE
+    try:
+        raw = r.get(_resolver_key(resolver_name, resolver_id, func_name, key))
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+        return CacheState.UNAVAILABLE
+    if raw is None:
+        return CacheState.MISS
+    try:
+        entry = json.loads(raw)
+        return entry["value"], float(entry["timestamp"])
+    except (TypeError, ValueError, KeyError) as e:
+        log.warning(f"Ignoring a malformed {func_name!r} entry of resolver {resolver_name!r} in Redis: {e}")
+        return CacheState.UNAVAILABLE
+
+
+def evict_resolver_lookups(resolver_name: str):
+    """
+    Remove all cached lookups of a resolver from Redis. Called when the resolver is
+    saved or deleted.
+
+    The keys are read from the index of the resolver, so the eviction does not depend on
+    the size of the key space. SMEMBERS and the removal are not atomic: a lookup another
+    worker writes in between is not removed. It still carries the id of its resolver
+    config, so an entry of an outdated config is never read by a worker that loaded the
+    new one.
+    """
+    r = redis_client_for_feature("users")
+    if r is None:
+        return
+    keys_key = _RESOLVER_KEYS_KEY.format(resolver_name)
+    try:
+        keys = r.smembers(keys_key)
+        pipe = r.pipeline()
+        for key in keys:
+            pipe.unlink(key)
+        pipe.unlink(keys_key)
+        pipe.execute()
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
+_AUTH_HEADER_KEY = "pi:resolver_auth:{}"  # pi:resolver_auth:<name>:<config hash> -> encrypted JSON
+
+
+def cache_resolver_auth_header(key: str, header: dict, expires_at: float):
+    """
+    Store the authorization header of a resolver's service account in Redis until it expires.
+
+    Skips silently if ``PI_REDIS_CACHE_RESOLVER_AUTH`` is not set, Redis is not reachable or
+    the header can not be encrypted. The header carries an access token, so it is encrypted
+    like the challenge data.
+
+    :param key: identifies the resolver and its service account
+    :param expires_at: the UNIX timestamp after which the header must not be used anymore
+    """
+    r = redis_client_for_feature("resolver_auth")
+    ttl = int(expires_at - time.time())
+    if r is None or ttl <= 0:
+        return
+    try:
+        payload = json.dumps({"header": encryptPassword(json.dumps(header)), "expires_at": expires_at})
+    except HSMException as e:
+        log.debug(f"Not caching the authorization header of {key!r} in Redis: {e}")
+        return
+    try:
+        r.set(_AUTH_HEADER_KEY.format(key), payload, ex=ttl)
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
+def get_resolver_auth_header_from_cache(key: str) -> "tuple[dict, float] | CacheState":
+    """
+    Return the authorization header another worker stored for the resolver.
+
+    :return: tuple of the header and the UNIX timestamp it expires at, ``CacheState.MISS``
+        if there is no valid entry or ``CacheState.UNAVAILABLE`` if the shared cache can
+        not be used. In both cases the resolver requests a new header.
+    """
+    r = redis_client_for_feature("resolver_auth")
+    if r is None:
+        return CacheState.UNAVAILABLE
+    try:
+        raw = r.get(_AUTH_HEADER_KEY.format(key))
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+        return CacheState.UNAVAILABLE
+    if raw is None:
+        return CacheState.MISS
+    try:
+        entry = json.loads(raw)
+        header = decryptPassword(entry["header"])
+        if header == FAILED_TO_DECRYPT_PASSWORD:
+            raise ValueError("the header can not be decrypted")
+        expires_at = float(entry["expires_at"])
+        header = json.loads(header)
+    except (HSMException, TypeError, ValueError, KeyError) as e:
+        log.warning(f"Ignoring a malformed authorization header of {key!r} in Redis: {e}")
+        return CacheState.UNAVAILABLE
+    if expires_at <= time.time():
+        return CacheState.MISS
+    return header, expires_at
+
+
+def evict_resolver_auth_header(key: str):
+    """
+    Remove the authorization header of a resolver from Redis, e.g. after the user store
+    rejected it.
+    """
+    r = redis_client_for_feature("resolver_auth")
+    if r is None:
+        return
+    try:
+        r.unlink(_AUTH_HEADER_KEY.format(key))
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
+# The number of users with active tokens, which the subscription check reuses
+_TOKEN_USERS_KEY = "pi:subscription:token_users"  # -> JSON {"count", "counted_at"}
+
+
+def cache_token_users(count: int, counted_at: float, ttl: int):
+    """
+    Share the number of users with active tokens with the other workers for ``ttl`` seconds.
+
+    Skips silently if ``PI_REDIS_CACHE_SUBSCRIPTION`` is not set or Redis is not
+    reachable. Each worker then counts the users itself.
+
+    :param counted_at: the time of the count as UNIX timestamp
+    """
+    r = redis_client_for_feature("subscription")
+    if r is None or ttl <= 0:
+        return
+    try:
+        r.set(_TOKEN_USERS_KEY, json.dumps({"count": count, "counted_at": counted_at}), ex=ttl)
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
+def get_token_users_from_cache() -> "tuple[int, float] | CacheState":
+    """
+    Return the number of users with active tokens another worker counted.
+
+    :return: tuple of the number and the time of the count as UNIX timestamp,
+        ``CacheState.MISS`` if there is no entry or ``CacheState.UNAVAILABLE`` if the
+        shared cache can not be used. In both cases the users are counted.
+    """
+    r = redis_client_for_feature("subscription")
+    if r is None:
+        return CacheState.UNAVAILABLE
+    try:
+        raw = r.get(_TOKEN_USERS_KEY)
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+        return CacheState.UNAVAILABLE
+    if raw is None:
+        return CacheState.MISS
+    try:
+        entry = json.loads(raw)
+        return int(entry["count"]), float(entry["counted_at"])
+    except (TypeError, ValueError, KeyError) as e:
+        log.warning(f"Ignoring a malformed number of users with active tokens in Redis: {e}")
+        return CacheState.UNAVAILABLE
+
+
+def evict_token_users():
+    """
+    Remove the shared number of users with active tokens from Redis.
+    """
+    r = redis_client_for_feature("subscription")
+    if r is None:
+        return
+    try:
+        r.unlink(_TOKEN_USERS_KEY)
+    except redis_lib.exceptions.RedisError as e:
+        _disable_redis(e)
+
+
 class ChallengeDTO:
     """
     A challenge object reconstituted from the Redis cache.
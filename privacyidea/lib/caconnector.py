@@ -40,7 +40,7 @@ from .crypto import encryptPassword, decryptPassword, is_censored, censor_dict
 from .log import log_with
 from privacyidea.lib.params import get_required
 from ..models import (CAConnector,
-                      CAConnectorConfig, db, save_config_timestamp)
+                      CAConnectorConfig, db, save_config_timestamp, ConfigSection)
 
 log = logging.getLogger(__name__)
 
@@ -129,7 +129,7 @@ def save_caconnector(params: dict) -> int:
                                        Description=desc.get(key, ""))
             db.session.add(config)
     db.session.commit()
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.CACONNECTOR)
     return connector_id
 
 
@@ -44,9 +44,10 @@ import sys
 import threading
 import traceback
 
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, or_
 
 from privacyidea.config import DefaultConfigValues, ConfigKey
+from privacyidea.lib.cache.redis import get_config_change_listener
 from privacyidea.lib.framework import get_request_local_store, get_app_config_value, get_app_local_store
 from privacyidea.lib.utils import to_list
 from privacyidea.lib.utils.export import (register_import, register_export)
@@ -56,17 +57,23 @@ from .crypto import encryptPassword
 from .crypto import CENSORED, is_censored
 from .log import log_with
 from .machines.base import BaseMachineResolver
+from .policies.index import PolicyIndex
 from .resolvers.UserIdResolver import UserIdResolver
 # We need these imports to return the list of CA connector types. Bummer: New import for each new Class anyway.
 from .utils import reload_db, is_true
 from ..models import (Config, db, Resolver, Realm, PRIVACYIDEA_TIMESTAMP,
-                      save_config_timestamp, Policy, EventHandler, CAConnector,
+                      save_config_timestamp, Policy, EventHandler, CAConnector, ConfigSection,
                       NodeName)
+from ..models.config import CONFIG_SECTIONS, section_timestamp_key
 
 log = logging.getLogger(__name__)
 
 ENCODING = 'utf-8'
 
+# Seconds after which the config timestamp is checked in the database, even if
+# config changes are announced via Redis.
+DEFAULT_REDIS_CONFIG_RECHECK = 60
+
 # this is a pointer to the module object instance itself.
 this = sys.modules[__name__]
 
@@ -83,6 +90,9 @@ class SharedConfigClass:
     timestamp in the database (while taking the PI_CHECK_RELOAD_CONFIG
     setting into account). If the database timestamp is newer, the current
     configuration is updated.
+    If config changes are announced via Redis (PI_REDIS_CACHE_CONFIG), the
+    configuration is reloaded as soon as a change is announced and the database
+    timestamp is only checked every PI_REDIS_CONFIG_RECHECK seconds.
 
     However, app code must not access the config stored in the shared object!
     Instead, it must use ``reload_and_clone()`` to retrieve
@@ -96,107 +106,68 @@ class SharedConfigClass:
         self.realm = {}
         self.default_realm = None
         self.policies = []
+        self.policy_index = PolicyIndex([])
         self.events = []
         self.timestamp = None
         self.caconnectors = []
+        # The config change listener and its version at the last reload
+        self.change_state = None
+        # The timestamps of the loaded sections, see ``ConfigSection``
+        self.section_timestamps = {}
 
     def _reload_from_db(self):
         """
         Read the timestamp from the database. If the timestamp is newer than
-        the internal timestamp, then read the complete data
+        the internal timestamp, then read the changed sections of the configuration.
         :return:
         """
-        from .resolver import get_resolver_class
         check_reload_config = get_app_config_value("PI_CHECK_RELOAD_CONFIG", 0)
-        if not self.timestamp or self.timestamp + datetime.timedelta(
+        changed = False
+        listener = get_config_change_listener()
+        change_state = (listener, listener.version) if listener else None
+        if listener:
+            # Changes are announced by the listener. The timestamp in the database is
+            # only checked in case an announcement got lost.
+            changed = change_state != self.change_state
+            check_reload_config = max(check_reload_config,
+                                      get_app_config_value(ConfigKey.REDIS_CONFIG_RECHECK,
+                                                           DEFAULT_REDIS_CONFIG_RECHECK))
+        if changed or not self.timestamp or self.timestamp + datetime.timedelta(
                 seconds=check_reload_config) < datetime.datetime.now():
-            stmt = select(Config).filter_by(Key=PRIVACYIDEA_TIMESTAMP)
-            db_ts = db.session.scalars(stmt).first()
-            if reload_db(self.timestamp, db_ts):
-                log.debug("Reloading shared config from database")
-                config = {}
-                resolverconfig = {}
-                realmconfig = {}
-                default_realm = None
-                policies = []
-                events = []
-                caconnectors = []
-                # Load system configuration
-                for sysconf in Config.query.all():
-                    config[sysconf.Key] = {
-                        "Value": sysconf.Value,
-                        "Type": sysconf.Type,
-                        "Description": sysconf.Description}
-                # Load resolver configuration
-                for resolver in Resolver.query.all():
-                    resolverdef = {"type": resolver.rtype,
-                                   "resolvername": resolver.name,
-                                   "censor_keys": []}
-                    resolver_class = get_resolver_class(resolver.rtype)
-                    class_descriptor_config = resolver_class.getResolverClassDescriptor()[resolver.rtype]["config"]
-                    data = {}
-                    for rconf in resolver.config_list:
-                        if rconf.Type == "password":
-                            value = decryptPassword(rconf.Value)
-                            resolverdef["censor_keys"].append(rconf.Key)
-                        elif rconf.Type == "dict":
-                            try:
-                                value = json.loads(rconf.Value)
-                            except json.JSONDecodeError as error:
-                                log.warning(
-                                    f"Could not load {rconf.Key} ({rconf.Value}) from resolver config as JSON: {error}")
-                                value = rconf.Value
-                        elif rconf.Type == "dict_with_password":
-                            # An entry in the dict is a password which needs to be decrypted
-                            try:
-                                value = json.loads(rconf.Value)
-                                for key, val in value.items():
-                                    if class_descriptor_config.get(f"{rconf.Key}.{key}", "") == "password":
-                                        value[key] = decryptPassword(val)
-                                        resolverdef["censor_keys"].append(f"{rconf.Key}.{key}")
-                            except json.JSONDecodeError as error:
-                                log.warning(
-                                    f"Could not load {rconf.Key} ({rconf.Value}) from resolver config as JSON: {error}")
-                                value = rconf.Value
-                        else:
-                            value = rconf.Value
-                        data[rconf.Key] = value
-                    resolverdef["data"] = data
-                    resolverconfig[resolver.name] = resolverdef
-                # Load realm configuration
-                for realm in Realm.query.all():
-                    if realm.default:
-                        default_realm = realm.name
-                    realmdef = {"id": realm.id,
-                                "default": realm.default,
-                                "resolver": []}
-                    for x in realm.resolver_list:
-                        realmdef["resolver"].append({"priority": x.priority,
-                                                     "name": x.resolver.name,
-                                                     "type": x.resolver.rtype,
-                                                     "node": x.node_uuid})
-                    realmconfig[realm.name] = realmdef
-                # Load all policies
-                policies_db = db.session.scalars(select(Policy)).unique().all()
-                for pol in policies_db:
-                    policies.append(pol.get())
-                # Load all events
-                event_handlers = db.session.scalars(select(EventHandler).order_by(EventHandler.ordering)).all()
-                for event in event_handlers:
-                    events.append(event.get())
-                # Load all CA connectors
-                from privacyidea.lib.caconnector import get_caconnector_object
-                ca_connectors_db = db.session.scalars(select(CAConnector)).all()
-                for ca in ca_connectors_db:
-                    try:
-                        ca_obj = get_caconnector_object(ca.name)
-                        caconnectors.append({"connectorname": ca.name,
-                                             "type": ca.catype,
-                                             "data": ca_obj.config,
-                                             "templates": ca_obj.get_templates()})
-                    except Exception as exx:  # pragma: no cover
-                        log.debug(f"{traceback.format_exc()!s}")
-                        log.error(exx)
+            stmt = select(Config).where(or_(Config.Key == PRIVACYIDEA_TIMESTAMP,
+                                            Config.Key.like(f"{PRIVACYIDEA_TIMESTAMP}.%")))
+            timestamps = {c.Key: c for c in db.session.scalars(stmt)}
+            db_ts = timestamps.get(PRIVACYIDEA_TIMESTAMP)
+            if changed or reload_db(self.timestamp, db_ts):
+                section_timestamps = {section: timestamps[section_timestamp_key(section)].Value
+                                      for section in CONFIG_SECTIONS
+                                      if section_timestamp_key(section) in timestamps}
+                sections = self._changed_sections(db_ts, section_timestamps)
+                log.debug(f"Reloading the sections {sections} of the shared config from database")
+                config = self._load_config() if ConfigSection.CONFIG in sections else self.config
+                if db_ts and ConfigSection.CONFIG not in sections:
+                    # The global timestamp is part of the config entries
+                    config = dict(config)
+                    config[PRIVACYIDEA_TIMESTAMP] = {"Value": db_ts.Value, "Type": db_ts.Type,
+                                                     "Description": db_ts.Description}
+                if ConfigSection.RESOLVER in sections:
+                    resolverconfig = self._load_resolvers()
+                else:
+                    resolverconfig = self.resolver
+                if ConfigSection.REALM in sections:
+                    realmconfig, default_realm = self._load_realms()
+                else:
+                    realmconfig, default_realm = self.realm, self.default_realm
+                if ConfigSection.POLICY in sections:
+                    policies = self._load_policies()
+                    policy_index = PolicyIndex(policies)
+                else:
+                    policies, policy_index = self.policies, self.policy_index
+                events = self._load_events() if ConfigSection.EVENT in sections else self.events
+                if ConfigSection.CACONNECTOR in sections:
+                    caconnectors = self._load_caconnectors()
+                else:
+                    caconnectors = self.caconnectors
 
                 # Finally, set the current timestamp
                 timestamp = datetime.datetime.now()
@@ -206,9 +177,139 @@ class SharedConfigClass:
                     self.realm = realmconfig
                     self.default_realm = default_realm
                     self.policies = policies
+                    self.policy_index = policy_index
                     self.events = events
                     self.timestamp = timestamp
                     self.caconnectors = caconnectors
+                    self.change_state = change_state
+                    self.section_timestamps = section_timestamps
+
+    def _changed_sections(self, db_ts, section_timestamps):
+        """
+        Compare the timestamps of the sections in the database with the timestamps
+        of the loaded sections.
+
+        All sections are reloaded, if the timestamp of a section is missing or if the
+        global timestamp is newer than all section timestamps. This is the case, if
+        the configuration was changed by an older version of privacyIDEA, which only
+        updates the global timestamp.
+
+        :param db_ts: The global timestamp config entry
+        :param section_timestamps: dictionary of the section names and their timestamps
+        :return: set of the section names to reload
+        """
+        if not self.timestamp or not db_ts or len(section_timestamps) != len(CONFIG_SECTIONS):
+            return set(CONFIG_SECTIONS)
+        try:
+            if float(db_ts.Value) > max(float(value) for value in section_timestamps.values()):
+                return set(CONFIG_SECTIONS)
+        except ValueError:
+            return set(CONFIG_SECTIONS)
+        sections = {section for section, value in section_timestamps.items()
+                    if self.section_timestamps.get(section) != value}
+        if ConfigSection.RESOLVER in sections:
+            # The realms contain the names and types of their resolvers
+            sections.add(ConfigSection.REALM)
+        return sections
+
+    @staticmethod
+    def _load_config():
+        config = {}
+        for sysconf in Config.query.all():
+            if sysconf.Key.startswith(f"{PRIVACYIDEA_TIMESTAMP}."):
+                # The timestamps of the sections are no configuration entries
+                continue
+            config[sysconf.Key] = {
+                "Value": sysconf.Value,
+                "Type": sysconf.Type,
+                "Description": sysconf.Description}
+        return config
+
+    @staticmethod
+    def _load_resolvers():
+        from .resolver import get_resolver_class
+        resolverconfig = {}
+        for resolver in Resolver.query.all():
+            resolverdef = {"type": resolver.rtype,
+                           "resolvername": resolver.name,
+                           "censor_keys": []}
+            resolver_class = get_resolver_class(resolver.rtype)
+            class_descriptor_config = resolver_class.getResolverClassDescriptor()[resolver.rtype]["config"]
+            data = {}
+            for rconf in resolver.config_list:
+                if rconf.Type == "password":
+                    value = decryptPassword(rconf.Value)
+                    resolverdef["censor_keys"].append(rconf.Key)
+                elif rconf.Type == "dict":
+                    try:
+                        value = json.loads(rconf.Value)
+                    except json.JSONDecodeError as error:
+                        log.warning(
+                            f"Could not load {rconf.Key} ({rconf.Value}) from resolver config as JSON: {error}")
+                        value = rconf.Value
+                elif rconf.Type == "dict_with_password":
+                    # An entry in the dict is a password which needs to be decrypted
+                    try:
+                        value = json.loads(rconf.Value)
+                        for key, val in value.items():
+                            if class_descriptor_config.get(f"{rconf.Key}.{key}", "") == "password":
+                                value[key] = decryptPassword(val)
+                                resolverdef["censor_keys"].append(f"{rconf.Key}.{key}")
+                    except json.JSONDecodeError as error:
+                        log.warning(
+                            f"Could not load {rconf.Key} ({rconf.Value}) from resolver config as JSON: {error}")
+                        value = rconf.Value
+                else:
+                    value = rconf.Value
+                data[rconf.Key] = value
+            resolverdef["data"] = data
+            resolverconfig[resolver.name] = resolverdef
+        return resolverconfig
+
+    @staticmethod
+    def _load_realms():
+        realmconfig = {}
+        default_realm = None
+        for realm in Realm.query.all():
+            if realm.default:
+                default_realm = realm.name
+            realmdef = {"id": realm.id,
+                        "default": realm.default,
+                        "resolver": []}
+            for x in realm.resolver_list:
+                realmdef["resolver"].append({"priority": x.priority,
+                                             "name": x.resolver.name,
+                                             "type": x.resolver.rtype,
+                                             "node": x.node_uuid})
+            realmconfig[realm.name] = realmdef
+        return realmconfig, default_realm
+
+    @staticmethod
+    def _load_policies():
+        policies_db = db.session.scalars(select(Policy)).unique().all()
+        return [pol.get() for pol in policies_db]
+
+    @staticmethod
+    def _load_events():
+        event_handlers = db.session.scalars(select(EventHandler).order_by(EventHandler.ordering)).all()
+        return [event.get() for event in event_handlers]
+
+    @staticmethod
+    def _load_caconnectors():
+        from privacyidea.lib.caconnector import get_caconnector_object
+        caconnectors = []
+        ca_connectors_db = db.session.scalars(select(CAConnector)).all()
+        for ca in ca_connectors_db:
+            try:
+                ca_obj = get_caconnector_object(ca.name)
+                caconnectors.append({"connectorname": ca.name,
+                                     "type": ca.catype,
+                                     "data": ca_obj.config,
+                                     "templates": ca_obj.get_templates()})
+            except Exception as exx:  # pragma: no cover
+                log.debug(f"{traceback.format_exc()!s}")
+                log.error(exx)
+        return caconnectors
 
     def _clone(self):
         """
@@ -223,7 +324,8 @@ class SharedConfigClass:
                 self.policies,
                 self.events,
                 self.caconnectors,
-                self.timestamp
+                self.timestamp,
+                self.policy_index
             )
 
     def reload_and_clone(self):
@@ -245,12 +347,15 @@ class LocalConfigClass:
     request and is supposed to stay alive and unchanged during the request.
     """
 
-    def __init__(self, config, resolver, realm, default_realm, policies, events, caconnectors, timestamp):
+    def __init__(self, config, resolver, realm, default_realm, policies, events, caconnectors, timestamp,
+                 policy_index=None):
         self.config = config
         self.resolver = resolver
         self.realm = realm
         self.default_realm = default_realm
         self.policies = policies
+        # The PolicyIndex of the policies. Without an index, all policies are searched.
+        self.policy_index = policy_index
         self.events = events
         self.caconnectors = caconnectors
         self.timestamp = timestamp
@@ -993,7 +1098,7 @@ def set_privacyidea_config(key, value, typ="", desc=""):
             pi_config.Type = typ
         if desc:
             pi_config.Description = desc
-        save_config_timestamp()
+        save_config_timestamp(section=ConfigSection.CONFIG)
         db.session.commit()
         ret = "update"
     else:
@@ -1015,7 +1120,7 @@ def delete_privacyidea_config(key: str) -> bool:
     delete_stmt = delete(Config).where(Config.Key == key)
     result = db.session.execute(delete_stmt)
     db.session.commit()
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.CONFIG)
     return result.rowcount > 0
 
 
@@ -45,6 +45,8 @@ This lib.crypto is tested in tests/test_lib_crypto.py
 import hmac
 import importlib
 import logging
+import os
+import threading
 from dataclasses import dataclass
 from hashlib import sha256
 import secrets
@@ -69,7 +71,7 @@ from privacyidea.lib.utils import (to_unicode, to_bytes, hexlify_and_unicode,
                                    b64encode_and_unicode)
 
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa, ec
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
@@ -162,6 +164,19 @@ class SecretObj:
         self._clearKey_(preserve=self.preserve)
         return h
 
+    def keyed_hmac(self, hash_algo):
+        """
+        Return an HMAC object keyed with the secret. Copies of this object calculate
+        the HMAC of several messages without setting up the key again.
+
+        :param hash_algo: the hash function like hashlib.sha1
+        :return: hmac.HMAC object
+        """
+        self._setupKey_()
+        h = hmac.new(self.bkey, digestmod=hash_algo)
+        self._clearKey_(preserve=self.preserve)
+        return h
+
     def aes_ecb_decrypt(self, enc_data):
         '''
         support inplace aes decryption for the yubikey (mode ECB)
@@ -735,11 +750,114 @@ def _slow_rsa_verify_raw(key, sig, msg):
     return msg == pow(sig, pn.e, pn.n)
 
 
+class SignatureAlgorithm:
+    """
+    Base class of the algorithms a :py:class:`Sign` object signs and verifies with.
+
+    The ``sig_ver`` of the algorithm is written in front of every signature, so that
+    a signature can be verified with the algorithm it was created with.
+    The algorithm of a ``Sign`` object is chosen by the type of its key.
+    """
+    sig_ver = None
+    key_types = ()
+
+    def sign(self, private_key, data):
+        """
+        :param private_key: the private key
+        :param data: the data to sign
+        :type data: bytes
+        :return: the signature
+        :rtype: bytes
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    def verify(self, public_key, signature, data):
+        """
+        :param public_key: the public key
+        :param signature: the signature
+        :type signature: bytes
+        :param data: the signed data
+        :type data: bytes
+        :raises InvalidSignature: if the signature does not match
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+
+class RSAPSSSignature(SignatureAlgorithm):
+    """
+    RSA-PSS signatures with SHA256
+    """
+    sig_ver = 'rsa_sha256_pss'
+    key_types = (rsa.RSAPrivateKey, rsa.RSAPublicKey)
+
+    @staticmethod
+    def _padding():
+        return asym_padding.PSS(mgf=asym_padding.MGF1(hashes.SHA256()),
+                                salt_length=asym_padding.PSS.MAX_LENGTH)
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, self._padding(), hashes.SHA256())
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, self._padding(), hashes.SHA256())
+
+
+class ECDSASignature(SignatureAlgorithm):
+    """
+    ECDSA signatures with SHA256, e.g. with a key on the curve P-256
+    """
+    sig_ver = 'ecdsa_sha256'
+    key_types = (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+
+
+class Ed25519Signature(SignatureAlgorithm):
+    """
+    Ed25519 signatures
+    """
+    sig_ver = 'ed25519'
+    key_types = (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)
+
+    def sign(self, private_key, data):
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data)
+
+
+SIGNATURE_ALGORITHMS = {algorithm.sig_ver: algorithm for algorithm in (RSAPSSSignature(),
+                                                                      ECDSASignature(),
+                                                                      Ed25519Signature())}
+
+
+def get_signature_algorithm(key):
+    """
+    Return the signature algorithm for the type of the given key.
+
+    :param key: a private or public key
+    :return: the SignatureAlgorithm
+    :raises TypeError: if there is no algorithm for this type of key
+    """
+    for algorithm in SIGNATURE_ALGORITHMS.values():
+        if isinstance(key, algorithm.key_types):
+            return algorithm
+    raise TypeError(f"No signature algorithm for keys of type {type(key).__name__}")
+
+
 class Sign:
     """
     Signing class that is used to sign Audit Entries and to sign API responses.
+
+    The signature algorithm depends on the type of the key: RSA keys sign with
+    RSA-PSS (``rsa_sha256_pss``), EC keys with ECDSA (``ecdsa_sha256``) and Ed25519
+    keys with Ed25519 (``ed25519``). Signatures of all algorithms can be verified.
     """
-    sig_ver = 'rsa_sha256_pss'
+    sig_ver = RSAPSSSignature.sig_ver
 
     def __init__(self, private_key=None, public_key=None, check_private_key=True):
         """
@@ -756,6 +874,7 @@ class Sign:
         """
         self.private = None
         self.public = None
+        self.algorithm = SIGNATURE_ALGORITHMS[self.sig_ver]
         backend = default_backend()
         if private_key:
             try:
@@ -763,6 +882,7 @@ class Sign:
                                                                   password=None,
                                                                   backend=backend,
                                                                   unsafe_skip_rsa_key_validation=not check_private_key)
+                self.algorithm = get_signature_algorithm(self.private)
             except Exception as e:
                 log.error(f"Error loading private key: ({e!r})")
                 log.debug(traceback.format_exc())
@@ -772,10 +892,15 @@ class Sign:
             try:
                 self.public = serialization.load_pem_public_key(public_key,
                                                                 backend=backend)
+                public_algorithm = get_signature_algorithm(self.public)
+                if self.private and public_algorithm is not self.algorithm:
+                    raise TypeError("The private and the public key are of different types.")
+                self.algorithm = public_algorithm
             except Exception as e:
                 log.error(f"Error loading public key: ({e!r})")
                 log.debug(traceback.format_exc())
                 raise e
+        self.sig_ver = self.algorithm.sig_ver
 
     def sign(self, s):
         """
@@ -791,12 +916,7 @@ class Sign:
             # TODO: should we throw an exception in this case?
             return ''
 
-        signature = self.private.sign(
-            to_bytes(s),
-            asym_padding.PSS(
-                mgf=asym_padding.MGF1(hashes.SHA256()),
-                salt_length=asym_padding.PSS.MAX_LENGTH),
-            hashes.SHA256())
+        signature = self.algorithm.sign(self.private, to_bytes(s))
         res = ':'.join([self.sig_ver, hexlify_and_unicode(signature)])
         return res
 
@@ -827,14 +947,12 @@ class Sign:
             pass
 
         try:
-            if sver == self.sig_ver:
-                self.public.verify(
-                    binascii.unhexlify(signature),
-                    to_bytes(s),
-                    asym_padding.PSS(
-                        mgf=asym_padding.MGF1(hashes.SHA256()),
-                        salt_length=asym_padding.PSS.MAX_LENGTH),
-                    hashes.SHA256())
+            if sver in SIGNATURE_ALGORITHMS:
+                if sver != self.sig_ver:
+                    log.warning(f'Could not verify a signature of type {sver!s} '
+                                f'with a key for {self.sig_ver!s}.')
+                    return r
+                self.algorithm.verify(self.public, binascii.unhexlify(signature), to_bytes(s))
                 r = True
             else:
                 if verify_old_sigs:
@@ -850,6 +968,80 @@ class Sign:
         return r
 
 
+_SIGN_KEY_CACHE_KEY = "sign_key_cache"
+_sign_key_cache_lock = threading.Lock()
+
+
+def _key_file_version(filename):
+    """
+    Return a value which changes whenever the given key file is replaced or modified.
+
+    :param filename: The key file or None
+    :return: a tuple of modification time and size or None if no file is given
+    :raises OSError: if the file does not exist
+    """
+    if not filename:
+        return None
+    stat_result = os.stat(filename)
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def get_sign_object(private_key_file=None, public_key_file=None, check_private_key=True):
+    """
+    Return a :py:class:`Sign` object for the given key files.
+
+    Parsing a PEM key (and checking an RSA private key) is expensive, so the ``Sign``
+    objects are kept in the app-local store and shared among all threads of the
+    worker. Each entry remembers the modification time and size of its key files and
+    the keys are read again as soon as one of the files changes.
+
+    :param private_key_file: The file containing the private key in PEM format
+    :type private_key_file: str or None
+    :param public_key_file: The file containing the public key in PEM format
+    :type public_key_file: str or None
+    :param check_private_key: Check the private key when loading (default: True)
+    :type check_private_key: bool
+    :return: The Sign object
+    :rtype: Sign
+    :raises OSError: if a key file can not be read
+    :raises ValueError: if a key can not be loaded
+    """
+    cache_key = (private_key_file, public_key_file, bool(check_private_key))
+    version = (_key_file_version(private_key_file), _key_file_version(public_key_file))
+    sign_key_cache = get_app_local_store().setdefault(_SIGN_KEY_CACHE_KEY,
+                                                      {"entries": {}, "hits": 0, "misses": 0})
+    with _sign_key_cache_lock:
+        entry = sign_key_cache["entries"].get(cache_key)
+        if entry and entry[0] == version:
+            sign_key_cache["hits"] += 1
+            return entry[1]
+        sign_key_cache["misses"] += 1
+        log.debug(f"Loading signing keys {private_key_file!s} and {public_key_file!s}.")
+        private_key = public_key = None
+        if private_key_file:
+            with open(private_key_file, "rb") as key_file:
+                private_key = key_file.read()
+        if public_key_file:
+            with open(public_key_file, "rb") as key_file:
+                public_key = key_file.read()
+        sign_object = Sign(private_key, public_key, check_private_key=check_private_key)
+        sign_key_cache["entries"][cache_key] = (version, sign_object)
+        return sign_object
+
+
+def get_sign_key_cache_stats():
+    """
+    Return the counters of the signing key cache of the current worker.
+
+    :return: a dictionary with the number of ``hits``, ``misses`` and cached ``entries``
+    :rtype: dict
+    """
+    sign_key_cache = get_app_local_store().get(_SIGN_KEY_CACHE_KEY, {})
+    return {"hits": sign_key_cache.get("hits", 0),
+            "misses": sign_key_cache.get("misses", 0),
+            "entries": len(sign_key_cache.get("entries", {}))}
+
+
 def create_hsm_object(config):
     """
     This creates an HSM object from the given config dictionary.
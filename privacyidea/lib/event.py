@@ -32,7 +32,7 @@ from privacyidea.lib.error import HandlerAbortError
 from privacyidea.lib.utils import fetch_one_resource, is_true
 from privacyidea.lib.utils.export import (register_import, register_export)
 from privacyidea.models import (EventHandler, db, save_config_timestamp, EventHandlerOption, EventHandlerCondition,
-                                audit_column_length)
+                                audit_column_length, ConfigSection)
 
 log = logging.getLogger(__name__)
 
@@ -283,7 +283,7 @@ def enable_event(event_id, enable=True):
     # Update the event
     ev.active = enable
     r = ev.save()
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.EVENT)
     return r
 
 
@@ -353,7 +353,7 @@ def set_event(name=None, event=None, handlermodule=None, action=None, conditions
             abort_on_error = handler_object.default_abort_on_error if handler_object else False
         id = EventHandler(name=name, event=event, handlermodule=handlermodule, action=action, ordering=ordering,
                           id=id, active=active, position=position, abort_on_error=abort_on_error).save()
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.EVENT)
 
     # --- Event Handler Options ---
     # Delete existing options
@@ -386,7 +386,7 @@ def delete_event(event_id: int) -> int:
     """
     event_id = int(event_id)
     db.session.delete(fetch_one_resource(EventHandler, id=event_id))
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.EVENT)
     db.session.commit()
     return event_id
 
@@ -2,18 +2,22 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 """In-process metrics module backed by the ``metric_aggregate`` table.
 
-Two primitives:
+Three primitives:
 
 * :func:`observe` - record a value (e.g. operation duration in seconds).
   Updates count / sum / max / histogram buckets for the active 5-minute window.
 * :func:`inc` - increment a counter.
+* :func:`gauge` - record a sampled level (e.g. the size of a cache). Updates
+  count / sum / max, so reads give its average and peak, but no histogram buckets.
 
 Reads via :func:`get_metrics` aggregate across nodes and time windows. Multi-node
 setups partition writes by ``PI_NODE`` so workers don't contend on the same row.
 
 While a request is handled, observations are aggregated in memory and written once
 at teardown, so instrumenting a per-item loop costs one transaction per request
-instead of one per item. See :func:`_request_metric_buffer`.
+instead of one per item. See :func:`_request_metric_buffer`. Code that counts
+events outside a request, e.g. a per-process cache, aggregates them in a
+:class:`CounterBuffer` instead, which writes them at most once per interval.
 
 This module never raises out of ``observe``/``inc``: failing to record a metric
 must not break the operation being measured. Errors are logged at debug level.
@@ -23,6 +27,7 @@ import functools
 import hashlib
 import json
 import logging
+import threading
 import time
 
 from sqlalchemy import case, select, delete, update
@@ -50,6 +55,7 @@ def _metrics_disabled() -> bool:
 WINDOW_SECONDS = 300            # 5-minute aggregation buckets.
 DEFAULT_QUERY_WINDOW = 3600     # Reads return the last hour by default.
 RETENTION_SECONDS = 86400       # Cleanup deletes rows older than 24h.
+COUNTER_FLUSH_SECONDS = 60      # A CounterBuffer writes its counts at most once a minute.
 
 # Bucket boundaries in seconds, paired with the column they map to.
 # Order matters: ascending. ``+inf`` is implicit (= total ``count``).
@@ -267,13 +273,15 @@ def _write_observations(observations: dict) -> None:
         session.close()
 
 
-def _record(name: str, labels: dict | None, value: float | None = None, count: int = 1) -> None:
+def _record(name: str, labels: dict | None, value: float | None = None, count: int = 1,
+            bucketed: bool = True) -> None:
     """Add one sample to the buffer, or write it through when there is no request to flush it.
 
     :param name: the metric name
     :param labels: the label set of this sample
     :param value: the observed value in seconds, or None for a counter
     :param count: how much the sample increments the count by
+    :param bucketed: whether the value is counted in the histogram buckets
     """
     key = (name, _label_items(labels), get_privacyidea_node() or "", _window_start(_utc_now()))
     buffer = _request_metric_buffer()
@@ -285,7 +293,7 @@ def _record(name: str, labels: dict | None, value: float | None = None, count: i
         aggregate["sum_value"] += float(value)
         aggregate["max_value"] = max(aggregate["max_value"], float(value))
         # Count the sample in every bucket whose upper bound is >= value (cumulative).
-        for index, (boundary, _column) in enumerate(_BUCKETS):
+        for index, (boundary, _column) in enumerate(_BUCKETS if bucketed else ()):
             if value <= boundary:
                 aggregate["buckets"][index] += 1
     if buffer is None:
@@ -320,6 +328,57 @@ def inc(name: str, labels: dict | None = None, by: int = 1) -> None:
         log.debug(f"metrics.inc({name!r}) failed: {e}")
 
 
+def gauge(name: str, value: float, labels: dict | None = None) -> None:
+    """Record the current level of gauge ``name``, e.g. the number of entries in a cache.
+
+    Only count / sum / max are updated, the bucket boundaries are timings and say
+    nothing about a level. :func:`get_metrics` reports the average and the peak
+    of the samples, its percentiles stay empty.
+    """
+    try:
+        if _metrics_disabled():
+            return
+        _record(name, labels, value=value, bucketed=False)
+    except Exception as e:
+        log.debug(f"metrics.gauge({name!r}) failed: {e}")
+
+
+class CounterBuffer:
+    """Aggregates counter increments in memory and writes them with :func:`inc` at most
+    once per ``interval`` seconds.
+
+    Outside a request every :func:`inc` is a transaction of its own, which is far too
+    expensive for events as frequent as the lookups of a per-process cache. The buffer
+    collects them instead; the increment that finds the interval elapsed writes all
+    counts collected so far, one :func:`inc` per counter and label set. Counts that are
+    still buffered when the process exits are lost.
+    """
+
+    def __init__(self, interval: int = COUNTER_FLUSH_SECONDS):
+        self.interval = interval
+        self._counts = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: dict | None = None, by: int = 1) -> bool:
+        """Add ``by`` to the buffered counter.
+
+        :return: True if this call wrote the buffered counts, so that the caller can
+            report its gauges at the same interval
+        """
+        key = (name, _label_items(labels))
+        now = time.monotonic()
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + by
+            if now - self._flushed_at < self.interval:
+                return False
+            counts, self._counts = self._counts, {}
+            self._flushed_at = now
+        for (counter_name, label_items), count in counts.items():
+            inc(counter_name, dict(label_items), by=count)
+        return True
+
+
 def _percentile_from_buckets(buckets: dict, count: int, q: float) -> float | None:
     """Approximate quantile from prom-style cumulative bucket counts.
 
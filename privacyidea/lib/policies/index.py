@@ -0,0 +1,156 @@
+# (c) NetKnights GmbH 2025,  https://netknights.it
+#
+# This code is free software; you can redistribute it and/or
+# modify it under the terms of the GNU AFFERO GENERAL PUBLIC LICENSE
+# as published by the Free Software Foundation; either
+# version 3 of the License, or any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU AFFERO GENERAL PUBLIC LICENSE for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+An index over the policies of the shared config object.
+
+``PolicyClass.list_policies`` filters the complete list of policies for every
+call. The ``PolicyIndex`` is built once when the policies are loaded from the
+database and returns the policies which *may* match a given name, scope,
+action, realm and user. These candidates are then filtered by
+``list_policies`` as before, so the index never changes which policies match.
+"""
+import logging
+from collections import defaultdict
+
+from netaddr import AddrFormatError
+
+from privacyidea.lib.utils import check_ip_in_policy, compile_ip_policy, check_ip_in_ip_sets
+
+log = logging.getLogger(__name__)
+
+# Policy values containing one of these characters are matched as regular expression
+# by PolicyClass._search_value and can not be looked up in the index.
+REGEX_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+
+class _AttributeIndex:
+    """
+    Maps the values of one policy attribute to the positions of the policies
+    containing the value.
+    """
+
+    def __init__(self, case_insensitive=False):
+        self.case_insensitive = case_insensitive
+        self.values = defaultdict(set)
+        # Policies without a value, with a wildcard or with a regular expression
+        # are candidates for every search value.
+        self.unrestricted = set()
+
+    def _normalize(self, value):
+        return value.lower() if self.case_insensitive else value
+
+    def add(self, position, policy_values):
+        if not policy_values or any(REGEX_CHARACTERS.intersection(value) for value in policy_values):
+            self.unrestricted.add(position)
+        else:
+            for value in policy_values:
+                self.values[self._normalize(value)].add(position)
+
+    def freeze(self):
+        self.values = {value: frozenset(positions) for value, positions in self.values.items()}
+        self.unrestricted = frozenset(self.unrestricted)
+
+    def candidates(self, search_value):
+        """
+        :param search_value: a single value or a list of values
+        :return: set of positions of the policies which may match the search value
+        """
+        search_values = search_value if isinstance(search_value, list) else [search_value]
+        positions = set(self.unrestricted)
+        for value in search_values:
+            value = self._normalize(value)
+            positions.update(self.values.get(value, ()))
+            if value.endswith("\n"):
+                # The "$" of the regular expression also matches before a trailing newline
+                positions.update(self.values.get(value[:-1], ()))
+        return positions
+
+
+class PolicyIndex:
+    """
+    An immutable index of a list of policy dictionaries.
+    """
+
+    def __init__(self, policies: list[dict]):
+        self.policies = tuple(policies)
+        self._names = defaultdict(set)
+        self._scopes = defaultdict(set)
+        self._actions = _AttributeIndex()
+        self._realms = _AttributeIndex()
+        # The user is compared case-insensitive for some policies, so the index is
+        # case-insensitive for all of them. list_policies then checks the case.
+        self._users = _AttributeIndex(case_insensitive=True)
+        # The client networks of each policy as tuple of (included IPSet, excluded IPSet)
+        self._clients = {}
+        for position, policy in enumerate(self.policies):
+            self._names[policy.get("name")].add(position)
+            self._scopes[policy.get("scope")].add(position)
+            self._actions.add(position, list(policy.get("action") or {}))
+            self._realms.add(position, policy.get("realm"))
+            self._users.add(position, policy.get("user"))
+            if policy.get("client"):
+                self._clients[id(policy)] = self._parse_client(policy)
+        self._names = {name: frozenset(positions) for name, positions in self._names.items()}
+        self._scopes = {scope: frozenset(positions) for scope, positions in self._scopes.items()}
+        for attribute_index in (self._actions, self._realms, self._users):
+            attribute_index.freeze()
+
+    @staticmethod
+    def _parse_client(policy):
+        """
+        :return: tuple of the included and the excluded client IPSet of the policy
+            or None, if the client definition can not be parsed
+        """
+        try:
+            return compile_ip_policy(policy.get("client"))
+        except (AddrFormatError, ValueError, TypeError):
+            log.warning(f"Invalid client definition in policy {policy.get('name')!r}: {policy.get('client')}")
+            return None
+
+    def candidates(self, name: str | None = None, scope: str | None = None, action: str | None = None,
+                   realm: str | list | None = None, user: str | None = None) -> list[dict]:
+        """
+        Return the policies which may match the given values in the order of the policy list.
+        A value of ``None`` does not restrict the policies.
+        """
+        positions = None
+        if name is not None:
+            positions = set(self._names.get(name, ()))
+        if scope is not None:
+            scope_positions = self._scopes.get(scope, frozenset())
+            positions = set(scope_positions) if positions is None else positions & scope_positions
+        for attribute_index, search_value in ((self._actions, action), (self._realms, realm),
+                                              (self._users, user)):
+            if search_value is not None:
+                attribute_positions = attribute_index.candidates(search_value)
+                positions = attribute_positions if positions is None else positions & attribute_positions
+        if positions is None:
+            return list(self.policies)
+        return [self.policies[position] for position in sorted(positions)]
+
+    def check_client(self, client: str, policy: dict) -> tuple[bool, bool]:
+        """
+        Check the client IP against the pre-parsed client networks of the policy.
+        See :func:`privacyidea.lib.utils.check_ip_in_policy`.
+
+        :param client: The client IP as string or IPAddress
+        :return: tuple of (found, excluded)
+        """
+        ip_sets = self._clients.get(id(policy))
+        if ip_sets is None:
+            return check_ip_in_policy(client, policy.get("client"))
+        return check_ip_in_ip_sets(client, ip_sets)
@@ -177,7 +177,7 @@ from datetime import datetime
 from operator import itemgetter
 
 from configobj import ConfigObj
-from netaddr import AddrFormatError
+from netaddr import AddrFormatError, IPAddress
 from sqlalchemy import select, exists
 from werkzeug.datastructures.headers import EnvironHeaders
 
@@ -188,6 +188,7 @@ from privacyidea.lib.config import (get_token_classes, get_token_types,
                                     get_email_validators, get_privacyidea_nodes, get_enrollable_token_types)
 from privacyidea.lib.error import ParameterError, PolicyError, ResourceNotFoundError, ServerError
 from privacyidea.lib.error import PrivacyIDEAError
+from privacyidea.lib.framework import get_request_local_store
 from privacyidea.lib.radiusserver import get_radiusservers
 from privacyidea.lib.realm import get_realms, get_ordered_resolvers
 from privacyidea.lib.resolver import get_resolver_list
@@ -203,7 +204,8 @@ from .log import log_with
 from .policies.actions import PolicyAction, PasskeyLoginButtonOptions
 from .policies.conditions import PolicyConditionClass, ConditionCheck, ConditionSection
 from .policies.evaluators import EVALUATOR_FUNCTIONS
-from ..models import (Policy, db, save_config_timestamp, PolicyDescription, PolicyCondition)
+from ..models import (Policy, db, save_config_timestamp, PolicyDescription, PolicyCondition,
+                      ConfigSection)
 from ..models.policy import parse_action_string
 
 log = logging.getLogger(__name__)
@@ -447,7 +449,22 @@ class PolicyClass:
         :return: list of policies
         :rtype: list of dicts
         """
-        reduced_policies = self.policies
+        config_object = get_config_object()
+        policy_index = config_object.policy_index
+        if additional_realms:
+            if realm and realm not in additional_realms:
+                additional_realms.append(realm)
+            search_realm = additional_realms
+        else:
+            search_realm = realm
+
+        if policy_index is not None:
+            # Only the policies found in the index may match, the following checks
+            # then filter these candidates.
+            reduced_policies = policy_index.candidates(name=name, scope=scope, action=action,
+                                                       realm=search_realm, user=user)
+        else:
+            reduced_policies = config_object.policies
 
         # Do exact matches for "name", "active" and "scope", as these fields
         # can only contain one entry
@@ -459,12 +476,7 @@ class PolicyClass:
                 log.debug("Policies after matching {!s}={!s}: {!s}".format(
                     searchkey, searchvalue, [p.get('name') for p in reduced_policies]))
 
-        if additional_realms:
-            if realm and realm not in additional_realms:
-                additional_realms.append(realm)
-            p = [("action", action), ("realm", additional_realms)]
-        else:
-            p = [("action", action), ("realm", realm)]
+        p = [("action", action), ("realm", search_realm)]
         q = [("user", user)]
         # If this is an admin-policy, we also do check the adminrealm
         if scope == SCOPE.ADMIN:
@@ -599,9 +611,18 @@ class PolicyClass:
             if not client:
                 raise ParameterError("client argument must be a non-empty string")
 
+            try:
+                # Parse the client only once for all policies
+                client_ip = IPAddress(client)
+            except (AddrFormatError, ValueError):
+                # An invalid client fails as soon as it is checked against a policy with clients
+                client_ip = client
             new_policies = []
             for policy in reduced_policies:
-                client_found, client_excluded = check_ip_in_policy(client, policy.get("client"))
+                if policy_index is not None:
+                    client_found, client_excluded = policy_index.check_client(client_ip, policy)
+                else:
+                    client_found, client_excluded = check_ip_in_policy(client_ip, policy.get("client"))
                 if client_found and not client_excluded:
                     # The client was contained in the defined subnets and was
                     #  not excluded
@@ -621,6 +642,27 @@ class PolicyClass:
 
         return reduced_policies
 
+    def _list_policies_of_request(self, **kwargs) -> list[dict]:
+        """
+        Return the result of ``list_policies`` for the given arguments.
+
+        A request matches the same policies several times, e.g. in the prepolicies and
+        in the token classes. The results are kept in the request-local store as long as
+        the request-local config object, and thus the set of policies, does not change.
+        The time and the policy conditions are not part of the cached result, as they
+        depend on the state of the tokens and users, which may change during the request.
+        """
+        config_object = get_config_object()
+        store = get_request_local_store()
+        matches = store.get("policy_matches")
+        if matches is None or matches[0] is not config_object:
+            matches = store["policy_matches"] = (config_object, {})
+        key = tuple((name, tuple(value) if isinstance(value, list) else value)
+                    for name, value in sorted(kwargs.items()))
+        if key not in matches[1]:
+            matches[1][key] = self.list_policies(**kwargs)
+        return list(matches[1][key])
+
     @log_with(log)
     def match_policies(self, name: str | None = None, scope: str | None = None, realm: str | None = None,
                        active: bool | None = None, resolver: str | None = None, user: str | None = None,
@@ -691,11 +733,13 @@ class PolicyClass:
 
         log.debug("Trying to match policy for action \"{!s}\". Policies: {!s}".format(
             action, [p.get("name") for p in self.policies]))
-        reduced_policies = self.list_policies(name=name, scope=scope, realm=realm, active=active,
-                                              resolver=resolver, user=user, client=client, action=action,
-                                              adminrealm=adminrealm, adminuser=adminuser, pinode=pinode,
-                                              sort_by_priority=sort_by_priority, additional_realms=additional_realms,
-                                              user_agent=user_agent)
+        reduced_policies = self._list_policies_of_request(name=name, scope=scope, realm=realm, active=active,
+                                                          resolver=resolver, user=user, client=client,
+                                                          action=action, adminrealm=adminrealm,
+                                                          adminuser=adminuser, pinode=pinode,
+                                                          sort_by_priority=sort_by_priority,
+                                                          additional_realms=additional_realms,
+                                                          user_agent=user_agent)
 
         # filter policy for time. If no time is set or if a time is set, and
         # it matches the time_range, then we add this policy
@@ -1282,7 +1326,7 @@ def rename_policy(name: str, new_name: str) -> int:
         raise ParameterError(_("Policy already exists:") + f" {new_name}")
 
     policy.name = new_name
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.POLICY)
     db.session.commit()
 
     return policy.id
@@ -1535,7 +1579,7 @@ def set_policy(name: str | None = None, scope: str | None = None, action: str |
     else:
         new_description = PolicyDescription(object_id=ret, object_type="policy", description=description)
         db.session.add(new_description)
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.POLICY)
     db.session.commit()
     return ret
 
@@ -1559,7 +1603,7 @@ def enable_policy(name, enable=True):
 
     # Update the policy
     policy.active = enable
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.POLICY)
     db.session.commit()
     return policy.id
 
@@ -1595,7 +1639,7 @@ def delete_policies(names):
         except ResourceNotFoundError:
             log.warning(f"Policy with name '{name}' does not exist and therefore can not be deleted.")
             pass
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.POLICY)
     db.session.commit()
     return ids
 
@@ -1606,7 +1650,7 @@ def delete_all_policies():
     policies = db.session.scalars(stmt).unique().all()
     for p in policies:
         db.session.delete(p)
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.POLICY)
     db.session.commit()
 
 
@@ -28,6 +28,8 @@ This module is tested in tests/test_lib_pooling.py.
 """
 
 import logging
+import os
+import weakref
 from threading import Lock
 
 from privacyidea.lib.framework import get_app_local_store, get_app_config_value
@@ -39,16 +41,53 @@ class BaseEngineRegistry:
     """
     Abstract base class for engine registries.
     """
-    def get_engine(self, key, creator):
+    def get_engine(self, key, creator, fingerprint=None):
         """
         Return the engine associated with the key ``key``.
         :param key: An arbitrary hashable Python object
         :param creator: A function with no arguments which returns a new SQLAlchemy engine.
                         Called to initially create an engine.
+        :param fingerprint: An optional hashable description of the engine configuration.
+                            If it differs from the one the engine was created with, the
+                            engine is replaced.
         :return: an SQLAlchemy engine
         """
         raise NotImplementedError()
 
+    def release_engine(self, engine):
+        """
+        Called when a request is done with an engine it got from ``get_engine``.
+        All sessions bound to the engine have to be closed already, so that their
+        connections have been returned to the pool.
+        :param engine: an SQLAlchemy engine
+        """
+        raise NotImplementedError()
+
+    def get_pool_stats(self):
+        """
+        Return the state of the connection pools held by this registry.
+        :return: a dictionary mapping the engine keys to a dictionary of pool statistics
+        """
+        return {}
+
+
+def _pool_stats(pool):
+    """
+    Return the statistics of an SQLAlchemy connection pool.
+
+    Only a ``QueuePool`` counts its connections. For the other pool classes, we just
+    report the class and the status string.
+
+    :param pool: an SQLAlchemy pool
+    :return: a dictionary
+    """
+    stats = {"pool_class": type(pool).__name__,
+             "status": pool.status()}
+    for stat in ("size", "checkedin", "checkedout", "overflow"):
+        if callable(getattr(pool, stat, None)):
+            stats[stat] = getattr(pool, stat)()
+    return stats
+
 
 class NullEngineRegistry(BaseEngineRegistry):
     """
@@ -58,13 +97,25 @@ class NullEngineRegistry(BaseEngineRegistry):
 
     It can be activated by setting ``PI_ENGINE_REGISTRY_CLASS`` to "null".
     """
-    def get_engine(self, key, creator):
+    def get_engine(self, key, creator, fingerprint=None):
         return creator()
 
+    def release_engine(self, engine):
+        # The engine was created for this request only, so we close its connections.
+        engine.dispose()
+
+
+# All shared registries of this process. They have to drop the connections inherited
+# from the parent process after a fork.
+_shared_registries = weakref.WeakSet()
+
 
 class SharedEngineRegistry(BaseEngineRegistry):
     """
     A registry which holds a dictionary mapping a key to an SQLAlchemy engine.
+    The engines and their connection pools are kept for the lifetime of the process.
+    An engine is only disposed if the process is forked or if it is requested
+    with a different fingerprint, i.e. the configuration of the engine has changed.
 
     It can be activated by setting ``PI_ENGINE_REGISTRY_CLASS`` to "shared".
     """
@@ -72,17 +123,51 @@ class SharedEngineRegistry(BaseEngineRegistry):
         BaseEngineRegistry.__init__(self)
         self._engine_lock = Lock()
         self._engines = {}
+        self._fingerprints = {}
+        _shared_registries.add(self)
 
-    def get_engine(self, key, creator):
+    def get_engine(self, key, creator, fingerprint=None):
         # This method will be called concurrently by multiple threads.
         # Thus, to be sure that we do not create an engine when there
         # is already one associated with the given key, we use a lock.
         with self._engine_lock:
+            if key in self._engines and self._fingerprints.get(key) != fingerprint:
+                log.info(f"The configuration of the engine for key {key!s} has changed, "
+                         f"disposing the old connection pool.")
+                self._engines.pop(key).dispose()
             if key not in self._engines:
                 log.info(f"Creating a new engine and connection pool for key {key!s}")
                 self._engines[key] = creator()
+                self._fingerprints[key] = fingerprint
             return self._engines[key]
 
+    def release_engine(self, engine):
+        # The connections have already been returned to the pool and stay open
+        # for the next request.
+        pass
+
+    def get_pool_stats(self):
+        with self._engine_lock:
+            engines = dict(self._engines)
+        return {str(key): _pool_stats(engine.pool) for key, engine in engines.items()}
+
+    def dispose_after_fork(self):
+        """
+        Replace the connection pools inherited from the parent process without
+        closing the connections, which are still in use by the parent.
+        """
+        for engine in list(self._engines.values()):
+            engine.dispose(close=False)
+
+
+def _dispose_engines_after_fork():
+    for registry in list(_shared_registries):
+        registry.dispose_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
 
 ENGINE_REGISTRY_CLASSES = {
     "null": NullEngineRegistry,
@@ -118,9 +203,30 @@ def get_registry():
         return app_store.setdefault("engine_registry", registry)
 
 
-def get_engine(key, creator):
+def get_engine(key, creator, fingerprint=None):
     """
     Shortcut to get an engine from the application-global engine registry.
+    :param key: An arbitrary hashable Python object
+    :param creator: A function with no arguments which returns a new SQLAlchemy engine.
+    :param fingerprint: An optional hashable description of the engine configuration.
+                        A shared engine is replaced if the fingerprint changes.
     :return: an SQLAlchemy engine
     """
-    return get_registry().get_engine(key, creator)
+    return get_registry().get_engine(key, creator, fingerprint)
+
+
+def release_engine(engine):
+    """
+    Shortcut to hand an engine back to the application-global engine registry
+    at the end of a request.
+    """
+    get_registry().release_engine(engine)
+
+
+def get_pool_stats():
+    """
+    Return the checked-in, checked-out and overflow connections of the pools in the
+    application-global engine registry.
+    :return: a dictionary mapping the engine keys to the pool statistics
+    """
+    return get_registry().get_pool_stats()
@@ -47,7 +47,7 @@ from .framework import get_app_config_value
 from .log import log_with
 from ..models import (Realm,
                       ResolverRealm,
-                      Resolver, db, save_config_timestamp, TokenRealm)
+                      Resolver, db, save_config_timestamp, TokenRealm, ConfigSection)
 
 log = logging.getLogger(__name__)
 
@@ -155,7 +155,7 @@ def set_default_realm(default_realm=None):
         r = fetch_one_resource(Realm, name=default_realm)
         r.default = True
         res = r.id
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.REALM)
     db.session.commit()
     return res
 
@@ -237,7 +237,7 @@ def delete_realm(realm_name: str, delete_custom_attributes: bool = False):
 
     # Delete realm
     db.session.delete(realm)
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.REALM)
     db.session.commit()
 
     # If there was a default realm before
@@ -328,7 +328,7 @@ def set_realm(realm, resolvers=None):
     if len(realms) == 1:
         db_realm.default = True
 
-    save_config_timestamp()
+    save_config_timestamp(section=ConfigSection.REALM)
     db.session.commit()
 
     return added, failed
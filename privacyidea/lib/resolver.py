@@ -45,11 +45,14 @@ webservice!
 import copy
 import json
 import logging
+import threading
 from typing import Any
 
 from sqlalchemy import func, delete, select
 
-from privacyidea.lib.framework import get_request_local_store
+from privacyidea.lib.cache.redis import evict_resolver_lookups
+from privacyidea.lib.framework import get_request_local_store, get_app_local_store
+from privacyidea.lib.lifecycle import register_finalizer
 from privacyidea.lib.usercache import delete_user_cache
 from privacyidea.lib.utils import (sanity_name_check, get_data_from_params,
                                    is_true)
@@ -60,11 +63,53 @@ from .error import ConfigAdminError
 from .log import log_with
 from privacyidea.lib.params import get_required
 from ..models import (Resolver,
-                      ResolverConfig, save_config_timestamp, db)
+                      ResolverConfig, save_config_timestamp, db, ConfigSection)
 
 log = logging.getLogger(__name__)
 
 
+class _ResolverObjectCache(threading.local):
+    """
+    The resolver objects of one thread, which are reused by the following requests
+    handled by the thread as long as the configuration does not change.
+
+    Resolver objects hold connections and are not thread-safe, so every thread
+    gets its own objects.
+    """
+    def __init__(self):
+        self.timestamp = None
+        self.objects = {}
+
+    def get(self, resolvername, timestamp):
+        """
+        :return: the resolver object created with the configuration of the given timestamp or None
+        """
+        if timestamp is None or timestamp != self.timestamp:
+            # The configuration has been reloaded, all resolvers are created again
+            self.timestamp = timestamp
+            self.objects = {}
+            return None
+        return self.objects.get(resolvername)
+
+    def set(self, resolvername, timestamp, resolver_object):
+        if timestamp is not None and timestamp == self.timestamp:
+            self.objects[resolvername] = resolver_object
+
+    def pop(self, resolvername):
+        self.objects.pop(resolvername, None)
+
+
+def _get_resolver_object_cache():
+    """
+    :return: the application-wide ``_ResolverObjectCache``, which is created on demand
+    """
+    store = get_app_local_store()
+    if 'resolver_object_cache' not in store:
+        # Like the shared config object, a concurrently created cache loses and is discarded.
+        store.setdefault('resolver_object_cache', _ResolverObjectCache())
+    return store['resolver_object_cache']
+
+
 # Hide the keyswords BINDPW and Password in params
 @log_with(log)
 def save_resolver(params):
@@ -184,7 +229,8 @@ def save_resolver(params):
 
     # Remove corresponding entries from the user cache
     delete_user_cache(resolver=resolvername)
-    save_config_timestamp()
+    evict_resolver_lookups(resolvername)
+    save_config_timestamp(section=ConfigSection.RESOLVER)
     db.session.commit()
 
     # Resolver TLS endpoints may have changed - drop cached cert health.
@@ -285,7 +331,7 @@ def delete_resolver(resolvername):
                                    f"realm {realmname!r}.")
 
         db.session.delete(resolver)
-        save_config_timestamp()
+        save_config_timestamp(section=ConfigSection.RESOLVER)
         db.session.commit()
         ret = resolver.id
     # Delete resolver object from cache
@@ -293,9 +339,11 @@ def delete_resolver(resolvername):
     if 'resolver_objects' in store:
         if resolvername in store['resolver_objects']:
             del store['resolver_objects'][resolvername]
+    _get_resolver_object_cache().pop(resolvername)
 
     # Remove corresponding entries from the user cache
     delete_user_cache(resolver=resolvername)
+    evict_resolver_lookups(resolvername)
 
     # Resolver TLS endpoints may have changed - drop cached cert health.
     from privacyidea.lib.health import invalidate_certificate_cache
@@ -382,6 +430,12 @@ def get_resolver_object(resolvername):
     Return the cached resolver object for the given resolver name (stored in the request context).
     If no resolver object is cached, create it and add it to the cache.
 
+    Creating a resolver object and loading its configuration is costly, e.g. the
+    LDAP resolver creates its server pool and TLS context and the SQL resolver
+    reads the table definition. Hence, the resolver objects are also kept for the
+    following requests of the same thread, until the configuration is reloaded.
+    At the end of each request the resolver is closed (see ``UserIdResolver.close``).
+
     :param resolvername: the resolver string as from the token including
                          the config as last part
     :return: instance of the resolver with the loaded config
@@ -399,12 +453,18 @@ def get_resolver_object(resolvername):
             store['resolver_objects'] = {}
         resolver_objects = store['resolver_objects']
         if resolvername not in resolver_objects:
-            # create the resolver instance and load the config
-            r_obj = resolver_objects[resolvername] = r_obj_class()
-            if r_obj is not None:
+            timestamp = get_config_object().timestamp
+            object_cache = _get_resolver_object_cache()
+            r_obj = object_cache.get(resolvername, timestamp)
+            if r_obj is None or not isinstance(r_obj, r_obj_class):
+                # create the resolver instance and load the config
+                r_obj = r_obj_class()
                 resolver_config = get_resolver_config(resolvername)
                 r_obj.loadConfig(resolver_config)
                 r_obj.name = resolvername
+                object_cache.set(resolvername, timestamp, r_obj)
+            register_finalizer(r_obj.close)
+            resolver_objects[resolvername] = r_obj
         return resolver_objects[resolvername]
 
 
@@ -18,24 +18,35 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import copy
+import functools
+import hashlib
 import json
 import logging
 import re
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
+from http.cookiejar import DefaultCookiePolicy
 from urllib.parse import quote
 
 import requests
 from pydash import get
 from requests import Response, HTTPError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .UserIdResolver import UserIdResolver
+from ..cache.redis import (CacheState, cache_resolver_auth_header, evict_resolver_auth_header,
+                           get_resolver_auth_header_from_cache)
 from ..error import ParameterError, ResolverError
 from ..log import log_with
 from ..utils import is_true
-from privacyidea.lib.metrics import track_resolver_op
+from privacyidea.lib.framework import get_app_local_store
+from privacyidea.lib.metrics import track_resolver_op, CounterBuffer
 from privacyidea.lib.params import get_required
+from privacyidea.lib.utils.singleflight import SingleFlight
 
 ENCODING = "utf-8"
 EDITABLE = "Editable"
@@ -67,6 +78,22 @@ PASSWORD = "password"
 VERIFY_TLS = "verify_tls"
 TLS_CA_PATH = "tls_ca_path"
 TIMEOUT = "timeout"
+POOL_SIZE = "pool_size"
+RETRIES = "retries"
+CACHE_TIMEOUT = "cache_timeout"
+
+#: The default number of connections to the user store, which each process keeps open per resolver
+DEFAULT_POOL_SIZE = 10
+#: The default number of retries of a request, if the connection to the user store fails
+DEFAULT_RETRIES = 1
+#: The default number of seconds the users looked up in the user store are cached. 0 disables the cache.
+DEFAULT_CACHE_TIMEOUT = 0
+#: The maximum number of entries in the user cache of each resolver
+DEFAULT_CACHE_SIZE = 10000
+#: The number of seconds before its ``expires_in`` an authorization header is requested again
+AUTH_HEADER_REFRESH_MARGIN = 30
+#: The number of seconds an authorization header is used, if the token response contains no ``expires_in``
+AUTH_HEADER_DEFAULT_LIFETIME = 60
 
 log = logging.getLogger(__name__)
 
@@ -74,6 +101,13 @@ log = logging.getLogger(__name__)
 # the closing brace of another tag.
 TAG_PATTERN = re.compile(r"\{([^{}]+)\}")
 
+# The requests for single users of all HTTP resolvers, which are currently sent to a user store
+_REQUESTS_IN_FLIGHT = SingleFlight()
+_SESSIONS_LOCK = threading.Lock()
+_USER_CACHES_LOCK = threading.Lock()
+# The requests for the authorization header of all HTTP resolvers, which are currently sent to a user store
+_AUTH_HEADERS_IN_FLIGHT = SingleFlight()
+
 
 @dataclass
 class Error:
@@ -105,6 +139,145 @@ class HTTPMethod(Enum):
         return [cls.POST, cls.PATCH, cls.PUT]
 
 
+class HTTPSession:
+    """
+    A ``requests.Session`` of a resolver, which is shared by all threads of a process. It keeps
+    up to ``pool_size`` connections to each host of the user store open, so that the following
+    requests do not need a new TCP connection and TLS handshake.
+
+    Failed connections are retried ``retries`` times. Requests which may have reached the user
+    store are only retried for idempotent methods.
+    Cookies are neither stored nor sent, so that no state is shared between the requests.
+
+    The requests and the newly opened connections are counted in memory and reported via
+    :mod:`privacyidea.lib.metrics` once a minute as ``http_resolver_requests_total`` and
+    ``http_resolver_connections_total``.
+    """
+
+    def __init__(self, name: str, pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES):
+        self.labels = {"resolver": name}
+        self.description = (pool_size, retries)
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=retries, raise_on_status=False))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._adapter = adapter
+        self.requests = 0
+        self.connections = 0
+        self._counters = CounterBuffer()
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            self._count_request()
+
+    def _count_request(self):
+        pools = self._adapter.poolmanager.pools
+        connections = 0
+        for key in pools.keys():
+            try:
+                connections += pools[key].num_connections
+            except KeyError:  # pragma: no cover
+                # The pool of a host was evicted in the meantime
+                pass
+        with self._lock:
+            self.requests += 1
+            new_connections = max(connections - self.connections, 0)
+            self.connections = max(connections, self.connections)
+        if new_connections:
+            self._counters.inc("http_resolver_connections_total", self.labels, by=new_connections)
+        self._counters.inc("http_resolver_requests_total", self.labels)
+
+    def close(self):
+        self.session.close()
+
+
+class UserCache:
+    """
+    The per-process cache of the user lookups of a resolver, which is shared by all threads of a
+    process. It maps the name and the arguments of a lookup to its result and the time the
+    result expires.
+
+    All entries live for the same ``timeout``, so the oldest entry is the next to expire. If the
+    cache holds more than ``max_size`` entries, the oldest ones are evicted.
+    Empty results, i.e. unknown users, are not cached, so a new user is found immediately.
+
+    The lookups are counted in memory and reported via :mod:`privacyidea.lib.metrics` once a
+    minute as ``http_resolver_cache_lookups_total``.
+    """
+
+    def __init__(self, name: str, timeout: int, description: str = "", max_size: int = DEFAULT_CACHE_SIZE):
+        self.labels = {"resolver": name}
+        self.timeout = timeout
+        self.description = description
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._counters = CounterBuffer()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key: tuple):
+        """
+        :return: a copy of the value cached for the key, or None if there is none or it is expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._counters.inc("http_resolver_cache_lookups_total", {**self.labels, "result": "hit" if entry else "miss"})
+        return copy.deepcopy(entry[0]) if entry else None
+
+    def store(self, key: tuple, value):
+        """
+        Store a copy of the value as the newest entry and evict the surplus entries.
+        """
+        if not value:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (copy.deepcopy(value), time.time() + self.timeout)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached(func):
+    """
+    Decorator for the user lookups of an HTTP resolver. The result is taken from the user cache of the
+    resolver, if the resolver has a ``cache_timeout``.
+    """
+
+    @functools.wraps(func)
+    def cached_lookup(self, *args, **kwargs):
+        user_cache = self.get_user_cache()
+        if user_cache is None:
+            return func(self, *args, **kwargs)
+        key = (func.__name__, json.dumps([args, kwargs], sort_keys=True, default=str))
+        value = user_cache.lookup(key)
+        if value is None:
+            value = func(self, *args, **kwargs)
+            user_cache.store(key, value)
+        return value
+
+    return cached_lookup
+
+
 class RequestConfig:
 
     def __init__(self, config: dict, default_headers: dict, tags: dict | None = None):
@@ -304,6 +477,12 @@ class HTTPResolver(UserIdResolver):
         self._tls_ca = None
         self.tls = self._verify_tls
         self.timeout = 60  # Default timeout for requests
+        self.pool_size = DEFAULT_POOL_SIZE
+        self.retries = DEFAULT_RETRIES
+        self.cache_timeout = DEFAULT_CACHE_TIMEOUT
+        self._user_cache_description = ""
+        # Reuse the authorization header until it expires
+        self.cache_auth_header = True
         self._map = self.attribute_mapping_pi_to_user_store
         self.updateable = True
 
@@ -361,7 +540,10 @@ class HTTPResolver(UserIdResolver):
             PASSWORD: 'password',
             VERIFY_TLS: 'bool',
             TLS_CA_PATH: 'string',
-            TIMEOUT: 'int'
+            TIMEOUT: 'int',
+            POOL_SIZE: 'int',
+            RETRIES: 'int',
+            CACHE_TIMEOUT: 'int'
         }
         return {typ: descriptor}
 
@@ -376,6 +558,9 @@ class HTTPResolver(UserIdResolver):
         censored_config[VERIFY_TLS] = self._verify_tls
         censored_config["type"] = self.getResolverType()
         censored_config[TIMEOUT] = self.timeout
+        censored_config[POOL_SIZE] = self.pool_size
+        censored_config[RETRIES] = self.retries
+        censored_config[CACHE_TIMEOUT] = self.cache_timeout
         censored_config[CONFIG_GET_USER_GROUPS] = self.config_get_user_groups
         if self.base_url:
             censored_config[BASE_URL] = self.base_url
@@ -423,6 +608,7 @@ class HTTPResolver(UserIdResolver):
         return mapping
 
     @track_resolver_op("get_user_id")
+    @cached
     def getUserId(self, login_name: str) -> str:
         """
         Returns the user ID for the given username. If the user does not exist, an empty string is returned.
@@ -438,11 +624,12 @@ class HTTPResolver(UserIdResolver):
             return login_name
 
         config = RequestConfig(config_get_user_by_name, self.headers, {"username": login_name})
-        user_info = self._get_user(login_name, config, ["userid"])
+        user_info = self._get_user_coalesced(login_name, config, ["userid"])
         user_id = user_info.get("userid", "")
         return user_id
 
     @track_resolver_op("get_username")
+    @cached
     def getUsername(self, userid: str) -> str:
         """
         Returns the username for the given user ID.
@@ -452,6 +639,7 @@ class HTTPResolver(UserIdResolver):
         return user_name
 
     @track_resolver_op("get_user_info")
+    @cached
     def get_user_info(self, user_id: int or str, attributes: list[str] = None) -> dict:
         """
         This function returns all user information for a given user object
@@ -462,7 +650,7 @@ class HTTPResolver(UserIdResolver):
         :return:  dictionary, if no object is found, the dictionary is empty
         """
         config = RequestConfig(self.config_get_user_by_id, self.headers, {"userid": user_id})
-        user_info = self._get_user(user_id, config, attributes)
+        user_info = self._get_user_coalesced(user_id, config, attributes)
         return user_info
 
     def get_available_info_keys(self) -> list[str]:
@@ -529,6 +717,7 @@ class HTTPResolver(UserIdResolver):
 
         # Request
         response = self._do_request(config, request_params)
+        self.clear_user_cache()
 
         # Handle Response
         success = self._create_user_error_handling(response, config)
@@ -565,6 +754,7 @@ class HTTPResolver(UserIdResolver):
 
         # Request
         response = self._do_request(config, params)
+        self.clear_user_cache()
 
         # Handle Response
         success = self._delete_user_error_handling(response, config, uid)
@@ -598,6 +788,7 @@ class HTTPResolver(UserIdResolver):
 
         # Request
         response = self._do_request(config, request_params)
+        self.clear_user_cache()
 
         # Handle Request
         success = self._update_user_error_handling(response, config, uid)
@@ -667,6 +858,9 @@ class HTTPResolver(UserIdResolver):
         * verify_tls: bool or str (e.g. "true" or "false")
         * tls_certificate_path: str
         * timeout: int (seconds) or str e.g. "10"
+        * pool_size: int or str, the number of connections kept open to the user store
+        * retries: int or str, the number of retries if the connection to the user store fails
+        * cache_timeout: int or str, the number of seconds the users are cached, 0 disables the cache
         * config_get_user_by_id: dict
             - method: str (e.g. "get" or "post")
             - endpoint: str
@@ -749,8 +943,69 @@ class HTTPResolver(UserIdResolver):
         except ValueError as e:
             log.debug(f"Invalid value for '{TIMEOUT}': {config.get(TIMEOUT)}. {e}")
             raise ParameterError(f"Invalid value for '{TIMEOUT}': {config.get(TIMEOUT)}.")
+        for key, default in ((POOL_SIZE, DEFAULT_POOL_SIZE), (RETRIES, DEFAULT_RETRIES),
+                             (CACHE_TIMEOUT, DEFAULT_CACHE_TIMEOUT)):
+            value = config.get(key)
+            try:
+                value = int(default if value in (None, "") else value)
+            except ValueError as e:
+                log.debug(f"Invalid value for '{key}': {value}. {e}")
+                raise ParameterError(f"Invalid value for '{key}': {value}.")
+            if value < 0 or (key == POOL_SIZE and value < 1):
+                raise ParameterError(f"Invalid value for '{key}': {value}.")
+            setattr(self, key, value)
+        description = json.dumps([self.getResolverType(), self.config, self.base_url], sort_keys=True, default=str)
+        self._user_cache_description = hashlib.sha256(description.encode()).hexdigest()
         return self
 
+    def get_session(self) -> HTTPSession:
+        """
+        Return the process-level HTTP session of this resolver. Retrieve it from the app-local store.
+        If it does not exist yet or the pool configuration changed, create a new one.
+
+        :return: a ``HTTPSession`` instance
+        """
+        sessions = get_app_local_store().setdefault("http_resolver_sessions", {})
+        name = str(getattr(self, "name", None) or self.base_url or self.getResolverId())
+        session_key = (self.getResolverType(), name)
+        with _SESSIONS_LOCK:
+            session = sessions.get(session_key)
+            if session is None or session.description != (self.pool_size, self.retries):
+                if session is not None:
+                    session.close()
+                session = sessions[session_key] = HTTPSession(name, self.pool_size, self.retries)
+        return session
+
+    def get_user_cache(self) -> UserCache | None:
+        """
+        Return the process-level user cache of this resolver from the app-local store. If it does not exist yet
+        or the configuration of the resolver changed, create a new one.
+
+        :return: a ``UserCache`` instance or None, if the resolver has no ``cache_timeout``
+        """
+        if self.cache_timeout <= 0:
+            return None
+        user_caches = get_app_local_store().setdefault("http_resolver_user_caches", {})
+        name = str(getattr(self, "name", None) or self.base_url or self.getResolverId())
+        cache_key = (self.getResolverType(), name)
+        user_cache = user_caches.get(cache_key)
+        if user_cache is None or user_cache.description != self._user_cache_description:
+            with _USER_CACHES_LOCK:
+                user_cache = user_caches.get(cache_key)
+                if user_cache is None or user_cache.description != self._user_cache_description:
+                    user_cache = user_caches[cache_key] = UserCache(name, self.cache_timeout,
+                                                                    self._user_cache_description)
+        return user_cache
+
+    def clear_user_cache(self):
+        """
+        Remove all users of this resolver from the user cache of this process, e.g. after a user was changed.
+        The caches of the other processes expire after the ``cache_timeout``.
+        """
+        user_cache = self.get_user_cache()
+        if user_cache is not None:
+            user_cache.clear()
+
     @classmethod
     def testconnection(cls, param: dict) -> tuple[bool, str]:
         """
@@ -780,6 +1035,8 @@ class HTTPResolver(UserIdResolver):
         tested_configs = []
         try:
             resolver = cls()
+            # The connection test always requests a new authorization header
+            resolver.cache_auth_header = False
             resolver.loadConfig(param)
             # backward compatibility: only sends username in testUser
             test_user = param.get("testUser")
@@ -882,6 +1139,7 @@ class HTTPResolver(UserIdResolver):
 
         return success, description
 
+    @cached
     def get_user_groups(self, user: dict) -> list:
         """
         Gets all groups of a user
@@ -975,13 +1233,66 @@ class HTTPResolver(UserIdResolver):
         Returns the auth header for the request. Typically, this requests an access token for a service account.
         The resulting authorization header can be used to access the user endpoints of the API.
         If the authorization is not configure an empty dict is returned.
-        """
-        # TODO: Cache implementation
 
-        auth_header = {}
+        The header is cached per process until the ``expires_in`` of the token response, minus a refresh margin.
+        If several threads need a new header at the same time, only one of them requests it. With
+        ``PI_REDIS_CACHE_RESOLVER_AUTH`` the header is shared with the other workers via Redis.
+        """
         if not self.authorization_config:
-            return auth_header
+            return {}
+        if not self.cache_auth_header:
+            return self._request_auth_header()[0]
+
+        key = self._auth_header_cache_key()
+        cached = get_app_local_store().setdefault("http_resolver_auth_headers", {}).get(key)
+        if cached and time.time() < cached[1]:
+            return dict(cached[0])
+        return dict(_AUTH_HEADERS_IN_FLIGHT.do(key, self._refresh_auth_header, key))
+
+    def _auth_header_cache_key(self) -> str:
+        """
+        Returns the key of the cached authorization header. It contains a hash of the resolver configuration
+        including the credentials of the service account, so a changed configuration never uses an old header.
+        """
+        description = json.dumps([self.getResolverType(), self.config, self.base_url, self.authorization_config,
+                                  self.username, self.password], sort_keys=True, default=str)
+        name = getattr(self, "name", None) or self.base_url or self.getResolverId()
+        return f"{name}:{hashlib.sha256(description.encode()).hexdigest()}"
+
+    def _refresh_auth_header(self, key: str) -> dict:
+        """
+        Takes the authorization header from the shared cache or requests a new one and stores it in the
+        per-process cache.
+        """
+        shared = get_resolver_auth_header_from_cache(key)
+        if isinstance(shared, CacheState):
+            auth_header, lifetime = self._request_auth_header()
+            expires_at = time.time() + lifetime
+            cache_resolver_auth_header(key, auth_header, expires_at)
+        else:
+            auth_header, expires_at = shared
+        get_app_local_store().setdefault("http_resolver_auth_headers", {})[key] = (auth_header, expires_at)
+        return auth_header
 
+    def _forget_auth_header(self, request_headers: dict):
+        """
+        Removes the cached authorization header, if it was sent with a request the user store rejected.
+        The next request then requests a new header.
+        """
+        key = self._auth_header_cache_key()
+        auth_headers = get_app_local_store().setdefault("http_resolver_auth_headers", {})
+        cached = auth_headers.get(key)
+        if cached and cached[0] and all(request_headers.get(name) == value for name, value in cached[0].items()):
+            log.info("The user store rejected the cached authorization header. Requesting a new one.")
+            auth_headers.pop(key, None)
+            evict_resolver_auth_header(key)
+
+    def _request_auth_header(self) -> tuple[dict, float]:
+        """
+        Requests the authorization header from the user store.
+
+        :return: tuple of the header and the number of seconds it may be used
+        """
         config = RequestConfig(self.authorization_config, {"Content-Type": "application/x-www-form-urlencoded"},
                                {"username": self.username, "password": self.password})
 
@@ -994,7 +1305,11 @@ class HTTPResolver(UserIdResolver):
         else:
             raise ResolverError("Failed to get authorization header.")
 
-        return auth_header
+        try:
+            expires_in = float(json_result.get("expires_in"))
+        except (AttributeError, TypeError, ValueError):
+            return auth_header, AUTH_HEADER_DEFAULT_LIFETIME
+        return auth_header, max(expires_in - AUTH_HEADER_REFRESH_MARGIN, expires_in / 2)
 
     @staticmethod
     def _apply_response_mapping(config: RequestConfig, result: dict) -> dict:
@@ -1083,17 +1398,20 @@ class HTTPResolver(UserIdResolver):
             # representation of the list) and skips entries with the value None. A pre-encoded string would be used as
             # it is, hence the params have to stay a dict.
             # The same applies to the request body: dicts passed to json or data are encoded by requests as well.
+            session = self.get_session()
             if config.method in HTTPMethod.methods_with_body():
                 # The params are the body, either as json or form encoded, so there is no query string
-                response = requests.request(config.method.value, config.endpoint, json=json_params, data=params,
-                                            headers=config.headers, timeout=self.timeout, verify=self.tls)
+                response = session.request(config.method.value, config.endpoint, json=json_params, data=params,
+                                           headers=config.headers, timeout=self.timeout, verify=self.tls)
             else:
-                response = requests.request(config.method.value, config.endpoint, params=params,
-                                            headers=config.headers, timeout=self.timeout, verify=self.tls)
+                response = session.request(config.method.value, config.endpoint, params=params,
+                                           headers=config.headers, timeout=self.timeout, verify=self.tls)
         except Exception as error:
             log.warning(f"Failed to perform HTTP request: {error}")
             raise ResolverError("Failed to perform HTTP request!")
         end_time = time.time()
+        if response.status_code == 401 and self.authorization_config and self.cache_auth_header and not censor_log:
+            self._forget_auth_header(config.headers)
 
         if censor_log:
             request_url = config.endpoint
@@ -1107,6 +1425,22 @@ class HTTPResolver(UserIdResolver):
 
         return response
 
+    def _get_user_coalesced(self, user_identifier: str, config: RequestConfig, attributes: list[str] = None) -> dict:
+        """
+        Fetches a single user from the user store with ``_get_user``. Concurrent requests of the same
+        resolver for the same user are coalesced: only the first thread sends the request to the user
+        store, the other threads wait for its result. Each thread gets its own copy of the result.
+
+        :param user_identifier: Either the UID or the username
+        :param config: Configuration to fetch the user
+        :param attributes: list of attributes to be returned for the user
+        :return: Dictionary containing pi conform user attributes
+        """
+        key = (getattr(self, "name", None) or id(self), config.method, config.endpoint,
+               json.dumps(config.request_mapping, sort_keys=True, default=str),
+               tuple(attributes) if attributes else None)
+        return copy.deepcopy(_REQUESTS_IN_FLIGHT.do(key, self._get_user, user_identifier, config, attributes))
+
     def _get_user(self, user_identifier: str, config: RequestConfig, attributes: list[str] = None) -> dict:
         """
         Fetches a single user from the user store
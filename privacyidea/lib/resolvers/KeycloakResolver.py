@@ -27,7 +27,7 @@ from privacyidea.lib.resolvers.HTTPResolver import (HTTPResolver, METHOD, ENDPOI
                                                     CONFIG_GET_USER_BY_NAME, CONFIG_GET_USER_LIST, REQUEST_MAPPING,
                                                     RequestConfig, HEADERS, ADVANCED, RESPONSE_MAPPING,
                                                     CONFIG_CREATE_USER, CONFIG_DELETE_USER, CONFIG_EDIT_USER,
-                                                    CONFIG_USER_AUTH, Error, ACTIVE,
+                                                    CONFIG_USER_AUTH, Error, ACTIVE, cached,
                                                     USER_GROUPS_ATTRIBUTE, PI_USER_GROUPS_KEY)
 from privacyidea.lib.resolvers.util import delete_user_error_handling_no_content
 
@@ -129,6 +129,7 @@ class KeycloakResolver(HTTPResolver):
         return KeycloakResolver.getResolverClassDescriptor()
 
     @track_resolver_op("get_user_id")
+    @cached
     def getUserId(self, login_name: str) -> str:
         """
         Searches for a user by its name. Keycloak does not have an explicit endpoint for this purpose. Hence, we use
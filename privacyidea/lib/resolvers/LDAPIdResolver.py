@@ -26,15 +26,19 @@ The file is tested in tests/test_lib_resolver.py
 """
 
 import binascii
+import copy
 import datetime
 import functools
 import hashlib
+import heapq
 import logging
 import os.path
 import ssl
 import threading
+import time
 import traceback
 import uuid
+from collections import OrderedDict
 from operator import itemgetter
 from typing import Any
 
@@ -42,24 +46,37 @@ import ldap3
 import yaml
 from ldap3 import MODIFY_REPLACE, MODIFY_ADD, MODIFY_DELETE
 from ldap3 import Tls
-from ldap3.core.exceptions import LDAPOperationResult
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPOperationResult
 from ldap3.core.results import RESULT_SIZE_LIMIT_EXCEEDED
 from ldap3.utils.conv import escape_bytes
 from passlib.hash import ldap_salted_sha1
 
 from privacyidea.lib import _
+from privacyidea.lib.cache.redis import (CacheState, cache_resolver_lookup,
+                                         get_resolver_lookup_from_cache)
 from privacyidea.lib.error import PrivacyIDEAError, ResolverError, ParameterError
 from privacyidea.lib.framework import get_app_local_store, get_app_config_value
-from privacyidea.lib.metrics import track_resolver_op
+from privacyidea.lib.metrics import track_resolver_op, inc, observe, gauge, CounterBuffer
 from privacyidea.lib.log import log_with
 from privacyidea.lib.utils import (is_true, to_bytes, to_unicode,
                                    convert_column_to_unicode)
+from privacyidea.lib.utils.singleflight import SingleFlight
 from .UserIdResolver import UserIdResolver
 from ..lifecycle import register_finalizer
 
 log = logging.getLogger(__name__)
 
+#: Maps the resolver id to the ResolverCache of each cached function
 CACHE = {}
+#: The default maximum number of entries in the cache of each cached function of a resolver
+DEFAULT_CACHE_SIZE = 100000
+#: The default time in seconds an unknown user is cached
+DEFAULT_NEGATIVE_CACHE_TIMEOUT = 10
+#: The lookups of all resolvers, which are currently sent to an LDAP server
+_LOOKUPS_IN_FLIGHT = SingleFlight()
+#: The default time in seconds an unused connection stays in the connection pool
+DEFAULT_CONNECTION_POOL_IDLE_TIMEOUT = 60
+_CONNECTION_POOLS_LOCK = threading.Lock()
 
 ENCODING = "utf-8"
 # The number of rounds the resolver tries to reach a responding server in the
@@ -126,6 +143,128 @@ class LockingServerPool(ldap3.ServerPool):
             return ldap3.ServerPool.get_current_server(self, connection)
 
 
+class LDAPConnectionPool:
+    """
+    A bounded pool of open LDAP connections of one resolver, which is shared by all threads
+    of a process.
+
+    A thread acquires a connection for the duration of a request and releases it afterwards.
+    If all ``max_size`` connections are in use, the thread waits up to ``wait_timeout`` seconds
+    for a connection to be released. Idle connections are reused in LIFO order, so that
+    the connections not needed at low load expire after ``idle_timeout`` seconds.
+    Connections which were closed or released as not reusable are discarded.
+
+    The time a thread waits for a connection is reported via :mod:`privacyidea.lib.metrics`
+    as ``ldap_pool_wait_seconds``.
+    """
+
+    def __init__(self, name: str, connect, max_size: int, idle_timeout: int, wait_timeout: int,
+                 description: tuple = ()):
+        """
+        :param name: the name of the pool used in the log and the metrics labels
+        :param connect: callable without arguments returning a new connection
+        :param description: the configuration the connections were created with
+        """
+        self.labels = {"resolver": name}
+        self.description = description
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        # The idle connections as tuples of (connection, time of the release)
+        self._idle = []
+        # The number of connections of the pool, in use or idle
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self) -> ldap3.Connection:
+        """
+        Return an idle connection or a new one, if the pool is not full yet.
+
+        :raises ResolverError: if no connection was released within the wait timeout
+        """
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        expired = []
+        connection = None
+        try:
+            with self._condition:
+                while True:
+                    while self._idle and connection is None:
+                        idle_connection, released = self._idle.pop()
+                        if idle_connection.closed or time.monotonic() - released >= self.idle_timeout:
+                            expired.append(idle_connection)
+                            self._size -= 1
+                        else:
+                            connection = idle_connection
+                    if connection is not None or self._size < self.max_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        observe("ldap_pool_wait_seconds", time.monotonic() - start, self.labels)
+                        inc("ldap_pool_timeouts_total", self.labels)
+                        raise ResolverError(f"No LDAP connection available for "
+                                            f"{self.labels['resolver']!r} within {self.wait_timeout} seconds.")
+                    self._condition.wait(remaining)
+                if connection is None:
+                    self._size += 1
+        finally:
+            for expired_connection in expired:
+                self._unbind(expired_connection)
+        observe("ldap_pool_wait_seconds", time.monotonic() - start, self.labels)
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                self._remove()
+                raise
+        return connection
+
+    def release(self, connection: ldap3.Connection, reusable: bool = True) -> None:
+        """
+        Return a connection to the pool or close it, if it can not be reused.
+        """
+        if not reusable or connection.closed or self._closed:
+            self._unbind(connection)
+            self._remove()
+        else:
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    def close(self) -> None:
+        """
+        Close the idle connections. Connections in use are closed when they are released.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _released in idle:
+            self._unbind(connection)
+
+    def _remove(self) -> None:
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _unbind(connection: ldap3.Connection) -> None:
+        try:
+            connection.unbind()
+        except Exception as e:  # pragma: no cover
+            log.debug(f"Error during LDAP unbind operation: {e}")
+
+
 def get_ad_timestamp_now() -> int:
     """
     returns the current UTC time as it is used in Active Directory in the
@@ -205,39 +344,143 @@ def ignore_sizelimit_exception(conn, generator):
 CACHE_MISS = object()
 
 
-def _get_cache_bucket(resolver: "IdResolver", func_name: str) -> dict:
+class ResolverCache(OrderedDict):
     """
-    Return the cache dict of this resolver for the given function, after evicting expired entries.
+    The cache of one function of one LDAP resolver, mapping a key to a dict with the cached
+    ``value`` and the ``timestamp`` of the lookup.
+
+    Entries of unknown users expire after the shorter negative cache timeout and entries copied
+    from the shared cache keep the time of the original lookup, so the order of insertion is not
+    the order of expiry. The expiry times are therefore kept in a heap: expired entries are
+    evicted in the order they expire, which costs O(log n) per stored entry instead of a walk
+    over the whole cache. If the cache still holds more than ``max_size`` entries, the oldest
+    stored ones are evicted.
+
+    The hits, misses and evictions are counted in memory and reported via
+    :mod:`privacyidea.lib.metrics` once a minute, together with the size of the cache.
+    """
+
+    def __init__(self, resolver_name: str, func_name: str):
+        super().__init__()
+        self.labels = {"resolver": resolver_name, "op": func_name}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._counters = CounterBuffer()
+        # The expiry time of each key, and a heap of (expiry time, key). The heap keeps the
+        # expiry times of replaced and evicted entries until they are due or it is rebuilt.
+        self._expires = {}
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str, timeout: int, negative_timeout: int) -> dict | None:
+        """
+        :param timeout: the time in seconds an entry is valid
+        :param negative_timeout: the time in seconds an entry of an unknown user is valid
+        :return: the entry stored for the key, or None if there is none or it is expired
+        """
+        entry = self.get(key)
+        if entry:
+            if not entry.get("value"):
+                timeout = negative_timeout
+            if datetime.datetime.now(tz=datetime.timezone.utc) < \
+                    entry.get("timestamp") + datetime.timedelta(seconds=timeout):
+                return entry
+        return None
+
+    def count_lookup(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._count("ldap_cache_lookups_total", {**self.labels, "result": "hit" if hit else "miss"})
+
+    def _count(self, name: str, labels: dict, by: int = 1) -> None:
+        if self._counters.inc(name, labels, by=by):
+            gauge("ldap_cache_size", len(self), self.labels)
+
+    def store(self, key: str, value: dict | str, timeout: int, max_size: int,
+              timestamp: datetime.datetime | None = None) -> dict:
+        """
+        Store the value as the newest entry and evict the expired and the surplus entries.
+
+        :param timeout: the time in seconds the entry is valid after the lookup
+        :param timestamp: the time of the lookup, if it was not just done by this process
+        :return: the stored entry
+        """
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        entry = {"value": value, "timestamp": timestamp or now}
+        expires = entry["timestamp"] + datetime.timedelta(seconds=timeout)
+        evicted = 0
+        with self._lock:
+            self.pop(key, None)
+            self[key] = entry
+            self._expires[key] = expires
+            heapq.heappush(self._expiry_heap, (expires, key))
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expired, expired_key = heapq.heappop(self._expiry_heap)
+                if self._expires.get(expired_key) != expired:
+                    # The entry was replaced in the meantime
+                    continue
+                del self._expires[expired_key]
+                if self.pop(expired_key, None) is not None:
+                    evicted += 1
+            while len(self) > max_size:
+                oldest_key, _oldest_entry = self.popitem(last=False)
+                self._expires.pop(oldest_key, None)
+                evicted += 1
+            if len(self._expiry_heap) > 2 * max_size:
+                self._expires = {cached_key: self._expires[cached_key] for cached_key in self
+                                 if cached_key in self._expires}
+                self._expiry_heap = [(expiry, cached_key) for cached_key, expiry in self._expires.items()]
+                heapq.heapify(self._expiry_heap)
+        if evicted:
+            self.evictions += evicted
+            self._count("ldap_cache_evictions_total", self.labels, by=evicted)
+        return entry
+
+
+def _get_cache_bucket(resolver: "IdResolver", func_name: str) -> ResolverCache:
+    """
+    Return the cache of this resolver for the given function.
     """
     resolver_id = resolver.getResolverId()
-    now = datetime.datetime.now(tz=datetime.timezone.utc)
-    tdelta = datetime.timedelta(seconds=resolver.cache_timeout)
-    if resolver_id not in CACHE:
-        CACHE[resolver_id] = {"getUserId": {},
-                              "get_user_info": {},
-                              "_getDN": {}}
-    else:
-        # Clean up the cache in the current resolver and the current function
-        _to_be_deleted = []
-        try:
-            for user, cached_result in CACHE[resolver_id].get(func_name, {}).items():
-                if now > cached_result.get("timestamp") + tdelta:
-                    _to_be_deleted.append(user)
-        except RuntimeError:  # pragma: no cover
-            # This might happen if thread A evicts an expired
-            # cache entry while thread B looks for expired cache entries
-            pass
-        for user in _to_be_deleted:
-            try:
-                del CACHE[resolver_id][func_name][user]
-            except KeyError:  # pragma: no cover
-                # Another thread evicted the same entry in the meantime
-                pass
+    buckets = CACHE.setdefault(resolver_id, {})
+    if func_name not in buckets:
+        resolver_name = getattr(resolver, "name", None) or resolver_id
+        buckets.setdefault(func_name, ResolverCache(str(resolver_name), func_name))
+    return buckets[func_name]
 
-    return CACHE[resolver_id].setdefault(func_name, {})
+
+def _negative_cache_timeout(resolver: "IdResolver") -> int:
+    """
+    Return the time in seconds an empty result, i.e. an unknown user, is cached.
+    """
+    return min(resolver.negative_cache_timeout, resolver.cache_timeout)
 
 
-def cache_lookup(resolver: "IdResolver", func_name: str, key: str, attributes: list[str] = None) -> Any:
+def _shared_cache_lookup(resolver: "IdResolver", bucket: ResolverCache, func_name: str, key: str) -> dict | None:
+    """
+    Return the entry another worker stored in the shared Redis cache (see ``PI_REDIS_CACHE_USERS``)
+    and copy it to the per-process cache, or None if there is no valid entry.
+    """
+    resolver_name = getattr(resolver, "name", None)
+    if not resolver_name:
+        # Only resolvers created from the stored config can be invalidated in the shared cache
+        return None
+    cached = get_resolver_lookup_from_cache(resolver_name, resolver.getResolverId(), func_name, key)
+    if isinstance(cached, CacheState):
+        return None
+    value, timestamp = cached
+    # The entry expires as if this process had done the lookup itself
+    timeout = resolver.cache_timeout if value else _negative_cache_timeout(resolver)
+    bucket.store(key, value, timeout, resolver.cache_size,
+                 timestamp=datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc))
+    return bucket.lookup(key, resolver.cache_timeout, _negative_cache_timeout(resolver))
+
+
+def cache_lookup(resolver: "IdResolver", func_name: str, key: str, attributes: list[str] = None,
+                 count: bool = True) -> Any:
     """
     Return the cached result of ``func_name`` for ``key``, or ``CACHE_MISS`` if there is none.
 
@@ -248,15 +491,17 @@ def cache_lookup(resolver: "IdResolver", func_name: str, key: str, attributes: l
     :param func_name: Name of the cached function
     :param key: The user ID or login name the entry is stored under
     :param attributes: The attributes the caller needs, for ``get_user_info`` entries
+    :param count: Whether to count the lookup as hit or miss, False for a repeated lookup
     """
     if resolver.cache_timeout <= 0:
         return CACHE_MISS
 
-    entry = _get_cache_bucket(resolver, func_name).get(key)
+    bucket = _get_cache_bucket(resolver, func_name)
+    entry = (bucket.lookup(key, resolver.cache_timeout, _negative_cache_timeout(resolver))
+             or _shared_cache_lookup(resolver, bucket, func_name, key))
     if not entry:
-        return CACHE_MISS
-    now = datetime.datetime.now(tz=datetime.timezone.utc)
-    if now >= entry.get("timestamp") + datetime.timedelta(seconds=resolver.cache_timeout):
+        if count:
+            bucket.count_lookup(hit=False)
         return CACHE_MISS
 
     result = entry.get("value")
@@ -264,24 +509,32 @@ def cache_lookup(resolver: "IdResolver", func_name: str, key: str, attributes: l
         requested_attributes = set(attributes if attributes else resolver.get_available_info_keys())
         cached_attributes = set(result.keys())
         if not requested_attributes.issubset(cached_attributes):
+            if count:
+                bucket.count_lookup(hit=False)
             return CACHE_MISS
         if cached_attributes > requested_attributes:
             # extract only requested attributes from the cache
             result = {k: v for k, v in result.items() if k in requested_attributes}
 
+    if count:
+        bucket.count_lookup(hit=True)
     log.debug(f"Reading {key!r} from cache for {func_name!r}")
     return result
 
 
 def cache_store(resolver: "IdResolver", func_name: str, key: str, value: dict | str) -> None:
     """
-    Write a result into the per-process cache, if caching is enabled for this resolver.
+    Write a result into the per-process cache, if caching is enabled for this resolver,
+    and into the shared Redis cache, if it is enabled.
     """
-    if resolver.cache_timeout <= 0:
+    timeout = resolver.cache_timeout if value else _negative_cache_timeout(resolver)
+    if timeout <= 0:
         return
-    _get_cache_bucket(resolver, func_name)[key] = {
-        "value": value,
-        "timestamp": datetime.datetime.now(tz=datetime.timezone.utc)}
+    entry = _get_cache_bucket(resolver, func_name).store(key, value, timeout, resolver.cache_size)
+    resolver_name = getattr(resolver, "name", None)
+    if resolver_name:
+        cache_resolver_lookup(resolver_name, resolver.getResolverId(), func_name, key, value,
+                              entry["timestamp"].timestamp(), timeout)
 
 
 def cache(func):
@@ -289,18 +542,33 @@ def cache(func):
     cache the user with his loginname, resolver and UID in a local
     dictionary cache.
     This is a per-process cache.
+
+    Concurrent calls for the same user, which all miss the cache, are
+    coalesced: only the first thread asks the LDAP server, the other
+    threads wait for its result and get a copy of it.
     """
 
+    def _requested_attributes(args, kwds):
+        return kwds.get("attributes", args[1] if len(args) > 1 else None)
+
+    def _lookup_and_store(self, *args, **kwds):
+        # Another thread may have stored the result while this one waited for its turn
+        result = cache_lookup(self, func.__name__, args[0], _requested_attributes(args, kwds), count=False)
+        if result is CACHE_MISS:
+            result = func(self, *args, **kwds)
+            cache_store(self, func.__name__, args[0], result)
+        return result
+
     @functools.wraps(func)
     def cache_wrapper(self, *args, **kwds):
-        attributes = kwds.get("attributes", args[1] if len(args) > 1 else None)
+        attributes = _requested_attributes(args, kwds)
         result = cache_lookup(self, func.__name__, args[0], attributes)
         if result is not CACHE_MISS:
             return result
 
-        f_result = func(self, *args, **kwds)
-        cache_store(self, func.__name__, args[0], f_result)
-        return f_result
+        key = (self.getResolverId(), func.__name__, args[0], tuple(attributes) if attributes else None)
+        # The result is shared by all waiting threads and the cache, so each caller gets a copy
+        return copy.deepcopy(_LOOKUPS_IN_FLIGHT.do(key, _lookup_and_store, self, *args, **kwds))
 
     return cache_wrapper
 
@@ -337,6 +605,8 @@ class IdResolver(UserIdResolver):
         self.resolverId = self.uri
         self.scope = ldap3.SUBTREE
         self.cache_timeout = 120
+        self.negative_cache_timeout = DEFAULT_NEGATIVE_CACHE_TIMEOUT
+        self.cache_size = DEFAULT_CACHE_SIZE
         self.tls_context = None
         self.start_tls = False
         self.serverpool_persistent = False
@@ -344,6 +614,10 @@ class IdResolver(UserIdResolver):
         self.serverpool_skip = SERVERPOOL_SKIP
         self.serverpool_strategy = SERVERPOOL_STRATEGY
         self.serverpool = None
+        self.connection_pool_size = 0
+        self.connection_pool_idle_timeout = DEFAULT_CONNECTION_POOL_IDLE_TIMEOUT
+        # The pool the current connection was acquired from
+        self._connection_pool = None
         self.keytabfile = None
         self.recursive_group_search = False
         self.group_base_dn = None
@@ -415,19 +689,22 @@ class IdResolver(UserIdResolver):
             # since we must avoid anonymous binds!
             if not bind_user or len(bind_user) < 1:
                 raise ResolverError("No valid user. Empty bind_user.")
-            connection = self.create_connection(authtype=self.authtype,
-                                                server=self.serverpool,
-                                                user=bind_user,
-                                                password=password,
-                                                receive_timeout=self.timeout,
-                                                auto_referrals=not self.noreferrals,
-                                                start_tls=self.start_tls)
-            if not connection.bind():
-                raise ResolverError(f"Bind failed with: {connection.result.get('description')} "
-                                    f"({connection.result.get('result')})")
-            log.debug(f"LDAP bind operation took {connection.usage.elapsed_time}")
-            connection.unbind()
-            log.debug("unbind successful.")
+            if self.connection_pool_size > 0 and self.authtype == AUTHTYPE.SIMPLE:
+                self._bind_with_pooled_connection(bind_user, password)
+            else:
+                connection = self.create_connection(authtype=self.authtype,
+                                                    server=self.serverpool,
+                                                    user=bind_user,
+                                                    password=password,
+                                                    receive_timeout=self.timeout,
+                                                    auto_referrals=not self.noreferrals,
+                                                    start_tls=self.start_tls)
+                if not connection.bind():
+                    raise ResolverError(f"Bind failed with: {connection.result.get('description')} "
+                                        f"({connection.result.get('result')})")
+                log.debug(f"LDAP bind operation took {connection.usage.elapsed_time}")
+                connection.unbind()
+                log.debug("unbind successful.")
         except Exception as e:
             log.info(f"Failed to check password for {uid!r}/{bind_user!r}: {e}")
             log.debug(traceback.format_exc())
@@ -435,6 +712,27 @@ class IdResolver(UserIdResolver):
 
         return True
 
+    def _bind_with_pooled_connection(self, bind_user, password):
+        """
+        Check the password of a user with a simple bind on an open connection of the
+        authentication pool. Afterwards the connection is bound as this user, so the
+        authentication pool is never used for searches.
+
+        :raises ResolverError: if the bind fails
+        """
+        pool = self.get_connection_pool("authentication")
+        connection = pool.acquire()
+        reusable = False
+        try:
+            bound = connection.rebind(user=bind_user, password=to_unicode(password),
+                                      authentication=ldap3.SIMPLE)
+            result = dict(connection.result or {})
+            reusable = True
+        finally:
+            pool.release(connection, reusable=reusable)
+        if not bound:
+            raise ResolverError(f"Bind failed with: {result.get('description')} ({result.get('result')})")
+
     def _trim_result(self, result_list):
         """
         The resultlist can contain entries of type:searchResEntry and of
@@ -590,11 +888,21 @@ class IdResolver(UserIdResolver):
                 log.info(f"The filter '{search_filter}' returned no DN.")
         return dn
 
+    def close(self):
+        """
+        Unbind the connection after the request. The resolver object itself with
+        its server pool is reused by the following requests of the thread.
+        """
+        self.unbind()
+
     def unbind(self):
         """
-        Unbind and close open connection
+        Unbind and close open connection. A connection of the connection pool is
+        returned to the pool instead.
         """
-        if hasattr(self, "connection") and self.connection is not None and self.connection.bound:
+        if self._connection_pool is not None:
+            self._release_connection(reusable=True)
+        elif hasattr(self, "connection") and self.connection is not None and self.connection.bound:
             try:
                 self.connection.unbind()
                 self.i_am_bound = False
@@ -602,41 +910,136 @@ class IdResolver(UserIdResolver):
             except Exception as e:
                 log.debug(f"Error during LDAP unbind operation: {e}")
 
+    def _release_connection(self, reusable):
+        """
+        Return the current connection to the connection pool it was acquired from.
+        """
+        connection, self.connection = getattr(self, "connection", None), None
+        pool, self._connection_pool = self._connection_pool, None
+        self.i_am_bound = False
+        if connection is not None:
+            pool.release(connection, reusable=reusable and connection.bound)
+
     def _bind(self):
         """
         Perform LDAP bind operation on a connection.
-        Create the connection if it doesn't exist yet
+        Create the connection if it doesn't exist yet, or acquire it
+        from the connection pool.
         """
         if not self.i_am_bound:
-            if not self.serverpool:
-                self.serverpool = self.get_serverpool_instance(self.get_info)
-            try:
-                self.connection = self.create_connection(authtype=self.authtype,
-                                                         server=self.serverpool,
-                                                         user=self.binddn,
-                                                         password=self.bindpw,
-                                                         receive_timeout=self.timeout,
-                                                         auto_referrals=not self.noreferrals,
-                                                         start_tls=self.start_tls,
-                                                         keytabfile=self.keytabfile)
-                bound = self.connection.bind()
-            except Exception as ex:
-                log.error(f"Error performing bind operation: {ex}!")
-                raise ResolverError(f"Error performing bind operation: {ex}")
-            if not bound:
-                result = self.connection.result
-                log.error(f"LDAP Bind unsuccessful: "
-                          f"{result.get('description')} ({result.get('result')})!")
-                raise ResolverError(f"Unable to perform bind operation: "
-                                    f"{result.get('description')} ({result.get('result')})")
+            if self.connection_pool_size > 0:
+                pool = self.get_connection_pool("service")
+                self.connection = pool.acquire()
+                self._connection_pool = pool
+            else:
+                if not self.serverpool:
+                    self.serverpool = self.get_serverpool_instance(self.get_info)
+                self.connection = self._create_bound_connection(self.serverpool)
             self.i_am_bound = True
 
+    def _create_bound_connection(self, server_pool):
+        """
+        Create a connection and bind it with the configured credentials.
+
+        :raises ResolverError: if the bind fails
+        """
+        try:
+            connection = self.create_connection(authtype=self.authtype,
+                                                server=server_pool,
+                                                user=self.binddn,
+                                                password=self.bindpw,
+                                                receive_timeout=self.timeout,
+                                                auto_referrals=not self.noreferrals,
+                                                start_tls=self.start_tls,
+                                                keytabfile=self.keytabfile)
+            bound = connection.bind()
+        except Exception as ex:
+            log.error(f"Error performing bind operation: {ex}!")
+            raise ResolverError(f"Error performing bind operation: {ex}")
+        if not bound:
+            result = connection.result
+            log.error(f"LDAP Bind unsuccessful: "
+                      f"{result.get('description')} ({result.get('result')})!")
+            raise ResolverError(f"Unable to perform bind operation: "
+                                f"{result.get('description')} ({result.get('result')})")
+        return connection
+
+    def _create_open_connection(self):
+        """
+        Create an open, but not yet bound connection for the authentication pool.
+        """
+        connection = self.create_connection(authtype=AUTHTYPE.ANONYMOUS,
+                                            server=self.get_persistent_serverpool(ldap3.NONE),
+                                            receive_timeout=self.timeout,
+                                            auto_referrals=not self.noreferrals,
+                                            start_tls=self.start_tls)
+        if connection.closed:
+            connection.open(read_server_info=False)
+        return connection
+
+    def get_connection_pool(self, kind):
+        """
+        Return the process-level connection pool of this resolver. Retrieve it from the app-local
+        store. If it does not exist yet or the resolver configuration changed, create a new one.
+
+        :param kind: "service" for the connections bound with the configured credentials,
+            "authentication" for the connections used to check the passwords of users
+        :return: a ``LDAPConnectionPool`` instance
+        """
+        pools = get_app_local_store().setdefault('ldap_connection_pools', {})
+        pool_key = (self.getResolverId(), self.binddn, kind)
+        # The connections of a pool are only reused as long as the configuration is the same
+        pool_description = (self.authtype,
+                            hashlib.sha256(to_bytes(self.bindpw or "")).hexdigest(),
+                            self.keytabfile,
+                            self.timeout,
+                            self.get_info,
+                            repr(self.tls_context),
+                            self.start_tls,
+                            self.noreferrals,
+                            self.serverpool_rounds,
+                            self.serverpool_skip,
+                            self.serverpool_strategy,
+                            self.connection_pool_size,
+                            self.connection_pool_idle_timeout)
+        with _CONNECTION_POOLS_LOCK:
+            pool = pools.get(pool_key)
+            if pool is None or pool.description != pool_description:
+                if pool is not None:
+                    log.info(f"The configuration of the LDAP resolver {pool.labels['resolver']!r} changed. "
+                             f"Closing its {kind} connection pool.")
+                    pool.close()
+                if kind == "service":
+                    connect = functools.partial(self._create_bound_connection,
+                                                self.get_persistent_serverpool(self.get_info))
+                else:
+                    connect = self._create_open_connection
+                pool = LDAPConnectionPool(str(getattr(self, "name", None) or self.getResolverId()), connect,
+                                          max_size=self.connection_pool_size,
+                                          idle_timeout=self.connection_pool_idle_timeout,
+                                          wait_timeout=self.timeout,
+                                          description=pool_description)
+                pools[pool_key] = pool
+        return pool
+
     def _search(self, search_base, search_filter, attributes):
         self._bind()
-        self.connection.search(search_base=search_base,
-                               search_scope=self.scope,
-                               search_filter=search_filter,
-                               attributes=attributes)
+        try:
+            self.connection.search(search_base=search_base,
+                                   search_scope=self.scope,
+                                   search_filter=search_filter,
+                                   attributes=attributes)
+        except LDAPCommunicationError as e:
+            if self._connection_pool is None:
+                raise
+            # The LDAP server may have closed the pooled connection while it was idle
+            log.info(f"Search on a pooled LDAP connection failed ({e!r}). Retrying with another connection.")
+            self._release_connection(reusable=False)
+            self._bind()
+            self.connection.search(search_base=search_base,
+                                   search_scope=self.scope,
+                                   search_filter=search_filter,
+                                   attributes=attributes)
         result = self.connection.response
         result = self._trim_result(result)
         log.debug(f"LDAP search operation took {self.connection.usage.elapsed_time}")
@@ -1131,6 +1534,13 @@ class IdResolver(UserIdResolver):
         self.bindpw = config.get("BINDPW")
         self.timeout = int(config.get("TIMEOUT", 5))
         self.cache_timeout = int(config.get("CACHE_TIMEOUT", 120))
+        negative_cache_timeout = config.get("NEGATIVE_CACHE_TIMEOUT")
+        self.negative_cache_timeout = int(DEFAULT_NEGATIVE_CACHE_TIMEOUT if negative_cache_timeout in (None, "")
+                                          else negative_cache_timeout)
+        self.cache_size = int(config.get("CACHE_SIZE") or DEFAULT_CACHE_SIZE)
+        self.connection_pool_size = int(config.get("CONNECTION_POOL_SIZE") or 0)
+        self.connection_pool_idle_timeout = int(config.get("CONNECTION_POOL_IDLE_TIMEOUT")
+                                                or DEFAULT_CONNECTION_POOL_IDLE_TIMEOUT)
         self.sizelimit = int(config.get("SIZELIMIT", 500))
         self.loginname_attribute = [la.strip() for la in config.get("LOGINNAMEATTRIBUTE", "").split(",")]
         self.searchfilter = config.get("LDAPSEARCHFILTER")
@@ -1163,6 +1573,8 @@ class IdResolver(UserIdResolver):
         self.serverpool_strategy = config.get("SERVERPOOL_STRATEGY") or SERVERPOOL_STRATEGY
         # The configuration might have changed. We reset the serverpool
         self.serverpool = None
+        if self._connection_pool is not None:
+            self._release_connection(reusable=True)
         self.i_am_bound = False
 
         # settings for recursive search of groups
@@ -1357,6 +1769,10 @@ class IdResolver(UserIdResolver):
                                 'TLS_CA_FILE': 'string',
                                 'START_TLS': 'bool',
                                 'CACHE_TIMEOUT': 'int',
+                                'CACHE_SIZE': 'int',
+                                'NEGATIVE_CACHE_TIMEOUT': 'int',
+                                'CONNECTION_POOL_SIZE': 'int',
+                                'CONNECTION_POOL_IDLE_TIMEOUT': 'int',
                                 'SERVERPOOL_STRATEGY': 'string',
                                 'SERVERPOOL_ROUNDS': 'int',
                                 'SERVERPOOL_SKIP': 'int',
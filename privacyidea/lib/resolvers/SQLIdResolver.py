@@ -223,6 +223,14 @@ class IdResolver (UserIdResolver):
         self.password_hash_type = None
         return
 
+    def close(self):
+        """
+        Return the connection of the session to the pool after the request.
+        The resolver object is reused by the following requests of the thread.
+        """
+        if self.session is not None:
+            self.session.close()
+
     def getSearchFields(self):
         return self.searchFields
 
@@ -38,6 +38,8 @@ import requests
 from sqlalchemy import func, select, update
 
 from privacyidea.lib import lazy_gettext
+from privacyidea.lib.cache.redis import (CacheState, cache_token_users, evict_token_users,
+                                         get_token_users_from_cache)
 from privacyidea.lib.config import get_from_config, set_privacyidea_config
 from privacyidea.lib.crypto import Sign
 from privacyidea.lib.error import SubscriptionError
@@ -228,6 +230,11 @@ GITHUB_VERSION_CONFIG_KEY = "subscription.latest_releases"
 # reported today; should a future one push it past the limit, the shared cache is skipped
 # instead of failing the request, and each worker falls back to its own lookup.
 CONFIG_VALUE_LENGTH = 2000
+# How long the number of users with active tokens is reused by the metering in
+# check_subscription, which runs on every authentication of a metered client. Counting
+# joins the tokens with their owners, which takes a noticeable time with many users.
+# Set PI_SUBSCRIPTION_TOKEN_USERS_TTL (in seconds) to change it, 0 counts on every request.
+TOKEN_USERS_TTL = datetime.timedelta(minutes=5)
 
 log = logging.getLogger(__name__)
 
@@ -418,16 +425,102 @@ def get_users_with_active_tokens():
     :rtype: int
     """
     from privacyidea.models import Token, TokenOwner
-    stmt = (
+    users = (
         select(TokenOwner.resolver, TokenOwner.user_id)
         .select_from(TokenOwner)
         .join(Token, Token.id == TokenOwner.token_id)
         .where(Token.active.is_(True))
         .distinct()
+        .subquery()
     )
-    result = db.session.execute(stmt)
-    rows = result.all()
-    return len(rows)
+    return db.session.scalar(select(func.count()).select_from(users))
+
+
+@dataclasses.dataclass
+class _TokenUsersCache:
+    """Process-local cache of the number of users with active tokens, in front of the shared one."""
+    counted_at: datetime.datetime | None = None
+    count: int = 0
+
+    def is_valid(self, now: datetime.datetime, ttl: datetime.timedelta) -> bool:
+        return self.counted_at is not None and now - self.counted_at < ttl
+
+    def store(self, counted_at: datetime.datetime | None, count: int) -> None:
+        self.counted_at = counted_at
+        self.count = count
+
+
+_token_users_cache = _TokenUsersCache()
+
+
+def _token_users_ttl() -> datetime.timedelta:
+    """The time the number of users with active tokens is reused, see :data:`TOKEN_USERS_TTL`."""
+    ttl = get_app_config_value("PI_SUBSCRIPTION_TOKEN_USERS_TTL")
+    if ttl is None:
+        return TOKEN_USERS_TTL
+    return datetime.timedelta(seconds=int(ttl))
+
+
+def _load_shared_token_users() -> tuple[datetime.datetime | None, int]:
+    """
+    Read the count another worker shared in Redis, as ``(counted_at, count)``.
+    Without a shared count it is counted again.
+    """
+    entry = get_token_users_from_cache()
+    if isinstance(entry, CacheState):
+        return None, 0
+    count, counted_at = entry
+    return datetime.datetime.fromtimestamp(counted_at), count
+
+
+def refresh_users_with_active_tokens() -> int:
+    """
+    Count the users with active tokens and publish the number to the process-local and,
+    with ``PI_REDIS_CACHE_SUBSCRIPTION``, the shared cache of
+    :func:`get_cached_users_with_active_tokens`. Called on a cache miss and by the
+    SimpleStats task, which keeps the shared value fresh.
+
+    Nothing is written to the database, so the authentication does not commit or
+    change the config timestamp, which would make all workers reload the config.
+
+    :return: Number of users
+    """
+    now = datetime.datetime.now()
+    count = get_users_with_active_tokens()
+    _token_users_cache.store(now, count)
+    cache_token_users(count, now.timestamp(), int(_token_users_ttl().total_seconds()))
+    return count
+
+
+def get_cached_users_with_active_tokens() -> int:
+    """
+    Return the number of users with active tokens like :func:`get_users_with_active_tokens`,
+    but reuse a count that is younger than :data:`TOKEN_USERS_TTL`. The count is cached
+    process-local and, with ``PI_REDIS_CACHE_SUBSCRIPTION``, in Redis, so only one worker
+    counts per TTL.
+
+    The metering of :func:`check_subscription` is a probability anyway, so a count
+    that is a few minutes old makes no difference to it.
+
+    :return: Number of users
+    """
+    ttl = _token_users_ttl()
+    if not ttl:
+        return get_users_with_active_tokens()
+    now = datetime.datetime.now()
+    if _token_users_cache.is_valid(now, ttl):
+        return _token_users_cache.count
+    counted_at, count = _load_shared_token_users()
+    if counted_at is not None and now - counted_at < ttl:
+        _token_users_cache.store(counted_at, count)
+        return count
+    return refresh_users_with_active_tokens()
+
+
+def invalidate_token_users_cache() -> None:
+    """Drop the cached number of users with active tokens, process-local and shared."""
+    _token_users_cache.store(None, 0)
+    evict_token_users()
 
 
 class SubscriptionState(str, enum.Enum):
@@ -824,7 +917,7 @@ def check_subscription(application, max_free_subscriptions=None):
         subscriptions = [subscription for subscription in get_subscription(application)
                          if subscription.get("date_till")]
         # get the number of users with active tokens
-        token_users = get_users_with_active_tokens()
+        token_users = get_cached_users_with_active_tokens()
         free_subscriptions = max_free_subscriptions or APPLICATIONS.get(application)
         if len(subscriptions) == 0:
             if subscription_exceeded_probability(token_users, free_subscriptions):
@@ -853,11 +946,20 @@ def check_subscription(application, max_free_subscriptions=None):
     return True
 
 
+# The results of verifying the signatures of subscriptions, see check_signature
+_signature_cache = {}
+# A handful of subscriptions is on file, so more entries are only left over from replaced ones
+SIGNATURE_CACHE_SIZE = 64
+
+
 def check_signature(subscription):
     """
     This function checks the signature of a subscription. If the signature
     checking fails, a SignatureError / Exception is raised.
 
+    The result is kept for each subscription record and public key file, since
+    a valid subscription is checked on every request of a metered client.
+
     :param subscription: The dict of the subscription
     :return: True
     """
@@ -872,11 +974,17 @@ def check_signature(subscription):
         subscription["date_from"] = subscription.get("date_from").strftime(SUBSCRIPTION_DATE_FORMAT)
         subscription["date_till"] = subscription.get("date_till").strftime(SUBSCRIPTION_DATE_FORMAT)
         sign_string = SIGN_FORMAT.format(**subscription)
-        with open(filename, 'rb') as key_file:
-            sign_obj = Sign(private_key=None, public_key=key_file.read())
-
         signature = subscription.get('signature', '100')
-        r = sign_obj.verify(sign_string, signature, verify_old_sigs=True)
+        # A changed key file is verified again
+        cache_key = (filename, os.stat(filename).st_mtime_ns, sign_string, signature)
+        r = _signature_cache.get(cache_key)
+        if r is None:
+            with open(filename, 'rb') as key_file:
+                sign_obj = Sign(private_key=None, public_key=key_file.read())
+            r = sign_obj.verify(sign_string, signature, verify_old_sigs=True)
+            if len(_signature_cache) >= SIGNATURE_CACHE_SIZE:
+                _signature_cache.clear()
+            _signature_cache[cache_key] = r
         subscription["date_from"] = datetime.datetime.strptime(
             subscription.get("date_from"),
             SUBSCRIPTION_DATE_FORMAT)
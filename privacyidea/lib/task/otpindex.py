@@ -0,0 +1,56 @@
+# SPDX-FileCopyrightText: 2026 NetKnights GmbH <https://netknights.it>
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Periodic task that fills the OTP index of the unassigned HOTP and TOTP tokens.
+
+Each run calculates the index entries of the tokens, whose entries are missing,
+outdated or about to run out, and removes the entries of tokens, which were
+assigned to a user in the meantime. See :mod:`privacyidea.lib.token.otpindex`.
+"""
+import logging
+
+from privacyidea.lib import _
+from privacyidea.lib.task.base import BaseTask
+from privacyidea.lib.token import get_tokens
+from privacyidea.lib.token.otpindex import (update_otp_index, prune_otp_index, OTP_INDEX_TOKEN_TYPES,
+                                            DEFAULT_OTP_INDEX_LOOKAHEAD, DEFAULT_OTP_INDEX_WINDOW)
+
+log = logging.getLogger(__name__)
+
+
+class OTPIndexTask(BaseTask):
+    identifier = "OTPIndex"
+    description = "Calculate the OTP index of unassigned HOTP and TOTP tokens for autoassignment."
+
+    @property
+    def options(self):
+        return {
+            "realm": {
+                "type": "str",
+                "description": _("Only index the unassigned tokens of this realm. "
+                                 "By default, all unassigned tokens are indexed."),
+            },
+            "lookahead": {
+                "type": "int",
+                "description": _("The number of counters of an HOTP token or time steps of a TOTP "
+                                 "token, which are indexed. Default 100."),
+            },
+            "window": {
+                "type": "int",
+                "description": _("The search window in counters, which lookups may use. Default 10."),
+            }
+        }
+
+    def do(self, params):
+        try:
+            lookahead = int(params.get("lookahead") or DEFAULT_OTP_INDEX_LOOKAHEAD)
+            window = int(params.get("window") or DEFAULT_OTP_INDEX_WINDOW)
+        except (TypeError, ValueError):
+            log.warning("Invalid lookahead or window for the OTPIndex task, using the defaults.")
+            lookahead, window = DEFAULT_OTP_INDEX_LOOKAHEAD, DEFAULT_OTP_INDEX_WINDOW
+        pruned = prune_otp_index()
+        tokens = get_tokens(token_type_list=list(OTP_INDEX_TOKEN_TYPES), assigned=False,
+                            realm=params.get("realm") or None, all_nodes=True)
+        updated = update_otp_index(tokens, lookahead=max(lookahead, 1), window=max(window, 1))
+        log.info(f"OTPIndex updated {updated} of {len(tokens)} unassigned tokens "
+                 f"and removed {pruned} assigned tokens.")
+        return True
@@ -21,7 +21,7 @@ from privacyidea.lib.utils import is_true
 from privacyidea.lib.tokenclass import Tokenkind
 from privacyidea.lib.token import get_tokens
 from privacyidea.lib.monitoringstats import write_stats
-from privacyidea.lib.subscriptions import get_users_with_active_tokens
+from privacyidea.lib.subscriptions import refresh_users_with_active_tokens
 from privacyidea.lib.task.base import BaseTask
 # from privacyidea.lib.user import get_user_list
 from privacyidea.lib import _
@@ -63,7 +63,8 @@ class SimpleStatsTask(BaseTask):
 
     @property
     def _user_with_token(self):
-        return get_users_with_active_tokens()
+        # Also keeps the number the subscription check reuses fresh
+        return refresh_users_with_active_tokens()
 
     @property
     def _total_tokens(self):
@@ -7,7 +7,7 @@ tokenclass implementations like lib.tokens.hotptoken)
 
 This is the middleware/glue between the HTTP API and the database.
 
-The implementation is split across submodules (query, otp, attributes,
+The implementation is split across submodules (query, otp, otpindex, attributes,
 lifecycle, auth, tokengroups, importexport, misc); every public name is
 re-exported here so ``from privacyidea.lib.token import X`` keeps working.
 """
@@ -42,6 +42,13 @@ from privacyidea.lib.token.otp import (  # noqa: F401
     get_serial_by_otp,
     get_serial_by_otp_list,
 )
+from privacyidea.lib.token.otpindex import (  # noqa: F401
+    get_otp_index_candidates,
+    update_otp_index,
+    refresh_otp_index,
+    remove_from_otp_index,
+    prune_otp_index,
+)
 from privacyidea.lib.token.attributes import (  # noqa: F401
     set_realms,
     set_defaults,
@@ -138,6 +145,11 @@ __all__ = [
     "get_token_by_otp",
     "get_serial_by_otp",
     "get_serial_by_otp_list",
+    "get_otp_index_candidates",
+    "update_otp_index",
+    "refresh_otp_index",
+    "remove_from_otp_index",
+    "prune_otp_index",
     "set_realms",
     "set_defaults",
     "assign_token",
@@ -16,6 +16,7 @@ from privacyidea.lib.log import log_with
 from privacyidea.lib.realm import realm_is_defined
 from privacyidea.models import (db, TokenOwner)
 
+from privacyidea.lib.token.otpindex import remove_from_otp_index
 from privacyidea.lib.token.query import get_one_token, get_tokens_from_serial_or_user
 
 if TYPE_CHECKING:
@@ -420,6 +421,8 @@ def set_hashlib(serial: str | None, hashlib: str = "sha1", user: "User | None" =
 
     for tokenobject in tokenobject_list:
         tokenobject.set_hashlib(hashlib)
+        # The OTP values in the index were calculated with the former hashlib
+        remove_from_otp_index([tokenobject.token.id], commit=False)
         tokenobject.save()
 
     return len(tokenobject_list)
@@ -7,6 +7,8 @@ import logging
 from collections import defaultdict
 from typing import TYPE_CHECKING
 
+from sqlalchemy.exc import SQLAlchemyError
+
 from privacyidea.lib import _
 from privacyidea.lib.challengeresponsedecorators import (generic_challenge_response_reset_pin,
                                                          generic_challenge_response_resync)
@@ -29,6 +31,7 @@ from privacyidea.lib.utils import (is_true, create_tag_dict,
                                    redacted_phone_number, redacted_email)
 
 from privacyidea.lib.token.query import get_one_token, get_tokens
+from privacyidea.models import db
 
 if TYPE_CHECKING:
     from privacyidea.models import Challenge
@@ -66,7 +69,7 @@ def check_realm_pass(realm: str, passw: str, options: dict | None = None,
     # since an attacker does not know, which token is tested, we restrict to
     # only active tokens. He would not guess that the given OTP value is that
     #  of an inactive token.
-    tokenobject_list = get_tokens(realm=realm, assigned=True, active=True)
+    tokenobject_list = get_tokens(realm=realm, assigned=True, active=True, eager_load=True)
     if not tokenobject_list:
         reply_dict["message"] = _("There is no active and assigned token in this realm")
         return False, reply_dict
@@ -163,7 +166,7 @@ def check_user_pass(user: User, passw: str, options: dict | None = None) -> tupl
     """
     options = dict(options) if options else {}
     token_type = options.pop("token_type", None)
-    token_objects = get_tokens(user=user, tokentype=token_type)
+    token_objects = get_tokens(user=user, tokentype=token_type, eager_load=True)
     reply_dict = {}
     if not token_objects:
         # The user has no tokens assigned
@@ -289,6 +292,12 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
     This function is called by check_serial_pass, check_user_pass and
     check_yubikey_pass.
 
+    The OTP counter of a matching token is written and committed immediately by
+    the token, so that an OTP value can not be used twice. The other changes of
+    the authentication like the fail counters and the authentication counters
+    are collected and written with a single commit at the end. They are also
+    written, if the authentication fails with an exception.
+
     :param token_object_list: list of identified tokens
     :param passw: the provided password, can be just the PIN or PIN+OTP
     :param user: the identified use - as class object
@@ -299,6 +308,27 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
     :return: tuple of success and optional response
     :rtype: (bool, dict)
     """
+    try:
+        result = _check_token_list(token_object_list, passw, user, options)
+    except Exception:
+        # Keep e.g. the increased fail counters, unless the database transaction itself failed
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            log.warning(f"Could not write the token changes of the failed authentication: {e}")
+            db.session.rollback()
+        raise
+    # Write the collected changes of the authentication
+    db.session.commit()
+    return result
+
+
+def _check_token_list(token_object_list: list[TokenClass], passw: str, user: User | None,
+                      options: dict | None) -> tuple[bool, dict]:
+    """
+    The authentication of :func:`check_token_list`. The changes of the tokens are not
+    committed, except for the OTP counter.
+    """
     res = False
     reply_dict = {}
     increase_auth_counters = not is_true(get_from_config(key="no_auth_counter"))
@@ -341,7 +371,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
             log.debug(f"Found user with loginId {token_object.user}: {token_object.get_serial()}")
 
         # Reset exceeded fail counter if reset timeout is reached
-        token_object.check_reset_failcount()
+        token_object.check_reset_failcount(commit_db_session=False)
 
         if not token_object.check_all(messages):
             # token can not be used for authentication (e.g. maxfail exceeded, disabled, not within validity period)
@@ -422,12 +452,12 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
         # write serial numbers or something to audit log
         for token_obj in valid_token_list:
             # Reset the failcounter, if there is a timeout set
-            token_obj.check_reset_failcount()
+            token_obj.check_reset_failcount(commit_db_session=False)
             # Check if the max auth is succeeded.
             # We need to set the offsets, since we are in the n+1st authentication.
             if token_obj.check_all(message_list):
                 if increase_auth_counters:
-                    token_obj.inc_count_auth_success()
+                    token_obj.inc_count_auth_success(commit_db_session=False)
 
                 # The token is active and the auth counters are ok.
                 res = True
@@ -436,7 +466,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
                 if reply_dict["type"] != token_obj.token.tokentype:
                     reply_dict["type"] = "undetermined"
                 # reset the failcounter of valid token
-                token_obj.reset()
+                token_obj.reset(commit_db_session=False)
                 # Run the token post method. e.g. registration token deletes itself.
                 token_obj.post_success()
         if len(valid_token_list) == 1:
@@ -475,7 +505,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
                     # Challenge matches, token is active and token is fit for challenge
                     res = True
                     if increase_auth_counters:
-                        token_object.inc_count_auth_success()
+                        token_object.inc_count_auth_success(commit_db_session=False)
                     reply_dict["message"] = _("Found matching challenge")
                     # If they exist, add next pin and next password change
                     next_pin = token_object.get_tokeninfo("next_pin_change")
@@ -496,7 +526,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
                     else:
                         # This was the last successful challenge, so
                         # reset the fail counter of the challenge response token
-                        token_object.reset()
+                        token_object.reset(commit_db_session=False)
                         token_object.post_success()
 
                     # Clean up all challenges with this transaction_id from
@@ -511,7 +541,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
             # We did not find any successful response, so we need to increase the failcounters
             for token_obj in challenge_response_token_list:
                 if not token_obj.is_outofband():
-                    token_obj.inc_failcount()
+                    token_obj.inc_failcount(commit_db_session=False)
             if not matching_challenge:
                 if len(challenge_response_token_list) == 1:
                     reply_dict["serial"] = challenge_response_token_list[0].token.serial
@@ -538,9 +568,9 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
         # But there are tokens, with a matching pin.
         # So we increase the failcounter. Return failure.
         for token_object in pin_matching_token_list:
-            token_object.inc_failcount()
+            token_object.inc_failcount(commit_db_session=False)
             if get_from_config(SYSCONF.RESET_FAILCOUNTER_ON_PIN_ONLY, False, return_bool=True):
-                token_object.check_reset_failcount()
+                token_object.check_reset_failcount(commit_db_session=False)
             reply_dict["message"] = _("wrong otp value")
             if len(pin_matching_token_list) == 1:
                 # If there is only one pin matching token, we look if it was
@@ -551,7 +581,7 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
                     reply_dict["message"] += _(". previous otp used again")
             if increase_auth_counters:
                 for token_obj in pin_matching_token_list:
-                    token_obj.inc_count_auth()
+                    token_obj.inc_count_auth(commit_db_session=False)
             # write the serial numbers to the audit log
             if len(pin_matching_token_list) == 1:
                 reply_dict["serial"] = pin_matching_token_list[0].token.serial
@@ -565,9 +595,9 @@ def check_token_list(token_object_list: list[TokenClass], passw: str, user: User
         reply_dict["message"] = _("wrong otp pin")
         if get_inc_fail_count_on_false_pin():
             for token_object in invalid_token_list:
-                token_object.inc_failcount()
+                token_object.inc_failcount(commit_db_session=False)
                 if increase_auth_counters:
-                    token_object.inc_count_auth()
+                    token_object.inc_count_auth(commit_db_session=False)
 
     elif messages:
         reply_dict["message"] = ", ".join(set(messages))
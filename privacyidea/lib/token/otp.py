@@ -11,6 +11,7 @@ from privacyidea.lib.error import (TokenAdminError)
 from privacyidea.lib.log import log_with
 from privacyidea.lib.tokenclass import TokenClass
 
+from privacyidea.lib.token.otpindex import get_otp_index_candidates, refresh_otp_index
 from privacyidea.lib.token.query import get_one_token
 
 
@@ -81,6 +82,7 @@ def get_multi_otp(serial: str, count: int = 0, epoch_start: int = 0, epoch_end:
 def get_token_by_otp(token_list: list[TokenClass], otp: str = "", window: int = 10) -> TokenClass | None:
     """
     Search the token in the token_list, that creates the given OTP value.
+    Only the tokens, which may create the OTP value according to the OTP index, are checked.
 
     :param token_list: the list of token objects to be investigated
     :type token_list: list of token objects
@@ -95,7 +97,7 @@ def get_token_by_otp(token_list: list[TokenClass], otp: str = "", window: int =
     result_token = None
     result_list = []
 
-    for token in token_list:
+    for token in get_otp_index_candidates(token_list, otp, window=window):
         log.debug(f"Checking token {token.get_serial()}")
         try:
             r = token.check_otp_exist(otp=otp, window=window)
@@ -108,6 +110,8 @@ def get_token_by_otp(token_list: list[TokenClass], otp: str = "", window: int =
 
     if len(result_list) == 1:
         result_token = result_list[0]
+        # The counter of the token was increased
+        refresh_otp_index(result_token)
     elif result_list:
         raise TokenAdminError(_('multiple tokens are matching this OTP value!'), id=1200)
 
@@ -0,0 +1,271 @@
+# SPDX-FileCopyrightText: 2026 NetKnights GmbH <https://netknights.it>
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+The OTP index of unassigned HOTP and TOTP tokens.
+
+Autoassignment and the search for the serial of an OTP value would otherwise
+calculate the OTP values of the search window for every unassigned token. The
+index stores a keyed hash of the next OTP values of each token together with
+the counter range it covers and a fingerprint of the token state. A lookup
+then only checks the tokens, whose index contains the OTP value, and the tokens
+the index does not cover (yet). The found tokens are still verified by the
+token class, so the index never changes which token matches.
+
+The index is filled by the ``OTPIndex`` periodic task and refreshed for a
+token, when its counter changes during a lookup.
+It is tested in tests/test_lib_token_otpindex.py
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections.abc import Callable
+
+from sqlalchemy import delete, select
+
+from privacyidea.lib.config import get_from_config
+from privacyidea.lib.framework import get_app_config_value
+from privacyidea.lib.tokenclass import TokenClass
+from privacyidea.lib.tokens.HMAC import HmacOtp
+from privacyidea.lib.utils import to_bytes
+from privacyidea.models import db, TokenOTPIndex, TokenOTPIndexRange, TokenOwner
+
+log = logging.getLogger(__name__)
+
+OTP_INDEX_TOKEN_TYPES = ("hotp", "totp")
+#: The default number of counters of an HOTP token or time steps of a TOTP token, which are indexed
+DEFAULT_OTP_INDEX_LOOKAHEAD = 100
+#: The default search window, i.e. the number of counters a lookup checks, which the index covers
+DEFAULT_OTP_INDEX_WINDOW = 10
+# The number of token ids in one query
+CHUNK_SIZE = 500
+# The number of tokens, whose index entries are written in one transaction
+COMMIT_SIZE = 100
+
+
+def _otp_hash(otp: str) -> str:
+    """
+    Return the keyed hash of an OTP value. The key is the pepper of the server, so that the
+    OTP values can not be derived from the index by trying all possible values.
+    """
+    pepper = get_app_config_value("PI_PEPPER", "missing")
+    return hmac.new(to_bytes(pepper), to_bytes(otp), hashlib.sha256).hexdigest()
+
+
+def _fingerprint(token: TokenClass) -> str:
+    """
+    Return a hash of the token columns the OTP values depend on. The index entries of a token
+    are only used, if the fingerprint did not change since they were calculated.
+    """
+    db_token = token.token
+    state = [db_token.tokentype, db_token.key_enc, db_token.key_iv, db_token.otplen, db_token.count]
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+
+
+def _settings(token: TokenClass) -> dict:
+    """
+    Return the settings of the token from the tokeninfo, which determine its OTP values.
+    """
+    settings = {"hashlib": token.hashlib, "time_step": 0, "time_shift": 0.0, "otp_window": 0}
+    if token.get_tokentype().lower() == "totp":
+        settings["time_step"] = token.timestep
+        settings["time_shift"] = token.timeshift
+        settings["otp_window"] = int(token.timewindow / token.timestep)
+    return settings
+
+
+def _settings_hash(settings: dict) -> str:
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _indexed_tokens(token_list: list[TokenClass]) -> list[TokenClass]:
+    return [token for token in token_list if token.get_tokentype().lower() in OTP_INDEX_TOKEN_TYPES]
+
+
+def _get_ranges(token_ids: list[int]) -> dict[int, TokenOTPIndexRange]:
+    ranges = {}
+    for i in range(0, len(token_ids), CHUNK_SIZE):
+        stmt = select(TokenOTPIndexRange).where(TokenOTPIndexRange.token_id.in_(token_ids[i:i + CHUNK_SIZE]))
+        ranges.update((index_range.token_id, index_range) for index_range in db.session.scalars(stmt))
+    return ranges
+
+
+def _needed_counters(token: TokenClass, settings: dict, window: int | None, now: float) -> tuple[int, int]:
+    """
+    Return the range of counters, which the token class checks for an OTP value.
+
+    :param settings: the current settings of the token, see ``_settings``
+    :param window: the search window, None for the window of ``check_otp``
+    """
+    if settings["time_step"]:
+        # TOTP checks the counters around the current time step
+        counter = int((now + settings["time_shift"]) / settings["time_step"])
+        window = settings["otp_window"] if window is None else window
+        return max(counter - window, 0), counter + window
+    # HOTP checks the counters from the current counter on
+    counter = int(token.token.count or 0)
+    window = int(token.get_count_window()) if window is None else window
+    return counter, counter + window
+
+
+def _covers(token: TokenClass, index_range: TokenOTPIndexRange | None, window: int | None, now: float) -> bool:
+    if index_range is None or index_range.fingerprint != _fingerprint(token):
+        return False
+    settings = _settings(token)
+    if index_range.settings != _settings_hash(settings):
+        # The OTP values were calculated with another hash algorithm or time step
+        return False
+    first, last = _needed_counters(token, settings, window, now)
+    return index_range.first_counter <= first and last <= index_range.last_counter
+
+
+def get_otp_index_candidates(token_list: list[TokenClass], otp: str | Callable[[TokenClass], str | None],
+                             window: int | None = None) -> list[TokenClass]:
+    """
+    Return the tokens of the list, which may generate the OTP value, in the order of the list.
+    Tokens, which are not contained in the OTP index or whose index entries are outdated, are
+    always returned. Thus, the caller still needs to check the OTP value of the returned tokens.
+
+    :param token_list: list of token objects
+    :param otp: the OTP value or a function returning the OTP value for a token, e.g. after
+        splitting the PIN. The function returns None, if the token can not match.
+    :param window: the search window as passed to ``check_otp_exist`` or None for the window
+        of ``check_otp``
+    :return: list of token objects
+    """
+    indexed_tokens = _indexed_tokens(token_list)
+    if not indexed_tokens:
+        return token_list
+    if window is None and get_from_config("AutoResync", False, return_bool=True):
+        # The autosync of check_otp also accepts OTP values outside the window
+        return token_list
+    if db.session.execute(select(TokenOTPIndexRange.token_id).limit(1)).first() is None:
+        # The index is not used
+        return token_list
+
+    now = time.time()
+    ranges = _get_ranges([token.token.id for token in indexed_tokens])
+    covered_ids = set()
+    token_ids_by_hash = {}
+    for token in indexed_tokens:
+        if _covers(token, ranges.get(token.token.id), window, now):
+            covered_ids.add(token.token.id)
+            otp_value = otp(token) if callable(otp) else otp
+            if otp_value:
+                token_ids_by_hash.setdefault(_otp_hash(otp_value), set()).add(token.token.id)
+
+    matching_ids = set()
+    if token_ids_by_hash:
+        stmt = select(TokenOTPIndex.token_id, TokenOTPIndex.otp_hash).where(
+            TokenOTPIndex.otp_hash.in_(list(token_ids_by_hash.keys())))
+        for token_id, otp_hash in db.session.execute(stmt):
+            if token_id in token_ids_by_hash[otp_hash]:
+                matching_ids.add(token_id)
+    candidates = [token for token in token_list
+                  if token.token.id not in covered_ids or token.token.id in matching_ids]
+    log.debug(f"The OTP index reduced {len(token_list)} tokens to {len(candidates)} candidates.")
+    return candidates
+
+
+def update_otp_index(token_list: list[TokenClass], lookahead: int = DEFAULT_OTP_INDEX_LOOKAHEAD,
+                     window: int = DEFAULT_OTP_INDEX_WINDOW) -> int:
+    """
+    Calculate the index entries of the HOTP and TOTP tokens in the list, whose entries are
+    missing, outdated or about to run out. The other tokens are left as they are.
+
+    An HOTP token is indexed for the next ``lookahead`` counters. A TOTP token is indexed for
+    the next ``lookahead`` time steps, and additionally for the search window around the
+    current time step.
+
+    :param token_list: list of token objects, usually the unassigned tokens
+    :param lookahead: the number of counters or time steps to index
+    :param window: the search window, which lookups should be able to use
+    :return: the number of tokens, whose index entries were calculated
+    """
+    indexed_tokens = _indexed_tokens(token_list)
+    ranges = _get_ranges([token.token.id for token in indexed_tokens])
+    now = time.time()
+    updated = 0
+    for token in indexed_tokens:
+        index_range = ranges.get(token.token.id)
+        settings = _settings(token)
+        if settings["time_step"]:
+            window_size = max(window, settings["otp_window"])
+            counter = int((now + settings["time_shift"]) / settings["time_step"])
+            first, last = max(counter - window_size, 0), counter + window_size + lookahead
+            # Refresh the entries, when half of the lookahead is used up
+            still_valid = index_range is not None and counter + window_size + lookahead // 2 <= \
+                index_range.last_counter
+        else:
+            window_size = max(window, int(token.get_count_window() or 0))
+            first = int(token.token.count or 0)
+            last = first + max(lookahead, window_size)
+            still_valid = index_range is not None and index_range.last_counter - index_range.first_counter == \
+                last - first
+        if still_valid and index_range.fingerprint == _fingerprint(token) and \
+                index_range.settings == _settings_hash(settings):
+            continue
+        _index_token(token, settings, first, last)
+        updated += 1
+        if updated % COMMIT_SIZE == 0:
+            db.session.commit()
+    db.session.commit()
+    log.info(f"Updated the OTP index of {updated} tokens.")
+    return updated
+
+
+def _index_token(token: TokenClass, settings: dict, first: int, last: int) -> None:
+    token_id = token.token.id
+    hmac_otp = HmacOtp(token.token.get_otpkey(), first, int(token.token.otplen),
+                       token.get_hashlib(settings["hashlib"]))
+    entries = [{"token_id": token_id, "otp_hash": _otp_hash(otp), "counter": counter}
+               for counter, otp in enumerate(hmac_otp.generate_range(first, last), first)]
+    db.session.execute(delete(TokenOTPIndex).where(TokenOTPIndex.token_id == token_id))
+    db.session.execute(TokenOTPIndex.__table__.insert(), entries)
+    db.session.merge(TokenOTPIndexRange(token_id=token_id, fingerprint=_fingerprint(token),
+                                        settings=_settings_hash(settings), first_counter=first,
+                                        last_counter=last, time_step=settings["time_step"],
+                                        time_shift=settings["time_shift"], otp_window=settings["otp_window"]))
+
+
+def refresh_otp_index(token: TokenClass) -> None:
+    """
+    Recalculate the index entries of a token after its counter changed, if the token is indexed.
+    An HOTP token keeps the number of indexed counters.
+    """
+    if token.get_tokentype().lower() not in OTP_INDEX_TOKEN_TYPES:
+        return
+    index_range = _get_ranges([token.token.id]).get(token.token.id)
+    if index_range is None:
+        return
+    lookahead = DEFAULT_OTP_INDEX_LOOKAHEAD
+    if not index_range.time_step:
+        lookahead = index_range.last_counter - index_range.first_counter
+    update_otp_index([token], lookahead=lookahead)
+
+
+def remove_from_otp_index(token_ids: list[int], commit: bool = True) -> None:
+    """
+    Remove the index entries of the given tokens, e.g. after a token was assigned to a user.
+    """
+    for i in range(0, len(token_ids), CHUNK_SIZE):
+        chunk = token_ids[i:i + CHUNK_SIZE]
+        db.session.execute(delete(TokenOTPIndex).where(TokenOTPIndex.token_id.in_(chunk)))
+        db.session.execute(delete(TokenOTPIndexRange).where(TokenOTPIndexRange.token_id.in_(chunk)))
+    if commit:
+        db.session.commit()
+
+
+def prune_otp_index() -> int:
+    """
+    Remove the index entries of all tokens, which are assigned to a user.
+
+    :return: the number of removed tokens
+    """
+    stmt = select(TokenOTPIndexRange.token_id).where(
+        TokenOTPIndexRange.token_id.in_(select(TokenOwner.token_id)))
+    token_ids = list(db.session.scalars(stmt))
+    remove_from_otp_index(token_ids)
+    return len(token_ids)
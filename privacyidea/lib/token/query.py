@@ -24,7 +24,8 @@ from privacyidea.lib.tokenclass import TokenClass
 from privacyidea.lib.utils import SQL_LIKE_ESCAPE, convert_wildcard_to_sql_like
 from privacyidea.lib.user import User
 from privacyidea.models import (db, Token, Realm, TokenRealm, TokenInfo, TokenOwner, TokenContainer,
-                                TokenContainerToken)
+                                TokenContainerToken, TOKENINFO_COLUMNS, TOKENINFO_COUNTER_COLUMNS,
+                                auth_loader_options)
 from privacyidea.models.utils import clob_to_varchar
 
 log = logging.getLogger(__name__)
@@ -258,9 +259,20 @@ def _create_token_query(tokentype: str | None = None, token_type_list: list[str]
         if len(tokeninfo) != 1:
             raise PrivacyIDEAError(_("I can only create SQL filters from tokeninfo of length 1."))
         key, value = list(tokeninfo.items())[0]
-        sql_query = sql_query.join(TokenInfo, TokenInfo.token_id == Token.id)
-        sql_query = sql_query.where(TokenInfo.Key == key)
-        sql_query = sql_query.where(clob_to_varchar(TokenInfo.Value) == value)
+        if key in TOKENINFO_COLUMNS:
+            # The token info is stored in a column of the token table
+            column = getattr(Token, key)
+            if key in TOKENINFO_COUNTER_COLUMNS:
+                try:
+                    sql_query = sql_query.where(column == int(value))
+                except (TypeError, ValueError):
+                    sql_query = sql_query.where(false())
+            else:
+                sql_query = sql_query.where(column == value)
+        else:
+            sql_query = sql_query.join(TokenInfo, TokenInfo.token_id == Token.id)
+            sql_query = sql_query.where(TokenInfo.Key == key)
+            sql_query = sql_query.where(clob_to_varchar(TokenInfo.Value) == value)
 
     # Filtering by container_serial
     if container_serial is not None:
@@ -590,7 +602,8 @@ def get_tokens(tokentype: str | None = None, token_type_list: list[str] | None =
                resolver: str | None = None, userid: str | None = None, rollout_state: str | None = None,
                count: bool = False, revoked: bool | None = None, locked: bool | None = None,
                tokeninfo: dict | None = None,
-               maxfail: bool | None = None, all_nodes: bool = False) -> list[TokenClass] | int:
+               maxfail: bool | None = None, all_nodes: bool = False,
+               eager_load: bool = False) -> list[TokenClass] | int:
     """
     (was getTokensOfType)
     This function returns a list of token objects of a
@@ -652,6 +665,9 @@ def get_tokens(tokentype: str | None = None, token_type_list: list[str] | None =
         reached maxfail
     :param all_nodes: If True, ignore node specific realm configurations (default: False)
     :type all_nodes: bool
+    :param eager_load: If True, the token info and the owners are loaded with the tokens in a fixed
+        number of queries (see ``auth_loader_options``). Used by the authentication.
+    :type eager_load: bool
     :return: A list of lib.tokenclass objects.
     :rtype: list or int
     """
@@ -687,6 +703,8 @@ def get_tokens(tokentype: str | None = None, token_type_list: list[str] | None =
             )
         ).scalar_one()
     else:
+        if eager_load:
+            sql_query = sql_query.options(*auth_loader_options())
         tokens = session.execute(sql_query).unique().scalars().all()
         token_list = []
         for token in tokens:
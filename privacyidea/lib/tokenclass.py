@@ -85,7 +85,8 @@ from datetime import datetime, timedelta, timezone
 from dateutil.parser import parse as parse_date_string, ParserError
 from dateutil.tz import tzlocal, tzutc
 from flask_babel import lazy_gettext
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.orm.attributes import set_committed_value
 
 from privacyidea.lib import _
 from privacyidea.lib.crypto import (decryptPassword,
@@ -113,7 +114,8 @@ from .policies.actions import PolicyAction
 from .policydecorators import libpolicy, auth_otppin, challenge_response_allowed
 from .user import (User)
 from ..models import (TokenOwner, TokenTokengroup, cleanup_challenges, TokenInfo, db, TokenRealm, Realm,
-                      Tokengroup, TokenCredentialIdHash)
+                      Tokengroup, TokenCredentialIdHash, TokenOTPIndex, TokenOTPIndexRange, Token,
+                      TOKENINFO_COLUMNS, commit_and_reload_tokens)
 
 DATE_FORMAT = '%Y-%m-%dT%H:%M%z'
 AUTH_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f%z"
@@ -369,14 +371,18 @@ class TokenClass:
         return user_identifier, user_displayname
 
     @check_token_locked
-    def reset(self):
+    def reset(self, commit_db_session: bool = True):
         """
         Reset the failcounter
+
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
         """
         if self.token.failcount:
             # reset the failcounter and write to database
-            self.set_failcount(0)
-            self.token.save()
+            self.set_failcount(0, commit_db_session=commit_db_session)
+            if commit_db_session:
+                self.token.save()
 
     @check_token_locked
     def add_init_details(self, key, value):
@@ -427,6 +433,15 @@ class TokenClass:
             you are doing multiple database changes with a final single commit.
         """
 
+        if key in TOKENINFO_COLUMNS:
+            try:
+                self.token.set_info_column(key, value)
+            except ValueError:
+                raise ParameterError(_("The token info {0!s} must be an integer.").format(key))
+            if commit_db_session:
+                db.session.commit()
+            return
+
         if value_type == "password":
             value = encryptPassword(value)
 
@@ -771,6 +786,10 @@ class TokenClass:
         from privacyidea.lib.challenge import delete_challenges
         delete_challenges(serial=self.token.serial, commit=False)
 
+        if self.get_tokentype().lower() in ["hotp", "totp"]:
+            db.session.execute(delete(TokenOTPIndex).where(TokenOTPIndex.token_id == self.token.id))
+            db.session.execute(delete(TokenOTPIndexRange).where(TokenOTPIndexRange.token_id == self.token.id))
+
         if self.get_tokentype().lower() in ["webauthn", "passkey"]:
             delete_stmt_token_credential = delete(TokenCredentialIdHash).where(
                 TokenCredentialIdHash.token_id == self.token.id)
@@ -836,13 +855,16 @@ class TokenClass:
         return self.token.failcount
 
     @check_token_locked
-    def set_failcount(self, failcount):
+    def set_failcount(self, failcount, commit_db_session: bool = True):
         """
         Set the failcounter in the database
+
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
         """
         self.token.failcount = failcount
         if failcount == 0:
-            self.delete_tokeninfo(FAILCOUNTER_EXCEEDED)
+            self.delete_tokeninfo(FAILCOUNTER_EXCEEDED, commit_db_session=commit_db_session)
 
     def get_max_failcount(self):
         return self.token.maxfail
@@ -968,6 +990,25 @@ class TokenClass:
         self.token.count = int(otpCount)
         self.token.save()
 
+    def set_otp_count_if_unchanged(self, otp_count: int, former_count: int) -> bool:
+        """
+        Set the OTP counter in a single conditional UPDATE statement, which only
+        succeeds, if the counter in the database still is the former counter.
+        The change is committed immediately. This way two concurrent requests can
+        not both use the same OTP value. The tokens of an authentication, which the
+        commit expired, are loaded again at once (see ``commit_and_reload_tokens``).
+
+        :param otp_count: The new OTP counter
+        :param former_count: The OTP counter, which was used to verify the OTP value
+        :return: True, if the counter was set, False if it was changed in the meantime
+        """
+        statement = (update(Token).where(Token.id == self.token.id, Token.count == former_count)
+                     .values(count=int(otp_count))
+                     .execution_options(synchronize_session=False))
+        result = db.session.execute(statement)
+        commit_and_reload_tokens()
+        return result.rowcount > 0
+
     @check_token_locked
     def set_pin(self, pin, encrypt=False):
         """
@@ -1035,13 +1076,20 @@ class TokenClass:
         self.add_tokeninfo("hashlib", hashlib)
 
     @check_token_locked
-    def inc_failcount(self):
+    def inc_failcount(self, commit_db_session: bool = True):
+        """
+        Increase the failcounter of the token
+
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
+        :return: the new failcounter
+        """
         if self.token.failcount < self.token.maxfail:
             self.token.failcount = (self.token.failcount + 1)
             if self.token.failcount == self.token.maxfail:
-                self.add_tokeninfo(FAILCOUNTER_EXCEEDED,
-                                   datetime.now(tzlocal()).strftime(
-                                       DATE_FORMAT))
+                self.token.failcounter_exceeded = datetime.now(tzlocal()).strftime(DATE_FORMAT)
+        if not commit_db_session:
+            return self.token.failcount
         try:
             self.token.save()
         except Exception:  # pragma: no cover
@@ -1127,17 +1175,26 @@ class TokenClass:
 
         return ret
 
-    def delete_tokeninfo(self, key: str = None):
+    def delete_tokeninfo(self, key: str = None, commit_db_session: bool = True):
         """
         Deletes the token info for the given key. If no key is given, all info entries from this token are deleted.
 
         :param key: The key to delete
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
         """
-        statement = delete(TokenInfo).where(TokenInfo.token_id == self.token.id)
-        if key:
-            statement = statement.where(TokenInfo.Key == key)
-        db.session.execute(statement)
-        db.session.commit()
+        if key in TOKENINFO_COLUMNS:
+            self.token.set_info_column(key, None)
+        else:
+            if not key:
+                for column in TOKENINFO_COLUMNS:
+                    self.token.set_info_column(column, None)
+            statement = delete(TokenInfo).where(TokenInfo.token_id == self.token.id)
+            if key:
+                statement = statement.where(TokenInfo.Key == key)
+            db.session.execute(statement)
+        if commit_db_session:
+            db.session.commit()
 
     def delete_tokengroup(self, tokengroup: str = None, tokengroup_id: int = None) -> bool:
         """
@@ -1219,7 +1276,7 @@ class TokenClass:
         """
         Return the number of successful authentications
         """
-        ret = int(self.get_tokeninfo("count_auth_success", 0))
+        ret = int(self.token.count_auth_success or 0)
         return ret
 
     def get_count_auth_max(self):
@@ -1233,7 +1290,7 @@ class TokenClass:
         """
         Return the number of all authentication tries
         """
-        ret = int(self.get_tokeninfo("count_auth", 0))
+        ret = int(self.token.count_auth or 0)
         return ret
 
     def get_validity_period_end(self):
@@ -1338,18 +1395,16 @@ class TokenClass:
         return datetime.now(tzlocal()) > date_change
 
     @check_token_locked
-    def inc_count_auth_success(self):
+    def inc_count_auth_success(self, commit_db_session: bool = True):
         """
         Increase the counter, that counts successful authentications
         Also increase the auth counter
+
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
         """
-        succcess_counter = self.get_count_auth_success()
-        succcess_counter += 1
-        auth_counter = self.get_count_auth()
-        auth_counter += 1
-        self.add_tokeninfo_dict({"count_auth_success": int(succcess_counter),
-                                 "count_auth": int(auth_counter)})
-        return succcess_counter
+        self._inc_counter_columns(Token.count_auth, Token.count_auth_success, commit_db_session=commit_db_session)
+        return self.get_count_auth_success()
 
     @check_token_locked
     def post_success(self):
@@ -1359,21 +1414,44 @@ class TokenClass:
         return
 
     @check_token_locked
-    def inc_count_auth(self):
+    def inc_count_auth(self, commit_db_session: bool = True):
         """
         Increase the counter, that counts authentications - successful and
         unsuccessful
+
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
+        """
+        self._inc_counter_columns(Token.count_auth, commit_db_session=commit_db_session)
+        return self.get_count_auth()
+
+    def _inc_counter_columns(self, *columns, commit_db_session: bool = True):
         """
-        count = self.get_count_auth()
-        count += 1
-        self.set_count_auth(count)
-        return count
+        Increase the counter columns of the token by one in a single UPDATE statement,
+        so that concurrent authentications do not lose increments. The token takes the
+        new values from the UPDATE, if the database supports RETURNING, and loads them
+        with the next access otherwise.
+        """
+        statement = (update(Token).where(Token.id == self.token.id)
+                     .values({column: func.coalesce(column, 0) + 1 for column in columns})
+                     .execution_options(synchronize_session=False))
+        if db.engine.dialect.update_returning:
+            new_values = db.session.execute(statement.returning(*columns)).one()
+            for column, value in zip(columns, new_values):
+                set_committed_value(self.token, column.key, value)
+        else:
+            db.session.execute(statement)
+            db.session.expire(self.token, [column.key for column in columns])
+        if commit_db_session:
+            db.session.commit()
 
-    def check_reset_failcount(self):
+    def check_reset_failcount(self, commit_db_session: bool = True):
         """
         Checks if we should reset the failcounter due to the
         FAILCOUNTER_CLEAR_TIMEOUT
 
+        :param commit_db_session: Whether the database changes should be committed to be persistent. Only use false if
+            you are doing multiple database changes with a final single commit.
         :return: True, if the failcounter was reset
         """
         timeout = 0
@@ -1385,11 +1463,11 @@ class TokenClass:
                         f"{exx!s}")
         if timeout and self.token.failcount == self.get_max_failcount():
             now = datetime.now(tzlocal())
-            lastfail = self.get_tokeninfo(FAILCOUNTER_EXCEEDED)
+            lastfail = self.token.failcounter_exceeded
             if lastfail is not None:
                 failcounter_exceeded = parse_legacy_time(lastfail, return_date=True)
                 if now > failcounter_exceeded + timedelta(minutes=timeout):
-                    self.reset()
+                    self.reset(commit_db_session=commit_db_session)
                     return True
         return False
 
@@ -1508,7 +1586,7 @@ class TokenClass:
 
         if (reset_counter and self.token.active and self.token.failcount <
                 self.token.maxfail):
-            self.set_failcount(0)
+            self.set_failcount(0, commit_db_session=False)
 
         # make DB persistent immediately, to avoid the re-usage of the counter
         self.token.save()
@@ -1973,7 +2051,7 @@ class TokenClass:
         tdelta = parse_timedelta(last_auth)
 
         # The last successful authentication of the token
-        date_s = self.get_tokeninfo(PolicyAction.LASTAUTH)
+        date_s = self.token.last_auth
         if date_s:
             log.debug("Compare the last successful authentication of "
                       f"token {self.token.serial} with policy "
@@ -36,13 +36,20 @@ import binascii
 
 from hashlib import sha1
 
-from privacyidea.lib.utils import hexlify_and_unicode
+from privacyidea.lib.utils import hexlify_and_unicode, to_bytes
 from privacyidea.lib.log import log_with
-from privacyidea.lib.crypto import safe_compare
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 
 log = logging.getLogger(__name__)
 
+# Windows of at least this many counters are truncated with numpy, if it is installed
+NUMPY_MIN_WINDOW = 1000
+
 
 class HmacOtp:
 
@@ -148,12 +155,70 @@ class HmacOtp:
             end = self.counter + (window)
 
         log.debug(f"OTP range counter: {start!r} - {end!r}")
-        for c in range(start, end):
-            otpval = self.generate(c)
-            #log.debug("calculating counter {0!r}".format(c))
-
-            if safe_compare(otpval, anOtpVal):
-                res = c
-                break
+        if start < end:
+            res = self.scan_window(anOtpVal, start, end)
         # return -1 or the counter
         return res
+
+    def _digests(self, start, end):
+        """
+        Yield the HMAC digests of the counters from start to end (exclusive).
+        The secret is only decrypted once and the keyed HMAC object is copied for
+        each counter.
+        """
+        keyed_hmac = self.secretObj.keyed_hmac(self.hashfunc)
+        pack = struct.Struct(">Q").pack
+        for counter in range(start, end):
+            h = keyed_hmac.copy()
+            h.update(pack(counter))
+            yield h.digest()
+
+    def generate_range(self, start, end):
+        """
+        Return the OTP values of the counters from start to end (exclusive).
+
+        :rtype: list of str
+        """
+        return [str(self.truncate(digest)).zfill(self.digits) for digest in self._digests(start, end)]
+
+    def scan_window(self, otp, start, end):
+        """
+        Search the counters from start to end (exclusive) for the OTP value.
+        Each OTP value is compared in constant time.
+
+        Large windows of a numeric OTP value are truncated with numpy at once,
+        if numpy is installed.
+
+        :param otp: The OTP value to search for
+        :type otp: str
+        :return: the first matching counter or -1
+        :rtype: int
+        """
+        otp = str(otp)
+        if (np is not None and end - start >= NUMPY_MIN_WINDOW and self.digits <= 9
+                and len(otp) == self.digits and otp.isdigit()):
+            return self._scan_window_numpy(otp, start, end)
+
+        otp_bytes = to_bytes(otp)
+        for counter, digest in enumerate(self._digests(start, end), start):
+            candidate = str(self.truncate(digest)).zfill(self.digits)
+            if hmac.compare_digest(to_bytes(candidate), otp_bytes):
+                return counter
+        return -1
+
+    def _scan_window_numpy(self, otp, start, end):
+        """
+        Dynamic truncation (RFC 4226, section 5.3) of all digests of the window
+        as uint32 vectors. All truncated values are compared with the OTP value,
+        so the comparison does not depend on the position of the match.
+        """
+        digests = np.frombuffer(b"".join(self._digests(start, end)), dtype=np.uint8)
+        digests = digests.reshape(end - start, -1)
+        rows = np.arange(end - start)
+        offsets = (digests[:, -1] & 0x0f).astype(np.intp)
+        binary = (digests[rows, offsets].astype(np.uint32) & 0x7f) << 24
+        binary |= digests[rows, offsets + 1].astype(np.uint32) << 16
+        binary |= digests[rows, offsets + 2].astype(np.uint32) << 8
+        binary |= digests[rows, offsets + 3].astype(np.uint32)
+        matches = np.flatnonzero(binary % np.uint32(10 ** self.digits) == np.uint32(int(otp)))
+        return start + int(matches[0]) if matches.size else -1
@@ -103,7 +103,7 @@ class DeprecatedTokenClass(TokenClass):
             self._refuse()
         TokenClass.enable(self, enable=False)
 
-    def reset(self):
+    def reset(self, commit_db_session=True):
         # Resetting the failcounter on a token that will never pass its
         # next check is meaningless.
         self._refuse()
@@ -437,6 +437,7 @@ class HotpTokenClass(TokenClass):
         """
         otplen = int(self.token.otplen)
         secretHOtp = self.token.get_otpkey()
+        former_count = self.token.count
 
         if counter is None:
             counter = int(self.get_otp_count())
@@ -450,11 +451,12 @@ class HotpTokenClass(TokenClass):
 
         if res == -1:
             res = self._autosync(hmac2Otp, anOtpVal)
-        if res != -1:
-            # on success, we save the counter
-            self.set_otp_count(res + 1)
-            # We could also store it temporarily
-            # self.auth_details["matched_otp_counter"] = res
+        if res != -1 and not self.set_otp_count_if_unchanged(res + 1, former_count):
+            # on success, we save the counter. The counter is only saved, if no
+            # concurrent request used the same OTP value in the meantime.
+            log.warning(f"the OTP value of counter {res} was used by a concurrent request "
+                        f"of token {self.token.serial}.")
+            res = -1
 
         return res
 
@@ -239,9 +239,12 @@ class MotpTokenClass(TokenClass):
             res = -1
             return res
 
-        if res != -1:
-            # on success, we have to save the last attempt
-            self.set_otp_count(res)
+        if res != -1 and not self.set_otp_count_if_unchanged(res, oCount):
+            # on success, we have to save the last attempt. It is only saved, if no
+            # concurrent request used the same OTP value in the meantime.
+            log.warning(f"the OTP value of counter {res} was used by a concurrent request "
+                        f"of token {self.token.serial}.")
+            res = -1
 
         return res
 
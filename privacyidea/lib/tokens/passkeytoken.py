@@ -513,7 +513,7 @@ class PasskeyTokenClass(TokenClass):
     def use_for_authentication(self, options):
         return self.is_active()
 
-    def inc_failcount(self):
+    def inc_failcount(self, commit_db_session: bool = True):
         """
         Do not increment the fail count for passkey, since their authentication process is decoupled from the usual.
         """
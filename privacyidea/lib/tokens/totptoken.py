@@ -356,9 +356,14 @@ class TotpTokenClass(HotpTokenClass):
             # _autosync: test if two consecutive otps have been provided
             res = self._autosync(hmac2Otp, anOtpVal)
 
+        if res != -1 and not self.set_otp_count_if_unchanged(res, oCount):
+            # on success, we have to save the last attempt. It is only saved, if no
+            # concurrent request used the same OTP value in the meantime.
+            log.warning(f"the OTP value of counter {res} was used by a concurrent request "
+                        f"of token {self.token.serial}.")
+            return -1
+
         if res != -1:
-            # on success, we have to save the last attempt
-            self.set_otp_count(res)
             # We could also store it temporarily
             # self.auth_details["matched_otp_counter"] = res
 
@@ -27,6 +27,7 @@ This module is tested in tests/test_lib_utils.py
 
 import base64
 import binascii
+import functools
 import hashlib
 import html
 import logging
@@ -45,7 +46,7 @@ import segno
 import sqlalchemy
 from dateutil.parser import parse as parse_date_string
 from dateutil.tz import tzlocal, tzutc
-from netaddr import IPAddress, IPNetwork, AddrFormatError
+from netaddr import IPAddress, IPNetwork, IPSet, AddrFormatError
 
 from privacyidea.lib.error import ParameterError, ResourceNotFoundError, PolicyError
 from privacyidea.lib.framework import get_app_config_value, get_base_url
@@ -538,6 +539,7 @@ def parse_date(date_string):
     return d
 
 
+@functools.lru_cache(maxsize=16)
 def parse_proxy(proxy_settings):
     """
     This parses the string of the system settings OverrideAuthorizationClient into a set of "proxy paths",
@@ -564,9 +566,11 @@ def parse_proxy(proxy_settings):
 
     Multiple such settings may be separated by comma.
 
+    The setting is parsed once and then taken from a cache for the following requests.
+
     :param proxy_settings: The OverrideAuthorizationClient config string
     :type proxy_settings: basestring
-    :return: A set of tuples of IPNetwork objects. Each tuple has at least two elements.
+    :return: A frozenset of tuples of IPNetwork objects. Each tuple has at least two elements.
     """
     proxy_set = set()
     if proxy_settings.strip():
@@ -580,7 +584,21 @@ def parse_proxy(proxy_settings):
                 proxypath = (IPNetwork(p_list[0]), IPNetwork("0.0.0.0/0"))
             proxy_set.add(proxypath)
 
-    return proxy_set
+    return frozenset(proxy_set)
+
+
+@functools.lru_cache(maxsize=16)
+def parse_trusted_proxies(proxy_settings):
+    """
+    Collect the networks, which may act as the first proxy, of the proxy paths of
+    OverrideAuthorizationClient into one IPSet. A client outside of it can not rewrite
+    its IP, so its request does not need to be checked against every proxy path.
+
+    :param proxy_settings: The OverrideAuthorizationClient config string
+    :return: An IPSet of the first hops of all proxy paths
+    :raises AddrFormatError: if the setting can not be parsed
+    """
+    return IPSet(proxy_path[0] for proxy_path in parse_proxy(proxy_settings))
 
 
 def check_proxy(path_to_client, proxy_settings):
@@ -603,6 +621,7 @@ def check_proxy(path_to_client, proxy_settings):
     """
     try:
         proxy_dict = parse_proxy(proxy_settings)
+        trusted_proxies = parse_trusted_proxies(proxy_settings)
     except AddrFormatError:
         log.error("Error parsing the OverrideAuthorizationClient setting: "
                   f"{proxy_settings!s}! The IP addresses need to be comma separated. Fix "
@@ -624,6 +643,10 @@ def check_proxy(path_to_client, proxy_settings):
     #   as the proxy path does not match completely because 10.2.3.4 is not allowed to map to 192.168.1.1.
     # After having processed all paths in the proxy settings, we return the "deepest" IP from ``path_to_client`` that
     # is allowed according to any proxy path of the proxy settings.
+    if path_to_client[0] not in trusted_proxies:
+        # The HTTP client is no proxy, so no proxy path can match
+        log.debug(f"The client {path_to_client[0]!r} is not a trusted proxy, the client IP is not mapped.")
+        return path_to_client[0]
     log.debug(f"Determining the mapped IP from {path_to_client!r} given the proxy settings {proxy_settings!r} ...")
     max_idx = 0
     for proxy_path in proxy_dict:
@@ -700,29 +723,76 @@ def get_client_ip(request, proxy_settings):
         return request.remote_addr
 
 
+def compile_ip_policy(policy):
+    """
+    This parses a list like
+
+       ["10.0.0.2", "192.168.2.1/24", "!192.168.2.12", "-172.16.200.1"]
+
+    into an IPSet of the included and an IPSet of the excluded addresses.
+    The result can be checked repeatedly with ``check_ip_in_ip_sets``.
+
+    :param policy: A list of single IP addresses, negated IP address and subnets.
+    :return: tuple of (included IPSet, excluded IPSet)
+    :raises AddrFormatError: if an entry is not a valid address or subnet
+    """
+    included = []
+    excluded = []
+    # Skip empty entries of the list
+    for ipdef in filter(None, policy):
+        if ipdef[0] in ['-', '!']:
+            excluded.append(IPNetwork(ipdef[1:]))
+        else:
+            included.append(IPNetwork(ipdef))
+    return IPSet(included), IPSet(excluded)
+
+
+def check_ip_in_ip_sets(client_ip, ip_sets):
+    """
+    This checks, if the given client IP is contained in the IP sets created by
+    ``compile_ip_policy``.
+
+    :param client_ip: The IP address in question
+    :type client_ip: str or IPAddress
+    :param ip_sets: tuple of (included IPSet, excluded IPSet)
+    :return: tuple of (found, excluded)
+    """
+    included, excluded = ip_sets
+    if not included and not excluded:
+        return False, False
+    client_ip = IPAddress(client_ip)
+    client_found = client_ip in included
+    client_excluded = client_ip in excluded
+    if client_excluded:
+        log.debug(f"the client {client_ip!s} is excluded")
+    return client_found, client_excluded
+
+
 def check_ip_in_policy(client_ip, policy):
     """
     This checks, if the given client IP is contained in a list like
 
        ["10.0.0.2", "192.168.2.1/24", "!192.168.2.12", "-172.16.200.1"]
 
+    The IP sets of a policy value are compiled once and then taken from a cache.
+
     :param client_ip: The IP address in question
     :param policy: A string of single IP addresses, negated IP address and subnets.
     :return: tuple of (found, excluded)
     """
-    client_found = False
-    client_excluded = False
-    # Remove empty strings from the list
-    policy = list(filter(None, policy))
-    for ipdef in policy:
-        if ipdef[0] in ['-', '!']:
-            # exclude the client?
-            if IPAddress(client_ip) in IPNetwork(ipdef[1:]):
-                log.debug(f"the client {client_ip!s} is excluded by {ipdef!s}")
-                client_excluded = True
-        elif IPAddress(client_ip) in IPNetwork(ipdef):
-            client_found = True
-    return client_found, client_excluded
+    return check_ip_in_ip_sets(client_ip, _compile_ip_policy_cached(tuple(policy)))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_ip_policy_cached(policy):
+    """
+    Cached variant of ``compile_ip_policy`` for ``check_ip_in_policy``. The returned
+    IP sets are shared and must not be modified.
+
+    :param policy: A tuple of single IP addresses, negated IP address and subnets.
+    :return: tuple of (included IPSet, excluded IPSet)
+    """
+    return compile_ip_policy(policy)
 
 
 def reload_db(timestamp, db_ts):
@@ -0,0 +1,90 @@
+# (c) NetKnights GmbH 2025,  https://netknights.it
+#
+# This code is free software; you can redistribute it and/or
+# modify it under the terms of the GNU AFFERO GENERAL PUBLIC LICENSE
+# as published by the Free Software Foundation; either
+# version 3 of the License, or any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU AFFERO GENERAL PUBLIC LICENSE for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: AGPL-3.0-or-later
+#
+"""
+This module coalesces concurrent calls for the same key into a single call.
+
+If several threads of a worker look up the same user at the same moment, e.g.
+during a burst of RADIUS requests, only the first thread asks the user store.
+The other threads wait for its result instead of sending the same query.
+It is tested in test_lib_utils.py
+"""
+import logging
+import threading
+from collections.abc import Callable, Hashable
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+class _Call:
+    """
+    A call in flight, which the waiting threads share.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. A thread calling ``do`` with a key
+    that is already in flight waits for the running call and gets its result,
+    or its exception.
+
+    Nothing is stored after the call returned, so a later call for the same key
+    runs again. Caching the result is up to the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call ``func(*args, **kwargs)``, unless a call for ``key`` is already in flight.
+
+        :param key: identifies calls which return the same result
+        :return: the result of the call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            in_flight = call is not None
+            if in_flight:
+                call.waiters += 1
+            else:
+                call = self._calls[key] = _Call()
+        if in_flight:
+            log.debug(f"Waiting for the call in flight for {key!r}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,126 @@
+"""v3.14: Move the authentication counters from the tokeninfo to the token table
+
+The token info count_auth, count_auth_success, failcounter_exceeded and
+last_auth change with every authentication. They are stored in columns of the
+token table, so that the counters are increased with a single UPDATE.
+
+Revision ID: a7b8c9d0e1f2
+Revises: f3a4b5c6d7e8
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+# revision identifiers, used by Alembic.
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f3a4b5c6d7e8'
+branch_labels = None
+depends_on = None
+
+COUNTER_COLUMNS = ('count_auth', 'count_auth_success')
+STRING_COLUMNS = ('failcounter_exceeded', 'last_auth')
+STRING_LENGTH = 50
+
+
+def _token_table():
+    return sa.table(
+        'token',
+        sa.column('id', sa.Integer),
+        *[sa.column(name, sa.Integer) for name in COUNTER_COLUMNS],
+        *[sa.column(name, sa.Unicode(STRING_LENGTH)) for name in STRING_COLUMNS],
+    )
+
+
+def _tokeninfo_table():
+    return sa.table(
+        'tokeninfo',
+        sa.column('id', sa.Integer),
+        sa.column('token_id', sa.Integer),
+        sa.column('Key', sa.Unicode(255)),
+        sa.column('Value', sa.UnicodeText),
+        sa.column('Type', sa.Unicode(100)),
+        sa.column('Description', sa.Unicode(2000)),
+    )
+
+
+def _convert(key, value):
+    """
+    Convert a tokeninfo value to the value of the column. Returns None for values,
+    which can not be stored in the column, e.g. a counter, which is not an integer.
+    """
+    if value is None or value == "":
+        return None
+    if key in COUNTER_COLUMNS:
+        try:
+            return int(value)
+        except ValueError:
+            print(f"Dropping the invalid tokeninfo value {key}={value!r}.")
+            return None
+    return value[:STRING_LENGTH]
+
+
+def upgrade():
+    columns = [sa.Column(name, sa.Integer(), nullable=True) for name in COUNTER_COLUMNS]
+    columns += [sa.Column(name, sa.Unicode(length=STRING_LENGTH), nullable=True) for name in STRING_COLUMNS]
+    for column in columns:
+        try:
+            op.add_column('token', column)
+        except (OperationalError, ProgrammingError) as exx:
+            if "already exists" in str(exx.orig).lower() or "duplicate column name" in str(exx.orig).lower():
+                print(f"Column '{column.name}' already exists.")
+            else:
+                print(f"Could not add column '{column.name}' to table 'token'.")
+                raise
+
+    _run_data_migration(op.get_bind())
+
+
+def _run_data_migration(conn) -> None:
+    """
+    Copy the tokeninfo entries into the new columns and delete them from the
+    tokeninfo table. Safe to re-run, the entries are only deleted after they were
+    copied.
+    """
+    token = _token_table()
+    tokeninfo = _tokeninfo_table()
+    for key in COUNTER_COLUMNS + STRING_COLUMNS:
+        rows = conn.execute(
+            sa.select(tokeninfo.c.token_id, tokeninfo.c.Value).where(tokeninfo.c.Key == key)
+        ).fetchall()
+        params = [{"b_id": row.token_id, "b_value": _convert(key, row.Value)} for row in rows
+                  if row.token_id is not None]
+        if params:
+            conn.execute(
+                token.update().where(token.c.id == sa.bindparam("b_id"))
+                .values({key: sa.bindparam("b_value")}),
+                params
+            )
+        conn.execute(tokeninfo.delete().where(tokeninfo.c.Key == key))
+
+
+def downgrade():
+    # Copy the values back into the tokeninfo table and drop the columns.
+    conn = op.get_bind()
+    token = _token_table()
+    tokeninfo = _tokeninfo_table()
+    id_value = {}
+    if conn.dialect.supports_sequences:
+        id_value = {"id": sa.Sequence("tokeninfo_seq").next_value()}
+    for key in COUNTER_COLUMNS + STRING_COLUMNS:
+        column = token.c[key]
+        rows = conn.execute(sa.select(token.c.id, column).where(column.isnot(None))).fetchall()
+        for token_id, value in rows:
+            conn.execute(tokeninfo.insert().values(token_id=token_id, Key=key, Value=str(value), **id_value))
+
+    for name in COUNTER_COLUMNS + STRING_COLUMNS:
+        try:
+            op.drop_column('token', name)
+        except (OperationalError, ProgrammingError) as exx:
+            msg = str(exx.orig).lower()
+            if "no such column" in msg or "does not exist" in msg or "check that it exists" in msg:
+                print(f"Column '{name}' already removed.")
+            else:
+                print(f"Could not remove column '{name}' from table 'token'.")
+                raise
@@ -0,0 +1,58 @@
+"""v3.14: Add pidea_audit_checkpoint table
+
+Used by the sql audit module to store signed Merkle roots over batches of audit
+entries when PI_AUDIT_SIGN_CHECKPOINT is enabled.
+
+Revision ID: e1f2a3b4c5d6
+Revises: d9e0f1a2b3c4
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+log = logging.getLogger("alembic.runtime.migration")
+
+revision = 'e1f2a3b4c5d6'
+down_revision = 'd9e0f1a2b3c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("pidea_audit_checkpoint"):
+        # The table can already exist when the schema was bootstrapped from the
+        # models (create_all) before this migration ran.
+        log.info("Table 'pidea_audit_checkpoint' already exists, skipping creation.")
+        return
+
+    try:
+        op.execute(sa.schema.CreateSequence(sa.Sequence("audit_checkpoint_seq")))
+    except (OperationalError, ProgrammingError):
+        # Some dialects (sqlite, mysql) don't have sequences - SQLAlchemy
+        # falls back to autoincrement, which is fine.
+        pass
+
+    op.create_table("pidea_audit_checkpoint",
+                    sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+                              primary_key=True, autoincrement=True),
+                    sa.Column("date", sa.DateTime(), nullable=True),
+                    sa.Column("chain", sa.Unicode(length=32), nullable=False),
+                    sa.Column("first_sequence", sa.BigInteger(), nullable=False),
+                    sa.Column("last_sequence", sa.BigInteger(), nullable=False),
+                    sa.Column("previous", sa.Unicode(length=64), nullable=True),
+                    sa.Column("leaves", sa.UnicodeText(), nullable=True),
+                    sa.Column("signature", sa.Unicode(length=1100), nullable=True))
+    op.create_index("ix_pidea_audit_checkpoint_chain", "pidea_audit_checkpoint", ["chain"])
+
+
+def downgrade():
+    op.drop_index("ix_pidea_audit_checkpoint_chain", table_name="pidea_audit_checkpoint")
+    op.drop_table("pidea_audit_checkpoint")
+    try:
+        op.execute(sa.schema.DropSequence(sa.Sequence("audit_checkpoint_seq")))
+    except (OperationalError, ProgrammingError):
+        pass
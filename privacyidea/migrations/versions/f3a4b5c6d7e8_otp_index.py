@@ -0,0 +1,84 @@
+"""v3.14: Add tokenotpindex and tokenotpindexrange tables
+
+Used to find unassigned HOTP and TOTP tokens by an OTP value, e.g. for
+autoassignment, without calculating the OTP values of all tokens.
+
+Revision ID: f3a4b5c6d7e8
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from privacyidea.models.db import (create_sequence_if_supported, restart_sequence_past_max,
+                                   sequence_id_column)
+
+# revision identifiers, used by Alembic.
+revision = 'f3a4b5c6d7e8'
+down_revision = 'e1f2a3b4c5d6'
+branch_labels = None
+depends_on = None
+
+SEQUENCE_NAME = "tokenotpindex_seq"
+
+
+def upgrade():
+    create_sequence_if_supported(op, SEQUENCE_NAME)
+
+    try:
+        op.create_table(
+            'tokenotpindex',
+            sequence_id_column(op, SEQUENCE_NAME),
+            sa.Column('token_id', sa.Integer(), nullable=False),
+            sa.Column('otp_hash', sa.Unicode(length=64), nullable=False),
+            sa.Column('counter', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['token_id'], ['token.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.Index('ix_tokenotpindex_token_id', 'token_id'),
+            sa.Index('ix_tokenotpindex_otp_hash', 'otp_hash'),
+        )
+    except (OperationalError, ProgrammingError) as ex:
+        if "already exists" in str(ex.orig).lower():
+            print("Table 'tokenotpindex' already exists.")
+        else:
+            print("Could not add table 'tokenotpindex' to database.")
+            raise
+    restart_sequence_past_max(op, 'tokenotpindex', SEQUENCE_NAME)
+
+    try:
+        op.create_table(
+            'tokenotpindexrange',
+            sa.Column('token_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('fingerprint', sa.Unicode(length=64), nullable=False),
+            sa.Column('settings', sa.Unicode(length=64), nullable=False),
+            sa.Column('first_counter', sa.Integer(), nullable=False),
+            sa.Column('last_counter', sa.Integer(), nullable=False),
+            sa.Column('time_step', sa.Integer(), nullable=True),
+            sa.Column('time_shift', sa.Float(), nullable=True),
+            sa.Column('otp_window', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['token_id'], ['token.id']),
+            sa.PrimaryKeyConstraint('token_id'),
+        )
+    except (OperationalError, ProgrammingError) as ex:
+        if "already exists" in str(ex.orig).lower():
+            print("Table 'tokenotpindexrange' already exists.")
+        else:
+            print("Could not add table 'tokenotpindexrange' to database.")
+            raise
+
+
+def downgrade():
+    for table in ('tokenotpindexrange', 'tokenotpindex'):
+        try:
+            op.drop_table(table)
+        except (OperationalError, ProgrammingError) as ex:
+            msg = str(ex.orig).lower()
+            if "no such table" in msg or "unknown table" in msg or "does not exist" in msg:
+                print(f"Table '{table}' already removed.")
+            else:
+                print(f"Could not remove table '{table}'.")
+                raise
+    if op.get_bind().dialect.supports_sequences:
+        op.execute("DROP SEQUENCE IF EXISTS tokenotpindex_seq")
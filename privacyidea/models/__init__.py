@@ -35,14 +35,14 @@
 # Nov 11, 2014 Cornelius Kölbel, info@privacyidea.org
 
 from .db import db
-from .audit import Audit, audit_column_length
+from .audit import Audit, AuditCheckpoint, audit_column_length
 from .cache import AuthCache, UserCache
 from .caconnector import CAConnector, CAConnectorConfig
 from .challenge import Challenge, cleanup_challenges
 from .client import Client, ClientStatus
 from .remembered_device import RememberedDevice
 from .config import (Config, NodeName, Admin, PasswordReset,
-                     save_config_timestamp, PRIVACYIDEA_TIMESTAMP)
+                     save_config_timestamp, PRIVACYIDEA_TIMESTAMP, ConfigSection)
 from .customuserattribute import CustomUserAttribute
 from .internaluserattribute import InternalUserAttribute
 from .event import EventHandler, EventHandlerOption, EventHandlerCondition
@@ -61,7 +61,9 @@ from .serviceid import Serviceid
 from .smsgateway import SMSGateway, SMSGatewayOption
 from .subscription import ClientApplication, Subscription
 from .token import (Token, TokenInfo, TokenOwner, TokenCredentialIdHash,
-                    TokenRealm, get_token_id)
+                    TokenRealm, TokenOTPIndex, TokenOTPIndexRange, get_token_id,
+                    TOKENINFO_COLUMNS, TOKENINFO_COUNTER_COLUMNS, auth_loader_options,
+                    commit_and_reload_tokens)
 from .tokencontainer import (TokenContainer, TokenContainerInfo,
                              TokenContainerRealm, TokenContainerOwner,
                              TokenContainerStates, TokenContainerTemplate,
@@ -70,11 +72,11 @@ from .tokengroup import Tokengroup, TokenTokengroup
 from .usersetting import UserSetting
 
 # We don't use "import *" but to avoid the unused import warning we define this
-__all__ = ["db", "Audit", "audit_column_length", "AuthCache", "UserCache",
+__all__ = ["db", "Audit", "AuditCheckpoint", "audit_column_length", "AuthCache", "UserCache",
            "CAConnector", "CAConnectorConfig", "Challenge", "cleanup_challenges", "Client", "ClientStatus",
            "RememberedDevice",
            "Config", "NodeName", "Admin", "PasswordReset", "save_config_timestamp",
-           "PRIVACYIDEA_TIMESTAMP", "CustomUserAttribute", "InternalUserAttribute",
+           "PRIVACYIDEA_TIMESTAMP", "ConfigSection", "CustomUserAttribute", "InternalUserAttribute",
            "EventHandler", "EventHandlerOption", "EventHandlerCondition", "EventCounter",
            "MachineResolver", "MachineResolverConfig", "MachineToken",
            "MachineTokenOptions", "get_machineresolver_id", "get_machinetoken_ids",
@@ -86,7 +88,8 @@ __all__ = ["db", "Audit", "audit_column_length", "AuthCache", "UserCache",
            "Serviceid", "SMSGateway", "SMSGatewayOption",
            "ClientApplication", "Subscription",
            "Token", "TokenInfo", "TokenOwner", "TokenCredentialIdHash",
-           "TokenRealm", "get_token_id",
+           "TokenRealm", "TokenOTPIndex", "TokenOTPIndexRange", "get_token_id",
+           "TOKENINFO_COLUMNS", "TOKENINFO_COUNTER_COLUMNS", "auth_loader_options", "commit_and_reload_tokens",
            "TokenContainer", "TokenContainerInfo",
            "TokenContainerRealm", "TokenContainerOwner",
            "TokenContainerStates", "TokenContainerTemplate",
@@ -23,6 +23,7 @@ from sqlalchemy import (
     Sequence,
     Interval,
     Unicode,
+    UnicodeText,
     BigInteger,
 )
 from sqlalchemy.dialects import sqlite
@@ -59,6 +60,7 @@ audit_column_length = {"signature": 1100,
                        "container_type": 100}
 
 AUDIT_TABLE_NAME = 'pidea_audit'
+AUDIT_CHECKPOINT_TABLE_NAME = 'pidea_audit_checkpoint'
 
 
 class Audit(MethodsMixin, db.Model):
@@ -96,3 +98,28 @@ class Audit(MethodsMixin, db.Model):
                                                            default="default")
     thread_id: Mapped[str | None] = mapped_column(Unicode(audit_column_length.get("thread_id")), default="0")
     policies: Mapped[str | None] = mapped_column(Unicode(audit_column_length.get("policies")), default="")
+
+
+class AuditCheckpoint(MethodsMixin, db.Model):
+    """
+    A signed checkpoint over a batch of audit entries.
+
+    Instead of signing every audit entry, the sql audit module can hash each entry
+    into a chain and only sign the Merkle root of a batch of entry hashes. The
+    audit entries reference their chain and sequence number in their signature
+    column and the checkpoint stores the entry hashes of the batch, so that every
+    entry can be verified against the signed root.
+    """
+    __tablename__ = AUDIT_CHECKPOINT_TABLE_NAME
+    id: Mapped[int] = mapped_column(BigIntegerType,
+                                    Sequence("audit_checkpoint_seq", data_type=BigInteger), primary_key=True)
+    date: Mapped[datetime | None] = mapped_column(default=datetime.now)
+    # Random identifier of the writing process. The sequence numbers are only unique within a chain.
+    chain: Mapped[str] = mapped_column(Unicode(32), nullable=False, index=True)
+    first_sequence: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_sequence: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # The chain hash of the last entry of the previous checkpoint of the chain, which links the checkpoints.
+    previous: Mapped[str | None] = mapped_column(Unicode(64), default="")
+    # The concatenated hex encoded SHA-256 hashes of the audit entries in sequence order
+    leaves: Mapped[str | None] = mapped_column(UnicodeText, default="")
+    signature: Mapped[str | None] = mapped_column(Unicode(audit_column_length.get("signature")), default="")
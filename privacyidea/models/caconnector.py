@@ -28,7 +28,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from privacyidea.lib.utils import convert_column_to_unicode
 from privacyidea.models import db
-from privacyidea.models.config import TimestampMethodsMixin
+from privacyidea.models.config import TimestampMethodsMixin, ConfigSection
 
 
 class CAConnector(TimestampMethodsMixin, db.Model):
@@ -38,6 +38,7 @@ class CAConnector(TimestampMethodsMixin, db.Model):
     stored in the table "caconnectorconfig".
     """
     __tablename__ = 'caconnector'
+    config_section = ConfigSection.CACONNECTOR
     id: Mapped[int] = mapped_column(Sequence("caconnector_seq"), primary_key=True, nullable=False)
     name: Mapped[str] = mapped_column(Unicode(255), default="", unique=True, nullable=False)
     catype: Mapped[str] = mapped_column(Unicode(255), default="", nullable=False)
@@ -39,23 +39,49 @@ PRIVACYIDEA_TIMESTAMP = "__timestamp__"
 SAFE_STORE = "PI_DB_SAFE_STORE"
 
 
-def save_config_timestamp(invalidate_config=True):
+class ConfigSection:
+    __doc__ = """The sections of the shared config object, which are reloaded separately"""
+    CONFIG = "config"
+    RESOLVER = "resolver"
+    REALM = "realm"
+    POLICY = "policy"
+    EVENT = "event"
+    CACONNECTOR = "caconnector"
+
+
+CONFIG_SECTIONS = (ConfigSection.CONFIG, ConfigSection.RESOLVER, ConfigSection.REALM,
+                   ConfigSection.POLICY, ConfigSection.EVENT, ConfigSection.CACONNECTOR)
+
+
+def section_timestamp_key(section):
+    """
+    :return: the key of the config entry holding the timestamp of the given section
+    """
+    return f"{PRIVACYIDEA_TIMESTAMP}.{section}"
+
+
+def save_config_timestamp(invalidate_config=True, section=None):
     """
     Save the current timestamp to the database, and optionally
     invalidate the current request-local config object.
+
+    Besides the global timestamp, the timestamp of the changed section is saved,
+    so that the other workers only reload this section of the configuration.
+
     :param invalidate_config: defaults to True
+    :param section: The changed section (see ``ConfigSection``). ``None`` marks all
+        sections as changed.
     """
-    # Replaced .query with a modern select statement
-    stmt = select(Config).filter_by(Key=PRIVACYIDEA_TIMESTAMP)
-    c1 = db.session.execute(stmt).scalar_one_or_none()
-
-    if c1:
-        c1.Value = str(datetime.now().timestamp())
-    else:
-        new_timestamp = Config(PRIVACYIDEA_TIMESTAMP,
-                               str(datetime.now().timestamp()),
-                               Description="config timestamp. last changed.")
-        db.session.add(new_timestamp)
+    sections = CONFIG_SECTIONS if section is None else (section,)
+    keys = [PRIVACYIDEA_TIMESTAMP] + [section_timestamp_key(s) for s in sections]
+    timestamp = str(datetime.now().timestamp())
+    stmt = select(Config).where(Config.Key.in_(keys))
+    existing = {c.Key: c for c in db.session.scalars(stmt)}
+    for key in keys:
+        if key in existing:
+            existing[key].Value = timestamp
+        else:
+            db.session.add(Config(key, timestamp, Description="config timestamp. last changed."))
     if invalidate_config:
         # We have just modified the config. From now on, the request handling
         # should operate on the *new* config. Hence, we need to invalidate
@@ -66,23 +92,28 @@ def save_config_timestamp(invalidate_config=True):
         invalidate_config_object()
     # Commit the changes at the end of the function.
     db.session.commit()
+    # Tell the other workers about the change, now that it is visible to them
+    from privacyidea.lib.cache.redis import publish_config_change
+    publish_config_change()
 
 
 class TimestampMethodsMixin:
     """
     This class mixes in the table functions including update of the timestamp
     """
+    # The section of the shared config object, which contains the data of the table
+    config_section = None
 
     def save(self):
         db.session.add(self)
-        save_config_timestamp()
+        save_config_timestamp(section=self.config_section)
         db.session.commit()
         return self.id
 
     def delete(self):
         ret = self.id
         db.session.delete(self)
-        save_config_timestamp()
+        save_config_timestamp(section=self.config_section)
         db.session.commit()
         return ret
 
@@ -113,14 +144,14 @@ class Config(TimestampMethodsMixin, db.Model):
 
     def save(self):
         db.session.add(self)
-        save_config_timestamp()
+        save_config_timestamp(section=ConfigSection.CONFIG)
         db.session.commit()
         return self.Key
 
     def delete(self):
         ret = self.Key
         db.session.delete(self)
-        save_config_timestamp()
+        save_config_timestamp(section=ConfigSection.CONFIG)
         db.session.commit()
         return ret
 
@@ -24,7 +24,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from privacyidea.lib.utils import is_true
 from privacyidea.models import db
-from privacyidea.models.config import TimestampMethodsMixin
+from privacyidea.models.config import TimestampMethodsMixin, ConfigSection
 from privacyidea.models.utils import MethodsMixin
 
 log = logging.getLogger(__name__)
@@ -60,6 +60,7 @@ class Policy(TimestampMethodsMixin, db.Model):
      * webui
     """
     __tablename__ = "policy"
+    config_section = ConfigSection.POLICY
     id: Mapped[int] = mapped_column(Integer, Sequence("policy_seq"), primary_key=True)
     active: Mapped[bool | None] = mapped_column(Boolean, default=True)
     check_all_resolvers: Mapped[bool | None] = mapped_column(Boolean, default=False)
@@ -215,6 +216,7 @@ class PolicyDescription(TimestampMethodsMixin, db.Model):
     The description table is used to store the description of policy
     """
     __tablename__ = 'description'
+    config_section = ConfigSection.POLICY
     id: Mapped[int] = mapped_column(Integer, Sequence("description_seq"), primary_key=True)
     object_id: Mapped[int] = mapped_column(Integer, ForeignKey('policy.id'), nullable=False)
     object_type: Mapped[str] = mapped_column(Unicode(64), unique=False, nullable=False)
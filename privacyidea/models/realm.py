@@ -27,7 +27,7 @@ if TYPE_CHECKING:
 from privacyidea.lib.error import DatabaseError
 from privacyidea.lib.log import log_with
 from privacyidea.models import db
-from privacyidea.models.config import (TimestampMethodsMixin,
+from privacyidea.models.config import (TimestampMethodsMixin, ConfigSection,
                                        NodeName)
 from privacyidea.models.resolver import Resolver
 
@@ -41,6 +41,7 @@ class Realm(TimestampMethodsMixin, db.Model):
     the realms. The linking to resolvers is stored in the table "resolverrealm".
     """
     __tablename__ = 'realm'
+    config_section = ConfigSection.REALM
     id: Mapped[int] = mapped_column(Integer, Sequence("realm_seq"), primary_key=True, nullable=False)
     name: Mapped[str] = mapped_column(Unicode(255), default='', unique=True, nullable=False)
     default: Mapped[bool | None] = mapped_column(Boolean(), default=False)
@@ -68,6 +69,7 @@ class ResolverRealm(TimestampMethodsMixin, db.Model):
     This is a N:M relation
     """
     __tablename__ = 'resolverrealm'
+    config_section = ConfigSection.REALM
     id: Mapped[int] = mapped_column(Integer, Sequence("resolverrealm_seq"), primary_key=True)
     resolver_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("resolver.id"))
     realm_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("realm.id"))
@@ -22,7 +22,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from privacyidea.lib.utils import convert_column_to_unicode
 from privacyidea.models import db
-from privacyidea.models.config import TimestampMethodsMixin
+from privacyidea.models.config import TimestampMethodsMixin, ConfigSection
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +34,7 @@ class Resolver(TimestampMethodsMixin, db.Model):
     configuration of the resolvers is stored in the table "resolverconfig".
     """
     __tablename__ = 'resolver'
+    config_section = ConfigSection.RESOLVER
     id: Mapped[int] = mapped_column(Integer, Sequence("resolver_seq"), primary_key=True,
                                     nullable=False)
     name: Mapped[str] = mapped_column(Unicode(255), default="",
@@ -63,6 +64,7 @@ class ResolverConfig(TimestampMethodsMixin, db.Model):
     The config entries are referenced by the id of the resolver.
     """
     __tablename__ = 'resolverconfig'
+    config_section = ConfigSection.RESOLVER
     id: Mapped[int] = mapped_column(Integer, Sequence("resolverconf_seq"), primary_key=True)
     resolver_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('resolver.id'))
     Key: Mapped[str] = mapped_column(Unicode(255), nullable=False)
@@ -19,8 +19,8 @@ import binascii
 import logging
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Sequence, Unicode, Integer, Boolean, select, UnicodeText
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Sequence, Unicode, Integer, Boolean, Float, select, UnicodeText, inspect
+from sqlalchemy.orm import Mapped, mapped_column, relationship, lazyload, selectinload
 
 if TYPE_CHECKING:
     from privacyidea.models.machine import MachineToken
@@ -38,6 +38,15 @@ from privacyidea.models.utils import MethodsMixin
 
 log = logging.getLogger(__name__)
 
+#: Token info keys, which change with every authentication. They are stored in columns of the
+#: token table, so that they can be updated with a single statement, but are still read and
+#: written as token info.
+TOKENINFO_COUNTER_COLUMNS = ("count_auth", "count_auth_success")
+TOKENINFO_COLUMNS = TOKENINFO_COUNTER_COLUMNS + ("failcounter_exceeded", "last_auth")
+
+# The number of token IDs in one ``IN`` clause, when the tokens of an authentication are loaded again
+RELOAD_CHUNK_SIZE = 500
+
 
 class TokenCredentialIdHash(MethodsMixin, db.Model):
     __tablename__ = "tokencredentialidhash"
@@ -116,8 +125,15 @@ class Token(MethodsMixin, db.Model):
                                                        default=1000)
     rollout_state: Mapped[str | None] = mapped_column(Unicode(10),
                                                          default='')
+    # The token info in TOKENINFO_COLUMNS. None means, that the token info is not set.
+    count_auth: Mapped[int | None] = mapped_column(Integer)
+    count_auth_success: Mapped[int | None] = mapped_column(Integer)
+    failcounter_exceeded: Mapped[str | None] = mapped_column(Unicode(50))
+    last_auth: Mapped[str | None] = mapped_column(Unicode(50))
     info_list = relationship('TokenInfo', lazy='select', back_populates='token', cascade="all, delete-orphan")
     owners = relationship('TokenOwner', lazy='dynamic', back_populates='token', cascade="all, delete-orphan")
+    # The owners as a list, which can be loaded eagerly with the token (e.g. for the authentication)
+    owner_list = relationship('TokenOwner', viewonly=True, order_by='TokenOwner.id')
 
     # Container
     container = relationship('TokenContainer', secondary='tokencontainertoken', back_populates='tokens')
@@ -152,11 +168,15 @@ class Token(MethodsMixin, db.Model):
 
     @property
     def first_owner(self):
-        return self.owners.first()
+        if "owner_list" in inspect(self).unloaded:
+            return self.owners.first()
+        return self.owner_list[0] if self.owner_list else None
 
     @property
     def all_owners(self):
-        return self.owners.all()
+        if "owner_list" in inspect(self).unloaded:
+            return self.owners.all()
+        return list(self.owner_list)
 
     @staticmethod
     def _fix_spaces(data):
@@ -408,8 +428,29 @@ class Token(MethodsMixin, db.Model):
             if tokeninfo.Type:
                 ret[tokeninfo.Key + ".type"] = tokeninfo.Type
             ret[tokeninfo.Key] = tokeninfo.Value
+        for key in TOKENINFO_COLUMNS:
+            value = getattr(self, key)
+            if value is not None:
+                ret[key] = str(value)
         return ret
 
+    def set_info_column(self, key, value):
+        """
+        Set a token info, which is stored in a column of the token table.
+        The counters are converted to int, an empty value removes the token info.
+
+        :param key: one of TOKENINFO_COLUMNS
+        :param value: the value of the token info
+        :raises ValueError: if a counter is not an integer
+        """
+        if value is None or value == "":
+            value = None
+        elif key in TOKENINFO_COUNTER_COLUMNS:
+            value = int(value)
+        else:
+            value = convert_column_to_unicode(value)
+        setattr(self, key, value)
+
     def update_type(self, typ):
         """
         in case the previous has been different type
@@ -559,7 +600,78 @@ class TokenRealm(MethodsMixin, db.Model):
         self.token_id = token_id
 
 
+class TokenOTPIndex(MethodsMixin, db.Model):
+    """
+    An entry of the OTP index: the keyed hash of an OTP value, which an
+    unassigned HOTP or TOTP token generates for the given counter.
+    The index is used to find the token of an OTP value without calculating
+    the OTP values of all tokens, see :mod:`privacyidea.lib.token.otpindex`.
+    """
+    __tablename__ = 'tokenotpindex'
+    id: Mapped[int] = mapped_column(Integer, Sequence("tokenotpindex_seq"), primary_key=True)
+    token_id: Mapped[int] = mapped_column(Integer, db.ForeignKey('token.id'), nullable=False, index=True)
+    otp_hash: Mapped[str] = mapped_column(Unicode(64), nullable=False, index=True)
+    counter: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __init__(self, token_id, otp_hash, counter):
+        self.token_id = token_id
+        self.otp_hash = otp_hash
+        self.counter = counter
+
+
+class TokenOTPIndexRange(MethodsMixin, db.Model):
+    """
+    The counters of a token, which are contained in the OTP index, and the
+    state of the token they were calculated for. The index entries of a token
+    are only used as long as the fingerprint of the token does not change.
+    """
+    __tablename__ = 'tokenotpindexrange'
+    token_id: Mapped[int] = mapped_column(Integer, db.ForeignKey('token.id'), primary_key=True,
+                                          autoincrement=False)
+    # Hash of the token columns the OTP values depend on, like the key and the counter
+    fingerprint: Mapped[str] = mapped_column(Unicode(64), nullable=False)
+    # Hash of the token settings from the tokeninfo, like the hashlib
+    settings: Mapped[str] = mapped_column(Unicode(64), nullable=False)
+    first_counter: Mapped[int] = mapped_column(Integer, nullable=False)
+    # The first counter, which is not contained in the index
+    last_counter: Mapped[int] = mapped_column(Integer, nullable=False)
+    # The time step of a TOTP token in seconds or 0 for an HOTP token
+    time_step: Mapped[int | None] = mapped_column(Integer, default=0)
+    time_shift: Mapped[float | None] = mapped_column(Float, default=0.0)
+    # The number of counters a TOTP token checks around the current time
+    otp_window: Mapped[int | None] = mapped_column(Integer, default=0)
+
+
 def get_token_id(serial):
     stmt = select(Token).filter(Token.serial == serial)
     token = db.session.scalars(stmt).unique().one_or_none()
     return token.id if token else None
+
+
+def auth_loader_options() -> tuple:
+    """
+    The loader options of the authentication. The token info and the owners of all tokens are each
+    loaded with one additional query, instead of one query per token. The realms are always loaded
+    with the token. The token of an owner is the already loaded token.
+    """
+    return (selectinload(Token.info_list),
+            selectinload(Token.owner_list).options(lazyload(TokenOwner.token)))
+
+
+def commit_and_reload_tokens() -> None:
+    """
+    Commit the database session and load the tokens again, which were loaded with the
+    :func:`auth_loader_options`.
+
+    The commit expires all loaded objects, so that the changes of concurrent requests like an
+    increased fail counter are seen. An authentication would then load each of its tokens again
+    on the next access, with several queries per token. Reloading them together costs a fixed
+    number of queries.
+    """
+    token_ids = [inspect(obj).identity[0] for obj in db.session.identity_map.values()
+                 if isinstance(obj, Token) and "owner_list" not in inspect(obj).unloaded]
+    db.session.commit()
+    for i in range(0, len(token_ids), RELOAD_CHUNK_SIZE):
+        stmt = (select(Token).where(Token.id.in_(token_ids[i:i + RELOAD_CHUNK_SIZE]))
+                .options(*auth_loader_options()).execution_options(populate_existing=True))
+        db.session.execute(stmt).unique().scalars().all()
@@ -1090,6 +1090,10 @@ myApp.controller("LdapResolverController", ["$scope", "ConfigFactory", "$state",
             AUTHTYPE: $scope.authtypes["Simple"],
             SCOPE: "SUBTREE",
             CACHE_TIMEOUT: 120,
+            CACHE_SIZE: 100000,
+            NEGATIVE_CACHE_TIMEOUT: 10,
+            CONNECTION_POOL_SIZE: 0,
+            CONNECTION_POOL_IDLE_TIMEOUT: 60,
             NOSCHEMAS: false,
             TLS_VERIFY: true,
             TLS_VERSION: "2",
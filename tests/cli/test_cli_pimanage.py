@@ -562,7 +562,7 @@ class TestPIManageSetupClass:
         runner = app.test_cli_runner()
         result = runner.invoke(pi_manage, ["setup"])
         assert "Commands to set up the privacyIDEA server for production" in result.output
-        assert "create_audit_keys  Create the RSA signing keys for the audit log." in result.output
+        assert "create_audit_keys  Create the signing keys for the audit log and the..." in result.output
         assert "create_enckey      Create a key for encrypting the sensitive database..." in result.output
         assert "create_pgp_keys    Generate PGP keys to allow encrypted token import." in result.output
         assert "create_tables      Initially create the tables in the database." in result.output
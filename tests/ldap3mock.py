@@ -76,6 +76,27 @@ def wrapper%(signature)s:
 """
 
 
+def _check_password(directory, user, password, authentication=None):
+    """
+    Check the credentials of a bind against the entries of the directory.
+    """
+    correct_password = False
+    # Anonymous bind
+    if authentication == ldap3.ANONYMOUS and user is None:
+        correct_password = True
+    for entry in directory:
+        if to_unicode(entry.get("dn")) == user:
+            pw = entry.get("attributes").get("userPassword")
+            # password can be unicode
+            if to_bytes(pw) == to_bytes(password):
+                correct_password = True
+            elif pw.startswith('{SSHA}'):
+                correct_password = ldap_salted_sha1.verify(password, pw)
+            else:
+                correct_password = False
+    return correct_password
+
+
 def _convert_objectGUID(item):
     item = uuid.UUID("{{{0!s}}}".format(item)).bytes_le
     item = escape_bytes(item)
@@ -135,6 +156,7 @@ class Connection(object):
         import copy
         self.directory = copy.deepcopy(directory)
         self.bound = False
+        self.closed = False
         self.start_tls_called = False
         self.extend = self.Extend(self)
         self.usage = Mock(**{"elapsed_time": datetime.timedelta(microseconds=500)})
@@ -163,6 +185,10 @@ class Connection(object):
     def bind(self, read_server_info=True):
         return self.bound
 
+    def rebind(self, user=None, password=None, authentication=None, *args, **kwargs):
+        self.bound = _check_password(self.directory, user, password, authentication)
+        return self.bound
+
     def start_tls(self, read_server_info=True):
         self.start_tls_called = True
         return True
@@ -657,6 +683,8 @@ class Connection(object):
         return True
 
     def unbind(self):
+        self.bound = False
+        self.closed = True
         return True
 
 
@@ -733,24 +761,11 @@ class Ldap3Mock(object):
         # Raise an exception, if we are told to do so
         if self.exception:
             raise Exception("LDAP request failed")
-        # check the password
-        correct_password = False
-        # Anonymous bind
         # Reload the directory just in case a change has been made to
         # user credentials
         self.directory = self._load_data(DIRECTORY)
-        if authentication == ldap3.ANONYMOUS and user is None:
-            correct_password = True
-        for entry in self.directory:
-            if to_unicode(entry.get("dn")) == user:
-                pw = entry.get("attributes").get("userPassword")
-                # password can be unicode
-                if to_bytes(pw) == to_bytes(password):
-                    correct_password = True
-                elif pw.startswith('{SSHA}'):
-                    correct_password = ldap_salted_sha1.verify(password, pw)
-                else:
-                    correct_password = False
+        # check the password
+        correct_password = _check_password(self.directory, user, password, authentication)
         self.con_obj = Connection(self.directory)
         self.con_obj.bound = correct_password
         return self.con_obj
@@ -5,19 +5,21 @@ This tests the files
 """
 import datetime
 import os
+import time
 import types
 import unittest
 
 from mock import mock
-from sqlalchemy import text
+from sqlalchemy import event, func, text
 from sqlalchemy.pool import NullPool
 
 from privacyidea.config import TestingConfig
 from privacyidea.lib.audit import getAudit, search
 from privacyidea.lib.auditmodules.containeraudit import Audit as ContainerAudit
 from privacyidea.lib.auditmodules.loggeraudit import Audit as LoggerAudit
-from privacyidea.lib.auditmodules.sqlaudit import Audit as SQLAudit, column_length
+from privacyidea.lib.auditmodules.sqlaudit import Audit as SQLAudit, AuditChain, column_length
 from privacyidea.lib.utils import AUTH_RESPONSE
+from privacyidea.models import Audit as LogEntry, AuditCheckpoint, db
 from .base import MyTestCase, OverrideConfigTestCase
 from testfixtures import log_capture
 
@@ -489,6 +491,134 @@ class AuditTestCase(MyTestCase):
             self.Audit.session.execute(text("SET SESSION auto_increment_increment = 1"))
 
 
+    def test_15_sign_with_nonce(self):
+        # an entry signed with its id
+        self.Audit.log({"action": "signed_with_id", "user": "nonce_user"})
+        self.Audit.finalize_log()
+        # an entry signed with a nonce is written with a single INSERT
+        self.Audit.sign_with_nonce = True
+        end_date = datetime.datetime(2025, 3, 4, 10, 20, 30, 123456)
+        self.Audit.log({"action": "signed_with_nonce", "user": "nonce_user",
+                        "startdate": end_date - datetime.timedelta(seconds=1, microseconds=5)})
+        with mock.patch.object(self.Audit.session, "merge") as mock_merge, \
+                mock.patch("privacyidea.lib.auditmodules.sqlaudit._now", return_value=end_date):
+            self.Audit.finalize_log()
+        mock_merge.assert_not_called()
+        audit_log = self.Audit.search({"user": "nonce_user"})
+        self.assertEqual(2, audit_log.total)
+        for entry in audit_log.auditdata:
+            self.assertEqual("OK", entry.get("sig_check"), entry)
+        db_entry = next(self.Audit.search_query({"action": "signed_with_nonce"}))
+        self.assertTrue(db_entry.signature.startswith("n1:"), db_entry.signature)
+        # The dates are written as they are
+        self.assertEqual(end_date, db_entry.date)
+        nonce, signature = SQLAudit._split_signature(db_entry.signature)
+        chain, sequence, _previous_date, _previous = nonce.split(":")
+        self.assertEqual(8, len(chain))
+        self.assertTrue(signature.startswith("rsa_sha256_pss:"), signature)
+        # old signatures have no nonce
+        db_entry = next(self.Audit.search_query({"action": "signed_with_id"}))
+        self.assertEqual((None, db_entry.signature), SQLAudit._split_signature(db_entry.signature))
+
+        # the next entry is chained to the previous one
+        self.Audit.log({"action": "signed_with_nonce2", "user": "nonce_user"})
+        self.Audit.finalize_log()
+        db_entry = next(self.Audit.search_query({"action": "signed_with_nonce2"}))
+        next_nonce, _signature = SQLAudit._split_signature(db_entry.signature)
+        next_chain, next_sequence, next_previous_date, _previous = next_nonce.split(":")
+        self.assertEqual(chain, next_chain)
+        self.assertEqual(int(sequence) + 1, int(next_sequence))
+        self.assertEqual("20250304102030", next_previous_date)
+
+        # modified entries fail the check
+        db_entry = next(self.Audit.search_query({"action": "signed_with_nonce"}))
+        db_entry.realm = "realm1"
+        self.Audit.session.merge(db_entry)
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"action": "signed_with_nonce*"})
+        self.assertEqual(["FAIL", "FAIL"], [entry.get("sig_check") for entry in audit_log.auditdata])
+        # as does a modified duration
+        db_entry = next(self.Audit.search_query({"action": "signed_with_nonce"}))
+        db_entry.realm = ""
+        db_entry.duration = datetime.timedelta(seconds=5)
+        self.Audit.session.merge(db_entry)
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"action": "signed_with_nonce"})
+        self.assertEqual("FAIL", audit_log.auditdata[0].get("sig_check"))
+        # and a swapped nonce
+        db_entry = next(self.Audit.search_query({"action": "signed_with_nonce"}))
+        db_entry.duration = datetime.timedelta(seconds=1, microseconds=5)
+        db_entry.signature = f"n1:00000000:1:::{signature}"
+        self.Audit.session.merge(db_entry)
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"action": "signed_with_nonce"})
+        self.assertEqual("FAIL", audit_log.auditdata[0].get("sig_check"))
+
+    def test_16_sign_with_nonce_copied_entry(self):
+        self.Audit.sign_with_nonce = True
+        self.Audit.log({"action": "nonce_original", "user": "nonce_copy_user"})
+        self.Audit.finalize_log()
+        audit_log = self.Audit.search({"user": "nonce_copy_user"})
+        self.assertEqual("OK", audit_log.auditdata[0].get("sig_check"))
+        # A copy of the entry is detected, as well as the original
+        db_entry = next(self.Audit.search_query({"action": "nonce_original"}))
+        columns = {column.key: getattr(db_entry, column.key) for column in LogEntry.__table__.columns
+                   if column.key != "id"}
+        self.Audit.session.add(LogEntry(**columns))
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"user": "nonce_copy_user"})
+        self.assertEqual(["FAIL", "FAIL"], [entry.get("sig_check") for entry in audit_log.auditdata])
+
+    def test_17_sign_with_nonce_replaced_entry(self):
+        self.Audit.sign_with_nonce = True
+        for i in range(3):
+            self.Audit.log({"action": f"nonce_replaced{i}", "user": "nonce_replace_user"})
+            self.Audit.finalize_log()
+        audit_log = self.Audit.search({"user": "nonce_replace_user"})
+        self.assertEqual(["OK"] * 3, [entry.get("sig_check") for entry in audit_log.auditdata])
+        # The entry in the middle is replaced by another entry of the chain, which is not
+        # the one the last entry was signed with
+        entries = list(self.Audit.search_query({"user": "nonce_replace_user"}))
+        _nonce, signature = SQLAudit._split_signature(entries[0].signature)
+        nonce, _signature = SQLAudit._split_signature(entries[1].signature)
+        entries[1].action = entries[0].action
+        entries[1].signature = f"n1:{nonce}:{signature}"
+        self.Audit.session.merge(entries[1])
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"user": "nonce_replace_user"})
+        self.assertEqual("FAIL", audit_log.auditdata[1].get("sig_check"))
+        self.assertEqual("FAIL", audit_log.auditdata[2].get("sig_check"))
+        # A deleted previous entry is reported by the missing line check
+        self.Audit.session.delete(entries[1])
+        self.Audit.session.commit()
+        audit_log = self.Audit.search({"user": "nonce_replace_user"})
+        self.assertEqual("OK", audit_log.auditdata[1].get("sig_check"))
+        self.assertEqual("FAIL", audit_log.auditdata[1].get("missing_line"))
+
+    def test_18_sign_with_nonce_positions_of_page(self):
+        self.Audit.sign_with_nonce = True
+        for i in range(5):
+            self.Audit.log({"action": f"nonce_page{i}", "user": "nonce_page_user"})
+            self.Audit.finalize_log()
+        statements = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        # The positions of all entries of a page are read with one query
+        event.listen(self.Audit.engine, "before_cursor_execute", on_execute)
+        try:
+            audit_log = self.Audit.search({"user": "nonce_page_user"})
+            csv = list(self.Audit.csv_generator({"user": "nonce_page_user"}))
+        finally:
+            event.remove(self.Audit.engine, "before_cursor_execute", on_execute)
+        self.assertEqual(["OK"] * 5, [entry.get("sig_check") for entry in audit_log.auditdata])
+        self.assertEqual(5, len(csv))
+        self.assertTrue(all("'OK'" in line for line in csv), csv)
+        self.assertEqual(2, len([statement for statement in statements if "signature LIKE" in statement]),
+                         statements)
+
+
 class AuditEngineOptionsTestCase(unittest.TestCase):
     """
     The audit engine is built from the pool defaults with the configured engine
@@ -583,6 +713,217 @@ class AuditColumnLengthTestCase(OverrideConfigTestCase):
         self.assertEqual(len(self.Audit.audit_data.get("user")), 10, self.Audit.audit_data)
 
 
+class AuditAsyncWriterTestCase(OverrideConfigTestCase):
+    class Config(TestingConfig):
+        PI_AUDIT_SQL_ASYNC = True
+        PI_AUDIT_SQL_ASYNC_BATCH_SIZE = 3
+        PI_AUDIT_SQL_ASYNC_FLUSH_INTERVAL = 50
+
+    def setUp(self):
+        self.Audit = getAudit(self.app.config)
+        self.Audit.clear()
+
+    def test_01_write_in_background(self):
+        for i in range(7):
+            self.Audit.log({"action": f"async{i}", "user": "async_user"})
+            self.Audit.finalize_log()
+            self.assertFalse(self.Audit.has_data)
+        self.Audit.flush()
+        audit_log = self.Audit.search({"user": "async_user"}, page_size=10)
+        self.assertEqual(7, audit_log.total)
+        self.assertEqual({f"async{i}" for i in range(7)},
+                         {entry.get("action") for entry in audit_log.auditdata})
+        # The entries are signed by the writer
+        for entry in audit_log.auditdata:
+            self.assertEqual("OK", entry.get("sig_check"), entry)
+        # the writer is reused by the next audit object
+        writer = self.Audit._get_audit_writer()
+        self.assertIs(writer, getAudit(self.app.config)._get_audit_writer())
+
+    def test_02_full_queue(self):
+        writer = self.Audit._get_audit_writer()
+        self.Audit.log({"action": "sync_fallback", "user": "async_user"})
+        # The queue is full, so the entry is written synchronously
+        with mock.patch.object(writer, "put", return_value=False):
+            self.Audit.finalize_log()
+        self.assertEqual(1, self.Audit.get_total({"action": "sync_fallback"}))
+
+        # Without the fallback the request waits for the writer
+        self.app.config["PI_AUDIT_SQL_ASYNC_SYNC_FALLBACK"] = False
+        try:
+            self.Audit.log({"action": "wait_for_writer", "user": "async_user"})
+            with mock.patch.object(writer, "put", side_effect=[False, True]) as mock_put:
+                self.Audit.finalize_log()
+            self.assertEqual(2, mock_put.call_count)
+            self.assertIsNone(mock_put.call_args.kwargs.get("timeout"))
+            self.assertEqual(0, self.Audit.get_total({"action": "wait_for_writer"}))
+        finally:
+            self.app.config.pop("PI_AUDIT_SQL_ASYNC_SYNC_FALLBACK")
+
+    def test_03_sign_with_nonce(self):
+        self.Audit.sign_with_nonce = True
+        for i in range(4):
+            self.Audit.log({"action": f"nonce{i}", "user": "async_nonce_user"})
+            self.Audit.finalize_log()
+        self.Audit.flush()
+        audit_log = self.Audit.search({"user": "async_nonce_user"})
+        self.assertEqual(4, audit_log.total)
+        for entry in audit_log.auditdata:
+            self.assertEqual("OK", entry.get("sig_check"), entry)
+        db_entry = next(self.Audit.search_query({"user": "async_nonce_user"}))
+        self.assertTrue(db_entry.signature.startswith("n1:"), db_entry.signature)
+
+    def test_04_stop_writer(self):
+        writer = self.Audit._get_audit_writer()
+        self.Audit.log({"action": "before_stop"})
+        self.Audit.finalize_log()
+        # Stopping the writer writes the queued entries and removes its exit handler
+        with mock.patch("privacyidea.lib.auditmodules.sqlaudit.atexit.unregister") as mock_unregister:
+            writer.stop()
+        mock_unregister.assert_called_once_with(writer.stop)
+        self.assertFalse(writer.is_alive)
+        self.assertEqual(1, self.Audit.get_total({"action": "before_stop"}))
+        # A new writer is started for the next entry
+        self.Audit.log({"action": "after_stop"})
+        self.Audit.finalize_log()
+        self.assertIsNot(writer, self.Audit._get_audit_writer())
+        self.Audit.flush()
+        self.assertEqual(1, self.Audit.get_total({"action": "after_stop"}))
+
+
+    def test_05_failed_batch(self):
+        writer = self.Audit._get_audit_writer()
+        batch = [({"action": "batch_ok1"}, self.Audit.sign_object, False, None),
+                 ({"action": "batch_broken", "date": "no date"}, self.Audit.sign_object, False, None),
+                 ({"action": "batch_ok2"}, self.Audit.sign_object, False, None)]
+        # The batch fails, so the entries are written one by one
+        with mock.patch.object(writer, "_insert", wraps=writer._insert) as mock_insert:
+            writer._write(batch)
+        self.assertEqual(4, mock_insert.call_count)
+        audit_log = self.Audit.search({"action": "batch_*"})
+        self.assertEqual({"batch_ok1", "batch_ok2"}, {entry.get("action") for entry in audit_log.auditdata})
+        for entry in audit_log.auditdata:
+            self.assertEqual("OK", entry.get("sig_check"), entry)
+
+
+class AuditCheckpointTestCase(OverrideConfigTestCase):
+    class Config(TestingConfig):
+        PI_AUDIT_SIGN_CHECKPOINT = True
+        PI_AUDIT_SIGN_CHECKPOINT_SIZE = 3
+        # no timer, the checkpoints are written by size or by flush()
+        PI_AUDIT_SIGN_CHECKPOINT_INTERVAL = 0
+
+    def setUp(self):
+        self.Audit = getAudit(self.app.config)
+        self.Audit.flush()
+        self.Audit.clear()
+
+    def test_01_sign_checkpoints(self):
+        with mock.patch.object(self.Audit.sign_object, "sign",
+                               wraps=self.Audit.sign_object.sign) as mock_sign:
+            for i in range(4):
+                self.Audit.log({"action": f"chained{i}", "user": "chain_user"})
+                self.Audit.finalize_log()
+        # Only the checkpoint over the first three entries is signed
+        self.assertEqual(1, mock_sign.call_count)
+        audit_log = SQLAudit(self.app.config).search({"user": "chain_user"}, page_size=10)
+        self.assertEqual(4, audit_log.total)
+        self.assertEqual(["OK", "OK", "OK", "PENDING"],
+                         [entry.get("sig_check") for entry in audit_log.auditdata])
+        db_entry = next(self.Audit.search_query({"action": "chained0"}))
+        self.assertTrue(db_entry.signature.startswith("c1:"), db_entry.signature)
+
+        # flush() writes the checkpoint over the pending entry
+        self.Audit.flush()
+        audit_log = SQLAudit(self.app.config).search({"user": "chain_user"}, page_size=10)
+        self.assertEqual(["OK"] * 4, [entry.get("sig_check") for entry in audit_log.auditdata])
+        checkpoints = db.session.query(AuditCheckpoint).order_by(AuditCheckpoint.first_sequence).all()
+        self.assertEqual(2, len(checkpoints))
+        self.assertEqual(checkpoints[0].last_sequence + 1, checkpoints[1].first_sequence)
+        # The checkpoints are linked
+        self.assertEqual(checkpoints[0].leaves[-64:], checkpoints[1].previous)
+        # The page is verified with one query per checkpoint
+        audit = SQLAudit(self.app.config)
+        audit.search({"user": "chain_user"}, page_size=10)
+        self.assertEqual(2, len(audit._checkpoints))
+
+    def test_02_tampering(self):
+        for i in range(3):
+            self.Audit.log({"action": f"tamper{i}", "user": "tamper_user"})
+            self.Audit.finalize_log()
+        # A modified entry fails the check
+        db_entry = next(self.Audit.search_query({"action": "tamper1"}))
+        db_entry.realm = "realm1"
+        self.Audit.session.merge(db_entry)
+        self.Audit.session.commit()
+        audit_log = SQLAudit(self.app.config).search({"user": "tamper_user"})
+        self.assertEqual(["OK", "FAIL", "OK"], [entry.get("sig_check") for entry in audit_log.auditdata])
+
+        # A modified checkpoint fails the check of all of its entries
+        checkpoint = db.session.query(AuditCheckpoint).one()
+        checkpoint.leaves = checkpoint.leaves[:64] + "0" * 64 + checkpoint.leaves[128:]
+        db.session.commit()
+        audit_log = SQLAudit(self.app.config).search({"user": "tamper_user"})
+        self.assertEqual(["FAIL"] * 3, [entry.get("sig_check") for entry in audit_log.auditdata])
+
+    def test_03_write_checkpoint_by_time(self):
+        chain = AuditChain(self.Audit._create_engine(), checkpoint_size=100, checkpoint_interval=0.05)
+        with mock.patch.object(SQLAudit, "_get_audit_chain", return_value=chain):
+            self.Audit.log({"action": "timed_checkpoint"})
+            self.Audit.finalize_log()
+        for _ in range(100):
+            if not chain.pending:
+                break
+            time.sleep(0.02)
+        self.assertFalse(chain.pending)
+        audit_log = SQLAudit(self.app.config).search({"action": "timed_checkpoint"})
+        self.assertEqual("OK", audit_log.auditdata[0].get("sig_check"))
+        chain.close()
+
+    def test_04_async_writer(self):
+        self.app.config["PI_AUDIT_SQL_ASYNC"] = True
+        try:
+            audit = getAudit(self.app.config)
+            for i in range(5):
+                audit.log({"action": f"async_chained{i}", "user": "async_chain_user"})
+                audit.finalize_log()
+            audit.flush()
+            audit_log = SQLAudit(self.app.config).search({"user": "async_chain_user"}, page_size=10)
+            self.assertEqual(5, audit_log.total)
+            self.assertEqual(["OK"] * 5, [entry.get("sig_check") for entry in audit_log.auditdata])
+            audit._get_audit_writer().stop()
+        finally:
+            self.app.config.pop("PI_AUDIT_SQL_ASYNC")
+
+    def test_05_missing_checkpoint(self):
+        for i in range(7):
+            self.Audit.log({"action": f"missing_checkpoint{i}", "user": "missing_checkpoint_user"})
+            self.Audit.finalize_log()
+        audit_log = SQLAudit(self.app.config).search({"user": "missing_checkpoint_user"}, page_size=10)
+        self.assertEqual(["OK"] * 6 + ["PENDING"], [entry.get("sig_check") for entry in audit_log.auditdata])
+        # The entries of a deleted checkpoint fail, since a later checkpoint of the chain exists
+        db.session.query(AuditCheckpoint).filter(AuditCheckpoint.first_sequence ==
+                                                 db.session.query(func.min(AuditCheckpoint.first_sequence))
+                                                 .scalar_subquery()).delete(synchronize_session=False)
+        db.session.commit()
+        audit_log = SQLAudit(self.app.config).search({"user": "missing_checkpoint_user"}, page_size=10)
+        self.assertEqual(["FAIL"] * 3 + ["OK"] * 3 + ["PENDING"],
+                         [entry.get("sig_check") for entry in audit_log.auditdata])
+        # The last entry fails, once the checkpoint interval and the grace period have passed
+        self.app.config["PI_AUDIT_SIGN_CHECKPOINT_INTERVAL"] = 10
+        try:
+            in_a_while = datetime.datetime.now() + datetime.timedelta(seconds=30)
+            with mock.patch("privacyidea.lib.auditmodules.sqlaudit._now", return_value=in_a_while):
+                audit_log = SQLAudit(self.app.config).search({"user": "missing_checkpoint_user"}, page_size=10)
+            self.assertEqual("PENDING", audit_log.auditdata[-1].get("sig_check"))
+            later = datetime.datetime.now() + datetime.timedelta(seconds=80)
+            with mock.patch("privacyidea.lib.auditmodules.sqlaudit._now", return_value=later):
+                audit_log = SQLAudit(self.app.config).search({"user": "missing_checkpoint_user"}, page_size=10)
+            self.assertEqual("FAIL", audit_log.auditdata[-1].get("sig_check"))
+        finally:
+            self.app.config["PI_AUDIT_SIGN_CHECKPOINT_INTERVAL"] = 0
+
+
 class AuditFileTestCase(OverrideConfigTestCase):
     class Config(TestingConfig):
         # this needs to exist on app creation
@@ -32,6 +32,7 @@ contract check, the version-gate behaviour) run unconditionally.
 """
 import json
 import os
+import time
 import unittest
 from contextlib import contextmanager
 from datetime import timedelta
@@ -43,6 +44,7 @@ import redis as redis_lib
 from .base import MyTestCase
 from privacyidea.lib.cache import redis as redis_cache
 from privacyidea.lib.cache.redis import (
+    CacheState,
     ChallengeDTO,
     _deserialize,
     _SERIAL_KEY,
@@ -1328,3 +1330,255 @@ class TestRedisKeyNames(MyTestCase):
 
     def test_serial_key_format(self):
         self.assertEqual('pi:challenge:serial:SPASS01', _SERIAL_KEY.format('SPASS01'))
+
+
+class TestConfigChangeListener(MyTestCase):
+    """The config change listener replaces polling the config timestamp. These
+    tests use a mocked client; the pub/sub round trip is tested against a real
+    Redis in ``TestConfigChangeListenerRedis``."""
+
+    def setUp(self):
+        super().setUp()
+        from flask import current_app
+        self._config = patch.dict(current_app.config, {"PI_REDIS_CACHE_CONFIG": True})
+        self._config.start()
+
+    def tearDown(self):
+        self._config.stop()
+        get_app_local_store().pop('_config_change_listener', None)
+        super().tearDown()
+
+    def test_listener_subscribes_and_counts_changes(self):
+        from unittest.mock import MagicMock
+        from privacyidea.lib.cache.redis import (get_config_change_listener, publish_config_change,
+                                                 _CONFIG_CHANNEL)
+        client = MagicMock()
+        with redis_in_store(client):
+            listener = get_config_change_listener()
+            self.assertIsNotNone(listener)
+            self.assertIs(listener, get_config_change_listener())
+            client.pubsub.return_value.subscribe.assert_called_once()
+            self.assertIn(_CONFIG_CHANNEL, client.pubsub.return_value.subscribe.call_args.kwargs)
+            self.assertEqual(0, listener.version)
+            # A message from another worker
+            listener._on_message({"type": "message", "channel": _CONFIG_CHANNEL, "data": "4711"})
+            self.assertEqual(1, listener.version)
+            # A change of this worker is counted at once and published
+            publish_config_change()
+            self.assertEqual(2, listener.version)
+            client.publish.assert_called_once_with(_CONFIG_CHANNEL, str(os.getpid()))
+
+            # A lost subscription creates a new listener
+            thread = MagicMock()
+            listener._on_error(redis_lib.exceptions.ConnectionError("gone"), None, thread)
+            thread.stop.assert_called_once()
+            self.assertFalse(listener.connected)
+            new_listener = get_config_change_listener()
+            self.assertIsNot(listener, new_listener)
+            self.assertEqual(0, new_listener.version)
+
+    def test_listener_unavailable(self):
+        from unittest.mock import MagicMock
+        from flask import current_app
+        from privacyidea.lib.cache.redis import get_config_change_listener, publish_config_change
+        client = MagicMock()
+        client.pubsub.return_value.subscribe.side_effect = redis_lib.exceptions.ConnectionError("down")
+        with redis_in_store(client):
+            self.assertIsNone(get_config_change_listener())
+            # The failure starts the cooldown
+            self.assertGreater(get_app_local_store().get('_redis_retry_after', 0), 0)
+        # Without the feature flag no listener is used and nothing is published
+        client = MagicMock()
+        with redis_in_store(client), patch.dict(current_app.config, {"PI_REDIS_CACHE_CONFIG": False}):
+            self.assertIsNone(get_config_change_listener())
+            publish_config_change()
+            client.publish.assert_not_called()
+
+
+class TestConfigChangeListenerRedis(_RealRedisBase):
+
+    def test_config_change_is_received(self):
+        import time as _time
+        from flask import current_app
+        from privacyidea.lib.cache.redis import _CONFIG_CHANNEL, get_config_change_listener
+        with redis_in_store(self._real_client), patch.dict(current_app.config, {"PI_REDIS_CACHE_CONFIG": True}):
+            listener = get_config_change_listener()
+            try:
+                self.assertTrue(listener.connected)
+                # Another worker publishes a change
+                self._real_client.publish(_CONFIG_CHANNEL, "4711")
+                deadline = _time.monotonic() + 5
+                while listener.version == 0 and _time.monotonic() < deadline:
+                    _time.sleep(0.05)
+                self.assertEqual(1, listener.version)
+            finally:
+                listener.stop()
+                get_app_local_store().pop('_config_change_listener', None)
+
+
+# -----------------------------------------------------------------------------
+# Shared resolver lookups
+# -----------------------------------------------------------------------------
+
+
+class TestResolverLookupCache(MyTestCase):
+    """The LDAP resolvers share their user lookups via Redis if PI_REDIS_CACHE_USERS
+    is set. The client is a mock backed by a dict."""
+
+    def setUp(self):
+        super().setUp()
+        from flask import current_app
+        self._config = patch.dict(current_app.config, {"PI_REDIS_CACHE_USERS": True})
+        self._config.start()
+
+    def tearDown(self):
+        self._config.stop()
+        super().tearDown()
+
+    @staticmethod
+    def _dict_client():
+        from unittest.mock import MagicMock
+        client = MagicMock()
+        client.entries = {}
+        client.get.side_effect = client.entries.get
+        client.set.side_effect = lambda key, value, ex: client.entries.__setitem__(key, value)
+        client.sadd.side_effect = lambda key, member: client.entries.setdefault(key, set()).add(member)
+        client.smembers.side_effect = lambda key: set(client.entries.get(key, set()))
+        client.unlink.side_effect = lambda key: client.entries.pop(key, None)
+        # The commands of a pipeline are applied right away
+        client.pipeline.return_value = client
+        return client
+
+    def test_lookup_round_trip(self):
+        from privacyidea.lib.cache.redis import cache_resolver_lookup, get_resolver_lookup_from_cache
+        client = self._dict_client()
+        with redis_in_store(client):
+            self.assertEqual(CacheState.MISS, get_resolver_lookup_from_cache("reso1", "4711", "getUserId", "bob"))
+            cache_resolver_lookup("reso1", "4711", "getUserId", "bob", "1000", 1700000000.5, 120)
+            client.set.assert_called_once()
+            self.assertEqual("pi:resolver:reso1:4711:getUserId:bob", client.set.call_args.args[0])
+            self.assertEqual(120, client.set.call_args.kwargs["ex"])
+            # The key is indexed for the eviction of the resolver
+            self.assertEqual({"pi:resolver:reso1:4711:getUserId:bob"}, client.entries["pi:resolver_keys:reso1"])
+            client.expire.assert_any_call("pi:resolver_keys:reso1", 120, gt=True)
+            self.assertEqual(("1000", 1700000000.5),
+                             get_resolver_lookup_from_cache("reso1", "4711", "getUserId", "bob"))
+            # Another config of the resolver uses another namespace
+            self.assertEqual(CacheState.MISS, get_resolver_lookup_from_cache("reso1", "0815", "getUserId", "bob"))
+
+            # Values which can not be stored as JSON stay in the per-process cache only
+            cache_resolver_lookup("reso1", "4711", "get_user_info", "1000", {"photo": b"\x00"}, 1700000000, 120)
+            self.assertEqual(1, client.set.call_count)
+
+            # A malformed entry is not used
+            client.entries["pi:resolver:reso1:4711:_getDN:1000"] = "not json"
+            self.assertEqual(CacheState.UNAVAILABLE,
+                             get_resolver_lookup_from_cache("reso1", "4711", "_getDN", "1000"))
+
+    def test_lookup_degrades_without_redis(self):
+        from flask import current_app
+        from privacyidea.lib.cache.redis import cache_resolver_lookup, get_resolver_lookup_from_cache
+        client = self._dict_client()
+        client.get.side_effect = redis_lib.exceptions.ConnectionError("down")
+        with redis_in_store(client):
+            self.assertEqual(CacheState.UNAVAILABLE,
+                             get_resolver_lookup_from_cache("reso1", "4711", "getUserId", "bob"))
+            # The failure starts the cooldown
+            self.assertGreater(get_app_local_store().get('_redis_retry_after', 0), 0)
+        # Without the feature flag Redis is not used at all
+        client = self._dict_client()
+        with redis_in_store(client), patch.dict(current_app.config, {"PI_REDIS_CACHE_USERS": False}):
+            cache_resolver_lookup("reso1", "4711", "getUserId", "bob", "1000", 1700000000, 120)
+            self.assertEqual(CacheState.UNAVAILABLE,
+                             get_resolver_lookup_from_cache("reso1", "4711", "getUserId", "bob"))
+            client.set.assert_not_called()
+            client.get.assert_not_called()
+
+    def test_evict_resolver_lookups(self):
+        from privacyidea.lib.cache.redis import cache_resolver_lookup, evict_resolver_lookups
+        client = self._dict_client()
+        with redis_in_store(client):
+            cache_resolver_lookup("reso*1", "4711", "getUserId", "bob", "1000", 1700000000, 120)
+            cache_resolver_lookup("reso*1", "0815", "_getDN", "1000", "cn=bob", 1700000000, 120)
+            cache_resolver_lookup("reso2", "4711", "getUserId", "bob", "1000", 1700000000, 120)
+            evict_resolver_lookups("reso*1")
+        # Only the lookups of the resolver and its index are removed, without a scan of the key space
+        self.assertEqual({"pi:resolver:reso2:4711:getUserId:bob", "pi:resolver_keys:reso2"}, set(client.entries))
+        client.scan_iter.assert_not_called()
+
+
+class TestResolverAuthHeaderCache(MyTestCase):
+    """The HTTP resolvers share the authorization header of their service account
+    via Redis if PI_REDIS_CACHE_RESOLVER_AUTH is set."""
+
+    def setUp(self):
+        super().setUp()
+        from flask import current_app
+        self._config = patch.dict(current_app.config, {"PI_REDIS_CACHE_RESOLVER_AUTH": True})
+        self._config.start()
+
+    def tearDown(self):
+        self._config.stop()
+        super().tearDown()
+
+    def test_auth_header_round_trip(self):
+        from privacyidea.lib.cache.redis import (cache_resolver_auth_header, evict_resolver_auth_header,
+                                                 get_resolver_auth_header_from_cache)
+        client = TestResolverLookupCache._dict_client()
+        header = {"Authorization": "Bearer 12345"}
+        expires_at = time.time() + 100
+        with redis_in_store(client):
+            self.assertEqual(CacheState.MISS, get_resolver_auth_header_from_cache("reso1:abc"))
+            cache_resolver_auth_header("reso1:abc", header, expires_at)
+            key, payload = client.set.call_args.args
+            self.assertEqual("pi:resolver_auth:reso1:abc", key)
+            self.assertLessEqual(client.set.call_args.kwargs["ex"], 100)
+            # The access token is stored encrypted
+            self.assertNotIn("12345", payload)
+            self.assertEqual((header, expires_at), get_resolver_auth_header_from_cache("reso1:abc"))
+
+            # An expired header is neither stored nor used
+            cache_resolver_auth_header("reso1:def", header, time.time() - 1)
+            self.assertEqual(1, client.set.call_count)
+            client.entries["pi:resolver_auth:reso1:def"] = json.dumps(
+                {"header": json.loads(payload)["header"], "expires_at": time.time() - 1})
+            self.assertEqual(CacheState.MISS, get_resolver_auth_header_from_cache("reso1:def"))
+
+            # A malformed entry is not used
+            client.entries["pi:resolver_auth:reso1:ghi"] = json.dumps({"header": "garbage", "expires_at": expires_at})
+            self.assertEqual(CacheState.UNAVAILABLE, get_resolver_auth_header_from_cache("reso1:ghi"))
+
+            evict_resolver_auth_header("reso1:abc")
+            client.unlink.assert_called_once_with("pi:resolver_auth:reso1:abc")
+
+
+class TestTokenUsersCache(MyTestCase):
+    """The subscription check shares the number of users with active tokens via Redis
+    if PI_REDIS_CACHE_SUBSCRIPTION is set."""
+
+    def setUp(self):
+        super().setUp()
+        from flask import current_app
+        self._config = patch.dict(current_app.config, {"PI_REDIS_CACHE_SUBSCRIPTION": True})
+        self._config.start()
+
+    def tearDown(self):
+        self._config.stop()
+        super().tearDown()
+
+    def test_token_users_round_trip(self):
+        from privacyidea.lib.cache.redis import cache_token_users, evict_token_users, get_token_users_from_cache
+        client = TestResolverLookupCache._dict_client()
+        with redis_in_store(client):
+            self.assertEqual(CacheState.MISS, get_token_users_from_cache())
+            cache_token_users(42, 1700000000.5, 300)
+            self.assertEqual("pi:subscription:token_users", client.set.call_args.args[0])
+            self.assertEqual(300, client.set.call_args.kwargs["ex"])
+            self.assertEqual((42, 1700000000.5), get_token_users_from_cache())
+
+            # A malformed entry is not used
+            client.entries["pi:subscription:token_users"] = "not json"
+            self.assertEqual(CacheState.UNAVAILABLE, get_token_users_from_cache())
+
+            evict_token_users()
+            client.unlink.assert_called_once_with("pi:subscription:token_users")
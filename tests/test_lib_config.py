@@ -4,6 +4,9 @@ This test file tests the lib.config
 The lib.config only depends on the database model.
 """
 import importlib
+from datetime import datetime, timedelta
+
+import mock
 
 from privacyidea.lib.config import (get_resolver_list,
                                     get_resolver_classes,
@@ -24,11 +27,13 @@ from privacyidea.lib.config import (get_resolver_list,
                                     this, get_config_object, invalidate_config_object,
                                     get_multichallenge_enrollable_types,
                                     get_email_validators,
-                                    check_node_uuid_exists)
+                                    check_node_uuid_exists, SharedConfigClass)
 from privacyidea.lib.resolvers.PasswdIdResolver import IdResolver as PWResolver
 from privacyidea.lib.tokens.hotptoken import HotpTokenClass
 from privacyidea.lib.tokens.totptoken import TotpTokenClass
-from privacyidea.models import Config, save_config_timestamp, db, NodeName
+from privacyidea.models import (Config, save_config_timestamp, db, NodeName, PRIVACYIDEA_TIMESTAMP,
+                                ConfigSection)
+from privacyidea.models.config import CONFIG_SECTIONS
 from .base import MyTestCase
 
 
@@ -314,3 +319,72 @@ class ConfigTestCase(MyTestCase):
         import_config({"ExpSecret": {"Value": CENSORED, "Type": "password"}})
         self.assertEqual(get_from_config("ExpSecret"), "topsecret")
         delete_privacyidea_config("ExpSecret")
+
+    def test_13_config_change_listener(self):
+        listener = mock.Mock(version=0)
+        shared_config = SharedConfigClass()
+        with mock.patch("privacyidea.lib.config.get_config_change_listener", return_value=listener):
+            shared_config._reload_from_db()
+            self.assertIsNotNone(shared_config.timestamp)
+            # Another worker changes the config
+            db.session.add(Config(Key="listener_key", Value="v1"))
+            save_config_timestamp(False)
+            # The timestamp in the database is not checked, as no change was announced
+            with mock.patch("privacyidea.lib.config.reload_db") as mock_reload_db:
+                shared_config._reload_from_db()
+                mock_reload_db.assert_not_called()
+            self.assertNotIn("listener_key", shared_config.config)
+            # The change is announced
+            listener.version = 1
+            shared_config._reload_from_db()
+            self.assertEqual("v1", shared_config.config["listener_key"]["Value"])
+            # A lost announcement is noticed after PI_REDIS_CONFIG_RECHECK seconds
+            shared_config.timestamp -= timedelta(seconds=61)
+            with mock.patch("privacyidea.lib.config.reload_db", return_value=False) as mock_reload_db:
+                shared_config._reload_from_db()
+                mock_reload_db.assert_called_once()
+            # A new listener may have missed announcements
+            shared_config.timestamp += timedelta(seconds=61)
+            with mock.patch("privacyidea.lib.config.get_config_change_listener",
+                            return_value=mock.Mock(version=0)):
+                timestamp = shared_config.timestamp
+                shared_config._reload_from_db()
+                self.assertNotEqual(timestamp, shared_config.timestamp)
+        delete_privacyidea_config("listener_key")
+
+    def test_14_reload_changed_sections(self):
+        from privacyidea.lib.policy import set_policy, delete_policy, SCOPE
+        shared_config = SharedConfigClass()
+        shared_config._reload_from_db()
+        self.assertEqual(set(CONFIG_SECTIONS), set(shared_config.section_timestamps))
+        # The section timestamps are no config entries
+        self.assertFalse([key for key in shared_config.config if key.startswith(f"{PRIVACYIDEA_TIMESTAMP}.")])
+        resolvers = shared_config.resolver
+        set_policy("section_policy", scope=SCOPE.AUTH, action="otppin=none")
+        with mock.patch.object(SharedConfigClass, "_load_resolvers") as mock_resolvers, \
+                mock.patch.object(SharedConfigClass, "_load_caconnectors") as mock_caconnectors, \
+                mock.patch.object(SharedConfigClass, "_load_config") as mock_config:
+            shared_config._reload_from_db()
+            mock_resolvers.assert_not_called()
+            mock_caconnectors.assert_not_called()
+            mock_config.assert_not_called()
+        # Only the policies are reloaded
+        self.assertIn("section_policy", [policy.get("name") for policy in shared_config.policies])
+        self.assertIs(resolvers, shared_config.resolver)
+        self.assertEqual(get_from_config(PRIVACYIDEA_TIMESTAMP), shared_config.config[PRIVACYIDEA_TIMESTAMP]["Value"])
+
+        # A resolver change also reloads the realms
+        with mock.patch.object(SharedConfigClass, "_load_realms", return_value=({}, None)) as mock_realms:
+            save_config_timestamp(section=ConfigSection.RESOLVER)
+            shared_config._reload_from_db()
+            mock_realms.assert_called_once()
+        shared_config._reload_from_db()
+
+        # An older version of privacyIDEA only updates the global timestamp
+        db_timestamp = db.session.get(Config, PRIVACYIDEA_TIMESTAMP)
+        db_timestamp.Value = str(datetime.now().timestamp() + 1)
+        db.session.commit()
+        with mock.patch.object(SharedConfigClass, "_load_caconnectors", return_value=[]) as mock_caconnectors:
+            shared_config._reload_from_db()
+            mock_caconnectors.assert_called_once()
+        delete_policy("section_policy")
@@ -4,7 +4,7 @@ This test file tests the lib.crypto and lib.security.default
 import base64
 
 from cryptography.exceptions import InvalidSignature
-from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey, Ed25519PrivateKey
 from cryptography.hazmat.primitives.asymmetric.ed448 import Ed448PublicKey, Ed448PrivateKey
@@ -12,6 +12,8 @@ from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X
 from cryptography.hazmat.primitives.asymmetric.x448 import X448PublicKey, X448PrivateKey
 from mock import call
 import binascii
+import os
+import tempfile
 
 from privacyidea.config import TestingConfig
 from privacyidea.lib.error import HSMException, ParameterError
@@ -26,7 +28,8 @@ from privacyidea.lib.crypto import (encryptPin, encryptPassword, decryptPin,
                                     encrypt, decrypt, Sign, generate_keypair,
                                     generate_password, pass_hash, verify_pass_hash, generate_keypair_ecc,
                                     ecc_key_pair_to_b64url_str, b64url_str_key_pair_to_ecc_obj, sign_ecc,
-                                    ecdh_key_exchange, encrypt_aes, decrypt_aes, verify_ecc)
+                                    ecdh_key_exchange, encrypt_aes, decrypt_aes, verify_ecc,
+                                    get_sign_object, get_sign_key_cache_stats, SIGNATURE_ALGORITHMS)
 from privacyidea.lib.utils import to_bytes, to_unicode
 from privacyidea.lib.security.default import (SecurityModule,
                                               DefaultSecurityModule)
@@ -891,6 +894,70 @@ class SignObjectTestCase(MyTestCase):
         long_data = b'\x01\x02' * 5000
         self.assertTrue(so.verify(long_data, long_data_sig, verify_old_sigs=True))
 
+    def test_02_sign_key_cache(self):
+        priv_file = current_app.config.get("PI_AUDIT_KEY_PRIVATE")
+        pub_file = current_app.config.get("PI_AUDIT_KEY_PUBLIC")
+        stats = get_sign_key_cache_stats()
+        so = get_sign_object(priv_file, pub_file)
+        # The same object is returned as long as the key files do not change
+        self.assertIs(so, get_sign_object(priv_file, pub_file))
+        new_stats = get_sign_key_cache_stats()
+        self.assertEqual(new_stats["hits"], stats["hits"] + 1)
+        self.assertGreaterEqual(new_stats["entries"], 1)
+        data = 'short text'
+        self.assertTrue(so.verify(data, so.sign(data)))
+        # A different set of key files is cached separately
+        so_priv = get_sign_object(priv_file)
+        self.assertIsNot(so, so_priv)
+        self.assertIsNone(so_priv.public)
+        self.assertEqual(get_sign_key_cache_stats()["misses"], new_stats["misses"] + 1)
+
+        # The keys are read again if the key file changes
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_priv = os.path.join(tmp_dir, "private.pem")
+            with open(priv_file, "rb") as src, open(tmp_priv, "wb") as dst:
+                dst.write(src.read())
+            so_tmp = get_sign_object(tmp_priv)
+            self.assertIs(so_tmp, get_sign_object(tmp_priv))
+            stat_result = os.stat(tmp_priv)
+            os.utime(tmp_priv, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1000000000))
+            self.assertIsNot(so_tmp, get_sign_object(tmp_priv))
+            # a missing key file raises an error
+            os.remove(tmp_priv)
+            self.assertRaises(OSError, get_sign_object, tmp_priv)
+
+    def test_03_sign_and_verify_ecdsa_and_ed25519(self):
+        with open(current_app.config.get("PI_AUDIT_KEY_PRIVATE"), 'rb') as f:
+            rsa_priv_key = f.read()
+        with open(current_app.config.get("PI_AUDIT_KEY_PUBLIC"), 'rb') as f:
+            rsa_pub_key = f.read()
+        rsa_so = Sign(rsa_priv_key, rsa_pub_key)
+        self.assertEqual(['rsa_sha256_pss', 'ecdsa_sha256', 'ed25519'], list(SIGNATURE_ALGORITHMS))
+        for private_key, sig_ver in [(ec.generate_private_key(ec.SECP256R1()), 'ecdsa_sha256'),
+                                     (Ed25519PrivateKey.generate(), 'ed25519')]:
+            priv_pem = private_key.private_bytes(encoding=serialization.Encoding.PEM,
+                                                 format=serialization.PrivateFormat.PKCS8,
+                                                 encryption_algorithm=serialization.NoEncryption())
+            pub_pem = private_key.public_key().public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo)
+            so = Sign(priv_pem, pub_pem)
+            self.assertEqual(so.sig_ver, sig_ver)
+            self.assertEqual(Sign(public_key=pub_pem).sig_ver, sig_ver)
+            data = 'short text'
+            sig = so.sign(data)
+            self.assertTrue(sig.startswith(sig_ver + ':'), sig)
+            self.assertTrue(so.verify(data, sig))
+            self.assertTrue(Sign(public_key=pub_pem).verify(data, sig))
+            self.assertFalse(so.verify('other text', sig))
+            # signatures of another algorithm can not be verified with this key and vice versa
+            self.assertFalse(so.verify(data, rsa_so.sign(data)))
+            self.assertFalse(rsa_so.verify(data, sig))
+            self.assertFalse(so.verify(data, '15197717811878792093921885389298262311', verify_old_sigs=True))
+            # the private and public key need to match in type
+            with self.assertRaises(TypeError):
+                Sign(priv_pem, rsa_pub_key)
+
 
 class DefaultHashAlgoListTestCase(MyTestCase):
     """Check if the default hash algorithm list is used."""
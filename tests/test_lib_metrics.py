@@ -8,6 +8,7 @@ from sqlalchemy import select
 
 from privacyidea.lib import metrics
 from privacyidea.lib.metrics import (
+    CounterBuffer,
     _BUCKETS,
     _labels_key,
     _parse_labels_key,
@@ -15,6 +16,7 @@ from privacyidea.lib.metrics import (
     _utc_now,
     _window_start,
     cleanup_old_metrics,
+    gauge,
     get_metrics,
     inc,
     observe,
@@ -201,6 +203,50 @@ class ObserveTest(MyTestCase):
         self.assertEqual(counts, sorted(counts))
 
 
+class GaugeTest(MyTestCase):
+    """``gauge`` records the level without histogram buckets."""
+
+    def setUp(self):
+        _wipe_metrics()
+
+    def test_average_and_peak(self):
+        gauge("test_gauge", 10, {"resolver": "ldap1"})
+        gauge("test_gauge", 30, {"resolver": "ldap1"})
+        results = get_metrics(name="test_gauge")
+        self.assertEqual(results[0]["count"], 2)
+        self.assertAlmostEqual(results[0]["avg"], 20)
+        self.assertAlmostEqual(results[0]["max"], 30)
+        # A level is no timing, so it is not counted in the buckets.
+        row = db.session.execute(
+            select(MetricAggregate).where(MetricAggregate.metric_name == "test_gauge")
+        ).scalar_one()
+        for _, col in _BUCKETS:
+            self.assertEqual(getattr(row, col), 0)
+        self.assertIsNone(results[0]["p95"])
+
+
+class CounterBufferTest(MyTestCase):
+    """``CounterBuffer`` writes its counts at most once per interval."""
+
+    def setUp(self):
+        _wipe_metrics()
+
+    def test_counts_are_written_once_per_interval(self):
+        counters = CounterBuffer(interval=60)
+        with patch.object(metrics.time, "monotonic", return_value=counters._flushed_at + 30):
+            for _ in range(5):
+                self.assertFalse(counters.inc("buffered_counter", {"result": "hit"}))
+            self.assertFalse(counters.inc("buffered_counter", {"result": "miss"}, by=2))
+        self.assertEqual(get_metrics(name="buffered_counter"), [])
+
+        # The first increment after the interval writes one row update per label set.
+        with patch.object(metrics.time, "monotonic", return_value=counters._flushed_at + 61):
+            self.assertTrue(counters.inc("buffered_counter", {"result": "hit"}))
+        results = {r["labels"]["result"]: r["count"] for r in get_metrics(name="buffered_counter")}
+        self.assertEqual(results, {"hit": 6, "miss": 2})
+        self.assertFalse(counters.inc("buffered_counter", {"result": "hit"}))
+
+
 class CrossWindowAndNodeAggregationTest(MyTestCase):
     """Reads fold across nodes and 5-minute windows."""
 
@@ -3,18 +3,23 @@ This test file tests the lib.policy.py
 
 The lib.policy.py only depends on the database model.
 """
+import copy
 import re
+from datetime import datetime
 
 import dateutil
 import mock
+from netaddr import AddrFormatError
 from werkzeug.datastructures.headers import Headers, EnvironHeaders
 
 from privacyidea.lib.auditmodules.base import Audit
 from privacyidea.lib.auth import ROLE
+from privacyidea.lib.config import LocalConfigClass
 from privacyidea.lib.container import init_container, find_container_by_serial
 from privacyidea.lib.containers.container_info import RegistrationState, TokenContainerInfoData
 from privacyidea.lib.error import ParameterError, PrivacyIDEAError
 from privacyidea.lib.policies.actions import PolicyAction
+from privacyidea.lib.policies.index import PolicyIndex
 from privacyidea.lib.policies.conditions import (PolicyConditionClass, ConditionSection,
                                                  ConditionHandleMissingData)
 from privacyidea.lib.policy import (set_policy, delete_policy, delete_policies,
@@ -2023,9 +2028,9 @@ class PolicyTestCase(MyTestCase):
             policy_class.match_policies(user_object=user, serial=token.get_serial())
 
         # Compare Error
-        token.set_tokeninfo({"count_auth": "invalid_count"})
+        token.set_tokeninfo({"count_custom": "invalid_count"})
         set_policy("policy", scope=SCOPE.USER, action=PolicyAction.SETPIN,
-                   conditions=[(ConditionSection.TOKENINFO, "count_auth", PrimaryComparators.BIGGER, "3", True,
+                   conditions=[(ConditionSection.TOKENINFO, "count_custom", PrimaryComparators.BIGGER, "3", True,
                                 ConditionHandleMissingData.RAISE_ERROR.value)])
         self.assertRaises(PolicyError, policy_class.match_policies, user_object=user, serial=token.get_serial())
 
@@ -2085,9 +2090,9 @@ class PolicyTestCase(MyTestCase):
         self.assertEqual(0, len(policies))
 
         # Compare Error still raises error
-        token.set_tokeninfo({"count_auth": "three"})
+        token.set_tokeninfo({"count_custom": "three"})
         set_policy("policy", scope=SCOPE.USER, action=PolicyAction.SETPIN,
-                   conditions=[(ConditionSection.TOKENINFO, "count_auth", PrimaryComparators.SMALLER, "3", True,
+                   conditions=[(ConditionSection.TOKENINFO, "count_custom", PrimaryComparators.SMALLER, "3", True,
                                 ConditionHandleMissingData.IS_FALSE.value)])
         self.assertRaises(PolicyError, policy_class.match_policies, user_object=user, serial=token.get_serial())
 
@@ -2632,6 +2637,93 @@ class PolicyTestCase(MyTestCase):
         db.session.delete(node1)
         db.session.delete(node2)
 
+    def test_58_match_policies_of_request_are_cached(self):
+        set_policy(name="otppin", scope=SCOPE.AUTH, action=f"{PolicyAction.OTPPIN}=none")
+        g = FakeFlaskG()
+        g.policy_object = PolicyClass()
+        g.audit_object = FakeAudit()
+        with mock.patch.object(PolicyClass, "list_policies", autospec=True,
+                               side_effect=PolicyClass.list_policies) as mock_list:
+            for _ in range(3):
+                self.assertEqual({"none": ["otppin"]},
+                                 Match.action_only(g, scope=SCOPE.AUTH,
+                                                   action=PolicyAction.OTPPIN).action_values(unique=True))
+            self.assertEqual(1, mock_list.call_count)
+            # The policies are written to the audit log once
+            self.assertEqual(["otppin"], g.audit_object.audit_data.get("policies"))
+            # A different context is matched again
+            Match.action_only(g, scope=SCOPE.AUTH, action=PolicyAction.PASSTHRU).any()
+            self.assertEqual(2, mock_list.call_count)
+            # Changed policies are matched again
+            set_policy(name="otppin", scope=SCOPE.AUTH, action=f"{PolicyAction.OTPPIN}=userstore")
+            self.assertEqual({"userstore": ["otppin"]},
+                             Match.action_only(g, scope=SCOPE.AUTH,
+                                               action=PolicyAction.OTPPIN).action_values(unique=True))
+            self.assertEqual(3, mock_list.call_count)
+        delete_policy("otppin")
+
+
+class PolicyIndexTestCase(MyTestCase):
+
+    @staticmethod
+    def _policy(name, scope=SCOPE.AUTH, action=None, realm=None, user=None, client=None, priority=1,
+                user_case_insensitive=False):
+        return {"name": name, "scope": scope, "active": True, "action": action or {}, "realm": realm or [],
+                "user": user or [], "client": client or [], "resolver": [], "adminrealm": [], "adminuser": [],
+                "pinode": [], "user_agents": [], "check_all_resolvers": False, "time": "", "conditions": [],
+                "priority": priority, "user_case_insensitive": user_case_insensitive}
+
+    def test_01_index_matches_linear_search(self):
+        policies = [
+            self._policy("generic"),
+            self._policy("otppin", action={"otppin": "userstore"}, realm=["realm1"], priority=2),
+            self._policy("wildcard_realm", action={"otppin": "none"}, realm=["*"]),
+            self._policy("regex_realm", action={"passthru": True}, realm=["realm.*"]),
+            self._policy("excluded_user", action={"passthru": True}, user=["*", "!alice"]),
+            self._policy("ci_user", action={"passthru": True}, user=["Bob"], user_case_insensitive=True),
+            self._policy("cs_user", action={"passthru": True}, user=["Bob"]),
+            self._policy("client", action={"otppin": "none"}, client=["10.0.0.0/8", "!10.0.0.1"]),
+            self._policy("admin", scope=SCOPE.ADMIN, action={"enable": True}, realm=["realm2"]),
+            self._policy("regex_action", action={"pass.*": True}),
+        ]
+        queries = [{}, {"scope": SCOPE.AUTH}, {"scope": SCOPE.ADMIN}, {"name": "otppin"},
+                   {"scope": SCOPE.AUTH, "action": "otppin"}, {"scope": SCOPE.AUTH, "action": "passthru"},
+                   {"scope": SCOPE.AUTH, "action": "passthru", "realm": "realm1", "user": "bob"},
+                   {"scope": SCOPE.AUTH, "action": "passthru", "realm": "realm3", "user": "Bob"},
+                   {"scope": SCOPE.AUTH, "action": "passthru", "user": "alice"},
+                   {"scope": SCOPE.AUTH, "realm": "", "user": ""},
+                   {"scope": SCOPE.AUTH, "realm": "realm1", "additional_realms": ["realm2"]},
+                   {"scope": SCOPE.AUTH, "action": "otppin", "client": "10.0.0.1"},
+                   {"scope": SCOPE.AUTH, "action": "otppin", "client": "10.0.0.2"},
+                   {"scope": SCOPE.AUTH, "action": "otppin", "client": "192.168.0.1"},
+                   {"scope": SCOPE.ADMIN, "action": "enable", "realm": "realm2"}]
+        index = PolicyIndex(policies)
+        for query in queries:
+            results = []
+            for policy_index in (index, None):
+                config_object = LocalConfigClass({}, {}, {}, None, policies, [], [], datetime.now(),
+                                                 policy_index=policy_index)
+                with mock.patch("privacyidea.lib.policy.get_config_object", return_value=config_object):
+                    results.append([p.get("name") for p in
+                                    PolicyClass().list_policies(**copy.deepcopy(query))])
+            self.assertEqual(results[0], results[1], query)
+
+        # The index only returns candidates, which are filtered by list_policies
+        self.assertEqual(["generic", "otppin", "wildcard_realm", "client", "regex_action"],
+                         [p.get("name") for p in index.candidates(scope=SCOPE.AUTH, action="otppin")])
+        self.assertEqual(["admin"], [p.get("name") for p in index.candidates(name="admin")])
+        self.assertEqual([], index.candidates(scope="unknown"))
+        self.assertEqual(len(policies), len(index.candidates()))
+
+    def test_02_client_networks(self):
+        index = PolicyIndex([self._policy("client", client=["10.0.0.0/8", "-10.0.0.1", ""]),
+                             self._policy("invalid", client=["10.0.0.300"])])
+        self.assertEqual((True, False), index.check_client("10.1.2.3", index.policies[0]))
+        self.assertEqual((True, True), index.check_client("10.0.0.1", index.policies[0]))
+        self.assertEqual((False, False), index.check_client("192.168.0.1", index.policies[0]))
+        # An invalid client definition fails when it is matched, as without the index
+        self.assertRaises(AddrFormatError, index.check_client, "10.0.0.1", index.policies[1])
+
 
 class PolicyConditionClassTestCase(MyTestCase):
 
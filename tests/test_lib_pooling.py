@@ -8,7 +8,8 @@ from sqlalchemy import create_engine
 
 from privacyidea.app import create_app
 from privacyidea.lib.auth import create_db_admin
-from privacyidea.lib.pooling import get_engine, get_registry, SharedEngineRegistry, NullEngineRegistry
+from privacyidea.lib.pooling import (get_engine, get_registry, SharedEngineRegistry, NullEngineRegistry,
+                                    release_engine, get_pool_stats, _dispose_engines_after_fork)
 from privacyidea.models import db, save_config_timestamp
 from .base import MyTestCase
 
@@ -47,6 +48,28 @@ class SharedPoolingTestCase(MyTestCase):
         engine3 = get_engine('my other engine', self._create_engine)
         self.assertIsNot(engine1, engine3)
 
+    def test_03_release_and_fingerprint(self):
+        engine1 = get_engine('pooled engine', self._create_engine, ('sqlite://', 1))
+        pool = engine1.pool
+        # releasing the engine keeps the pool
+        release_engine(engine1)
+        engine2 = get_engine('pooled engine', self._create_engine, ('sqlite://', 1))
+        self.assertIs(engine1, engine2)
+        self.assertIs(engine2.pool, pool)
+        stats = get_pool_stats()
+        self.assertIn('pooled engine', stats)
+        self.assertIn('pool_class', stats['pooled engine'])
+        self.assertIn('status', stats['pooled engine'])
+        # a changed configuration replaces the engine
+        engine3 = get_engine('pooled engine', self._create_engine, ('sqlite://', 2))
+        self.assertIsNot(engine1, engine3)
+        self.assertIs(engine3, get_engine('pooled engine', self._create_engine, ('sqlite://', 2)))
+        # after a fork the engine is kept, but it gets a new pool
+        pool = engine3.pool
+        _dispose_engines_after_fork()
+        self.assertIs(engine3, get_engine('pooled engine', self._create_engine, ('sqlite://', 2)))
+        self.assertIsNot(engine3.pool, pool)
+
 
 class NullPoolingTestCase(MyTestCase):
     """ Test Null pooling. This is the default in the testing configuration. """
@@ -68,3 +91,11 @@ class NullPoolingTestCase(MyTestCase):
         self.assertIsNot(engine1, engine2)
         self.assertIsNot(engine1, engine3)
         self.assertIsNot(engine2, engine3)
+
+    def test_03_release_engine(self):
+        # the engine of the request is disposed when it is released
+        engine = get_engine('my engine', self._create_engine)
+        pool = engine.pool
+        release_engine(engine)
+        self.assertIsNot(engine.pool, pool)
+        self.assertEqual(get_pool_stats(), {})
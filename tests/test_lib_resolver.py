@@ -16,6 +16,8 @@ import logging
 import shutil
 import ssl
 import tempfile
+import threading
+import time
 import uuid
 from contextlib import contextmanager
 
@@ -29,6 +31,8 @@ from testfixtures import LogCapture
 
 from privacyidea.lib.crypto import encryptPassword
 from privacyidea.lib.error import ParameterError, ResolverError
+from privacyidea.lib.framework import get_app_local_store, get_request_local_store
+from privacyidea.lib.lifecycle import call_finalizers
 from privacyidea.lib.realm import (set_realm, delete_realm)
 from privacyidea.lib.resolver import (save_resolver,
                                       delete_resolver,
@@ -42,7 +46,7 @@ from privacyidea.lib.resolvers.EntraIDResolver import (CLIENT_ID, TENANT, CLIENT
 from privacyidea.lib.resolvers.HTTPResolver import (HEADERS, METHOD, ENDPOINT, EDITABLE, CONFIG_GET_USER_BY_NAME,
                                                     HTTPMethod, CONFIG_GET_USER_BY_ID, ADVANCED)
 from privacyidea.lib.resolvers.LDAPIdResolver import IdResolver as LDAPResolver, LockingServerPool
-from privacyidea.lib.resolvers.LDAPIdResolver import (CACHE, SERVERPOOL_ROUNDS, SERVERPOOL_SKIP)
+from privacyidea.lib.resolvers.LDAPIdResolver import (CACHE, SERVERPOOL_ROUNDS, SERVERPOOL_SKIP, ResolverCache)
 from privacyidea.lib.resolvers.SCIMIdResolver import IdResolver as SCIMResolver
 from privacyidea.lib.resolvers.SQLIdResolver import IdResolver as SQLResolver
 from privacyidea.lib.resolvers.UserIdResolver import UserIdResolver
@@ -3144,6 +3148,267 @@ class LDAPResolverTestCase(MyTestCase):
         self.assertDictEqual({"1": "manager", "2": "alice", "does-not-exist": ""}, login_map)
         self.assertEqual(resolver.getUsername("2"), login_map["2"], login_map)
 
+    @ldap3mock.activate
+    def test_53_bounded_cache(self):
+        ldap3mock.setLDAPDirectory(LDAPDirectory)
+        resolver = self._get_batch_resolver(cache_timeout=120)
+        resolver.cache_size = 2
+        CACHE.pop(resolver.getResolverId(), None)
+
+        with mock.patch("privacyidea.lib.metrics.inc") as mock_inc, \
+                mock.patch("privacyidea.lib.resolvers.LDAPIdResolver.gauge") as mock_gauge:
+            for user_id in ["1", "2", "3"]:
+                resolver.get_user_info(user_id, attributes=["username"])
+            # The oldest entry is evicted to keep the cache at its maximum size
+            user_info_cache = CACHE[resolver.getResolverId()]["get_user_info"]
+            self.assertEqual(["2", "3"], list(user_info_cache.keys()))
+            # The counts are kept in memory until the next report is due
+            mock_inc.assert_not_called()
+            mock_gauge.assert_not_called()
+            user_info_cache._counters.interval = 0
+            with self._count_searches() as search_filters:
+                self.assertEqual("bob", resolver.get_user_info("3", attributes=["username"])["username"])
+            self.assertEqual(0, len(search_filters), search_filters)
+
+        self.assertEqual(1, user_info_cache.hits)
+        self.assertEqual(3, user_info_cache.misses)
+        self.assertEqual(1, user_info_cache.evictions)
+        labels = {"resolver": resolver.getResolverId(), "op": "get_user_info"}
+        mock_inc.assert_any_call("ldap_cache_lookups_total", {**labels, "result": "hit"}, by=1)
+        mock_inc.assert_any_call("ldap_cache_lookups_total", {**labels, "result": "miss"}, by=3)
+        mock_inc.assert_any_call("ldap_cache_evictions_total", labels, by=1)
+        mock_gauge.assert_called_once_with("ldap_cache_size", 2, labels)
+
+        # An expired entry is evicted when the next entry is stored
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        with mock.patch('privacyidea.lib.resolvers.LDAPIdResolver.datetime.datetime',
+                        wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = now + datetime.timedelta(seconds=121)
+            resolver.get_user_info("1", attributes=["username"])
+        self.assertEqual(["1"], list(user_info_cache.keys()))
+        self.assertEqual(3, user_info_cache.evictions)
+
+
+    @ldap3mock.activate
+    def test_54_shared_cache(self):
+        ldap3mock.setLDAPDirectory(LDAPDirectory)
+        resolver = self._get_batch_resolver(cache_timeout=120)
+        resolver.name = "reso_shared"
+        shared_entries = {}
+        client = mock.MagicMock()
+        client.get.side_effect = shared_entries.get
+        client.set.side_effect = lambda key, value, ex: shared_entries.__setitem__(key, value)
+        client.pipeline.return_value = client
+        with mock.patch("privacyidea.lib.cache.redis.redis_client_for_feature", return_value=client):
+            CACHE.pop(resolver.getResolverId(), None)
+            user_id = resolver.getUserId("alice")
+            self.assertEqual("2", user_id)
+            self.assertIn(f"pi:resolver:reso_shared:{resolver.getResolverId()}:getUserId:alice", shared_entries)
+            resolver.get_user_info(user_id, attributes=["username"])
+
+            # Another worker finds the lookups in the shared cache
+            CACHE.pop(resolver.getResolverId(), None)
+            with self._count_searches() as search_filters:
+                self.assertEqual(user_id, resolver.getUserId("alice"))
+                self.assertEqual("alice", resolver.get_user_info(user_id, attributes=["username"])["username"])
+            self.assertEqual(0, len(search_filters), search_filters)
+            # and keeps them in its per-process cache until they expire in the shared cache
+            self.assertIn("alice", CACHE[resolver.getResolverId()]["getUserId"])
+            shared_entry = json.loads(
+                shared_entries[f"pi:resolver:reso_shared:{resolver.getResolverId()}:getUserId:alice"])
+            self.assertEqual(shared_entry["timestamp"],
+                             CACHE[resolver.getResolverId()]["getUserId"]["alice"]["timestamp"].timestamp())
+
+            # Expired entries of the shared cache are not used
+            CACHE.pop(resolver.getResolverId(), None)
+            now = datetime.datetime.now(tz=datetime.timezone.utc)
+            with mock.patch('privacyidea.lib.resolvers.LDAPIdResolver.datetime.datetime',
+                            wraps=datetime.datetime) as mock_datetime:
+                mock_datetime.now.return_value = now + datetime.timedelta(seconds=121)
+                with self._count_searches() as search_filters:
+                    self.assertEqual(user_id, resolver.getUserId("alice"))
+            self.assertEqual(1, len(search_filters), search_filters)
+
+        # Without Redis the resolver asks the directory
+        CACHE.pop(resolver.getResolverId(), None)
+        with self._count_searches() as search_filters:
+            self.assertEqual(user_id, resolver.getUserId("alice"))
+        self.assertEqual(1, len(search_filters), search_filters)
+        CACHE.pop(resolver.getResolverId(), None)
+
+        # A copied entry, which expires before the entries stored earlier, is evicted first
+        bucket = ResolverCache("reso_shared", "getUserId")
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        bucket.store("bob", "3", 120, 10)
+        bucket.store("alice", "2", 120, 10, timestamp=now - datetime.timedelta(seconds=100))
+        with mock.patch('privacyidea.lib.resolvers.LDAPIdResolver.datetime.datetime',
+                        wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = now + datetime.timedelta(seconds=30)
+            self.assertIsNone(bucket.lookup("alice", 120, 10))
+            bucket.store("manager", "1", 120, 10)
+        self.assertEqual(["bob", "manager"], list(bucket.keys()))
+        self.assertEqual(1, bucket.evictions)
+
+    @ldap3mock.activate
+    def test_55_coalesced_lookups_and_negative_cache(self):
+        from privacyidea.lib.resolvers.LDAPIdResolver import _LOOKUPS_IN_FLIGHT
+        ldap3mock.setLDAPDirectory(LDAPDirectory)
+        resolver = self._get_batch_resolver(cache_timeout=120)
+        CACHE.pop(resolver.getResolverId(), None)
+        original_search = LDAPResolver._search
+        release = threading.Event()
+        search_filters = []
+
+        def slow_search(self, search_base, search_filter, attributes):
+            search_filters.append(search_filter)
+            release.wait(5)
+            return original_search(self, search_base, search_filter, attributes)
+
+        def wait_for_waiters(waiters):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if [call for call in _LOOKUPS_IN_FLIGHT._calls.values() if call.waiters == waiters]:
+                    return
+                time.sleep(0.01)
+            self.fail(f"Not {waiters} waiting threads")
+
+        # Concurrent lookups of the same user send one search
+        user_ids = []
+        with mock.patch.object(LDAPResolver, "_search", slow_search):
+            threads = [threading.Thread(target=lambda: user_ids.append(resolver.getUserId("alice")))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            wait_for_waiters(2)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(["2", "2", "2"], user_ids)
+        self.assertEqual(1, len(search_filters), search_filters)
+
+        # An unknown user is cached for the negative cache timeout only
+        self.assertEqual(10, resolver.negative_cache_timeout)
+        self.assertEqual("", resolver.getUserId("unknown"))
+        with self._count_searches() as search_filters:
+            self.assertEqual("", resolver.getUserId("unknown"))
+        self.assertEqual(0, len(search_filters), search_filters)
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        with mock.patch('privacyidea.lib.resolvers.LDAPIdResolver.datetime.datetime',
+                        wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = now + datetime.timedelta(seconds=11)
+            with self._count_searches() as search_filters:
+                self.assertEqual("", resolver.getUserId("unknown"))
+                # while a known user is still cached
+                self.assertEqual("2", resolver.getUserId("alice"))
+        self.assertEqual(1, len(search_filters), search_filters)
+
+        # and the entry of the unknown user is evicted before the older entry of the known user
+        bucket = CACHE[resolver.getResolverId()]["getUserId"]
+        self.assertEqual(["alice", "unknown"], list(bucket.keys()))
+        with mock.patch('privacyidea.lib.resolvers.LDAPIdResolver.datetime.datetime',
+                        wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = now + datetime.timedelta(seconds=22)
+            self.assertEqual("3", resolver.getUserId("bob"))
+        self.assertEqual(["alice", "bob"], list(bucket.keys()))
+
+        # Unknown users are not cached with a negative cache timeout of 0
+        resolver.negative_cache_timeout = 0
+        CACHE.pop(resolver.getResolverId(), None)
+        resolver.getUserId("unknown")
+        self.assertNotIn("unknown", CACHE[resolver.getResolverId()].get("getUserId", {}))
+        CACHE.pop(resolver.getResolverId(), None)
+
+    @ldap3mock.activate
+    def test_56_connection_pool(self):
+        from ldap3.core.exceptions import LDAPSessionTerminatedByServerError
+        ldap3mock.setLDAPDirectory(LDAPDirectory)
+        get_app_local_store().pop("ldap_connection_pools", None)
+
+        def pooled_resolver():
+            resolver = self._get_batch_resolver()
+            resolver.connection_pool_size = 2
+            resolver.timeout = 1
+            return resolver
+
+        def in_app_context(func):
+            def run():
+                with self.app.app_context():
+                    func()
+            return run
+
+        # The connection is returned to the pool after the request and reused by other threads
+        resolver1, resolver2, resolver3 = pooled_resolver(), pooled_resolver(), pooled_resolver()
+        self.assertEqual("2", resolver1.getUserId("alice"))
+        pool = resolver1.get_connection_pool("service")
+        connection = resolver1.connection
+        resolver1.unbind()
+        self.assertIsNone(resolver1.connection)
+        self.assertEqual((1, 1), (pool.size, pool.idle))
+        user_ids = []
+        thread = threading.Thread(target=in_app_context(
+            lambda: (user_ids.append(resolver2.getUserId("bob")), resolver2.unbind())))
+        thread.start()
+        thread.join(5)
+        self.assertEqual(["3"], user_ids)
+        self.assertIs(pool, resolver2.get_connection_pool("service"))
+        self.assertIs(connection, pool._idle[0][0])
+        self.assertTrue(connection.bound)
+
+        # At most two connections are open, a third thread waits for a connection
+        resolver1._bind()
+        resolver2._bind()
+        self.assertEqual((2, 0), (pool.size, pool.idle))
+        with mock.patch("privacyidea.lib.resolvers.LDAPIdResolver.observe") as mock_observe:
+            self.assertRaises(ResolverError, resolver3._bind)
+            mock_observe.assert_called_once()
+            name, wait_time, labels = mock_observe.call_args[0]
+            self.assertEqual("ldap_pool_wait_seconds", name)
+            self.assertGreaterEqual(wait_time, 1)
+            self.assertEqual({"resolver": resolver3.getResolverId()}, labels)
+
+            thread = threading.Thread(target=in_app_context(resolver3._bind))
+            thread.start()
+            time.sleep(0.1)
+            connection = resolver1.connection
+            resolver1.unbind()
+            thread.join(5)
+        self.assertIs(connection, resolver3.connection)
+        resolver2.unbind()
+        resolver3.unbind()
+        self.assertEqual((2, 2), (pool.size, pool.idle))
+
+        # Connections idle for longer than the idle timeout are closed
+        idle_connections = [idle_connection for idle_connection, _released in pool._idle]
+        with mock.patch("privacyidea.lib.resolvers.LDAPIdResolver.time") as mock_time:
+            mock_time.monotonic.return_value = time.monotonic() + 61
+            resolver1._bind()
+        self.assertNotIn(resolver1.connection, idle_connections)
+        self.assertTrue(all(idle_connection.closed for idle_connection in idle_connections))
+        self.assertEqual((1, 0), (pool.size, pool.idle))
+
+        # A connection closed by the server is replaced
+        with mock.patch.object(resolver1.connection, "search",
+                               side_effect=LDAPSessionTerminatedByServerError("closed")):
+            self.assertEqual("alice", resolver1.getUsername("2"))
+        self.assertEqual((1, 0), (pool.size, pool.idle))
+        resolver1.unbind()
+
+        # The passwords are checked on the connections of another pool
+        for resolver, user_id, password, valid in [(resolver1, "2", "alicepw", True),
+                                                   (resolver2, "2", "wrong", False),
+                                                   (resolver3, "3", "bobpwééé", True)]:
+            self.assertEqual(valid, resolver.checkPass(user_id, password))
+            resolver.unbind()
+        authentication_pool = resolver1.get_connection_pool("authentication")
+        self.assertEqual((1, 1), (authentication_pool.size, authentication_pool.idle))
+        self.assertEqual((1, 1), (pool.size, pool.idle))
+
+        # The pool is replaced if the configuration changes
+        resolver1.bindpw = "changed"
+        self.assertIsNot(pool, resolver1.get_connection_pool("service"))
+        self.assertEqual((0, 0), (pool.size, pool.idle))
+        get_app_local_store().pop("ldap_connection_pools", None)
+
 
 class BaseResolverTestCase(MyTestCase):
 
@@ -3446,6 +3711,43 @@ class ResolverTestCase(MyTestCase):
         reso_obj = get_resolver_object("unknown")
         self.assertTrue(reso_obj is None, reso_obj)
 
+    def test_07_resolver_object_is_reused(self):
+        resolver_name = "reso_reused"
+        save_resolver({"resolver": resolver_name,
+                       "type": "passwdresolver",
+                       "fileName": PWFILE})
+        reso_obj = get_resolver_object(resolver_name)
+        # The next request of the same thread gets the same object
+        get_request_local_store().pop("resolver_objects", None)
+        with mock.patch.object(reso_obj, "close") as mock_close:
+            self.assertIs(reso_obj, get_resolver_object(resolver_name))
+            call_finalizers()
+        # the resolver is closed at the end of the request
+        mock_close.assert_called_once()
+
+        # Another thread gets its own object
+        other_objects = []
+
+        def get_object_in_thread():
+            with self.app.app_context():
+                other_objects.append(get_resolver_object(resolver_name))
+
+        thread = threading.Thread(target=get_object_in_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(1, len(other_objects))
+        self.assertIsNot(reso_obj, other_objects[0])
+
+        # A changed configuration creates a new object
+        save_resolver({"resolver": resolver_name,
+                       "type": "passwdresolver",
+                       "fileName": "/etc/passwd"})
+        get_request_local_store().pop("resolver_objects", None)
+        new_obj = get_resolver_object(resolver_name)
+        self.assertIsNot(reso_obj, new_obj)
+        self.assertEqual("/etc/passwd", new_obj.file_name)
+        delete_resolver(resolver_name)
+
     def test_10_delete_resolver(self):
         # get the list of the resolvers
         reso_list = get_resolver_list()
@@ -3600,6 +3902,15 @@ class ResolverTestCase(MyTestCase):
         delete_realm("myrealm")
         delete_resolver(self.resolvername1)
 
+    def test_16_save_resolver_evicts_shared_lookups(self):
+        with mock.patch("privacyidea.lib.resolver.evict_resolver_lookups") as mock_evict:
+            save_resolver({"resolver": "reso_evict",
+                           "type": "passwdresolver",
+                           "fileName": "/etc/passwd"})
+            mock_evict.assert_called_once_with("reso_evict")
+            delete_resolver("reso_evict")
+            self.assertEqual(2, mock_evict.call_count)
+
     def test_replace_censored_values(self):
         old_config = {"data": {"key1": "secret1", "layer1": {"layer2": {"layer3": "secret2"}}},
                       "censor_keys": ["key1", "layer1.layer2.layer3"]}
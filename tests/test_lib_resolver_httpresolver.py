@@ -1,5 +1,8 @@
 import copy
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Optional, Union
 from urllib.parse import quote
 
@@ -10,6 +13,7 @@ from requests.exceptions import SSLError
 
 from privacyidea.api.lib.utils import get_required
 from privacyidea.lib.error import ResolverError, ParameterError
+from privacyidea.lib.framework import get_app_local_store
 from privacyidea.lib.resolvers.EntraIDResolver import (EntraIDResolver, CLIENT_ID, TENANT, AUTHORITY, CLIENT_SECRET,
                                                        CLIENT_CREDENTIAL_TYPE, CLIENT_CERTIFICATE, PRIVATE_KEY_FILE,
                                                        CERTIFICATE_FINGERPRINT, ClientCredentialType,
@@ -22,7 +26,7 @@ from privacyidea.lib.resolvers.HTTPResolver import (HTTPResolver, RequestConfig,
                                                     CONFIG_GET_USER_BY_NAME, ADVANCED, CONFIG_CREATE_USER,
                                                     CONFIG_USER_AUTH, CONFIG_DELETE_USER, CONFIG_EDIT_USER, HTTPMethod,
                                                     CONFIG_GET_USER_GROUPS, ACTIVE, USER_GROUPS_ATTRIBUTE,
-                                                    PI_USER_GROUPS_KEY)
+                                                    PI_USER_GROUPS_KEY, POOL_SIZE, RETRIES, CACHE_TIMEOUT)
 from privacyidea.lib.resolvers.KeycloakResolver import KeycloakResolver, REALM
 from tests.base import MyTestCase
 
@@ -1214,6 +1218,36 @@ class HTTPResolverTestCase(MyTestCase):
         self.assertEqual("Test", response.get('givenname'))
         self.assertSetEqual({"username", "givenname"}, set(response.keys()))
 
+    def test_14b_concurrent_requests_for_a_user_are_coalesced(self):
+        from privacyidea.lib.resolvers.HTTPResolver import _REQUESTS_IN_FLIGHT
+        instance = HTTPResolver()
+        instance.loadConfig(self.basic_config)
+        release = threading.Event()
+
+        def slow_get_user(user_identifier, config, attributes=None):
+            release.wait(5)
+            return {"username": user_identifier}
+
+        results = []
+        with mock.patch.object(instance, "_get_user", side_effect=slow_get_user) as mock_get_user:
+            threads = [threading.Thread(target=lambda: results.append(instance.get_user_info("PepePerez")))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while not [call for call in _REQUESTS_IN_FLIGHT._calls.values() if call.waiters == 2]:
+                self.assertLess(time.monotonic(), deadline, "The requests were not coalesced")
+                time.sleep(0.01)
+            # A request for another user is sent at once
+            release.set()
+            self.assertEqual({"username": "Juan"}, instance.get_user_info("Juan"))
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual([{"username": "PepePerez"}] * 3, results)
+        # Each thread gets its own copy of the result
+        self.assertEqual(3, len({id(result) for result in results}))
+        self.assertEqual(2, mock_get_user.call_count)
+
     def test_15_get_config(self):
         resolver = HTTPResolver()
         default_config = resolver.get_config()
@@ -1496,7 +1530,7 @@ class HTTPResolverTestCase(MyTestCase):
         self.assertListEqual([], groups)
 
         # SSL error
-        with mock.patch('requests.request', side_effect=SSLError("SSL error message")):
+        with mock.patch('requests.Session.request', side_effect=SSLError("SSL error message")):
             groups = instance.get_user_groups(user)
             self.assertListEqual([], groups)
 
@@ -1533,6 +1567,229 @@ class HTTPResolverTestCase(MyTestCase):
         keys = resolver.get_available_info_keys()
         self.assertSetEqual({"username", "userid", "givenname", "surname", custom_groups_key}, set(keys))
 
+    def test_27_connections_to_the_user_store_are_reused(self):
+        class UserStoreHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = json.dumps({"username": self.path.rsplit("/", 1)[-1]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), UserStoreHandler)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        get_app_local_store().pop("http_resolver_sessions", None)
+        try:
+            config = copy.deepcopy(self.advanced_config)
+            config[BASE_URL] = f"http://127.0.0.1:{server.server_address[1]}"
+            config[POOL_SIZE] = "2"
+            resolver = HTTPResolver()
+            resolver.loadConfig(config)
+            resolver.name = "http_pool"
+            other_resolver = HTTPResolver()
+            other_resolver.loadConfig(config)
+            other_resolver.name = "http_pool"
+
+            with mock.patch("privacyidea.lib.metrics.inc") as mock_inc:
+                for user in ["hans", "fritz", "franz"]:
+                    request_config = RequestConfig({METHOD: "GET", ENDPOINT: f"/users/{user}"}, {})
+                    self.assertEqual({"username": user},
+                                     resolver._do_request(request_config, None).json())
+                    request_config = RequestConfig({METHOD: "GET", ENDPOINT: f"/users/{user}"}, {})
+                    other_resolver._do_request(request_config, None)
+                # The counts are kept in memory until the next report is due
+                mock_inc.assert_not_called()
+                session = resolver.get_session()
+                session._counters.interval = 0
+                request_config = RequestConfig({METHOD: "GET", ENDPOINT: "/users/hans"}, {})
+                resolver._do_request(request_config, None)
+
+            # All requests of the resolver share one session and one connection
+            self.assertIs(session, other_resolver.get_session())
+            self.assertEqual(7, session.requests)
+            self.assertEqual(1, session.connections)
+            labels = {"resolver": "http_pool"}
+            mock_inc.assert_any_call("http_resolver_requests_total", labels, by=7)
+            mock_inc.assert_any_call("http_resolver_connections_total", labels, by=1)
+            self.assertEqual(2, session._adapter._pool_maxsize)
+
+            # A changed pool configuration creates a new session
+            config[RETRIES] = "0"
+            resolver.loadConfig(config)
+            self.assertIsNot(session, resolver.get_session())
+            self.assertEqual({POOL_SIZE: 2, RETRIES: 0},
+                             {key: resolver.get_config()[key] for key in (POOL_SIZE, RETRIES)})
+
+            # Invalid pool configurations are rejected
+            for key, value in ((POOL_SIZE, "0"), (POOL_SIZE, "many"), (RETRIES, "-1")):
+                invalid_config = dict(config, **{key: value})
+                self.assertRaises(ParameterError, HTTPResolver().loadConfig, invalid_config)
+        finally:
+            server.shutdown()
+            server.server_close()
+            get_app_local_store().pop("http_resolver_sessions", None)
+
+    @responses.activate
+    def test_28_auth_header_is_cached(self):
+        get_app_local_store().pop("http_resolver_auth_headers", None)
+        resolver = HTTPResolver()
+        config = copy.deepcopy(self.advanced_config)
+        config[CONFIG_AUTHORIZATION] = {METHOD: HTTPMethod.POST.value, ENDPOINT: "/token",
+                                        REQUEST_MAPPING: "username={username}&password={password}",
+                                        RESPONSE_MAPPING: '{"Authorization": "Bearer {access_token}"}',
+                                        HEADERS: '{"Content-Type": "application/x-www-form-urlencoded"}'}
+        config[USERNAME] = "admin"
+        config[PASSWORD] = "secret"
+        resolver.loadConfig(config)
+        resolver.name = "http_auth"
+        tokens = []
+        release = threading.Event()
+        release.set()
+
+        def token_callback(request):
+            release.wait(5)
+            tokens.append(f"token{len(tokens)}")
+            return 200, {}, json.dumps({"access_token": tokens[-1], "expires_in": 120})
+
+        responses.add_callback(responses.POST, "https://example.com/token", callback=token_callback)
+
+        # The header is requested once and used until shortly before it expires
+        self.assertEqual({"Authorization": "Bearer token0"}, resolver._get_auth_header())
+        self.assertEqual({"Authorization": "Bearer token0"}, resolver._get_auth_header())
+        self.assertEqual(1, len(tokens))
+        now = time.time()
+        with mock.patch("privacyidea.lib.resolvers.HTTPResolver.time") as mock_time:
+            mock_time.time.return_value = now + 89
+            self.assertEqual({"Authorization": "Bearer token0"}, resolver._get_auth_header())
+            mock_time.time.return_value = now + 91
+            self.assertEqual({"Authorization": "Bearer token1"}, resolver._get_auth_header())
+        self.assertEqual(2, len(tokens))
+
+        # Only one of several threads requests a new header
+        get_app_local_store().pop("http_resolver_auth_headers", None)
+        release.clear()
+        headers = []
+
+        def get_auth_header():
+            with self.app.app_context():
+                headers.append(resolver._get_auth_header())
+
+        threads = [threading.Thread(target=get_auth_header) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual([{"Authorization": "Bearer token2"}] * 3, headers)
+        self.assertEqual(3, len(tokens))
+
+        # A header rejected by the user store is requested again
+        responses.add(responses.GET, "https://example.com/users/1234", status=401, body="{}")
+        resolver.get_user_info("1234")
+        self.assertEqual({"Authorization": "Bearer token3"}, resolver._get_auth_header())
+        self.assertEqual(4, len(tokens))
+
+        # With Redis, the workers share the header
+        shared_entries = {}
+        client = mock.MagicMock()
+        client.get.side_effect = shared_entries.get
+        client.set.side_effect = lambda key, value, ex: shared_entries.__setitem__(key, value)
+        with mock.patch("privacyidea.lib.cache.redis.redis_client_for_feature", return_value=client):
+            get_app_local_store().pop("http_resolver_auth_headers", None)
+            self.assertEqual({"Authorization": "Bearer token4"}, resolver._get_auth_header())
+            self.assertEqual(1, len(shared_entries))
+            key, value = next(iter(shared_entries.items()))
+            self.assertTrue(key.startswith("pi:resolver_auth:http_auth:"))
+            # The token is encrypted
+            self.assertNotIn("token4", value)
+            # Another worker uses the shared header
+            get_app_local_store().pop("http_resolver_auth_headers", None)
+            self.assertEqual({"Authorization": "Bearer token4"}, resolver._get_auth_header())
+        self.assertEqual(5, len(tokens))
+
+        # The connection test always requests a new header
+        HTTPResolver.testconnection(config)
+        self.assertGreater(len(tokens), 5)
+        get_app_local_store().pop("http_resolver_auth_headers", None)
+
+    @responses.activate
+    def test_29_user_cache(self):
+        get_app_local_store().pop("http_resolver_user_caches", None)
+        resolver = HTTPResolver()
+        config = copy.deepcopy(self.advanced_config)
+        config[CACHE_TIMEOUT] = "120"
+        resolver.loadConfig(config)
+        resolver.name = "http_cache"
+        self.assertEqual(120, resolver.get_config()[CACHE_TIMEOUT])
+        get_user = responses.add(responses.GET, "https://example.com/users/1234", status=200,
+                                 body='{"id": "1234", "login": "hans", "first_name": "Hans"}')
+        unknown_user = responses.add(responses.GET, "https://example.com/users/unknown", status=404, body="{}")
+
+        # Each user is requested once
+        self.assertEqual("1234", resolver.getUserId("1234"))
+        self.assertEqual("hans", resolver.getUsername("1234"))
+        user_info = resolver.get_user_info("1234")
+        self.assertEqual("Hans", user_info["givenname"])
+        user_info["givenname"] = "Changed"
+        self.assertEqual("1234", resolver.getUserId("1234"))
+        self.assertEqual("hans", resolver.getUsername("1234"))
+        self.assertEqual("Hans", resolver.get_user_info("1234")["givenname"])
+        # getUserId, getUsername and get_user_info with all attributes
+        self.assertEqual(3, get_user.call_count)
+        user_cache = resolver.get_user_cache()
+        self.assertEqual(3, user_cache.hits)
+        # Unknown users are not cached
+        self.assertEqual({}, resolver.get_user_info("unknown"))
+        self.assertEqual({}, resolver.get_user_info("unknown"))
+        self.assertEqual(2, unknown_user.call_count)
+
+        # The users expire after the cache timeout
+        now = time.time()
+        with mock.patch("privacyidea.lib.resolvers.HTTPResolver.time") as mock_time:
+            mock_time.time.return_value = now + 119
+            resolver.get_user_info("1234")
+            self.assertEqual(3, get_user.call_count)
+            mock_time.time.return_value = now + 121
+            resolver.get_user_info("1234")
+            self.assertEqual(4, get_user.call_count)
+
+        # Editing or deleting a user clears the cache
+        responses.add(responses.PUT, "https://example.com/users/1234", status=204)
+        self.assertTrue(resolver.update_user("1234", {"givenname": "Hansi"}))
+        self.assertEqual(0, len(user_cache))
+        resolver.get_user_info("1234")
+        self.assertEqual(5, get_user.call_count)
+        responses.add(responses.DELETE, "https://example.com/users/1234", status=204)
+        self.assertTrue(resolver.delete_user("1234"))
+        resolver.get_user_info("1234")
+        self.assertEqual(6, get_user.call_count)
+
+        # A changed configuration uses a new cache
+        config[CONFIG_GET_USER_BY_ID][HEADERS] = '{"Accept": "application/json"}'
+        resolver.loadConfig(config)
+        self.assertIsNot(user_cache, resolver.get_user_cache())
+        resolver.get_user_info("1234")
+        self.assertEqual(7, get_user.call_count)
+
+        # The cache is disabled by default
+        resolver = HTTPResolver()
+        resolver.loadConfig(self.advanced_config)
+        self.assertIsNone(resolver.get_user_cache())
+        resolver.get_user_info("1234")
+        resolver.get_user_info("1234")
+        self.assertEqual(9, get_user.call_count)
+        config[CACHE_TIMEOUT] = "-1"
+        self.assertRaises(ParameterError, resolver.loadConfig, config)
+        get_app_local_store().pop("http_resolver_user_caches", None)
+
 
 class ConfidentialClientApplicationMock:
     def __init__(self, client_id: str, authority: str, client_credential: Union[str, dict[str, str]]):
@@ -2812,6 +3069,11 @@ class KeycloakResolverTestCase(MyTestCase):
         # success
         auth_header = resolver._get_auth_header()
         self.assertEqual("Bearer 123456789", auth_header["Authorization"])
+        # The header is cached
+        calls = len(responses.calls)
+        self.assertEqual(auth_header, resolver._get_auth_header())
+        self.assertEqual(calls, len(responses.calls))
+        resolver.cache_auth_header = False
 
         # Fails
         resolver.password = "wrong"
@@ -1,6 +1,7 @@
 """
 This test file tests the lib.subscriptions.py
 """
+import time
 from datetime import datetime, timedelta
 
 import mock
@@ -19,6 +20,11 @@ from privacyidea.lib.subscriptions import (save_subscription,
                                            get_subscription_owner,
                                            get_latest_github_versions,
                                            invalidate_github_version_cache,
+                                           get_cached_users_with_active_tokens,
+                                           get_users_with_active_tokens,
+                                           invalidate_token_users_cache,
+                                           refresh_users_with_active_tokens,
+                                           check_signature,
                                            version_sort_key,
                                            _subscription_state,
                                            SubscriptionState,
@@ -144,6 +150,8 @@ class SubscriptionApplicationTestCase(MyTestCase):
         init_token({"type": "spass"}, user=User("cornelius", self.realm1))
 
         save_subscription(SUBSCRIPTION4)
+        # The number of users with tokens is cached
+        invalidate_token_users_cache()
 
         # We have only one user with tokens, so having a subscription of 3 is fine!
         s = check_subscription("demo_application")
@@ -151,6 +159,7 @@ class SubscriptionApplicationTestCase(MyTestCase):
 
         init_token({"type": "spass"}, user=User("shadow", self.realm1))
         init_token({"type": "spass"}, user=User("nopw", self.realm1))
+        invalidate_token_users_cache()
         # Now we have three users with tokens, but only two are allowed. We fail with a probabiliy of 1/3
         # Fail subscription check
         with mock.patch("random.randrange") as mock_random:
@@ -243,6 +252,63 @@ class SubscriptionApplicationTestCase(MyTestCase):
                 self.assertTrue(check_subscription("FreeRADIUS"))
         mock_get_subscription.assert_called_once_with("privacyidea")
 
+    def test_08_cached_users_with_active_tokens(self):
+        self.setUp_user_realms()
+        invalidate_token_users_cache()
+        token_users = get_users_with_active_tokens()
+        init_token({"type": "spass", "serial": "SPASS_COUNT1"}, user=User("passthru", self.realm1))
+        self.assertEqual(token_users + 1, get_users_with_active_tokens())
+        # Counting does not write to the database
+        with mock.patch.object(db.session, "commit") as mock_commit, \
+                mock.patch("privacyidea.lib.subscriptions.cache_token_users") as mock_share:
+            self.assertEqual(token_users + 1, get_cached_users_with_active_tokens())
+        mock_commit.assert_not_called()
+        self.assertEqual(token_users + 1, mock_share.call_args.args[0])
+        # The count is reused until it expires
+        init_token({"type": "spass", "serial": "SPASS_COUNT2"}, user=User("multichal", self.realm1))
+        with mock.patch("privacyidea.lib.subscriptions.get_users_with_active_tokens") as mock_count:
+            self.assertEqual(token_users + 1, get_cached_users_with_active_tokens())
+            mock_count.assert_not_called()
+        # Another worker reuses the count shared in Redis
+        subscriptions_module._token_users_cache.store(None, 0)
+        with mock.patch("privacyidea.lib.subscriptions.get_users_with_active_tokens") as mock_count, \
+                mock.patch("privacyidea.lib.subscriptions.get_token_users_from_cache",
+                           return_value=(token_users + 1, time.time() - 10)):
+            self.assertEqual(token_users + 1, get_cached_users_with_active_tokens())
+            mock_count.assert_not_called()
+        # An outdated shared count is counted again
+        subscriptions_module._token_users_cache.store(None, 0)
+        with mock.patch("privacyidea.lib.subscriptions.get_token_users_from_cache",
+                        return_value=(3, time.time() - 3600)):
+            self.assertEqual(token_users + 2, get_cached_users_with_active_tokens())
+        # The periodic task refreshes it
+        self.assertEqual(token_users + 2, refresh_users_with_active_tokens())
+        self.assertEqual(token_users + 2, get_cached_users_with_active_tokens())
+        # An expired count is counted again
+        self.app.config["PI_SUBSCRIPTION_TOKEN_USERS_TTL"] = 0
+        try:
+            with mock.patch("privacyidea.lib.subscriptions.get_users_with_active_tokens",
+                            return_value=7):
+                self.assertEqual(7, get_cached_users_with_active_tokens())
+        finally:
+            self.app.config.pop("PI_SUBSCRIPTION_TOKEN_USERS_TTL")
+        invalidate_token_users_cache()
+
+    def test_09_check_signature_is_cached(self):
+        subscription = get_subscription("demo_application")
+        if not subscription:
+            save_subscription(SUBSCRIPTION1)
+            subscription = get_subscription("demo_application")
+        subscriptions_module._signature_cache.clear()
+        with mock.patch("privacyidea.lib.subscriptions.Sign", wraps=subscriptions_module.Sign) as mock_sign:
+            self.assertTrue(check_signature(dict(subscription[0])))
+            self.assertTrue(check_signature(dict(subscription[0])))
+        mock_sign.assert_called_once()
+        # a modified record is verified again
+        modified = dict(subscription[0])
+        modified["num_tokens"] = 1000
+        self.assertRaisesRegex(SubscriptionError, "does not match", check_signature, modified)
+
 
 class PluginSubscriptionStatusTestCase(MyTestCase):
     """
@@ -568,10 +634,12 @@ class PluginSubscriptionStatusTestCase(MyTestCase):
         # the record is ignored and the free tier applies as if none were on file.
         unusable = [{"application": "privacyidea-cp", "date_till": None}]
         with mock.patch("privacyidea.lib.subscriptions.get_subscription", return_value=unusable):
+            invalidate_token_users_cache()
             with mock.patch("privacyidea.lib.subscriptions.get_users_with_active_tokens",
                             return_value=0):
                 self.assertTrue(check_subscription("privacyidea-cp"))
             # Far beyond the free tier it fails like an install without a subscription.
+            invalidate_token_users_cache()
             with mock.patch("privacyidea.lib.subscriptions.get_users_with_active_tokens",
                             return_value=100_000):
                 self.assertRaises(SubscriptionError, check_subscription, "privacyidea-cp")
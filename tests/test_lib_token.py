@@ -19,11 +19,12 @@ import datetime
 import hashlib
 import json
 import logging
+from contextlib import contextmanager
 
 import mock
 from dateutil import parser
 from dateutil.tz import tzlocal
-from sqlalchemy import select
+from sqlalchemy import event, select, update
 from testfixtures import log_capture
 
 from privacyidea.lib.challenge import get_challenges
@@ -73,6 +74,7 @@ from privacyidea.lib.user import (User)
 from privacyidea.lib.utils import b32encode_and_unicode, hexlify_and_unicode
 from privacyidea.models import (db, Token, Challenge, TokenRealm, TokenOwner)
 from .base import MyTestCase
+from .test_lib_token_list_lookups import count_statements
 
 PWFILE = "tests/testdata/passwords"
 OTPKEY = "3132333435363738393031323334353637383930"
@@ -80,6 +82,22 @@ OTPKE2 = "31323334353637383930313233343536373839AA"
 CHANGED_KEY = '31323334353637383930313233343536373839AA'
 
 
+@contextmanager
+def count_commits():
+    """Collect the commits of the database session while the block runs."""
+    commits = []
+    session = db.session()
+
+    def on_commit(committed_session):
+        commits.append(committed_session)
+
+    event.listen(session, "after_commit", on_commit)
+    try:
+        yield commits
+    finally:
+        event.remove(session, "after_commit", on_commit)
+
+
 class TokenTestCase(MyTestCase):
     """
     Test the lib.token on an interface level
@@ -2496,3 +2514,101 @@ class TokenTestCase(MyTestCase):
         self.assertIn("ORPHAN001", result.failed_tokens)
         # The persisted row must have been rolled back, not left orphaned
         self.assertEqual(get_tokens(serial="ORPHAN001"), [])
+
+    def test_71_check_token_list_coalesced_writes(self):
+        token = init_token({"serial": "COALESCE1", "type": "hotp", "otpkey": self.otpkey, "pin": "test"})
+        token.token.failcount = 3
+        token.token.save()
+        # The first OTP value of the RFC 4226 key
+        with count_commits() as commits:
+            res, reply = check_serial_pass("COALESCE1", "test755224")
+        self.assertTrue(res, reply)
+        # The conditional update of the OTP counter and the final commit of check_token_list
+        self.assertEqual(len(commits), 2)
+        token = get_one_token(serial="COALESCE1")
+        self.assertEqual(token.token.count, 1)
+        self.assertEqual(token.token.failcount, 0)
+        self.assertEqual(token.get_count_auth(), 1)
+        self.assertEqual(token.get_count_auth_success(), 1)
+
+        # A wrong OTP value increases the fail counter and the auth counter with a single commit
+        with count_commits() as commits:
+            res, _reply = check_serial_pass("COALESCE1", "test755224")
+        self.assertFalse(res)
+        self.assertEqual(len(commits), 1)
+        token = get_one_token(serial="COALESCE1")
+        self.assertEqual(token.token.failcount, 1)
+        self.assertEqual(token.get_count_auth(), 2)
+        self.assertEqual(token.get_count_auth_success(), 1)
+
+        # The increased fail counter is written, even if a later step fails
+        with mock.patch("privacyidea.lib.tokens.hotptoken.HotpTokenClass.is_previous_otp",
+                        side_effect=RuntimeError("failed")):
+            self.assertRaises(RuntimeError, check_serial_pass, "COALESCE1", "test755224")
+        db.session.rollback()
+        token = get_one_token(serial="COALESCE1")
+        self.assertEqual(token.token.failcount, 2)
+
+        # The OTP counter is only set, if it was not changed by a concurrent request
+        self.assertFalse(token.set_otp_count_if_unchanged(5, 0))
+        self.assertEqual(token.token.count, 1)
+        self.assertTrue(token.set_otp_count_if_unchanged(5, 1))
+        self.assertEqual(token.token.count, 5)
+        remove_token("COALESCE1")
+
+    def test_72_check_user_pass_loads_tokens_eagerly(self):
+        self.setUp_user_realms()
+        user = User("selfservice", self.realm1)
+        select_counts = {}
+        # The first OTP values of self.otpkey, the other tokens have different keys
+        for num_tokens, otp in [(1, "755224"), (4, "287082")]:
+            for i in range(num_tokens):
+                if not get_tokens(serial=f"EAGER{i}"):
+                    init_token({"serial": f"EAGER{i}", "type": "hotp", "pin": "test",
+                                "otpkey": self.otpkey[:-2] + f"{30 + i}"}, user=user)
+            with count_statements() as statements:
+                res, reply = check_user_pass(user, "test" + otp)
+            self.assertTrue(res, reply)
+            self.assertEqual(reply.get("serial"), "EAGER0", reply)
+            select_counts[num_tokens] = [statement for statement in statements if statement.startswith("SELECT")]
+            # The token info and the owners of all tokens are loaded with one query each and
+            # loaded again after the commit of the OTP counter
+            self.assertEqual(2, len([statement for statement in statements if "FROM tokeninfo" in statement]),
+                             statements)
+            self.assertEqual(2, len([statement for statement in statements if "FROM tokenowner" in statement
+                                     and not statement.startswith("SELECT token.")]), statements)
+        # The number of queries does not depend on the number of tokens of the user
+        self.assertEqual(len(select_counts[1]), len(select_counts[4]), select_counts)
+
+        # A failed authentication only writes the fail counters of the tokens
+        with count_statements() as statements:
+            res, _reply = check_user_pass(user, "test000000")
+        self.assertFalse(res)
+        self.assertGreaterEqual(len(select_counts[4]), len([statement for statement in statements
+                                                            if statement.startswith("SELECT")]), statements)
+        for token in get_tokens(user=user):
+            self.assertEqual(token.token.failcount, 1)
+            remove_token(token.token.serial)
+
+    def test_73_counter_writes_load_concurrent_changes(self):
+        for serial in ["CONCURRENT1", "CONCURRENT2"]:
+            init_token({"serial": serial, "type": "hotp", "otpkey": self.otpkey})
+        token1 = get_one_token(serial="CONCURRENT1")
+        token2 = get_one_token(serial="CONCURRENT2")
+        self.assertEqual(token2.token.failcount, 0)
+        # A concurrent request changes the counters of both tokens
+        db.session.execute(update(Token).where(Token.serial.in_(["CONCURRENT1", "CONCURRENT2"]))
+                           .values(failcount=3, count_auth=5)
+                           .execution_options(synchronize_session=False))
+        # The token takes the increased counter from the database
+        token1.inc_count_auth(commit_db_session=False)
+        self.assertEqual(token1.token.count_auth, 6)
+        # The commit of the OTP counter loads the changes of the other token
+        self.assertTrue(token1.set_otp_count_if_unchanged(2, 0))
+        self.assertEqual(token1.token.count, 2)
+        self.assertEqual(token2.token.failcount, 3)
+        self.assertEqual(token2.token.count_auth, 5)
+        self.assertFalse(token1.set_otp_count_if_unchanged(3, 0))
+        self.assertEqual(token1.token.count, 2)
+        remove_token(serial="CONCURRENT1")
+        remove_token(serial="CONCURRENT2")
@@ -0,0 +1,165 @@
+"""
+This tests the files
+  lib/token/otpindex.py
+  lib/task/otpindex.py
+"""
+from flask import current_app
+from sqlalchemy import func, select
+
+from privacyidea.lib.task.otpindex import OTPIndexTask
+from privacyidea.lib.token import (init_token, get_tokens, get_serial_by_otp, assign_token, remove_token,
+                                   get_otp_index_candidates, update_otp_index, prune_otp_index)
+from privacyidea.lib.token.attributes import set_hashlib
+from privacyidea.lib.user import User
+from privacyidea.models import db, TokenOTPIndex, TokenOTPIndexRange
+from .base import MyTestCase
+
+OTPKEY = "3132333435363738393031323334353637383930"
+OTPKEY2 = "3132333435363738393031323334353637383931"
+# RFC 4226 HOTP values of OTPKEY for the counters 0 to 9
+HOTP_VALUES = ["755224", "287082", "359152", "969429", "338314",
+               "254676", "287922", "162583", "399871", "520489"]
+
+
+def _index_entries(token_id=None):
+    stmt = select(func.count(TokenOTPIndex.id))
+    if token_id is not None:
+        stmt = stmt.where(TokenOTPIndex.token_id == token_id)
+    return db.session.scalar(stmt)
+
+
+def _index_range(token_id):
+    return db.session.get(TokenOTPIndexRange, token_id)
+
+
+class OTPIndexTestCase(MyTestCase):
+
+    def test_01_empty_index(self):
+        init_token({"serial": "IDX1", "type": "hotp", "otpkey": OTPKEY})
+        init_token({"serial": "IDX2", "type": "hotp", "otpkey": OTPKEY2})
+        tokens = get_tokens(assigned=False)
+        # Without index entries, all tokens are candidates
+        self.assertEqual(tokens, get_otp_index_candidates(tokens, "000000"))
+        self.assertEqual(_index_entries(), 0)
+        remove_token("IDX1")
+        remove_token("IDX2")
+
+    def test_02_update_and_lookup(self):
+        token1 = init_token({"serial": "IDX1", "type": "hotp", "otpkey": OTPKEY})
+        token2 = init_token({"serial": "IDX2", "type": "hotp", "otpkey": OTPKEY2})
+        tokens = get_tokens(assigned=False)
+        self.assertEqual(update_otp_index(tokens, lookahead=20, window=10), 2)
+        self.assertEqual(_index_entries(token1.token.id), 20)
+        index_range = _index_range(token1.token.id)
+        self.assertEqual((index_range.first_counter, index_range.last_counter), (0, 20))
+        # The index is up to date, so nothing is calculated again
+        self.assertEqual(update_otp_index(tokens, lookahead=20, window=10), 0)
+
+        # Only the token creating the OTP value is a candidate
+        candidates = get_otp_index_candidates(tokens, HOTP_VALUES[2])
+        self.assertEqual([token.token.serial for token in candidates], ["IDX1"])
+        self.assertEqual(get_otp_index_candidates(tokens, "000000"), [])
+        # The OTP value can be passed as a function, e.g. to split the PIN
+        candidates = get_otp_index_candidates(tokens, lambda token: token.split_pin_pass("pin" + HOTP_VALUES[2])[2])
+        self.assertEqual([token.token.serial for token in candidates], ["IDX1"])
+        # A window larger than the indexed range can not use the index
+        self.assertEqual(len(get_otp_index_candidates(tokens, "000000", window=50)), 2)
+
+        # A token, which is not indexed, is always a candidate
+        init_token({"serial": "IDX3", "type": "hotp", "otpkey": OTPKEY2})
+        tokens = get_tokens(assigned=False)
+        candidates = get_otp_index_candidates(tokens, HOTP_VALUES[2])
+        self.assertEqual([token.token.serial for token in candidates], ["IDX1", "IDX3"])
+
+        # Find the serial, which increases the counter and refreshes the index
+        self.assertEqual(get_serial_by_otp(tokens, HOTP_VALUES[2]), "IDX1")
+        index_range = _index_range(token1.token.id)
+        self.assertEqual((index_range.first_counter, index_range.last_counter), (3, 23))
+        # The used OTP value is no longer indexed
+        self.assertEqual(get_otp_index_candidates(get_tokens(serial="IDX1"), HOTP_VALUES[2]), [])
+        self.assertIsNone(get_serial_by_otp(get_tokens(assigned=False), HOTP_VALUES[2]))
+        self.assertEqual(get_serial_by_otp(get_tokens(assigned=False), HOTP_VALUES[5]), "IDX1")
+
+        # A changed counter, which is not yet indexed, makes the token a candidate again
+        token2.token.count = 5
+        token2.token.save()
+        candidates = get_otp_index_candidates(get_tokens(serial="IDX2"), HOTP_VALUES[2])
+        self.assertEqual([token.token.serial for token in candidates], ["IDX2"])
+
+        # Removing a token removes its index entries
+        remove_token("IDX1")
+        self.assertEqual(_index_entries(token1.token.id), 0)
+        self.assertIsNone(_index_range(token1.token.id))
+        remove_token("IDX2")
+        remove_token("IDX3")
+        self.assertEqual(_index_entries(), 0)
+
+    def test_03_totp(self):
+        token = init_token({"serial": "IDXT", "type": "totp", "otpkey": OTPKEY})
+        update_otp_index([token], lookahead=10, window=5)
+        index_range = _index_range(token.token.id)
+        self.assertEqual(index_range.time_step, 30)
+        # The default timeWindow of 180 seconds is larger than the search window
+        self.assertEqual(index_range.otp_window, 6)
+        self.assertEqual(index_range.last_counter - index_range.first_counter, 2 * 6 + 10)
+        current_otp = token.get_otp()[2]
+        candidates = get_otp_index_candidates([token], current_otp, window=5)
+        self.assertEqual(candidates, [token])
+        self.assertEqual(get_otp_index_candidates([token], "abcdef", window=5), [])
+        remove_token("IDXT")
+
+    def test_04_invalidate(self):
+        token = init_token({"serial": "IDX1", "type": "hotp", "otpkey": OTPKEY})
+        update_otp_index([token], lookahead=20)
+        self.assertEqual(_index_entries(token.token.id), 20)
+        # A changed hash algorithm changes the OTP values
+        set_hashlib("IDX1", "sha256")
+        self.assertEqual(_index_entries(token.token.id), 0)
+        self.assertIsNone(_index_range(token.token.id))
+        # A changed key is detected by the fingerprint
+        set_hashlib("IDX1", "sha1")
+        update_otp_index([token], lookahead=20)
+        token = init_token({"serial": "IDX1", "type": "hotp", "otpkey": OTPKEY2})
+        self.assertEqual(get_otp_index_candidates([token], "000000"), [token])
+        remove_token("IDX1")
+
+    def test_05_changed_settings(self):
+        token = init_token({"serial": "IDXT", "type": "totp", "otpkey": OTPKEY})
+        update_otp_index([token], lookahead=10, window=5)
+        # Settings changed via the tokeninfo do not remove the index entries, but the token is
+        # still found with the OTP values of its current settings
+        token.add_tokeninfo("hashlib", "sha256")
+        token.add_tokeninfo("timeStep", "60")
+        token.add_tokeninfo("timeShift", "-600")
+        token.save()
+        self.assertEqual(_index_entries(token.token.id), 2 * 6 + 10)
+        current_otp = token.get_otp()[2]
+        self.assertEqual(get_otp_index_candidates([token], current_otp, window=5), [token])
+        self.assertEqual(get_otp_index_candidates([token], "abcdef", window=5), [token])
+        # until the token is indexed again
+        self.assertEqual(update_otp_index([token], lookahead=10, window=5), 1)
+        self.assertEqual(get_otp_index_candidates([token], current_otp, window=5), [token])
+        self.assertEqual(get_otp_index_candidates([token], "abcdef", window=5), [])
+        remove_token("IDXT")
+
+    def test_06_prune_and_task(self):
+        self.setUp_user_realms()
+        init_token({"serial": "IDX1", "type": "hotp", "otpkey": OTPKEY}, tokenrealms=[self.realm1])
+        init_token({"serial": "IDX2", "type": "totp", "otpkey": OTPKEY2})
+        init_token({"serial": "IDXS", "type": "spass"})
+        task = OTPIndexTask(current_app.config)
+        self.assertEqual(set(task.options.keys()), {"realm", "lookahead", "window"})
+        # Only index the tokens of the realm
+        self.assertTrue(task.do({"realm": self.realm1, "lookahead": "30"}))
+        self.assertEqual(db.session.scalar(select(func.count(TokenOTPIndexRange.token_id))), 1)
+        self.assertEqual(_index_entries(), 30)
+        self.assertTrue(task.do({}))
+        self.assertEqual(db.session.scalar(select(func.count(TokenOTPIndexRange.token_id))), 2)
+
+        # An assigned token is removed from the index
+        assign_token("IDX1", User("cornelius", self.realm1))
+        self.assertEqual(prune_otp_index(), 1)
+        self.assertEqual(prune_otp_index(), 0)
+        self.assertEqual(db.session.scalar(select(func.count(TokenOTPIndexRange.token_id))), 1)
+        for serial in ("IDX1", "IDX2", "IDXS"):
+            remove_token(serial)
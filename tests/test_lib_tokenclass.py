@@ -14,11 +14,11 @@ from privacyidea.lib.challenge import get_challenges
 from privacyidea.lib.config import set_privacyidea_config
 from privacyidea.lib.container import init_container, add_token_to_container
 from privacyidea.lib.crypto import geturandom
-from privacyidea.lib.error import TokenAdminError
+from privacyidea.lib.error import TokenAdminError, ParameterError
 from privacyidea.lib.policies.actions import PolicyAction
 from privacyidea.lib.realm import (set_realm)
 from privacyidea.lib.resolver import save_resolver
-from privacyidea.lib.token import init_token, assign_tokengroup
+from privacyidea.lib.token import init_token, assign_tokengroup, get_tokens
 from privacyidea.lib.tokenclass import (TokenClass, DATE_FORMAT, AUTH_DATE_FORMAT)
 from privacyidea.lib.tokengroup import set_tokengroup
 from privacyidea.lib.user import (User)
@@ -1052,3 +1052,48 @@ class TokenBaseTestCase(MyTestCase):
         removed_user = token.remove_user()
         self.assertEqual(removed_user.login, "cornelius", removed_user)
         self.assertEqual(token.user, None, token.user)
+
+    def test_44_auth_counter_columns(self):
+        token = init_token({"type": "hotp", "genkey": True, "serial": "COUNTERCOLUMNS"})
+        self.assertEqual(token.get_count_auth(), 0)
+        self.assertNotIn("count_auth", token.get_tokeninfo())
+
+        # The counters are increased in the token table
+        self.assertEqual(token.inc_count_auth(), 1)
+        self.assertEqual(token.inc_count_auth_success(), 1)
+        self.assertEqual(token.get_count_auth(), 2)
+        self.assertEqual(token.token.count_auth, 2)
+        self.assertEqual(token.token.count_auth_success, 1)
+        self.assertEqual(token.get_tokeninfo("count_auth"), "2")
+        self.assertEqual(token.get_tokeninfo("count_auth_success"), "1")
+        # No tokeninfo entries are written
+        stmt = select(TokenInfo).where(TokenInfo.token_id == token.token.id,
+                                       TokenInfo.Key.in_(["count_auth", "count_auth_success"]))
+        self.assertEqual(db.session.scalars(stmt).all(), [])
+
+        # A second token object of the same token does not overwrite the increments
+        other_token = TokenClass(db.session.get(Token, token.token.id))
+        other_token.inc_count_auth_success()
+        token.inc_count_auth_success()
+        self.assertEqual(token.get_count_auth_success(), 3)
+        self.assertEqual(token.get_count_auth(), 4)
+
+        # The counters can still be set and filtered as tokeninfo
+        token.add_tokeninfo("count_auth", "10")
+        self.assertEqual(token.get_count_auth(), 10)
+        self.assertEqual([t.token.serial for t in get_tokens(tokeninfo={"count_auth": "10"})], ["COUNTERCOLUMNS"])
+        self.assertEqual(get_tokens(tokeninfo={"count_auth": "ten"}), [])
+        self.assertRaises(ParameterError, token.add_tokeninfo, "count_auth", "ten")
+
+        # last_auth and failcounter_exceeded are stored in the token table as well
+        token.add_tokeninfo(PolicyAction.LASTAUTH, "2025-03-21 07:24:12.164578+0000")
+        self.assertEqual(token.token.last_auth, "2025-03-21 07:24:12.164578+0000")
+        self.assertEqual(get_tokens(tokeninfo={"last_auth": "2025-03-21 07:24:12.164578+0000"})[0].token.serial,
+                         "COUNTERCOLUMNS")
+        token.delete_tokeninfo(PolicyAction.LASTAUTH)
+        self.assertIsNone(token.token.last_auth)
+        token.set_tokeninfo({"failcounter_exceeded": "2025-03-21T07:24+0000", "something": "else"})
+        self.assertEqual(token.get_tokeninfo(), {"failcounter_exceeded": "2025-03-21T07:24+0000",
+                                                 "something": "else"})
+        self.assertIsNone(token.token.count_auth)
+        token.delete_token()
@@ -6,6 +6,7 @@ The lib.tokenclass depends on the DB model and lib.user
 import binascii
 import datetime
 import hashlib
+import unittest
 import warnings
 
 import mock
@@ -21,6 +22,8 @@ from privacyidea.lib.realm import (set_realm)
 from privacyidea.lib.resolver import (save_resolver)
 from privacyidea.lib.token import import_tokens, get_tokens, init_token, remove_token
 from privacyidea.lib.tokenclass import DATE_FORMAT
+from privacyidea.lib.tokens import HMAC
+from privacyidea.lib.tokens.HMAC import HmacOtp
 from privacyidea.lib.tokens.hotptoken import HotpTokenClass
 from privacyidea.lib.user import (User)
 from privacyidea.lib.utils import b32encode_and_unicode
@@ -921,3 +924,59 @@ class HOTPTokenTestCase(MyTestCase):
 
         # Clean up
         remove_token(hotptoken.token.serial)
+
+
+class HmacOtpTestCase(MyTestCase):
+    otpkey = "3132333435363738393031323334353637383930"
+    # RFC 4226, Appendix D
+    rfc_values = ["755224", "287082", "359152", "969429", "338314",
+                  "254676", "287922", "162583", "399871", "520489"]
+
+    def setUp(self):
+        super().setUp()
+        self.token = init_token({"serial": "HMAC1", "type": "hotp", "otpkey": self.otpkey})
+
+    def _hmac_otp(self, counter=0, digits=6, hashfunc=hashlib.sha1):
+        return HmacOtp(self.token.token.get_otpkey(), counter, digits, hashfunc)
+
+    def tearDown(self):
+        remove_token("HMAC1")
+        super().tearDown()
+
+    def test_01_generate_range(self):
+        hmac_otp = self._hmac_otp()
+        self.assertEqual(hmac_otp.generate_range(0, 10), self.rfc_values)
+        self.assertEqual(hmac_otp.generate_range(5, 7), self.rfc_values[5:7])
+        self.assertEqual(hmac_otp.generate_range(3, 3), [])
+        # The same values as the counter-wise calculation
+        hmac_otp = self._hmac_otp(digits=8, hashfunc=hashlib.sha256)
+        self.assertEqual(hmac_otp.generate_range(0, 50),
+                         [hmac_otp.generate(counter=c, inc_counter=False) for c in range(50)])
+
+    def test_02_check_otp(self):
+        hmac_otp = self._hmac_otp()
+        self.assertEqual(hmac_otp.checkOtp("359152", 10), 2)
+        self.assertEqual(hmac_otp.checkOtp("520489", 9), -1)
+        self.assertEqual(hmac_otp.checkOtp("12345", 10), -1)
+        self.assertEqual(hmac_otp.checkOtp("", 10), -1)
+        hmac_otp = self._hmac_otp(counter=5)
+        self.assertEqual(hmac_otp.checkOtp("755224", 10), -1)
+        self.assertEqual(hmac_otp.checkOtp("755224", 5, symetric=True), 0)
+        self.assertEqual(hmac_otp.checkOtp("520489", 5, symetric=True), 9)
+        self.assertEqual(hmac_otp.checkOtp("287922", 0), -1)
+        # A large window without numpy
+        hmac_otp = self._hmac_otp(counter=0)
+        otp = hmac_otp.generate(counter=1500, inc_counter=False)
+        with mock.patch.object(HMAC, "np", None):
+            self.assertEqual(hmac_otp.scan_window(otp, 0, 2000), 1500)
+            self.assertEqual(hmac_otp.scan_window(otp, 0, 1500), -1)
+
+    @unittest.skipIf(HMAC.np is None, "numpy is not installed")
+    def test_03_check_otp_numpy(self):
+        for digits, hashfunc in [(6, hashlib.sha1), (8, hashlib.sha256), (8, hashlib.sha512)]:
+            hmac_otp = self._hmac_otp(digits=digits, hashfunc=hashfunc)
+            values = hmac_otp.generate_range(0, 2000)
+            self.assertEqual(hmac_otp.scan_window(values[1500], 0, 2000), values.index(values[1500]))
+            self.assertEqual(hmac_otp.scan_window(values[0], 1, 2000),
+                             values.index(values[0], 1) if values[0] in values[1:] else -1)
+            self.assertEqual(hmac_otp.scan_window("abcdef", 0, 2000), -1)
@@ -2,17 +2,20 @@
 This tests the package lib.utils
 """
 import binascii
+import threading
+import time
 from datetime import timedelta, datetime
+from unittest import mock
 
 import segno
 from dateutil.tz import tzlocal, tzoffset, gettz
-from netaddr import IPAddress, IPNetwork, AddrFormatError
+from netaddr import IPAddress, IPNetwork, IPSet, AddrFormatError
 
 from privacyidea.config import TestingConfig
 from privacyidea.lib.crypto import generate_password
-from privacyidea.lib.error import PolicyError, ParameterError
+from privacyidea.lib.error import PolicyError, ParameterError, ResolverError
 from privacyidea.lib.utils import (parse_timelimit,
-                                   check_time_in_range, parse_proxy,
+                                   check_time_in_range, parse_proxy, parse_trusted_proxies,
                                    check_proxy, reduce_realms, is_true,
                                    parse_date, get_data_from_params, parse_legacy_time,
                                    int_to_hex, parse_time_offset_from_now, censor_connect_string,
@@ -26,12 +29,14 @@ from privacyidea.lib.utils import (parse_timelimit,
                                    b64encode_and_unicode, create_img,
                                    convert_timestamp_to_utc, modhex_encode,
                                    modhex_decode, checksum, urlsafe_b64encode_and_unicode,
-                                   check_ip_in_policy, split_pin_pass, create_tag_dict,
+                                   check_ip_in_policy, compile_ip_policy, check_ip_in_ip_sets,
+                                   split_pin_pass, create_tag_dict,
                                    check_serial_valid, determine_logged_in_userparams,
                                    to_list, parse_string_to_dict, convert_imagefile_to_dataimage,
                                    get_plugin_info_from_useragent, get_computer_name_from_user_agent,
                                    redacted_email, redacted_phone_number,
                                    convert_wildcard_to_sql_like, SQL_LIKE_ESCAPE)
+from privacyidea.lib.utils.singleflight import SingleFlight
 from .base import MyTestCase, OverrideConfigTestCase
 
 
@@ -117,6 +122,12 @@ class UtilsTestCase(MyTestCase):
                              (IPNetwork("127.0.0.1/24"), IPNetwork("10.0.0.0/16")),
                              (IPNetwork("127.0.0.1/24"), IPNetwork("10.1.0.0/16"), IPNetwork("10.2.0.0/24"))
                          })
+        # The parsed proxy settings are cached
+        self.assertIs(parse_proxy("127.0.0.1/24 >  10.0.0.0/16"), parse_proxy("127.0.0.1/24 >  10.0.0.0/16"))
+        # as well as the networks of the first proxies
+        self.assertEqual(parse_trusted_proxies("127.0.0.1/24>10.0.0.0/16, 10.1.0.1>10.2.0.0/16"),
+                         IPSet(["127.0.0.0/24", "10.1.0.1/32"]))
+        self.assertIs(parse_trusted_proxies("127.0.0.1"), parse_trusted_proxies("127.0.0.1"))
 
     def test_04b_check_overrideclient(self):
         proxy_def = " 10.0.0.12, 1.2.3.4/16> 192.168.1.0/24, 172.16.0.1 " \
@@ -139,6 +150,11 @@ class UtilsTestCase(MyTestCase):
                          IPAddress("172.16.0.1"))  # 172.16.0.1 may not map to 1.2.3.4
         self.assertEqual(check_proxy(list(map(IPAddress, ["172.16.0.1", "10.1.2.3"])), proxy_def),
                          IPAddress("10.1.2.3"))  # 172.16.0.1 may map to 10.1.2.3
+        # A client, which is no proxy, is not checked against the proxy paths
+        with mock.patch("privacyidea.lib.utils.log") as mock_log:
+            self.assertEqual(check_proxy(list(map(IPAddress, ["192.0.2.1", "10.1.2.3"])), proxy_def),
+                             IPAddress("192.0.2.1"))
+        self.assertEqual(1, mock_log.debug.call_count)
 
         # Wrong proxy setting. No commas (issue 526)
         proxy_def = " 10.0.0.12 1.2.3.4/16> 192.168.1.0/24 172.16.0.1 " \
@@ -758,6 +774,23 @@ class UtilsTestCase(MyTestCase):
         self.assertTrue(excluded)
         self.assertTrue(found)
 
+        # The compiled IP sets can be checked repeatedly
+        ip_sets = compile_ip_policy(["10.0.0.0/8", "192.168.1.1", "-10.0.1.0/24", "2001:db8::/32"])
+        self.assertEqual((True, False), check_ip_in_ip_sets("10.1.2.3", ip_sets))
+        self.assertEqual((True, True), check_ip_in_ip_sets("10.0.1.2", ip_sets))
+        self.assertEqual((True, False), check_ip_in_ip_sets(IPAddress("192.168.1.1"), ip_sets))
+        self.assertEqual((False, False), check_ip_in_ip_sets("192.168.1.2", ip_sets))
+        self.assertEqual((True, False), check_ip_in_ip_sets("2001:db8::1", ip_sets))
+        # An empty policy does not parse the client
+        self.assertEqual((False, False), check_ip_in_ip_sets("no ip", compile_ip_policy([])))
+        self.assertRaises(AddrFormatError, check_ip_in_ip_sets, "no ip", ip_sets)
+        self.assertRaises(AddrFormatError, compile_ip_policy, ["10.0.0.300"])
+        # check_ip_in_policy compiles the IP sets of a policy value only once
+        with mock.patch("privacyidea.lib.utils.compile_ip_policy", wraps=compile_ip_policy) as mock_compile:
+            for client in ["172.16.0.1", "172.16.1.1", "172.17.0.1"]:
+                check_ip_in_policy(client, ["172.16.0.0/16", "!172.16.1.0/24", "192.0.2.1"])
+        self.assertEqual(1, mock_compile.call_count)
+
     def test_30_split_pin_pass(self):
         pin, otp = split_pin_pass("test1234", 4, True)
         self.assertEqual(pin, "test")
@@ -960,6 +993,77 @@ class UtilsTestCase(MyTestCase):
         self.assertEqual("****-********", redacted_phone_number(""))
 
 
+class SingleFlightTestCase(MyTestCase):
+
+    @staticmethod
+    def _wait_for_waiters(single_flight, key, waiters):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            call = single_flight._calls.get(key)
+            if call is not None and call.waiters == waiters:
+                return
+            time.sleep(0.01)
+        raise AssertionError(f"Not {waiters} waiting threads")
+
+    def test_01_concurrent_calls_are_coalesced(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def lookup(name):
+            calls.append(name)
+            release.wait(5)
+            return {"name": name}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight.do("alice", lookup, "alice")))
+                   for _ in range(4)]
+        threads[0].start()
+        self._wait_for_waiters(single_flight, "alice", 0)
+        for thread in threads[1:]:
+            thread.start()
+        self._wait_for_waiters(single_flight, "alice", 3)
+        # Another key is not coalesced
+        self.assertEqual({"name": "bob"}, single_flight.do("bob", lambda: {"name": "bob"}))
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(["alice"], calls)
+        self.assertEqual([{"name": "alice"}] * 4, results)
+        self.assertIs(results[0], results[3])
+        # The call is not kept after it returned
+        self.assertEqual({}, single_flight._calls)
+        self.assertEqual({"name": "alice"}, single_flight.do("alice", lookup, "alice"))
+        self.assertEqual(["alice", "alice"], calls)
+
+    def test_02_exception_is_raised_in_all_threads(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+
+        def lookup():
+            release.wait(5)
+            raise ResolverError("The user store is not available")
+
+        errors = []
+
+        def call():
+            try:
+                single_flight.do("alice", lookup)
+            except ResolverError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        threads[0].start()
+        self._wait_for_waiters(single_flight, "alice", 0)
+        threads[1].start()
+        self._wait_for_waiters(single_flight, "alice", 1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(2, len(errors))
+        self.assertEqual({}, single_flight._calls)
+
+
 class UtilsTestCaseOverrideConfig(OverrideConfigTestCase):
     class Config(TestingConfig):
         OFFLINE_MACHINE_KEYS = ["Hostname", "myMachineIdentifier", "otherMachineIdentifier"]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare the OTP window search of privacyidea.lib.tokens.HMAC.HmacOtp with the former counter-wise search.
+
+Resynchronization, autoassignment and the search for a serial by an OTP value
+check large windows of counters. The former search set up the key and a new
+HMAC object for every counter. This script measures the search for an OTP value,
+which is not contained in the window, i.e. the complete window is calculated,
+with the former search, the copied HMAC state and, if numpy is installed, the
+vectorized truncation.
+
+USAGE
+
+    python tools/benchmark_otp_window.py [--seconds 1] [--windows 10 100 10000]
+"""
+import argparse
+import binascii
+import hashlib
+import time
+
+from privacyidea.lib.crypto import SecretObj, safe_compare
+from privacyidea.lib.tokens import HMAC
+from privacyidea.lib.tokens.HMAC import HmacOtp
+
+OTPKEY = "3132333435363738393031323334353637383930"
+# Not an OTP value of OTPKEY in the measured windows
+MISSING_OTP = "000000"
+
+
+def _secret_object():
+    """A secret object with the key already set up, so that the benchmark does not need an encryption key."""
+    secret = SecretObj(None, None)
+    secret.bkey = binascii.unhexlify(OTPKEY)
+    return secret
+
+
+def _former_check(hmac_otp, otp, window):
+    for counter in range(hmac_otp.counter, hmac_otp.counter + window):
+        if safe_compare(hmac_otp.generate(counter), otp):
+            return counter
+    return -1
+
+
+def _rate(func, seconds):
+    """Call func repeatedly for the given time and return the calls per second."""
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="Time in seconds to measure each window")
+    parser.add_argument("--windows", type=int, nargs="+", default=[10, 100, 10000],
+                        help="The window sizes to measure")
+    args = parser.parse_args()
+
+    hmac_otp = HmacOtp(_secret_object(), 0, 6, hashlib.sha1)
+    numpy_available = HMAC.np is not None
+    print(f"{'window':>8} {'former/s':>10} {'copy/s':>10} {'numpy/s':>10} {'speedup':>8}")
+    for window in args.windows:
+        assert _former_check(hmac_otp, MISSING_OTP, window) == -1  # nosec B101 # sanity check of the benchmark
+        former_rate = _rate(lambda: _former_check(hmac_otp, MISSING_OTP, window), args.seconds)
+        numpy_module = HMAC.np
+        HMAC.np = None
+        try:
+            copy_rate = _rate(lambda: hmac_otp.scan_window(MISSING_OTP, 0, window), args.seconds)
+        finally:
+            HMAC.np = numpy_module
+        numpy_rate = None
+        if numpy_available and window >= HMAC.NUMPY_MIN_WINDOW:
+            numpy_rate = _rate(lambda: hmac_otp.scan_window(MISSING_OTP, 0, window), args.seconds)
+        best_rate = max(copy_rate, numpy_rate or 0)
+        numpy_column = f"{numpy_rate:>10.0f}" if numpy_rate else f"{'-':>10}"
+        print(f"{window:>8} {former_rate:>10.0f} {copy_rate:>10.0f} {numpy_column} "
+              f"{best_rate / former_rate:>7.1f}x")
+    if not numpy_available:
+        print("numpy is not installed, the vectorized truncation was not measured.")
+
+
+if __name__ == "__main__":
+    main()
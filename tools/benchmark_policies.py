@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compare the policy lookup of privacyidea.lib.policy.PolicyClass with and without the policy index.
+
+A single authentication request looks up the policies dozens of times. This script
+creates policy sets of increasing size, spread over several scopes, realms, users
+and client networks, and measures the lookups of a typical /validate/check
+request with the PolicyIndex built by the shared config object and with a
+linear search over all policies.
+
+USAGE
+
+    python tools/benchmark_policies.py [--seconds 1] [--policies 10 100 1000 5000]
+"""
+import argparse
+import datetime
+import time
+
+from flask import Flask
+
+from privacyidea.lib.config import LocalConfigClass
+from privacyidea.lib.framework import get_request_local_store
+from privacyidea.lib.policies.index import PolicyIndex
+from privacyidea.lib.policy import PolicyClass, SCOPE
+
+SCOPES = [SCOPE.AUTH, SCOPE.AUTHZ, SCOPE.ADMIN, SCOPE.USER, SCOPE.ENROLL, SCOPE.WEBUI]
+ACTIONS = ["otppin", "passthru", "passonnouser", "challenge_response", "increase_failcounter_on_challenge",
+           "api_key_required", "tokentype", "serial", "setrealm", "no_detail_on_success", "hotp_hashlib",
+           "totp_timestep", "reset_all_user_tokens", "auth_max_success", "auth_max_fail", "lastauth"]
+# The policy lookups of a /validate/check request, see the prepolicy and postpolicy decorators
+REQUEST_ACTIONS = ["otppin", "passthru", "passonnouser", "api_key_required", "setrealm", "challenge_response",
+                   "auth_max_success", "auth_max_fail", "lastauth", "tokentype", "serial",
+                   "no_detail_on_success", "increase_failcounter_on_challenge", "reset_all_user_tokens"]
+
+
+def _create_policies(count):
+    policies = []
+    for i in range(count):
+        policies.append({"name": f"policy{i}", "scope": SCOPES[i % len(SCOPES)], "active": i % 10 != 0,
+                         "action": {ACTIONS[i % len(ACTIONS)]: True, ACTIONS[(i * 7) % len(ACTIONS)]: True},
+                         "realm": [f"realm{i % 50}"] if i % 3 else [],
+                         "user": [f"user{i % 200}"] if i % 4 == 0 else [],
+                         "client": [f"10.{i % 256}.0.0/16"] if i % 5 == 0 else [],
+                         "resolver": [], "adminrealm": [], "adminuser": [], "pinode": [], "user_agents": [],
+                         "check_all_resolvers": False, "time": "", "conditions": [], "priority": i % 20 + 1,
+                         "user_case_insensitive": False})
+    return policies
+
+
+def _rate(func, seconds):
+    """Call func repeatedly for the given time and return the calls per second."""
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def _request_lookups(policy_object):
+    for action in REQUEST_ACTIONS:
+        policy_object.list_policies(scope=SCOPE.AUTH, action=action, realm="realm7", user="user42",
+                                    resolver="resolver1", client="10.5.1.2", active=True, user_agent="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="Time in seconds to measure each policy set")
+    parser.add_argument("--policies", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="The number of policies to measure")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with app.app_context():
+        store = get_request_local_store()
+        policy_object = PolicyClass()
+        print(f"{'policies':>8} {'index build ms':>15} {'linear req/s':>13} {'index req/s':>12} {'speedup':>8}")
+        for count in args.policies:
+            policies = _create_policies(count)
+            start = time.perf_counter()
+            policy_index = PolicyIndex(policies)
+            build_time = (time.perf_counter() - start) * 1000
+            rates = []
+            for index in (None, policy_index):
+                store["config_object"] = LocalConfigClass({}, {}, {}, None, policies, [], [],
+                                                          datetime.datetime.now(), policy_index=index)
+                rates.append(_rate(lambda: _request_lookups(policy_object), args.seconds))
+            print(f"{count:>8} {build_time:>15.1f} {rates[0]:>13.0f} {rates[1]:>12.0f} "
+                  f"{rates[1] / rates[0]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compare the throughput of the signature algorithms of privacyidea.lib.crypto.Sign.
+
+privacyIDEA signs every API response and every audit entry, so the signature
+algorithm is paid for twice per request. This script creates a fresh key for each
+algorithm and measures how many signatures per second it creates and verifies.
+
+USAGE
+
+    python tools/benchmark_signing.py [--seconds 2] [--rsa-keysize 2048 4096]
+
+The keys for the audit log and the responses are created with::
+
+    pi-manage setup create_audit_keys --algorithm ed25519
+"""
+import argparse
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+
+from privacyidea.lib.crypto import Sign
+
+# A typical audit entry as created by sqlaudit.Audit._log_to_string()
+MESSAGE = ("id=4711,date=2025-01-01 12:00:00.123456,action=POST /validate/check,succ=1,"
+           "serial=TOTP0001234,t=totp,u=alice,r=realm1,adm=,ad=,i=matching 1 tokens,"
+           "ps=privacyidea.example.com,c=10.0.0.1,l=default,cl=default")
+
+
+def _pem_keys(private_key):
+    private_pem = private_key.private_bytes(encoding=serialization.Encoding.PEM,
+                                            format=serialization.PrivateFormat.PKCS8,
+                                            encryption_algorithm=serialization.NoEncryption())
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo)
+    return private_pem, public_pem
+
+
+def _rate(func, seconds):
+    """Call func repeatedly for the given time and return the calls per second."""
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=2.0,
+                        help="Time in seconds to measure each operation")
+    parser.add_argument("--rsa-keysize", type=int, nargs="+", default=[2048, 4096],
+                        help="The RSA key sizes to measure")
+    args = parser.parse_args()
+
+    keys = [(f"RSA-PSS {keysize}", rsa.generate_private_key(public_exponent=65537, key_size=keysize))
+            for keysize in args.rsa_keysize]
+    keys.append(("ECDSA P-256", ec.generate_private_key(ec.SECP256R1())))
+    keys.append(("Ed25519", ed25519.Ed25519PrivateKey.generate()))
+
+    print(f"{'algorithm':<16} {'sig_ver':<16} {'sign/s':>10} {'verify/s':>10} {'sig length':>11}")
+    for name, private_key in keys:
+        sign_object = Sign(*_pem_keys(private_key))
+        signature = sign_object.sign(MESSAGE)
+        assert sign_object.verify(MESSAGE, signature)  # nosec B101 # sanity check of the benchmark
+        sign_rate = _rate(lambda: sign_object.sign(MESSAGE), args.seconds)
+        verify_rate = _rate(lambda: sign_object.verify(MESSAGE, signature), args.seconds)
+        print(f"{name:<16} {sign_object.sig_ver:<16} {sign_rate:>10.0f} {verify_rate:>10.0f} "
+              f"{len(signature):>11}")
+
+
+if __name__ == "__main__":
+    main()